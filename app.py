@@ -12,13 +12,15 @@ from tasks.demo_task import add
 from tasks.availability_gen_regen import gen_availability, gen_availability_venue
 from tasks.sms import (
     send_sms_confirmation_new, send_sms_confirmation_mod, send_sms_confirmation_can,
-    send_sms_merchant,
+    send_sms_merchant, warm_manage_link,
     send_email_confirmation_new_rest, send_email_confirmation_new, 
     send_email_confirmation_mod_rest, send_email_confirmation_mod,
     send_email_confirmation_can_rest, send_email_confirmation_can,
     send_email_confirmation_customer_new, send_email_confirmation_customer_mod, send_email_confirmation_customer_can
 )
 from tasks.utils.display_format import format_display_datetime
+from tasks.utils import short_links
+from tasks.utils import slot_index
 from tasks.celery_app import app as celery_app
 from tasks.analyze_knowledge import analyze_knowledge_file
 from tasks.scrape_url import scrape_url_to_markdown
@@ -1027,6 +1029,60 @@ def api_generate_venue_availability():
         }), 500
 
 
+@app.route('/api/availability/slots', methods=['GET'])
+@require_api_key
+def api_search_slots():
+    """
+    Earliest / range slot search over the slot index (tasks/utils/slot_index.py),
+    without fetching availability chunks.
+
+    Query parameters:
+        tenant_id, location_id   required
+        service_id               staff locations: starts that fit this service
+        party_size               venue locations: units seating this many
+        after                    local ISO datetime, e.g. 2026-10-19T18:00
+                                 (default: now in location_tz)
+        location_tz              used only to default `after`
+        before                   optional local ISO datetime upper bound
+        limit                    max slots returned (default 1 = earliest fit, max 100)
+    """
+    args = request.args
+    try:
+        tenant_id = int(args['tenant_id'])
+        location_id = int(args['location_id'])
+        service_id = int(args['service_id']) if args.get('service_id') else None
+        party_size = int(args['party_size']) if args.get('party_size') else None
+        limit = min(max(int(args.get('limit', 1)), 1), 100)
+        if args.get('after'):
+            after = datetime.fromisoformat(args['after']).replace(tzinfo=None)
+        elif args.get('location_tz'):
+            after = slot_index.local_now(args['location_tz'])
+        else:
+            return jsonify({'error': 'after or location_tz required'}), 400
+        before = datetime.fromisoformat(args['before']).replace(tzinfo=None) if args.get('before') else None
+    except KeyError as e:
+        return jsonify({'error': 'Missing required parameter', 'parameter': str(e).strip("'")}), 400
+    except Exception as e:
+        return jsonify({'error': 'Invalid parameter', 'message': str(e)}), 400
+
+    client = slot_index._client()
+    if client is None:
+        return jsonify({'error': 'Slot index not configured'}), 503
+    try:
+        slots = slot_index.search(client, tenant_id, location_id, after, before=before,
+                                  service_id=service_id, party_size=party_size, limit=limit)
+    except Exception as e:
+        return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
+
+    return jsonify({
+        'tenant_id': tenant_id,
+        'location_id': location_id,
+        'after': after.isoformat(timespec='minutes'),
+        'slots': slots,
+        'count': len(slots),
+    }), 200
+
+
 @app.route('/api/task/<task_id>', methods=['GET'])
 @require_api_key
 def api_get_task_status(task_id):
@@ -1305,6 +1361,11 @@ def api_send_sms():
                 'valid_actions': ['new', 'modify', 'cancel']
             }), 400
         
+        # No customer SMS went out, so nothing has shortened the manage link yet —
+        # do it now so the first reminder doesn't wait on it.
+        if action in ('new', 'modify') and not notify_customer:
+            warm_manage_link.delay(booking_id)
+
         response = {
             'message': f'{action_description.title()} tasks started',
             'booking_id': booking_id,
@@ -1329,6 +1390,15 @@ def api_send_sms():
         }), 500
 
 
+@app.route('/s/<code>', methods=['GET'])
+def short_link_redirect(code):
+    """Our own short links (tasks/utils/short_links.py, SHORT_LINK_BASE_URL)."""
+    long_url = short_links.resolve(code)
+    if not long_url:
+        return jsonify({'error': 'Not found'}), 404
+    return redirect(long_url, code=302)
+
+
 @app.route('/api/booking/merchant_sms', methods=['POST'])
 @require_api_key
 def api_send_merchant_sms():
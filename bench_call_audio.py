@@ -0,0 +1,151 @@
+"""
+Benchmark: VAD post-processing in tasks/utils/call_audio.py on a synthetic
+10-minute stereo call — frame loops vs the NumPy versions, and the in-memory
+vs the streaming analyze_caller (time and peak traced memory).
+
+The call is synthesised (no customer audio): alternating caller/agent turns of
+voiced tone bursts with silence between them, at the 22050 Hz the stored
+recordings use. Times each stage and the whole analyze_caller, and checks the
+loop and vectorised versions agree.
+
+    python bench_call_audio.py
+"""
+
+import io
+import os
+import time
+import tracemalloc
+
+import numpy as np
+import soundfile as sf
+
+from tasks.utils import call_audio as ca
+
+SR = 22050
+MINUTES = float(os.getenv("BENCH_MINUTES", "10"))
+REPEAT = int(os.getenv("BENCH_REPEAT", "5"))
+
+
+def _tone(seconds, amplitude, rng):
+    t = np.arange(int(seconds * SR)) / SR
+    f = rng.uniform(180, 320)
+    w = (np.sin(2 * np.pi * f * t) + 0.5 * np.sin(2 * np.pi * 2 * f * t)
+         + 0.3 * np.sin(2 * np.pi * 3.5 * f * t)) * (1 + 0.4 * np.sin(2 * np.pi * 4 * t))
+    return (w / np.abs(w).max() * amplitude).astype(np.int16)
+
+
+def synthetic_call(minutes):
+    rng = np.random.default_rng(0)
+    n = int(minutes * 60 * SR)
+    caller = np.zeros(n, dtype=np.int16)
+    agent = np.zeros(n, dtype=np.int16)
+    pos, speaker = int(SR * 0.5), 1
+    while pos < n:
+        turn = int(rng.uniform(0.6, 6.0) * SR)
+        burst = _tone(turn / SR, rng.uniform(2000, 12000), rng)[: n - pos]
+        (agent if speaker else caller)[pos:pos + len(burst)] = burst
+        pos += len(burst) + int(rng.uniform(0.3, 2.0) * SR)
+        speaker ^= 1
+    buf = io.BytesIO()
+    sf.write(buf, np.stack([caller, agent], axis=1), SR, format="WAV", subtype="PCM_16")
+    return buf.getvalue()
+
+
+def loop_hangover(raw):
+    out, run = raw.copy(), 0
+    for i, v in enumerate(raw):
+        if v:
+            run = ca.HANGOVER_FRAMES
+        elif run:
+            out[i] = True
+            run -= 1
+    return out
+
+
+def loop_segments(mask, min_s=ca.MIN_UTTERANCE_S):
+    out, on, start = [], False, 0
+    for i, v in enumerate(mask):
+        if v and not on:
+            on, start = True, i
+        elif not v and on:
+            on = False
+            if (i - start) * ca.FRAME_S >= min_s:
+                out.append((round(start * ca.FRAME_S, 2), round(i * ca.FRAME_S, 2)))
+    if on and (len(mask) - start) * ca.FRAME_S >= min_s:
+        out.append((round(start * ca.FRAME_S, 2), round(len(mask) * ca.FRAME_S, 2)))
+    return out
+
+
+def loop_rms(x, segs):
+    out = []
+    for s, e in segs:
+        seg = x[int(s * SR):int(e * SR)].astype(np.float64)
+        out.append(round(float(np.sqrt((seg ** 2).mean())), 1) if seg.size else 0.0)
+    return out
+
+
+def loop_vad(x, n, fl):
+    import webrtcvad
+    vad = webrtcvad.Vad(ca.AGGRESSIVENESS)
+    buf = x[: n * fl].tobytes()
+    return np.fromiter(
+        (vad.is_speech(buf[i * fl * 2:(i + 1) * fl * 2], ca.VAD_RATE) for i in range(n)),
+        dtype=bool, count=n,
+    )
+
+
+def view_vad(x, n, fl):
+    import webrtcvad
+    vad = webrtcvad.Vad(ca.AGGRESSIVENESS)
+    buf = memoryview(np.ascontiguousarray(x[: n * fl])).cast("B")
+    step = fl * 2
+    return np.array([vad.is_speech(buf[i:i + step], ca.VAD_RATE)
+                     for i in range(0, n * step, step)], dtype=bool)
+
+
+def best(fn, *args):
+    times = []
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        times.append(time.perf_counter() - t0)
+    return min(times) * 1000, result
+
+
+def main():
+    audio = synthetic_call(MINUTES)
+    caller, _, sr = ca.load(audio)
+    energy, x, fl, n = ca.frame_energy(caller, sr)
+    raw = loop_vad(x, n, fl) & (energy > ca.energy_floor(energy))
+    mask = loop_hangover(raw)
+    segs = loop_segments(mask)
+    print(f"{MINUTES:g}-minute stereo call: {n} frames/channel, {len(segs)} caller utterances; "
+          f"best of {REPEAT}, ms")
+    print(f"{'stage':<12} {'loop':>9} {'numpy':>9} {'speedup':>8}  same")
+    stages = [
+        ("vad feed", loop_vad, view_vad, (x, n, fl)),
+        ("hangover", loop_hangover, ca.hangover, (raw,)),
+        ("segments", loop_segments, ca.segments, (mask,)),
+        ("rms", lambda s: loop_rms(caller, s),
+         lambda s: [ca.segment_rms(caller, sr, a, b) for a, b in s], (segs,)),
+    ]
+    for name, before, after, args in stages:
+        t_before, r_before = best(before, *args)
+        t_after, r_after = best(after, *args)
+        same = np.array_equal(r_before, r_after) if isinstance(r_before, np.ndarray) else r_before == r_after
+        print(f"{name:<12} {t_before:>9.2f} {t_after:>9.2f} {t_before / t_after:>7.1f}x  {same}")
+
+    print(f"\nanalyze_caller, both channels ({len(audio) / 1e6:.1f}MB WAV input)")
+    print(f"{'path':<12} {'ms':>9} {'peak MB':>9}  same")
+    results = {}
+    for name, stream in (("in memory", False), ("streaming", True)):
+        ms, results[name] = best(lambda: ca.analyze_caller(audio, stream=stream))
+        tracemalloc.start()
+        ca.analyze_caller(audio, stream=stream)
+        peak = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+        print(f"{name:<12} {ms:>9.1f} {peak:>9.1f}  {results[name] == results['in memory']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark: classifying log lines in tasks/utils/call_quality_rules.py —
+the linear scan over every pattern vs the tag-indexed classifier.
+
+Builds a pull_render_logs-sized sweep (20,000 lines by default) in the mix a
+real call log has: mostly lines from tags no rule cares about, then the Azure
+event stream the rules read. Reports lines per second for both and checks they
+classify every line identically.
+
+    python bench_call_quality_rules.py
+"""
+
+import os
+import random
+import time
+
+from tasks.utils.call_quality_rules import _PATTERNS, _classify, _parse_ts, Event
+
+LINES = int(os.getenv("BENCH_LINES", "20000"))
+REPEAT = int(os.getenv("BENCH_REPEAT", "5"))
+
+_SIGNAL = [
+    "[Azure] Caller speech started",
+    "[Azure] Caller speech started (barge-in: generating=True buffered_marks=2)",
+    "[Azure] Caller stopped speaking — VAD end-of-turn",
+    "[Azure] Input audio buffer committed",
+    "[Azure] Caller transcript: I'd like a table for two tomorrow at seven",
+    "[Azure] Assistant transcript: Sure, let me check that for you.",
+    "[Azure] Response completed: id=resp_1 status=completed audio_chunks=40 "
+    "audio_bytes=52000 twilio_sent=52000",
+    "[PlaybackClock] response playback confirmed (ack-last): id=resp_1 gen=1",
+    "[Azure] Response audio complete: azure_chunks=12 azure_bytes=44000",
+    '[TurnMetrics] {"turn": 3, "latency_ms": 812}',
+    "[Azure] Tool call: check_availabilities call_id=c1 params={}",
+    "[Azure] Tool result: check_availabilities call_id=c1 result={'ok': true}",
+]
+_NOISE = [
+    "[Azure] Sent audio chunk to Twilio: 640 bytes",
+    "[Azure] Received response.audio.delta",
+    "[Twilio] media event seq=1832",
+    "[Latency] stt=212ms llm=640ms tts=180ms",
+    "[SessionState] turn=4 state=listening",
+    "GET /health 200 0.4ms",
+    "[Redis] cache hit availability:35:2026-08-14",
+]
+
+
+def sweep(n):
+    rng = random.Random(0)
+    return [
+        {"seq": i, "ts": f"2026-08-13T10:{i // 60 % 60:02d}:{i % 60:02d}.000Z", "level": "info",
+         "msg": rng.choice(_SIGNAL) if rng.random() < 0.25 else rng.choice(_NOISE)}
+        for i in range(n)
+    ]
+
+
+def linear_classify(obj):
+    msg = obj.get("msg") or ""
+    for kind, pattern in _PATTERNS:
+        match = pattern.match(msg)
+        if match:
+            return Event(seq=obj.get("seq"), ts=_parse_ts(obj.get("ts")),
+                         level=(obj.get("level") or "").lower(), kind=kind,
+                         msg=msg, data=match.groupdict())
+    return None
+
+
+def rate(classify, lines):
+    best = float("inf")
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        for obj in lines:
+            classify(obj)
+        best = min(best, time.perf_counter() - t0)
+    return len(lines) / best
+
+
+def main():
+    lines = sweep(LINES)
+    same = all(
+        (a is None and b is None) or (a and b and (a.kind, a.data) == (b.kind, b.data))
+        for a, b in ((linear_classify(o), _classify(o)) for o in lines)
+    )
+    before, after = rate(linear_classify, lines), rate(_classify, lines)
+    print(f"{LINES} lines, best of {REPEAT}")
+    print(f"linear scan   {before:>12,.0f} lines/s")
+    print(f"tag index     {after:>12,.0f} lines/s   {after / before:.1f}x   identical={same}")
+
+
+if __name__ == "__main__":
+    main()
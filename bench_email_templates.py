@@ -0,0 +1,96 @@
+"""
+Benchmark: customer confirmation email render time, new / modified / cancelled
+(tasks/email_template_utils.py).
+
+Times the compiled, process-cached templates against a cold render (fresh
+Environment: read + compile every time, i.e. what each render cost before
+templates were cached). With BENCH_BASELINE_REV set, also times
+email_template_utils.py as it was at that git revision, and checks it renders
+the same HTML.
+
+    python bench_email_templates.py
+    BENCH_BASELINE_REV=<rev> python bench_email_templates.py
+"""
+
+import os
+import subprocess
+import sys
+import time
+import types
+
+from tasks import email_template_utils as etu
+
+RENDERS = int(os.getenv("BENCH_RENDERS", "2000"))
+
+_BASE = dict(
+    email_message="", location_name="Harbour Cafe", booking_ref="REF8F2K1",
+    customer_name="Ada Lovelace", customer_phone="+61400000000", party_num=4,
+    booking_date="Wed, 02 Sep 2026", start_time="6:30pm", end_time="8:00pm",
+    closing_message="We look forward to seeing you.", zone_names=["Patio", "Window"],
+    booking_page_alias="harbour-cafe", booking_access_token="3f0c7d1e-5b7a-4c1e-9f59-2a8d0c6b1e44",
+    location_address="1 Circular Quay, Sydney NSW", location_phone="+61290000000",
+    location_website="https://harbour.example", logo_url="https://cdn.example/logo.png",
+    banner_url=None,
+)
+VARIANTS = {
+    "new": dict(_BASE, email_title="Booking Confirmed",
+                button_color_start="#28a745", button_color_end="#20c997"),
+    "modified": dict(_BASE, email_title="Booking Modified", is_modification=True,
+                     original_booking_date="Tue, 01 Sep 2026", original_start_time="7:00pm",
+                     original_party_num=2, original_zone_names=["Bar"],
+                     button_color_start="#ffc107", button_color_end="#fd7e14"),
+    "cancelled": dict(_BASE, email_title="Booking Cancelled", is_cancellation=True,
+                      button_color_start="#dc3545", button_color_end="#e83e8c"),
+}
+
+
+def _baseline(rev):
+    source = subprocess.run(
+        ["git", "show", f"{rev}:tasks/email_template_utils.py"],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    module = types.ModuleType("email_template_utils_baseline")
+    module.__file__ = etu.__file__  # so it finds tasks/email_templates/
+    exec(compile(source, "email_template_utils_baseline.py", "exec"), module.__dict__)
+    return module
+
+
+def _time(render, kwargs, n=RENDERS):
+    render(**kwargs)  # warm-up
+    t0 = time.perf_counter()
+    for _ in range(n):
+        render(**kwargs)
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def _cold(**kwargs):
+    etu._env = None
+    return etu.render_customer_booking_confirmation_template(**kwargs)
+
+
+def main():
+    rev = os.getenv("BENCH_BASELINE_REV")
+    baseline = _baseline(rev) if rev else None
+
+    print(f"{RENDERS} renders per variant, µs per render")
+    header = f"{'variant':<10} {'cached':>9} {'cold':>9}"
+    if baseline:
+        header += f" {'baseline':>9} {'speedup':>8}"
+    print(header)
+    for name, kwargs in VARIANTS.items():
+        cached = _time(etu.render_customer_booking_confirmation_template, kwargs)
+        cold = _time(_cold, kwargs, n=max(1, RENDERS // 50))  # compiling is slow
+        etu._env = None
+        line = f"{name:<10} {cached:>9.1f} {cold:>9.1f}"
+        if baseline:
+            before = _time(baseline.render_customer_booking_confirmation_template, kwargs)
+            same = (baseline.render_customer_booking_confirmation_template(**kwargs)
+                    == etu.render_customer_booking_confirmation_template(**kwargs))
+            line += f" {before:>9.1f} {before / cached:>7.1f}x"
+            if not same:
+                line += "  OUTPUT DIFFERS"
+        print(line)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Benchmark: full vs watermark-bounded candidate discovery for
+tasks/summarize_chat_sessions.py.
+
+Builds a synthetic history in TEMP tables (they shadow the real ones for this
+session only, nothing persistent is touched): ~1,000,000 chat_messages across
+50,000 sessions spread over a year, with every old segment already summarised,
+plus a thin slice of recent traffic. Then times both queries the task can run.
+
+Needs a scratch Postgres (no pgvector required):
+
+    BENCH_DATABASE_URL=postgresql://localhost/scratch python bench_summarize_candidates.py
+"""
+
+import os
+import sys
+import time
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from tasks.summarize_chat_sessions import IDLE_TIMEOUT_SECONDS, find_candidates
+
+SESSIONS = int(os.getenv("BENCH_SESSIONS", "50000"))
+MESSAGES_PER_SESSION = int(os.getenv("BENCH_MESSAGES_PER_SESSION", "20"))
+RECENT_SESSIONS = int(os.getenv("BENCH_RECENT_SESSIONS", "200"))
+
+
+def _setup(cur):
+    cur.execute("""
+        CREATE TEMP TABLE chat_sessions (
+            session_id bigint PRIMARY KEY, tenant_id int, channel text,
+            channel_session_id text, current_conversation_id uuid
+        );
+        CREATE TEMP TABLE chat_messages (
+            id bigserial PRIMARY KEY, session_id bigint, conversation_id uuid,
+            role text, content text, created_at timestamptz
+        );
+        CREATE TEMP TABLE customer_episodes (
+            tenant_id int, channel_user_id text, conversation_id uuid, summary text
+        );
+    """)
+    # One closed (already summarised) segment per session, spread over a year,
+    # then a fresh current segment for each session.
+    cur.execute("""
+        INSERT INTO chat_sessions
+        SELECT s, s % 500, 'messenger', 'psid-' || s, gen_random_uuid()
+        FROM generate_series(1, %s) s
+    """, (SESSIONS,))
+    cur.execute("""
+        WITH old_seg AS (
+            SELECT session_id, gen_random_uuid() AS conv,
+                   now() - (random() * interval '365 days') - interval '1 day' AS t0
+            FROM chat_sessions
+        )
+        INSERT INTO chat_messages (session_id, conversation_id, role, content, created_at)
+        SELECT o.session_id, o.conv, CASE WHEN m % 2 = 0 THEN 'user' ELSE 'assistant' END,
+               'message ' || m, o.t0 + m * interval '30 seconds'
+        FROM old_seg o, generate_series(1, %s) m
+    """, (MESSAGES_PER_SESSION,))
+    cur.execute("""
+        INSERT INTO customer_episodes
+        SELECT DISTINCT cs.tenant_id, cs.channel_session_id, cm.conversation_id, 'done'
+        FROM chat_messages cm JOIN chat_sessions cs USING (session_id)
+    """)
+    # Recent traffic: a handful of sessions that went idle since the last run.
+    cur.execute("""
+        INSERT INTO chat_messages (session_id, conversation_id, role, content, created_at)
+        SELECT cs.session_id, cs.current_conversation_id,
+               CASE WHEN m % 2 = 0 THEN 'user' ELSE 'assistant' END,
+               'recent ' || m, now() - interval '150 minutes' + m * interval '1 minute'
+        FROM chat_sessions cs, generate_series(1, 8) m
+        WHERE cs.session_id <= %s
+    """, (RECENT_SESSIONS,))
+    cur.execute("CREATE INDEX ON chat_messages (created_at)")
+    cur.execute("CREATE INDEX ON chat_messages (session_id, conversation_id)")
+    cur.execute("CREATE INDEX ON customer_episodes (tenant_id, channel_user_id, conversation_id)")
+    cur.execute("ANALYZE chat_sessions; ANALYZE chat_messages; ANALYZE customer_episodes")
+
+
+def _time(cur, since, repeat=3):
+    best, rows = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        rows = find_candidates(cur, since)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best, len(rows)
+
+
+def main():
+    url = os.getenv("BENCH_DATABASE_URL")
+    if not url:
+        sys.exit("BENCH_DATABASE_URL not set (use a scratch database)")
+    conn = psycopg2.connect(url)
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            t0 = time.perf_counter()
+            _setup(cur)
+            cur.execute("SELECT count(*) AS n FROM chat_messages")
+            total = cur.fetchone()["n"]
+            print(f"synthetic history : {total:,} messages, {SESSIONS:,} sessions "
+                  f"({time.perf_counter() - t0:.1f}s to build)")
+
+            # A watermark 30 minutes ago, as after the previous cron run.
+            cur.execute(
+                "SELECT now() - interval '30 minutes' - make_interval(secs => %s) AS since",
+                (IDLE_TIMEOUT_SECONDS + 300,),
+            )
+            since = cur.fetchone()["since"]
+
+            full_s, full_n = _time(cur, None)
+            inc_s, inc_n = _time(cur, since)
+            print(f"full scan         : {full_s * 1000:9.1f} ms  ({full_n} candidates)")
+            print(f"since watermark   : {inc_s * 1000:9.1f} ms  ({inc_n} candidates)")
+            print(f"speedup           : {full_s / inc_s:9.1f}x")
+            if full_n != inc_n:
+                print("WARNING: candidate counts differ")
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Benchmark: dashboard trends construction — the list implementation vs the
+TrendCube array engine (tasks/utils/trends_engine.py), for a synthetic chain.
+
+Rows are synthetic rollup rows (location, day, one count per band) at the
+density a busy chain produces. Times the full 90-day build including JSON
+serialisation, and checks both produce the same bytes. The reference lists
+live in test_trends_engine.py.
+
+    python bench_trends_engine.py
+"""
+
+import json
+import os
+import time
+from datetime import date, timedelta
+
+from tasks.utils.trends_engine import TrendCube
+from test_trends_engine import legacy_full, random_rows, window
+
+LOCATIONS = int(os.getenv("BENCH_LOCATIONS", "300"))
+REPEAT = int(os.getenv("BENCH_REPEAT", "5"))
+TODAY = date(2026, 10, 18)
+
+
+def best(fn):
+    times = []
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    return min(times) * 1000, result
+
+
+def main():
+    location_ids = list(range(1, LOCATIONS + 1))
+    names = {loc: f"Location {loc}" for loc in location_ids}
+    rows = random_rows(location_ids, TODAY - timedelta(days=89), 90, density=0.7)
+    dates = window(TODAY)
+    print(f"{LOCATIONS} locations, {len(rows)} rollup rows; best of {REPEAT}, ms")
+
+    t_lists, lists = best(lambda: json.dumps(legacy_full(rows, location_ids, names, TODAY)))
+    t_cube, cube = best(lambda: json.dumps(TrendCube.from_rows(location_ids, dates, rows).to_json(names)))
+    print(f"{'lists':<8} {t_lists:>9.1f}")
+    print(f"{'cube':<8} {t_cube:>9.1f}   {t_lists / t_cube:.1f}x   same={lists == cube}")
+
+
+if __name__ == "__main__":
+    main()
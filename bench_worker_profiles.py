@@ -0,0 +1,59 @@
+"""
+Benchmark: startup time and resident memory of a worker process per queue
+profile, eager vs lazy (tasks/task_registry.py).
+
+Each profile runs in a fresh interpreter that imports tasks.celery_app and
+calls load_task_modules the way the celeryd_init handler does, then reports
+wall time and peak RSS. No broker is contacted.
+
+    python bench_worker_profiles.py
+"""
+
+import json
+import subprocess
+import sys
+
+PROFILES = {
+    "all (no -Q)": None,
+    "sms,availability": ["sms", "availability"],
+    "knowledge": ["knowledge"],
+    "scrape": ["scrape"],
+    "agent": ["agent"],
+    "reporting,telephony": ["reporting", "telephony"],
+}
+
+_CHILD = """
+import json, resource, sys, time
+t0 = time.perf_counter()
+from tasks.celery_app import app
+from tasks.task_registry import load_task_modules
+out = load_task_modules(app, queues=json.loads(sys.argv[1]), lazy=sys.argv[2] == "lazy")
+elapsed = time.perf_counter() - t0
+print(json.dumps({
+    "seconds": elapsed,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "modules": len(sys.modules),
+    "tasks": sum(1 for n in app.tasks if not n.startswith("celery.")),
+    "imported": len(out["imported"]),
+}))
+"""
+
+
+def run(queues, mode):
+    proc = subprocess.run(
+        [sys.executable, "-c", _CHILD, json.dumps(queues), mode],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    print(f"{'profile':<22}{'mode':<7}{'startup s':>10}{'RSS MB':>9}{'modules':>9}{'tasks':>7}")
+    for label, queues in PROFILES.items():
+        for mode in ("eager", "lazy"):
+            r = run(queues, mode)
+            print(f"{label:<22}{mode:<7}{r['seconds']:>10.2f}{r['rss_mb']:>9.1f}{r['modules']:>9}{r['tasks']:>7}")
+
+
+if __name__ == "__main__":
+    main()
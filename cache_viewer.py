@@ -8,6 +8,7 @@ import psycopg2
 from psycopg2.extras import RealDictCursor
 from html import unescape
 from tasks.availability_gen_regen import gen_availability, gen_availability_venue
+from tasks.celery_app import app as celery_app
 from functools import wraps
 import boto3
 import uuid
@@ -156,23 +157,53 @@ def get_template_availability():
 # ----------------------------
 # Availability Regeneration Route
 # ----------------------------
-@app.route("/availability", methods=["GET", "POST"])
-@restrict_ip
-def availability():
-    db_url = os.getenv("DATABASE_URL")
-    locations = []
-    result = None
+# Regeneration runs on the Celery worker; the page only enqueues it and polls
+# /availability/job/<id>. Running it inline held the viewer's single gunicorn
+# worker for the whole 60-day generation (and timed out on large venues).
+LOCATIONS_PER_PAGE = 50
+LOCATIONS_CACHE_TTL_SECONDS = int(os.getenv("LOCATIONS_CACHE_TTL_SECONDS", "60"))
 
-    with psycopg2.connect(db_url, cursor_factory=RealDictCursor) as conn:
+
+def fetch_locations_page(page, search=""):
+    """One page of active locations, {"locations", "page", "has_next"},
+    cached in Redis for LOCATIONS_CACHE_TTL_SECONDS per (page, search)."""
+    cache_key = f"cache_viewer:locations:page_{page}:q_{hashlib.sha1(search.encode()).hexdigest()[:12]}"
+    try:
+        cached = redis_client.get(cache_key)
+        if cached:
+            return json.loads(cached)
+    except Exception as e:
+        print(f"[WARN] locations cache read failed: {e}")
+
+    with psycopg2.connect(os.getenv("DATABASE_URL"), cursor_factory=RealDictCursor) as conn:
         with conn.cursor() as cur:
-            # Fetch active locations
+            # One extra row tells us whether there is a next page.
             cur.execute("""
                 SELECT tenant_id, location_id, name, location_type, timezone
                 FROM locations
-                WHERE is_active = true
-                ORDER BY name ASC
-            """)
-            locations = cur.fetchall()
+                WHERE is_active = true AND (%s = '' OR name ILIKE %s)
+                ORDER BY name ASC, location_id ASC
+                LIMIT %s OFFSET %s
+            """, (search, f"%{search}%", LOCATIONS_PER_PAGE + 1, (page - 1) * LOCATIONS_PER_PAGE))
+            rows = [dict(row) for row in cur.fetchall()]
+
+    result = {"locations": rows[:LOCATIONS_PER_PAGE], "page": page,
+              "has_next": len(rows) > LOCATIONS_PER_PAGE}
+    try:
+        redis_client.set(cache_key, json.dumps(result), ex=LOCATIONS_CACHE_TTL_SECONDS)
+    except Exception as e:
+        print(f"[WARN] locations cache write failed: {e}")
+    return result
+
+
+@app.route("/availability", methods=["GET", "POST"])
+@restrict_ip
+def availability():
+    search = request.args.get("q", "").strip()
+    try:
+        page = max(int(request.args.get("page", 1)), 1)
+    except ValueError:
+        page = 1
 
     if request.method == "POST" and request.form.get("action") == "regenerate":
         tenant_id = request.form.get("tenant_id")
@@ -180,22 +211,33 @@ def availability():
         location_type = request.form.get("location_type")
         timezone = request.form.get("timezone")
 
-        if not tenant_id or not location_id or not location_type or not timezone:
-            result = None  # Trigger error display
-        else:
+        if tenant_id and location_id and location_type and timezone:
             try:
-                # Convert tenant_id and location_id to integers
-                tenant_id = int(tenant_id)
-                location_id = int(location_id)
-                # Execute appropriate function based on location_type
-                if location_type == "rest":
-                    result = gen_availability_venue(tenant_id=tenant_id, location_id=location_id, location_tz=timezone)
-                else:
-                    result = gen_availability(tenant_id=tenant_id, location_id=location_id, location_tz=timezone)
+                task = gen_availability_venue if location_type == "rest" else gen_availability
+                job = task.delay(int(tenant_id), int(location_id), timezone)
+                return redirect(url_for("availability", job=job.id, page=page, q=search or None))
             except Exception as e:
-                result = None  # Treat exceptions as failure
+                print(f"[ERROR] Failed to enqueue availability regeneration: {e}")
+        return redirect(url_for("availability", error=1, page=page, q=search or None))
 
-    return render_template("availability.html", locations=locations, result=result)
+    listing = fetch_locations_page(page, search)
+    return render_template("availability.html", locations=listing["locations"], page=page,
+                           has_next=listing["has_next"], search=search,
+                           job_id=request.args.get("job"), error=bool(request.args.get("error")))
+
+
+@app.route("/availability/job/<job_id>")
+@restrict_ip
+def availability_job(job_id):
+    """Poll target for a regeneration job: Celery state plus PROGRESS meta."""
+    job = celery_app.AsyncResult(job_id)
+    response = {"job_id": job_id, "state": job.state, "ready": job.ready()}
+    if job.state == "PROGRESS" and isinstance(job.info, dict):
+        response.update(days_done=job.info.get("days_done"), days_total=job.info.get("days_total"))
+    elif job.ready():
+        response["success"] = job.successful() and bool(job.result)
+        response["result"] = job.result if job.successful() else str(job.info)
+    return jsonify(response)
 
 # Allowed extension check
 def allowed_file(filename):
@@ -4,7 +4,7 @@ import psycopg2
 import os
 from dotenv import load_dotenv
 #from tasks.availability import gen_availability, gen_availability_venue
-from tasks.availability_gen_regen import gen_availability, gen_availability_venue
+from tasks.availability_gen_regen import gen_availability_tenant
 
 # Load .env file if it exists (for local development)
 load_dotenv()
@@ -57,19 +57,32 @@ def run_all_jobs():
     utc_now = datetime.now(timezone.utc)
     print(f"[INFO] UTC now: {utc_now.isoformat()}")
 
+    # One task per tenant rather than per location: the batch shares a
+    # connection and the tenant-wide service maps (gen_availability_tenant).
+    due = {}
     for job in jobs:
         try:
             now_local = datetime.now(pytz.timezone(job["location_tz"]))
             if now_local.hour == 0 and now_local.minute < 30:
                 print(f"[INFO] Generating availability for tenant {job['tenant_id']} location {job['location_id']} at {now_local}")
-                if job["location_type"] == "rest":
-                    gen_availability_venue.delay(job["tenant_id"], job["location_id"], job["location_tz"])
-                else:
-                    gen_availability.delay(job["tenant_id"], job["location_id"], job["location_tz"])
+                due.setdefault(job["tenant_id"], []).append({
+                    "location_id": job["location_id"],
+                    "location_tz": job["location_tz"],
+                    "location_type": job["location_type"]
+                })
             else:
                 print(f"[SKIP] Not within the midnight window (00:00-00:29) in {job['location_tz']}. Local time is {now_local.strftime('%Y-%m-%d %H:%M:%S')}")
         except Exception as e:
             print(f"[ERROR] Failed processing job for location {job.get('location_id')} (Tenant {job.get('tenant_id')}): {e}")
 
+    for tenant_id, locations in due.items():
+        try:
+            # rolling: only the newly exposed day is computed; the other 59
+            # are re-sliced from the day store (tasks/utils/availability_day_store.py).
+            gen_availability_tenant.delay(tenant_id, locations, rolling=True)
+            print(f"[INFO] Enqueued tenant {tenant_id}: {len(locations)} location(s)")
+        except Exception as e:
+            print(f"[ERROR] Failed to enqueue tenant {tenant_id}: {e}")
+
 if __name__ == "__main__":
     run_all_jobs()
\ No newline at end of file
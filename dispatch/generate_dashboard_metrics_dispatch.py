@@ -2,7 +2,9 @@
 Dispatch script for generating dashboard metrics for all tenants.
 
 This script queries all active tenants and dispatches Celery tasks to generate
-their dashboard metrics (summary cards and booking trends).
+their dashboard metrics (summary cards and booking trends). Tenants are sent
+in batches of DASHBOARD_METRICS_BATCH_SIZE (default 50): each batch task
+shares one connection and writes its tenants with one bulk upsert.
 
 Usage:
     python dispatch/generate_dashboard_metrics_dispatch.py
@@ -16,7 +18,12 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
-from tasks.generate_dashboard_metrics import generate_dashboard_metrics_for_tenant
+from tasks.generate_dashboard_metrics import (
+    generate_dashboard_metrics_batch,
+    refresh_daily_location_metrics,
+)
+
+BATCH_SIZE = max(1, int(os.getenv("DASHBOARD_METRICS_BATCH_SIZE", "50")))
 
 
 def get_db_connection():
@@ -101,40 +108,49 @@ def dispatch_metrics_generation():
             f"{tenant['company_name']} (Created: {tenant['created_at']})"
         )
     
+    print()
+    # The tenant tasks read the daily_location_metrics rollup, so bring it up
+    # to date first (in-process, so it is finished before any task starts).
+    # On failure the tasks still run, a day behind.
+    try:
+        rollup = refresh_daily_location_metrics()
+        print(f"[INFO] Rollup refreshed ({rollup['mode']}): {rollup['days_upserted']} day(s) upserted")
+    except Exception as e:
+        print(f"[ERROR] Rollup refresh failed, dashboards will use the previous rollup: {e}")
+
     print()
     print("[INFO] Dispatching Celery tasks...")
     print()
     
-    # Dispatch tasks
+    # Dispatch tasks, one per batch of tenants
     dispatched = 0
     failed = 0
     
-    for tenant in tenants:
+    for start in range(0, len(tenants), BATCH_SIZE):
+        tenant_ids = [t['tenant_id'] for t in tenants[start:start + BATCH_SIZE]]
         try:
             # Dispatch Celery task
-            result = generate_dashboard_metrics_for_tenant.delay(
-                tenant['tenant_id']
-            )
+            result = generate_dashboard_metrics_batch.delay(tenant_ids)
             
             print(
-                f"[DISPATCHED] Tenant {tenant['tenant_id']} ({tenant['company_name']}): "
+                f"[DISPATCHED] Tenants {tenant_ids[0]}..{tenant_ids[-1]} ({len(tenant_ids)}): "
                 f"Task ID = {result.id}"
             )
             
-            dispatched += 1
+            dispatched += len(tenant_ids)
             
         except Exception as e:
             print(
-                f"[ERROR] Failed to dispatch task for tenant {tenant['tenant_id']}: {e}"
+                f"[ERROR] Failed to dispatch task for tenants {tenant_ids}: {e}"
             )
-            failed += 1
+            failed += len(tenant_ids)
     
     # Summary
     print()
     print("=" * 80)
     print("[DISPATCH] Summary:")
     print(f"  Total tenants: {len(tenants)}")
-    print(f"  Tasks dispatched: {dispatched}")
+    print(f"  Tenants dispatched: {dispatched} (batches of {BATCH_SIZE})")
     print(f"  Failed: {failed}")
     print(f"[DISPATCH] Completed at: {datetime.now().isoformat()}")
     print("=" * 80)
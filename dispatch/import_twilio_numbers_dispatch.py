@@ -29,6 +29,7 @@ load_dotenv()
 
 import psycopg2
 from tasks.purchase_twilio_number import get_twilio_client
+from tasks.utils import number_inventory as inventory
 
 
 # AU area code to region mapping
@@ -107,7 +108,8 @@ def import_twilio_numbers(dry_run: bool = True, use_prod: bool = False):
     # Step 1: Fetch from Twilio
     print("[1/3] Fetching numbers from Twilio API...")
     client = get_twilio_client()
-    all_twilio_numbers = client.incoming_phone_numbers.list()
+    # Largest page Twilio serves: a few requests instead of one per 50 numbers
+    all_twilio_numbers = client.incoming_phone_numbers.list(page_size=1000)
     # Filter: only Speako numbers (default friendly_name starts with digit)
     twilio_numbers = [tn for tn in all_twilio_numbers if tn.friendly_name and tn.friendly_name[0].isdigit()]
     skipped = len(all_twilio_numbers) - len(twilio_numbers)
@@ -166,17 +168,12 @@ def import_twilio_numbers(dry_run: bool = True, use_prod: bool = False):
         for phone, tn, country_code, area_code, region in missing:
             print(f"  INSERT: {phone} (country={country_code}, area={area_code}, region={region}, sid={tn.sid})")
 
-            if not dry_run:
-                safe_area_code = area_code[:10] if area_code else None
-                cur.execute("""
-                    INSERT INTO twilio_phone_numbers (
-                        phone_number, friendly_name, country_code, area_code, region,
-                        twilio_sid, status, created_at, updated_at
-                    ) VALUES (%s, %s, %s, %s, %s, %s, 'available', CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                    ON CONFLICT (phone_number) DO NOTHING
-                """, (phone, tn.friendly_name, country_code, safe_area_code, region, tn.sid))
-
     if not dry_run:
+        # One statement for every orphan (existing rows are skipped)
+        inventory.insert_numbers(cur, [
+            inventory.number_row(phone, tn.friendly_name, country_code, area_code, region, tn.sid)
+            for phone, tn, country_code, area_code, region in missing
+        ])
         conn.commit()
 
     cur.close()
@@ -26,6 +26,7 @@ load_dotenv()
 
 import psycopg2
 from tasks.purchase_twilio_number import COUNTRY_CONFIG, TWILIO_NUMBER_MODE
+from tasks.utils import number_inventory as inventory
 
 
 def move_numbers_to_prod(dry_run: bool = True):
@@ -127,26 +128,25 @@ def move_numbers_to_prod(dry_run: bool = True):
         print("\n  (nothing to move)")
     elif not dry_run:
         print(f"\nExecuting {len(to_move)} moves...")
-        for n in to_move:
-            # Insert into PROD
-            prod_cur.execute("""
-                INSERT INTO twilio_phone_numbers (
-                    phone_number, friendly_name, country_code, area_code, region,
-                    twilio_sid, status, created_at, updated_at
-                ) VALUES (%s, %s, %s, %s, %s, %s, 'available', CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                ON CONFLICT (phone_number) DO NOTHING
-            """, (
+        # Insert into PROD, one statement
+        inventory.insert_numbers(prod_cur, [
+            inventory.number_row(
                 n['phone_number'], n['friendly_name'], n['country_code'],
                 n['area_code'], n['region'], n['twilio_sid']
-            ))
-
-            # Delete from DEV
-            dev_cur.execute(
-                "DELETE FROM twilio_phone_numbers WHERE phone_number_id = %s",
-                (n['phone_number_id'],)
             )
+            for n in to_move
+        ])
+
+        # Delete from DEV, one statement
+        dev_cur.execute(
+            "DELETE FROM twilio_phone_numbers WHERE phone_number_id = ANY(%s)",
+            ([n['phone_number_id'] for n in to_move],)
+        )
+        for n in to_move:
             print(f"  Moved: {n['phone_number']}")
 
+        # PROD first: a failure between the commits leaves a number in both
+        # databases, never in neither
         prod_conn.commit()
         dev_conn.commit()
 
@@ -15,6 +15,20 @@ Run:
     python scripts/refresh_call_quality_findings.py --dev
     python scripts/refresh_call_quality_findings.py --prod        # requires care
 
+A backfill after an ANALYZER_VERSION bump runs in batches of `--batch-size`
+conversations: artifacts are fetched from R2 on `--fetch-workers` threads,
+decompressed and analysed on a pool of `--workers` processes, and each batch's
+deletes, inserts and badge updates are written in a few statements and
+committed together. After every committed batch the last
+`location_conversation_id` is saved to `--checkpoint` under the environment
+and analyzer version, so an interrupted run resumes where it stopped
+(`--restart` ignores it). `--workers 1` analyses in-process.
+
+Only a missing or corrupt artifact counts as unreadable. Other fetch errors
+(an R2 timeout, throttling) are retried `FETCH_ATTEMPTS` times; one that
+still fails holds the checkpoint before that conversation for the rest of
+the run, so the next run picks it up again.
+
 ⚠️ SAFETY — a human's triage decision is never destroyed.
 
 Rows the admin has acted on (status != 'open') are LEFT ALONE entirely, even if
@@ -29,7 +43,9 @@ import gzip
 import json
 import os
 import sys
+import time
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -37,7 +53,7 @@ import psycopg2
 from dotenv import load_dotenv
 
 from tasks.utils.call_quality_rules import ANALYZER_VERSION, analyze, index_catalogue
-from tasks.utils.call_quality_store import insert_findings, load_catalogue
+from tasks.utils.call_quality_store import insert_findings_batch, load_catalogue
 
 load_dotenv()
 
@@ -57,11 +73,141 @@ def _r2():
     )
 
 
-def download_call_log_from_r2(r2_key, use_dev):
+def download_call_log_from_r2(r2_key, use_dev, client=None):
     bucket = os.getenv("R2_BUCKET_NAME_DEV" if use_dev else "R2_BUCKET_NAME")
     if not bucket:
         raise RuntimeError("R2 bucket env var not set")
-    return _r2().get_object(Bucket=bucket, Key=r2_key)["Body"].read()
+    return (client or _r2()).get_object(Bucket=bucket, Key=r2_key)["Body"].read()
+
+
+DEFAULT_CHECKPOINT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".refresh_call_quality_checkpoint.json")
+
+
+def _checkpoint_key(is_dev):
+    return f"{'dev' if is_dev else 'prod'}:{ANALYZER_VERSION}"
+
+
+def read_checkpoint(path, is_dev):
+    """Last fully processed conversation id for this env + analyzer, or 0."""
+    try:
+        with open(path) as handle:
+            return int(json.load(handle).get(_checkpoint_key(is_dev)) or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def write_checkpoint(path, is_dev, conv_id):
+    try:
+        with open(path) as handle:
+            state = json.load(handle)
+    except (OSError, ValueError):
+        state = {}
+    state[_checkpoint_key(is_dev)] = conv_id
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as handle:
+        json.dump(state, handle, indent=2, sort_keys=True)
+    os.replace(tmp, path)   # never leave a half-written checkpoint
+
+
+def analyze_artifact(gz_bytes):
+    """Decompress and analyse one artifact: (findings, None), or (None, error
+    name) if it cannot be read. Runs in a worker process."""
+    try:
+        text = gzip.decompress(gz_bytes).decode()
+    except Exception as exc:
+        return None, type(exc).__name__
+    return analyze(text, load_catalogue()), None
+
+
+FETCH_ATTEMPTS = 3
+FETCH_BACKOFF_SECONDS = 1.0
+MISSING_CODES = {"NoSuchKey", "404", "NotFound"}
+
+
+def is_missing(exc):
+    """True for an S3/R2 "no such object" error (retrying cannot help)."""
+    return getattr(exc, "response", {}).get("Error", {}).get("Code") in MISSING_CODES
+
+
+def _fetch_batch(batch, is_dev, client, fetch_pool, sleep=time.sleep):
+    """[(target, gz_bytes | None, error | None, transient)] in batch order.
+    Errors other than a missing object are retried; `transient` marks one
+    that still failed, i.e. the artifact may well be readable next run."""
+    def fetch(target):
+        for attempt in range(FETCH_ATTEMPTS):
+            try:
+                return target, download_call_log_from_r2(target[4], use_dev=is_dev, client=client), None, False
+            except Exception as exc:
+                if is_missing(exc):
+                    return target, None, type(exc).__name__, False
+                if attempt == FETCH_ATTEMPTS - 1:
+                    return target, None, type(exc).__name__, True
+                sleep(FETCH_BACKOFF_SECONDS * (2 ** attempt))
+
+    return list(fetch_pool.map(fetch, batch))
+
+
+def _analyze_batch(fetched, analyze_pool):
+    """[(target, findings | None, error | None, transient)] in batch order."""
+    readable = [(t, gz) for t, gz, err, _ in fetched if err is None]
+    if analyze_pool is None:
+        results = [analyze_artifact(gz) for _, gz in readable]
+    else:
+        results = list(analyze_pool.map(analyze_artifact, [gz for _, gz in readable]))
+    by_conv = {t[0]: r for (t, _), r in zip(readable, results)}
+    out = []
+    for target, _, err, transient in fetched:
+        findings, analyze_err = by_conv.get(target[0], (None, err))
+        out.append((target, findings, err or analyze_err, transient))
+    return out
+
+
+def checkpoint_through(analysed):
+    """(last conversation id safe to checkpoint, whether a transient failure
+    stopped it short). The id is None when the batch's first conversation
+    failed transiently."""
+    through = None
+    for target, _, _, transient in analysed:
+        if transient:
+            return through, True
+        through = target[0]
+    return through, False
+
+
+def _write_batch(conn, analysed, existing):
+    """Refresh the open findings of every readable conversation in the batch
+    with a handful of statements, then commit."""
+    from psycopg2.extras import execute_values
+
+    conv_ids = [t[0] for t, findings, _, _ in analysed if findings is not None]
+    if not conv_ids:
+        return
+    with conn.cursor() as cur:
+        # Drop only untouched rows. Anything the admin acted on stays.
+        cur.execute(
+            """DELETE FROM call_quality_findings
+                WHERE location_conversation_id = ANY(%s) AND status = 'open'""",
+            (conv_ids,),
+        )
+        insert_findings_batch(conn, [
+            {"tenant_id": tenant_id, "location_id": location_id,
+             "conversation_id": conv_id, "call_sid": call_sid,
+             "findings": [f for f in findings if f["rule_id"] not in existing[conv_id][1]]}
+            for (conv_id, tenant_id, location_id, call_sid, _), findings, _, _ in analysed
+            if findings is not None
+        ])
+        # Keep the conversation-list badge consistent with the rows.
+        execute_values(
+            cur,
+            """UPDATE location_conversations c
+                  SET raw_metadata = COALESCE(c.raw_metadata,'{}'::jsonb) || v.summary::jsonb
+                 FROM (VALUES %s) AS v(conv_id, summary)
+                WHERE c.location_conversation_id = v.conv_id""",
+            [(t[0], json.dumps(_summary(findings)))
+             for t, findings, _, _ in analysed if findings is not None],
+        )
+    conn.commit()
 
 
 def main():
@@ -72,6 +218,14 @@ def main():
     ap.add_argument("--dry-run", action="store_true",
                     help="report what would change; write nothing")
     ap.add_argument("--limit", type=int, default=0, help="cap conversations processed")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                    help="analysis processes (1 = in-process)")
+    ap.add_argument("--fetch-workers", type=int, default=8, help="concurrent R2 downloads")
+    ap.add_argument("--batch-size", type=int, default=200,
+                    help="conversations per fetch/analyse/write/checkpoint batch")
+    ap.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT,
+                    help="file recording the last processed conversation per env+analyzer")
+    ap.add_argument("--restart", action="store_true", help="ignore the saved checkpoint")
     args = ap.parse_args()
 
     is_dev = args.dev
@@ -80,10 +234,13 @@ def main():
         sys.exit(f"{'DATABASE_URL' if is_dev else 'DATABASE_URL_PROD'} not set")
 
     catalogue = load_catalogue()
+    resume_after = 0 if args.restart else read_checkpoint(args.checkpoint, is_dev)
     print(f"target      : {'DEV' if is_dev else 'PRODUCTION'}")
     print(f"analyzer    : {ANALYZER_VERSION}")
     print(f"catalogue   : {catalogue['catalogue_version']}")
-    print(f"mode        : {'DRY RUN (no writes)' if args.dry_run else 'WRITING'}\n")
+    print(f"mode        : {'DRY RUN (no writes)' if args.dry_run else 'WRITING'}")
+    print(f"parallelism : {args.workers} analysis process(es), {args.fetch_workers} fetch thread(s)")
+    print(f"resume      : {f'after conv{resume_after}' if resume_after else 'from the start'}\n")
 
     conn = psycopg2.connect(db_url)
     cur = conn.cursor()
@@ -96,9 +253,10 @@ def main():
             ON c.location_conversation_id = f.location_conversation_id
          WHERE f.analyzer_version <> %s
            AND c.raw_metadata ? 'log_r2_key'
+           AND f.location_conversation_id > %s
          ORDER BY 1
         """,
-        (ANALYZER_VERSION,),
+        (ANALYZER_VERSION, resume_after),
     )
     targets = cur.fetchall()
     if args.limit:
@@ -109,68 +267,68 @@ def main():
     added = Counter()
     kept_human = 0
     unreadable = 0
-
-    for conv_id, tenant_id, location_id, call_sid, r2_key in targets:
-        try:
-            text = gzip.decompress(
-                download_call_log_from_r2(r2_key, use_dev=is_dev)
-            ).decode()
-        except Exception as exc:
-            unreadable += 1
-            print(f"  conv{conv_id}: artifact unreadable — left untouched ({type(exc).__name__})")
-            continue
-
-        fresh = analyze(text, catalogue)
-        fresh_ids = {f["rule_id"] for f in fresh}
-
-        cur.execute(
-            """SELECT rule_id, status FROM call_quality_findings
-                WHERE location_conversation_id = %s""",
-            (conv_id,),
-        )
-        existing = cur.fetchall()
-        stale_open = {r for r, s in existing if s == "open"}
-        human = {r for r, s in existing if s != "open"}
-        kept_human += len(human)
-
-        gone = stale_open - fresh_ids
-        new = fresh_ids - stale_open - human
-
-        if gone or new:
-            print(f"  conv{conv_id} (t{tenant_id}/l{location_id})")
-            for r in sorted(gone):
-                print(f"      - {r}")
-                removed[r] += 1
-            for r in sorted(new):
-                print(f"      + {r}")
-                added[r] += 1
-
-        if args.dry_run:
-            continue
-
-        # Drop only untouched rows. Anything the admin acted on stays.
-        cur.execute(
-            """DELETE FROM call_quality_findings
-                WHERE location_conversation_id = %s AND status = 'open'""",
-            (conv_id,),
-        )
-        insert_findings(
-            conn,
-            tenant_id=tenant_id, location_id=location_id,
-            conversation_id=conv_id, call_sid=call_sid,
-            findings=[f for f in fresh if f["rule_id"] not in human],
-        )
-        # Keep the conversation-list badge consistent with the rows.
-        cur.execute(
-            """UPDATE location_conversations
-                  SET raw_metadata = COALESCE(raw_metadata,'{}'::jsonb) || %s::jsonb
-                WHERE location_conversation_id = %s""",
-            (json.dumps(_summary(fresh)), conv_id),
-        )
-
-    if not args.dry_run:
-        conn.commit()
-    conn.close()
+    fetch_failed = 0
+    held = False   # a transient failure pinned the checkpoint for this run
+
+    client = _r2()
+    batch_size = max(1, args.batch_size)
+    analyze_pool = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 1 else None
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.fetch_workers)) as fetch_pool:
+            for start in range(0, len(targets), batch_size):
+                batch = targets[start:start + batch_size]
+                analysed = _analyze_batch(_fetch_batch(batch, is_dev, client, fetch_pool), analyze_pool)
+
+                cur.execute(
+                    """SELECT location_conversation_id, rule_id, status
+                         FROM call_quality_findings
+                        WHERE location_conversation_id = ANY(%s)""",
+                    ([t[0] for t in batch],),
+                )
+                existing = {t[0]: (set(), set()) for t in batch}   # conv -> (open, human)
+                for conv_id, rule_id, status in cur.fetchall():
+                    existing[conv_id][0 if status == "open" else 1].add(rule_id)
+
+                for (conv_id, tenant_id, location_id, _, _), findings, err, transient in analysed:
+                    if transient:
+                        fetch_failed += 1
+                        print(f"  conv{conv_id}: fetch failed after {FETCH_ATTEMPTS} attempts — retried next run ({err})")
+                        continue
+                    if findings is None:
+                        unreadable += 1
+                        print(f"  conv{conv_id}: artifact unreadable — left untouched ({err})")
+                        continue
+                    fresh_ids = {f["rule_id"] for f in findings}
+                    stale_open, human = existing[conv_id]
+                    kept_human += len(human)
+
+                    gone = stale_open - fresh_ids
+                    new = fresh_ids - stale_open - human
+                    if gone or new:
+                        print(f"  conv{conv_id} (t{tenant_id}/l{location_id})")
+                        for r in sorted(gone):
+                            print(f"      - {r}")
+                            removed[r] += 1
+                        for r in sorted(new):
+                            print(f"      + {r}")
+                            added[r] += 1
+
+                if args.dry_run:
+                    continue
+                _write_batch(conn, analysed, existing)
+                if held:
+                    continue
+                through, held = checkpoint_through(analysed)
+                if through is not None:
+                    write_checkpoint(args.checkpoint, is_dev, through)
+                if held:
+                    print(f"  [checkpoint] held at conv{through or resume_after}: a fetch failed in this batch")
+                else:
+                    print(f"  [checkpoint] {start + len(batch)}/{len(targets)} done, through conv{through}")
+    finally:
+        if analyze_pool is not None:
+            analyze_pool.shutdown()
+        conn.close()
 
     print("\n" + ("would remove" if args.dry_run else "removed") + ":")
     for r, n in removed.most_common() or [("(nothing)", 0)]:
@@ -181,6 +339,8 @@ def main():
     print(f"\nleft alone because a human had triaged them: {kept_human}")
     if unreadable:
         print(f"artifacts unreadable (skipped): {unreadable}")
+    if fetch_failed:
+        print(f"artifacts not fetched (transient errors, retried next run): {fetch_failed}")
 
 
 def _summary(findings):
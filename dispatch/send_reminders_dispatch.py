@@ -5,11 +5,12 @@ Runs every 5 minutes (Render cron). For each location with customer reminders en
 and one or more configured offsets, finds confirmed, still-upcoming bookings whose
 send-time (booking start − offset) has just become due — evaluated in the booking's
 OWN time_zone so DST is correct — and whose offset has not yet been recorded in
-booking_notification, then enqueues one `tasks.sms.send_reminder` task per
-(booking, offset).
+booking_notification, then enqueues `tasks.sms.send_reminders_batch` tasks of up to
+REMINDER_DISPATCH_BATCH_SIZE (booking, offset) pairs each — one claim statement, one
+DB connection and one pooled Twilio session per batch instead of per SMS.
 
 This script only finds CANDIDATES; exactly-once delivery is guaranteed by the atomic
-claim inside `send_reminder` (booking_notification.reminders[offset]). Modeled on
+claim inside the task (booking_notification.reminders[offset]). Modeled on
 dispatch/cancel_unpaid_guarantees_dispatch.py.
 
 Notes on the due-window guards:
@@ -32,6 +33,7 @@ load_dotenv()
 
 from tasks.celery_app import app  # noqa: E402  (import after load_dotenv so broker env is set)
 
+BATCH_SIZE = max(1, int(os.getenv("REMINDER_DISPATCH_BATCH_SIZE", "50")))
 
 DUE_REMINDERS_SQL = """
 SELECT b.booking_id, off.offset_minutes
@@ -71,14 +73,15 @@ def dispatch_reminders():
         cur.execute(DUE_REMINDERS_SQL)
         rows = cur.fetchall()
         print(f"[REMINDER-DISPATCH] {len(rows)} due (booking, offset) pair(s)")
-        for booking_id, offset_minutes in rows:
+        for start in range(0, len(rows), BATCH_SIZE):
+            pairs = [[int(b), int(o)] for b, o in rows[start:start + BATCH_SIZE]]
             try:
-                app.send_task("tasks.sms.send_reminder", args=[int(booking_id), int(offset_minutes)])
-                enqueued += 1
-                print(f"[REMINDER-DISPATCH] enqueued booking {booking_id} offset {offset_minutes}m")
+                app.send_task("tasks.sms.send_reminders_batch", args=[pairs])
+                enqueued += len(pairs)
+                print(f"[REMINDER-DISPATCH] enqueued batch of {len(pairs)} (bookings {pairs[0][0]}..{pairs[-1][0]})")
             except Exception as e:
-                # One bad enqueue must not abort the batch; the next run retries it.
-                print(f"[REMINDER-DISPATCH] enqueue failed booking {booking_id} offset {offset_minutes}m: {e}")
+                # One bad enqueue must not abort the run; the next run retries it.
+                print(f"[REMINDER-DISPATCH] enqueue failed for batch of {len(pairs)}: {e}")
         print(f"[REMINDER-DISPATCH] done — {enqueued}/{len(rows)} enqueued")
     except Exception as e:
         print(f"[REMINDER-DISPATCH] error: {e}")
@@ -5,7 +5,10 @@ Run by a Render cron job every 30 minutes. This project does NOT use Celery Beat
 
 Usage:
     PYTHONPATH=. python dispatch/summarize_chat_sessions_dispatch.py
+    PYTHONPATH=. python dispatch/summarize_chat_sessions_dispatch.py --full-scan   # ignore the watermark
 """
+import argparse
+
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -13,5 +16,9 @@ load_dotenv()
 from tasks.summarize_chat_sessions import summarize_chat_sessions
 
 if __name__ == "__main__":
-    res = summarize_chat_sessions.delay()
+    parser = argparse.ArgumentParser(description="Enqueue the chat-episode summariser")
+    parser.add_argument("--full-scan", action="store_true",
+                        help="scan all of chat_messages instead of the since-watermark window")
+    args = parser.parse_args()
+    res = summarize_chat_sessions.apply_async(kwargs={"full_scan": args.full_scan})
     print(f"[dispatch] summarize_chat_sessions queued: {res.id}")
@@ -25,6 +25,7 @@ load_dotenv()
 import os
 import psycopg2
 from tasks.purchase_twilio_number import get_twilio_client
+from tasks.utils import number_inventory as inventory
 
 
 # AU area code to region mapping
@@ -90,7 +91,8 @@ def update_twilio_numbers(dry_run: bool = True, use_prod: bool = False):
     # Step 1: Fetch from Twilio (for twilio_sid lookup)
     print("[1/3] Fetching numbers from Twilio API...")
     client = get_twilio_client()
-    all_twilio_numbers = client.incoming_phone_numbers.list()
+    # Largest page Twilio serves: a few requests instead of one per 50 numbers
+    all_twilio_numbers = client.incoming_phone_numbers.list(page_size=1000)
     twilio_numbers = [tn for tn in all_twilio_numbers if tn.friendly_name and tn.friendly_name[0].isdigit()]
     twilio_by_phone = {tn.phone_number: tn for tn in twilio_numbers}
     print(f"  Loaded {len(twilio_numbers)} Speako numbers for lookup\n")
@@ -120,6 +122,7 @@ def update_twilio_numbers(dry_run: bool = True, use_prod: bool = False):
     # Step 3: Update NULL fields
     print("[3/3] Updating NULL fields...\n")
     updated = 0
+    updates = []
 
     for phone, db_row in db_by_phone.items():
         needs_update = False
@@ -154,17 +157,7 @@ def update_twilio_numbers(dry_run: bool = True, use_prod: bool = False):
 
             print(f"  UPDATE #{db_row['phone_number_id']} {phone}: {', '.join(changes)}")
 
-            if not dry_run:
-                safe_area_code = new_area_code[:10] if new_area_code else None
-                cur.execute("""
-                    UPDATE twilio_phone_numbers
-                    SET area_code = COALESCE(%s, area_code),
-                        region = COALESCE(%s, region),
-                        twilio_sid = COALESCE(%s, twilio_sid),
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE phone_number_id = %s
-                """, (safe_area_code, new_region, new_sid, db_row['phone_number_id']))
-                updated += 1
+            updates.append((db_row['phone_number_id'], new_area_code, new_region, new_sid))
 
     if updated == 0 and not any(
         not db_by_phone[p]['area_code'] or not db_by_phone[p]['region'] or not db_by_phone[p]['twilio_sid']
@@ -173,6 +166,8 @@ def update_twilio_numbers(dry_run: bool = True, use_prod: bool = False):
         print("  (none — all fields populated)")
 
     if not dry_run:
+        # One statement for every row that needs filling
+        updated = inventory.update_numbers(cur, updates)
         conn.commit()
 
     cur.close()
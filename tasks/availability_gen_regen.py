@@ -11,6 +11,9 @@ from tasks.utils.availability_helpers import (
     annotate_bookable_starts,
 )
 from tasks.utils.task_db import mark_task_running, mark_task_failed, mark_task_succeeded
+from tasks.utils import availability_day_store as day_store
+from tasks.utils import availability_schedule as schedule
+from tasks.utils import slot_index
 
 import os
 import psycopg2
@@ -83,8 +86,272 @@ def fetch_sample_data():
         logger.error(f"[PRODUCTION] Database error: {e}")
         return None
 
+
+def load_tenant_scope(cur, tenant_id, staff=True, venue=True):
+    """Tenant-wide inputs shared by every location of the tenant:
+    {"staff_services": {staff_id: [service_id]},
+     "venue_unit_services": {venue_unit_id: [service_id]}}."""
+    scope = {}
+    if staff:
+        scope["staff_services"] = {}
+        cur.execute("SELECT staff_id, service_id FROM staff_services WHERE tenant_id = %s", (tenant_id,))
+        for sid, svc_id in cur.fetchall():
+            scope["staff_services"].setdefault(sid, []).append(svc_id)
+    if venue:
+        scope["venue_unit_services"] = {}
+        cur.execute("SELECT venue_unit_id, service_id FROM venue_unit_services WHERE tenant_id = %s", (tenant_id,))
+        for vuid, svc_id in cur.fetchall():
+            scope["venue_unit_services"].setdefault(vuid, []).append(svc_id)
+    return scope
+
+
+def _mark_generated(task, task_id, tenant_id, location_id, result):
+    """mark_task_succeeded for a generator result (best-effort)."""
+    if not task_id:
+        return
+    details = {'tenant_id': tenant_id, 'location_id': location_id}
+    details.update({k: v for k, v in result.items() if k != 'status'})
+    if result["status"] == "skipped":
+        details['status'] = 'skipped'
+    try:
+        mark_task_succeeded(task_id=str(task_id), celery_task_id=str(task.request.id),
+                            details=details, actor='celery', progress=100)
+    except Exception as db_e:
+        logger.warning(f"mark_task_succeeded failed: {db_e}")
+
+
+def _progress_reporter(task):
+    """progress callback publishing PROGRESS {days_done, days_total} to the
+    result backend, on top of task_track_started's STARTED (best-effort)."""
+    def report(done, total):
+        if not task.request.id:  # called synchronously, nobody is polling
+            return
+        try:
+            task.update_state(state="PROGRESS", meta={"days_done": done, "days_total": total})
+        except Exception as e:
+            logger.debug(f"update_state failed: {e}")
+    return report
+
+
+def generate_staff_location(pg_conn, valkey_client, tenant_id, location_id, location_tz,
+                            affected_date=None, rolling=False, tenant_scope=None,
+                            progress=None):
+    """Generate (or regenerate, with `affected_date`) one staff location's
+    availability chunks on the caller's connections. Returns a status dict;
+    raises on failure. `tenant_scope` is load_tenant_scope()'s result when
+    the caller generates several of the tenant's locations; `progress(done,
+    total)` is called (in days) after each chunk is cached."""
+    cur = pg_conn.cursor()
+    db_start = time.time()
+    chunk_size = 3
+    is_regen = affected_date is not None
+
+    if is_regen:
+
+        dt = parser.parse(affected_date)
+        affected_dt = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+        # Ensure affected_dt has the same timezone as location_tz
+        if affected_dt.tzinfo is None:
+            affected_dt = affected_dt.replace(tzinfo=ZoneInfo(location_tz))
+        # Compute current midnight in location_tz for chunk calculation
+        now_local = datetime.now(ZoneInfo(location_tz))
+        current_start = now_local.replace(hour=0, minute=0, second=0, microsecond=0)
+        day_offset = (affected_dt - current_start).days
+        if day_offset < 0:
+            logger.info(f"[SKIP] Affected date {affected_date} is in the past for tenant={tenant_id}, location={location_id}")
+            return {"status": "skipped", "reason": "date_in_past"}
+        chunk_index = day_offset // chunk_size
+        chunk_start_offset = chunk_index * chunk_size
+        chunk_start_day = current_start + timedelta(days=chunk_start_offset)
+        start_date = chunk_start_day
+        days_range = chunk_size  # 3 days for regen
+        start_date = start_date.replace(tzinfo=ZoneInfo(location_tz))
+        logger.info(f"[REGEN] Regenerating chunk starting {chunk_start_day.date().isoformat()} for affected_date={affected_date}")
+    else:
+        start_date = datetime.now(ZoneInfo(location_tz)).replace(hour=0, minute=0, second=0, microsecond=0)
+        days_range = 60
+        logger.info(f"[FULL] Generating full availability starting from {start_date.date().isoformat()}")
+
+    # Preload services once.
+    # Flexible-duration columns (Phase 2) are loaded additively. For the
+    # service-business (staff) path the staff slots are open windows with no
+    # baked-in duration, so the only change needed is to expose each flexible
+    # service's bounds here; the consumer validates a chosen (start, duration)
+    # against the staff window at request time. Fixed services keep the exact
+    # {id,name,duration} shape.
+    services = []
+    cur.execute("""
+        SELECT s.service_id, s.name, EXTRACT(EPOCH FROM s.duration)/60,
+               s.is_flexible_duration, s.min_duration_minutes,
+               s.max_duration_minutes, s.duration_increment_minutes
+        FROM location_services ls
+        JOIN services s ON ls.tenant_id = s.tenant_id AND ls.service_id = s.service_id
+        WHERE ls.tenant_id = %s AND ls.location_id = %s AND s.is_active = TRUE
+        ORDER BY s.service_id
+    """, (tenant_id, location_id))
+    for row in cur.fetchall():
+        svc = {"id": row[0], "name": row[1], "duration": int(row[2])}
+        if row[3] and row[4] is not None and row[5] is not None and row[6] is not None:
+            svc["is_flexible_duration"] = True
+            svc["min_duration_minutes"] = int(row[4])
+            svc["max_duration_minutes"] = int(row[5])
+            svc["duration_increment_minutes"] = int(row[6])
+        services.append(svc)
+
+    # Tenant-scoped: a tenant batch passes it in, loaded once for all locations.
+    staff_services = (tenant_scope or {}).get("staff_services")
+    if staff_services is None:
+        staff_services = load_tenant_scope(cur, tenant_id, venue=False)["staff_services"]
+
+    cur.execute("SELECT service_id FROM location_services WHERE tenant_id = %s AND location_id = %s", (tenant_id, location_id))
+    location_services = {r[0] for r in cur.fetchall()}
+
+    # The midnight roll (`rolling=True`, from dispatch/gen_availability_dispatch.py)
+    # re-slices days the store already holds and normally computes only the
+    # newly exposed last day. Every other run — API full generation after a
+    # schedule edit, regen, cache viewer — computes its whole range.
+    computed_at = day_store.database_now(cur)
+    reusable_days = {}
+    if rolling and not is_regen:
+        dates = [(start_date + timedelta(days=d)).strftime("%Y-%m-%d") for d in range(days_range)]
+        reusable_days = day_store.reusable_days(cur, valkey_client, "staff", tenant_id, location_id, dates)
+        logger.info(f"[DAYS] Re-slicing {len(reusable_days)}/{days_range} stored days for tenant={tenant_id}, location={location_id}")
+    computed_days = {}
+
+    # Read every schedule input once for the dates this run computes: the
+    # recurring rows compile into a per-weekday base, one-time rows,
+    # closures, hours and bookings are the per-date exceptions laid over it
+    # (tasks/utils/availability_schedule.py).
+    pending = [(start_date + timedelta(days=d)).strftime("%Y-%m-%d") for d in range(days_range)]
+    pending = [d for d in pending if d not in reusable_days]
+    if pending:
+        staff_schedule = schedule.load_staff_schedule(cur, tenant_id, location_id, pending[0], pending[-1])
+        location_hours = schedule.load_location_hours(cur, tenant_id, location_id, pending[0], pending[-1])
+        bookings_by_date = schedule.load_bookings(cur, tenant_id, location_id, pending[0], pending[-1], "staff_id")
+    staff_service_ids = {}
+
+    def services_at_location(sid):
+        if sid not in staff_service_ids:
+            staff_service_ids[sid] = [svc for svc in staff_services.get(sid, []) if svc in location_services]
+        return staff_service_ids[sid]
+
+    for chunk_start in range(0, days_range, chunk_size):
+        response = {
+            "tenant_id": tenant_id,
+            "location_id": location_id,
+            "services": services,
+            "availabilities": []
+        }
+
+        for day_offset in range(chunk_start, min(chunk_start + chunk_size, days_range)):
+            current_date = start_date + timedelta(days=day_offset)
+            current_date_str = current_date.strftime("%Y-%m-%d")
+            if current_date_str in reusable_days:
+                response["availabilities"].append(reusable_days[current_date_str])
+                continue
+            python_day = current_date.weekday()
+            db_day = (python_day + 1) % 7
+
+            availability = {
+                "date": current_date_str,
+                "staff": [],
+                "holiday": None,
+                "is_open": True,
+                "open_hours": []
+            }
+
+            staff_dict = schedule.staff_day(staff_schedule, current_date_str, db_day, services_at_location)
+            bookings = bookings_by_date.get(current_date_str, [])
+
+            updated_staff_dict = reconstruct_staff_availability(bookings, staff_dict)
+
+            # Resolve location open hours BEFORE finalising staff[] so we can
+            # clamp staff slots to the opening window. A holiday closure or
+            # absent open_hours collapses staff[] to an empty list.
+            hours = schedule.open_hours(location_hours, current_date_str, db_day)
+            if hours is None:
+                availability["holiday"] = True
+                availability["is_open"] = False
+            else:
+                availability["open_hours"] = hours
+                if not availability["open_hours"]:
+                    availability["is_open"] = False
+
+            if availability["is_open"]:
+                clamped_staff_dict = intersect_slots_with_open_hours(
+                    updated_staff_dict, availability["open_hours"]
+                )
+                availability["staff"] = list(clamped_staff_dict.values())
+            else:
+                # Holiday or no open hours — never advertise staff slots
+                availability["staff"] = []
+
+            response["availabilities"].append(availability)
+            computed_days[current_date_str] = availability
+
+        # Cache per 3-day chunk
+        # Get the chunk's start date
+        chunk_start_date = start_date + timedelta(days=chunk_start)
+        chunk_start_date_str = chunk_start_date.strftime("%Y-%m-%d")
+        cache_key = f"availability:tenant_{tenant_id}:location_{location_id}:start_date_{chunk_start_date_str}"
+
+        if not is_regen:
+            # ➖ Delete the previous day's key
+            prev_day = chunk_start_date - timedelta(days=1)
+            prev_day_key = f"availability:tenant_{tenant_id}:location_{location_id}:start_date_{prev_day.strftime('%Y-%m-%d')}"
+            deleted = valkey_client.delete(prev_day_key)
+            if deleted:
+                logger.info(f"[LOCAL TEST] Deleted previous cache key: {prev_day_key}")
+            else:
+                logger.info(f"[LOCAL TEST] No previous cache key to delete: {prev_day_key}")
+
+        # ✅ Set current chunk's key
+        valkey_client.set(cache_key, json.dumps(response))
+        logger.info(f"🗝️ [CACHE WRITE] Writing cache key: {cache_key}")
+        if progress:
+            progress(min(chunk_start + chunk_size, days_range), days_range)
+
+    day_store.write_days(valkey_client, tenant_id, location_id, "staff", computed_days, computed_at)
+    # Slot-search index (tasks/utils/slot_index.py): regen replaces the days
+    # it computed; every other run rebuilds the whole window from the days it
+    # just cached, reused ones included, so a lost index (or one that missed
+    # a failed write) is whole again after the next midnight roll.
+    if is_regen:
+        slot_index.write_days(valkey_client, tenant_id, location_id, computed_days, services=services)
+    else:
+        slot_index.write_days(valkey_client, tenant_id, location_id, {**reusable_days, **computed_days},
+                              services=services, rebuild=True)
+
+    # Update availability_change_log to mark changes as published
+    try:
+        cur.execute("""
+            UPDATE availability_change_log
+            SET is_published = TRUE, published_at = CURRENT_TIMESTAMP
+            WHERE tenant_id = %s AND location_id = %s AND is_published = FALSE
+            RETURNING change_id, entity_type, entity_id, action
+        """, (tenant_id, location_id))
+        published_changes = cur.fetchall()
+        pg_conn.commit()
+        if published_changes:
+            logger.info(f"[PUBLISH] Marked {len(published_changes)} availability changes as published for tenant={tenant_id}, location={location_id}")
+            for change_id, entity_type, entity_id, action in published_changes:
+                logger.debug(f"[PUBLISH] change_id={change_id}, {entity_type}={entity_id}, action={action}")
+        else:
+            logger.info(f"[PUBLISH] No unpublished changes found for tenant={tenant_id}, location={location_id}")
+    except Exception as publish_e:
+        logger.warning(f"[PUBLISH] Failed to update availability_change_log: {publish_e}")
+        # Don't fail the task if publish update fails
+
+    cur.close()
+    db_end = time.time()
+    logger.info(f"[INFO] DB fetch duration: {db_end - db_start:.2f}s")
+    logger.info(f"[DEBUG] JSON generated and cached for tenant_id={tenant_id}, location_id={location_id}")
+    return {"status": "success", "days_generated": days_range, "days_computed": len(computed_days),
+            "duration_seconds": db_end - db_start}
+
+
 @app.task(bind=True, acks_late=True, reject_on_worker_lost=True)
-def gen_availability(self, tenant_id, location_id, location_tz, affected_date=None, task_id=None):
+def gen_availability(self, tenant_id, location_id, location_tz, affected_date=None, task_id=None, rolling=False):
     logger.info(f"[LOCAL TEST] Generating availability for tenant={tenant_id}, location={location_id}")
 
     db_url = os.getenv("DATABASE_URL")
@@ -94,6 +361,7 @@ def gen_availability(self, tenant_id, location_id, location_tz, affected_date=No
         logger.error("Missing DATABASE_URL or REDIS_URL in .env")
         return
 
+    pg_conn = None
     try:
         pg_conn = psycopg2.connect(db_url)
         logger.info("✅ Connected to PostgreSQL")
@@ -112,261 +380,11 @@ def gen_availability(self, tenant_id, location_id, location_tz, affected_date=No
             except Exception as db_e:
                 logger.warning(f"mark_task_running failed: {db_e}")
 
-        cur = pg_conn.cursor()
-        db_start = time.time()
-        chunk_size = 3
-        is_regen = affected_date is not None
-
-        if is_regen:
-            
-            dt = parser.parse(affected_date)
-            affected_dt = dt.replace(hour=0, minute=0, second=0, microsecond=0)
-            # Ensure affected_dt has the same timezone as location_tz
-            if affected_dt.tzinfo is None:
-                affected_dt = affected_dt.replace(tzinfo=ZoneInfo(location_tz))
-            # Compute current midnight in location_tz for chunk calculation
-            now_local = datetime.now(ZoneInfo(location_tz))
-            current_start = now_local.replace(hour=0, minute=0, second=0, microsecond=0)
-            day_offset = (affected_dt - current_start).days
-            if day_offset < 0:
-                logger.info(f"[SKIP] Affected date {affected_date} is in the past for tenant={tenant_id}, location={location_id}")
-                if task_id:
-                    try:
-                        mark_task_succeeded(task_id=str(task_id), celery_task_id=str(self.request.id),
-                                            details={'tenant_id': tenant_id, 'location_id': location_id, 'status': 'skipped', 'reason': 'date_in_past'},
-                                            actor='celery', progress=100)
-                    except Exception as db_e:
-                        logger.warning(f"mark_task_succeeded (skipped) failed: {db_e}")
-                return {"status": "skipped"}
-            chunk_index = day_offset // chunk_size
-            chunk_start_offset = chunk_index * chunk_size
-            chunk_start_day = current_start + timedelta(days=chunk_start_offset)
-            start_date = chunk_start_day
-            days_range = chunk_size  # 3 days for regen
-            start_date = start_date.replace(tzinfo=ZoneInfo(location_tz))
-            logger.info(f"[REGEN] Regenerating chunk starting {chunk_start_day.date().isoformat()} for affected_date={affected_date}")
-        else:
-            start_date = datetime.now(ZoneInfo(location_tz)).replace(hour=0, minute=0, second=0, microsecond=0)
-            days_range = 60
-            logger.info(f"[FULL] Generating full availability starting from {start_date.date().isoformat()}")
-
-        # Preload services once.
-        # Flexible-duration columns (Phase 2) are loaded additively. For the
-        # service-business (staff) path the staff slots are open windows with no
-        # baked-in duration, so the only change needed is to expose each flexible
-        # service's bounds here; the consumer validates a chosen (start, duration)
-        # against the staff window at request time. Fixed services keep the exact
-        # {id,name,duration} shape.
-        services = []
-        cur.execute("""
-            SELECT s.service_id, s.name, EXTRACT(EPOCH FROM s.duration)/60,
-                   s.is_flexible_duration, s.min_duration_minutes,
-                   s.max_duration_minutes, s.duration_increment_minutes
-            FROM location_services ls
-            JOIN services s ON ls.tenant_id = s.tenant_id AND ls.service_id = s.service_id
-            WHERE ls.tenant_id = %s AND ls.location_id = %s AND s.is_active = TRUE
-            ORDER BY s.service_id
-        """, (tenant_id, location_id))
-        for row in cur.fetchall():
-            svc = {"id": row[0], "name": row[1], "duration": int(row[2])}
-            if row[3] and row[4] is not None and row[5] is not None and row[6] is not None:
-                svc["is_flexible_duration"] = True
-                svc["min_duration_minutes"] = int(row[4])
-                svc["max_duration_minutes"] = int(row[5])
-                svc["duration_increment_minutes"] = int(row[6])
-            services.append(svc)
-
-        staff_services, location_services = {}, set()
-        # Preload services on first day
-        cur.execute("SELECT staff_id, service_id FROM staff_services WHERE tenant_id = %s", (tenant_id,))
-        for sid, svc_id in cur.fetchall():
-            staff_services.setdefault(sid, []).append(svc_id)
-
-        cur.execute("SELECT service_id FROM location_services WHERE tenant_id = %s AND location_id = %s", (tenant_id, location_id))
-        location_services = {r[0] for r in cur.fetchall()}
-
-        for chunk_start in range(0, days_range, chunk_size):
-            response = {
-                "tenant_id": tenant_id,
-                "location_id": location_id,
-                "services": services,
-                "availabilities": []
-            }
-
-            for day_offset in range(chunk_start, min(chunk_start + chunk_size, days_range)):
-                current_date = start_date + timedelta(days=day_offset)
-                current_date_str = current_date.strftime("%Y-%m-%d")
-                python_day = current_date.weekday()
-                db_day = (python_day + 1) % 7
-
-                availability = {
-                    "date": current_date_str,
-                    "staff": [],
-                    "holiday": None,
-                    "is_open": True,
-                    "open_hours": []
-                }
-
-                # Step 1: Get one-time availability entries at THIS location for the date
-                cur.execute("""
-                    SELECT s.staff_id, s.name, sa.start_time, sa.end_time, sa.is_closed
-                    FROM staff s
-                    JOIN staff_availability sa ON s.tenant_id = sa.tenant_id AND s.staff_id = sa.staff_id
-                    WHERE s.tenant_id = %s AND sa.location_id = %s AND sa.type = 'one_time'
-                    AND sa.specific_date = %s AND sa.is_active = TRUE AND s.is_active = TRUE
-                """, (tenant_id, location_id, current_date_str))
-                one_time_staff_rows = cur.fetchall()
-
-                # Step 2: Recurring availability for staff who do NOT have a one-time
-                # entry on this date at ANY location in the tenant. The one-time row is
-                # treated as the tenant-wide source of truth: if a staff has a one-time
-                # at location B on this date, they are "pinned" to B and must not be
-                # emitted from any other location's recurring schedule.
-                cur.execute("""
-                    SELECT s.staff_id, s.name, sa.start_time, sa.end_time
-                    FROM staff s
-                    JOIN staff_availability sa ON s.tenant_id = sa.tenant_id AND s.staff_id = sa.staff_id
-                    WHERE s.tenant_id = %s AND sa.location_id = %s AND sa.type = 'recurring'
-                    AND sa.day_of_week = %s AND (sa.specific_date IS NULL OR sa.specific_date <> %s)
-                    AND sa.is_active = TRUE AND s.is_active = TRUE
-                    AND NOT EXISTS (
-                        SELECT 1
-                        FROM staff_availability sa2
-                        WHERE sa2.tenant_id = s.tenant_id
-                          AND sa2.staff_id = s.staff_id
-                          AND sa2.type = 'one_time'
-                          AND sa2.specific_date = %s
-                          AND sa2.is_active = TRUE
-                    )
-                """, (tenant_id, location_id, db_day, current_date_str, current_date_str))
-                recurring_staff_rows = cur.fetchall()
-
-                cur.execute("""
-                    SELECT staff_id, customer_id, start_time, end_time
-                    FROM bookings
-                    WHERE tenant_id = %s AND location_id = %s
-                    AND start_time >= %s AND start_time < %s::date + INTERVAL '1 day'
-                    AND status IN ('confirmed', 'pending_guarantee')
-                """, (tenant_id, location_id, current_date_str, current_date_str))
-                booking_rows = cur.fetchall()
-                bookings = [{"staff_id": r[0], "customer_id": r[1], "start_time": r[2].strftime("%Y-%m-%d %H:%M:%S"), "end_time": r[3].strftime("%Y-%m-%d %H:%M:%S")} for r in booking_rows]
-
-                staff_dict = {}
-                
-                # Process one-time availability first (highest priority)
-                for sid, name, start, end, is_closed in one_time_staff_rows:
-                    if not is_closed:  # Only add if not closed for the day
-                        staff_dict.setdefault(sid, {
-                            "id": sid,
-                            "name": name,
-                            "service": [svc for svc in staff_services.get(sid, []) if svc in location_services],
-                            "slots": []
-                        })["slots"].append({"start": str(start), "end": str(end)})
-                    # If is_closed = true, staff is completely unavailable (don't add to staff_dict)
-                
-                # Process recurring availability for staff without one-time entries
-                for sid, name, start, end in recurring_staff_rows:
-                    staff_dict.setdefault(sid, {
-                        "id": sid,
-                        "name": name,
-                        "service": [svc for svc in staff_services.get(sid, []) if svc in location_services],
-                        "slots": []
-                    })["slots"].append({"start": str(start), "end": str(end)})
-
-                updated_staff_dict = reconstruct_staff_availability(bookings, staff_dict)
-
-                # Resolve location open hours BEFORE finalising staff[] so we can
-                # clamp staff slots to the opening window. A holiday closure or
-                # absent open_hours collapses staff[] to an empty list.
-                cur.execute("""
-                    SELECT COUNT(*)
-                    FROM location_availability
-                    WHERE tenant_id = %s AND location_id = %s AND type = 'one_time'
-                    AND specific_date = %s AND is_active = true AND is_closed = true
-                """, (tenant_id, location_id, current_date_str))
-                if cur.fetchone()[0] > 0:
-                    availability["holiday"] = True
-                    availability["is_open"] = False
-                else:
-                    cur.execute("""
-                        SELECT start_time, end_time
-                        FROM location_availability
-                        WHERE tenant_id = %s AND location_id = %s AND is_active = true AND is_closed = false
-                        AND ((type = 'recurring' AND day_of_week = %s) OR (type = 'one_time' AND specific_date = %s))
-                        ORDER BY start_time
-                    """, (tenant_id, location_id, db_day, current_date_str))
-                    hours = cur.fetchall()
-                    for s, e in hours:
-                        availability["open_hours"].append({"start": s.strftime("%H:%M"), "end": e.strftime("%H:%M")})
-                    if not availability["open_hours"]:
-                        availability["is_open"] = False
-
-                if availability["is_open"]:
-                    clamped_staff_dict = intersect_slots_with_open_hours(
-                        updated_staff_dict, availability["open_hours"]
-                    )
-                    availability["staff"] = list(clamped_staff_dict.values())
-                else:
-                    # Holiday or no open hours — never advertise staff slots
-                    availability["staff"] = []
-
-                response["availabilities"].append(availability)
-
-            # Cache per 3-day chunk
-            # Get the chunk's start date
-            chunk_start_date = start_date + timedelta(days=chunk_start)
-            chunk_start_date_str = chunk_start_date.strftime("%Y-%m-%d")
-            cache_key = f"availability:tenant_{tenant_id}:location_{location_id}:start_date_{chunk_start_date_str}"
-
-            if not is_regen:
-                # ➖ Delete the previous day's key
-                prev_day = chunk_start_date - timedelta(days=1)
-                prev_day_key = f"availability:tenant_{tenant_id}:location_{location_id}:start_date_{prev_day.strftime('%Y-%m-%d')}"
-                deleted = valkey_client.delete(prev_day_key)
-                if deleted:
-                    logger.info(f"[LOCAL TEST] Deleted previous cache key: {prev_day_key}")
-                else:
-                    logger.info(f"[LOCAL TEST] No previous cache key to delete: {prev_day_key}")
-
-            # ✅ Set current chunk's key
-            valkey_client.set(cache_key, json.dumps(response))
-            logger.info(f"🗝️ [CACHE WRITE] Writing cache key: {cache_key}")
-
-        # Update availability_change_log to mark changes as published
-        try:
-            cur.execute("""
-                UPDATE availability_change_log
-                SET is_published = TRUE, published_at = CURRENT_TIMESTAMP
-                WHERE tenant_id = %s AND location_id = %s AND is_published = FALSE
-                RETURNING change_id, entity_type, entity_id, action
-            """, (tenant_id, location_id))
-            published_changes = cur.fetchall()
-            pg_conn.commit()
-            if published_changes:
-                logger.info(f"[PUBLISH] Marked {len(published_changes)} availability changes as published for tenant={tenant_id}, location={location_id}")
-                for change_id, entity_type, entity_id, action in published_changes:
-                    logger.debug(f"[PUBLISH] change_id={change_id}, {entity_type}={entity_id}, action={action}")
-            else:
-                logger.info(f"[PUBLISH] No unpublished changes found for tenant={tenant_id}, location={location_id}")
-        except Exception as publish_e:
-            logger.warning(f"[PUBLISH] Failed to update availability_change_log: {publish_e}")
-            # Don't fail the task if publish update fails
-
-        cur.close()
-        db_end = time.time()
-        logger.info(f"[INFO] DB fetch duration: {db_end - db_start:.2f}s")
-        logger.info(f"[DEBUG] JSON generated and cached for tenant_id={tenant_id}, location_id={location_id}")
-
-        # Mark task as succeeded before returning
-        if task_id:
-            try:
-                mark_task_succeeded(task_id=str(task_id), celery_task_id=str(self.request.id),
-                                    details={'tenant_id': tenant_id, 'location_id': location_id, 'days_generated': days_range, 'duration_seconds': db_end - db_start},
-                                    actor='celery', progress=100)
-            except Exception as db_e:
-                logger.warning(f"mark_task_succeeded failed: {db_e}")
-
-        return {"status": "success"}
+        result = generate_staff_location(pg_conn, valkey_client, tenant_id, location_id, location_tz,
+                                         affected_date, rolling=rolling,
+                                         progress=_progress_reporter(self))
+        _mark_generated(self, task_id, tenant_id, location_id, result)
+        return {"status": result["status"]}
 
     except Exception as e:
         import traceback
@@ -381,10 +399,291 @@ def gen_availability(self, tenant_id, location_id, location_tz, affected_date=No
             except Exception as db_e:
                 logger.warning(f"mark_task_failed failed: {db_e}")
         return None
+    finally:
+        if pg_conn is not None:
+            pg_conn.close()
+
+
+def generate_venue_location(pg_conn, valkey_client, tenant_id, location_id, location_tz,
+                            affected_date=None, rolling=False, tenant_scope=None,
+                            progress=None):
+    """generate_staff_location for a venue (restaurant) location."""
+    cur = pg_conn.cursor()
+    chunk_size = 3
+    is_regen = affected_date is not None
+
+    if is_regen:
+        from dateutil import parser
+        dt = parser.parse(affected_date)
+        affected_dt = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+        # Ensure affected_dt has the same timezone as location_tz
+        if affected_dt.tzinfo is None:
+            affected_dt = affected_dt.replace(tzinfo=ZoneInfo(location_tz))
+        # Compute current midnight in location_tz for chunk calculation
+        now_local = datetime.now(ZoneInfo(location_tz))
+        current_start = now_local.replace(hour=0, minute=0, second=0, microsecond=0)
+        day_offset = (affected_dt - current_start).days
+        if day_offset < 0:
+            logger.info(f"[SKIP] Affected date {affected_date} is in the past for tenant={tenant_id}, location={location_id}")
+            return {"status": "skipped", "reason": "date_in_past"}
+        chunk_index = day_offset // chunk_size
+        chunk_start_offset = chunk_index * chunk_size
+        chunk_start_day = current_start + timedelta(days=chunk_start_offset)
+        start_date = chunk_start_day
+        days_range = chunk_size  # 3 days for regen
+        start_date = start_date.replace(tzinfo=ZoneInfo(location_tz))
+        logger.info(f"[REGEN] Regenerating chunk starting {chunk_start_day.date().isoformat()} for affected_date={affected_date}")
+    else:
+        start_date = datetime.now(ZoneInfo(location_tz)).replace(hour=0, minute=0, second=0, microsecond=0)
+        days_range = 60
+        logger.info(f"[FULL] Generating full availability starting from {start_date.date().isoformat()}")
+
+    # Preload services
+    # Flexible-duration columns (Phase 2) are loaded additively: a service
+    # only carries is_flexible_duration + min/max/increment when it opted in
+    # AND has complete bounds. Fixed services keep the exact {id,name,duration}
+    # shape, so the cache is byte-identical for non-flexible tenants.
+    services = []
+    cur.execute("""
+        SELECT s.service_id, s.name, EXTRACT(EPOCH FROM s.duration)/60,
+               s.is_flexible_duration, s.min_duration_minutes,
+               s.max_duration_minutes, s.duration_increment_minutes
+        FROM location_services ls
+        JOIN services s ON ls.tenant_id = s.tenant_id AND ls.service_id = s.service_id
+        WHERE ls.tenant_id = %s AND ls.location_id = %s AND s.is_active = TRUE
+        ORDER BY s.service_id
+    """, (tenant_id, location_id))
+    for row in cur.fetchall():
+        svc = {"id": row[0], "name": row[1], "duration": int(row[2])}
+        if row[3] and row[4] is not None and row[5] is not None and row[6] is not None:
+            svc["is_flexible_duration"] = True
+            svc["min_duration_minutes"] = int(row[4])
+            svc["max_duration_minutes"] = int(row[5])
+            svc["duration_increment_minutes"] = int(row[6])
+        services.append(svc)
+
+    # Bounds lookups for marking flexible venue units below.
+    service_bounds_by_id = {
+        s["id"]: {
+            "min": s["min_duration_minutes"],
+            "max": s["max_duration_minutes"],
+            "increment": s["duration_increment_minutes"],
+        }
+        for s in services if s.get("is_flexible_duration")
+    }
+    flexible_service_ids = set(service_bounds_by_id.keys())
+
+    # Option B — restaurant venue-wide flexible duration. A `rest` location can
+    # be flexible as a whole via locations.flexible_booking_enabled + four
+    # location-level bound columns (one activity per location, v1). When the
+    # flag is on AND the bounds are valid, EVERY venue unit is marked flexible
+    # with these bounds (takes precedence over the per-service-link logic). This
+    # is the only function that serves rest venues, so no location_type gate is
+    # needed. Dark-by-default: disabled, or enabled-with-invalid-bounds, leaves
+    # location_flex_bounds = None and the legacy per-link path runs unchanged.
+    cur.execute(
+        """
+        SELECT flexible_booking_enabled, flexible_min_duration_minutes,
+               flexible_max_duration_minutes, flexible_duration_increment_minutes
+        FROM locations WHERE tenant_id = %s AND location_id = %s
+        """,
+        (tenant_id, location_id),
+    )
+    _loc_flex_row = cur.fetchone()
+    location_flex_bounds = None
+    if _loc_flex_row and _loc_flex_row[0]:
+        _mn, _mx, _inc = _loc_flex_row[1], _loc_flex_row[2], _loc_flex_row[3]
+        location_flex_bounds = resolve_location_flex_bounds(True, _mn, _mx, _inc)
+        if location_flex_bounds is None:
+            logger.warning(
+                "[gen_availability_venue] flexible_booking_enabled is true for "
+                "tenant_id=%s location_id=%s but location-level bounds are invalid "
+                "(min=%s max=%s increment=%s); treating venue as fixed.",
+                tenant_id, location_id, _mn, _mx, _inc,
+            )
+
+    # Preload service mappings
+    # Tenant-scoped: a tenant batch passes it in, loaded once for all locations.
+    venue_unit_services = (tenant_scope or {}).get("venue_unit_services")
+    if venue_unit_services is None:
+        venue_unit_services = load_tenant_scope(cur, tenant_id, staff=False)["venue_unit_services"]
+
+    cur.execute("SELECT service_id FROM location_services WHERE tenant_id = %s AND location_id = %s", (tenant_id, location_id))
+    location_services = {r[0] for r in cur.fetchall()}
+
+    # Preload venue tags for this location
+    venue_tags = {}
+    location_zone_tags = []
+    cur.execute("""
+        SELECT tag_id, name, slug
+        FROM location_tag 
+        WHERE tenant_id = %s AND location_id = %s AND is_active = TRUE AND category_id = 1
+        ORDER BY name
+    """, (tenant_id, location_id))
+    for tag_id, tag_name, tag_slug in cur.fetchall():
+        venue_tags[tag_id] = tag_name  # Keep for lookup
+        location_zone_tags.append({
+            "id": tag_id,
+            "name": tag_name,
+            "slug": tag_slug
+        })
+
+    # The midnight roll (`rolling=True`, from dispatch/gen_availability_dispatch.py)
+    # re-slices days the store already holds and normally computes only the
+    # newly exposed last day. Every other run — API full generation after a
+    # schedule edit, regen, cache viewer — computes its whole range.
+    computed_at = day_store.database_now(cur)
+    reusable_days = {}
+    if rolling and not is_regen:
+        dates = [(start_date + timedelta(days=d)).strftime("%Y-%m-%d") for d in range(days_range)]
+        reusable_days = day_store.reusable_days(cur, valkey_client, "venue", tenant_id, location_id, dates)
+        logger.info(f"[DAYS] Re-slicing {len(reusable_days)}/{days_range} stored days for tenant={tenant_id}, location={location_id}")
+    computed_days = {}
+
+    # Read every schedule input once for the dates this run computes: the
+    # recurring rows compile into a per-weekday base, one-time rows,
+    # closures, hours and bookings are the per-date exceptions laid over it
+    # (tasks/utils/availability_schedule.py).
+    pending = [(start_date + timedelta(days=d)).strftime("%Y-%m-%d") for d in range(days_range)]
+    pending = [d for d in pending if d not in reusable_days]
+    if pending:
+        venue_schedule = schedule.load_venue_schedule(cur, tenant_id, location_id, pending[0], pending[-1])
+        location_hours = schedule.load_location_hours(cur, tenant_id, location_id, pending[0], pending[-1])
+        bookings_by_date = schedule.load_bookings(cur, tenant_id, location_id, pending[0], pending[-1], "venue_unit_id")
+    unit_details_by_id = {}
+
+    def unit_details(vuid, zone_tag_ids):
+        if vuid not in unit_details_by_id:
+            unit_details_by_id[vuid] = (
+                [svc for svc in venue_unit_services.get(vuid, []) if svc in location_services],
+                resolve_tag_names(zone_tag_ids, venue_tags),
+            )
+        return unit_details_by_id[vuid]
+
+    for chunk_start in range(0, days_range, chunk_size):
+        response = {
+            "tenant_id": tenant_id,
+            "location_id": location_id,
+            "services": services,
+            "location_zone_tags": location_zone_tags,
+            "availabilities": []
+        }
+
+        for day_offset in range(chunk_start, min(chunk_start + chunk_size, days_range)):
+            current_date = start_date + timedelta(days=day_offset)
+            current_date_str = current_date.strftime("%Y-%m-%d")
+            if current_date_str in reusable_days:
+                response["availabilities"].append(reusable_days[current_date_str])
+                continue
+            python_day = current_date.weekday()
+            db_day = (python_day + 1) % 7
+
+            availability = {
+                "date": current_date_str,
+                "holiday": None,
+                "is_open": True,
+                "open_hours": []
+            }
+
+            venue_dict, is_dining_table = schedule.venue_day(venue_schedule, current_date_str, db_day, unit_details)
+            bookings = bookings_by_date.get(current_date_str, [])
+
+            # Mark flexible venue units (Phase 2): a unit is flexible when any
+            # of its linked services is flexible. Bounds live at the venue
+            # level (they survive reconstruct's deepcopy); annotate_bookable_starts
+            # reads them to compute starts + expose bounds on each slot. Units
+            # with no flexible service are untouched (fixed behavior preserved).
+            for v in venue_dict.values():
+                if location_flex_bounds is not None:
+                    # Venue-wide flexible (Option B): every unit, location bounds.
+                    v["is_flexible"] = True
+                    v["duration_bounds"] = location_flex_bounds
+                    continue
+                flex = next(
+                    (service_bounds_by_id[s] for s in v.get("service", []) if s in flexible_service_ids),
+                    None,
+                )
+                if flex:
+                    v["is_flexible"] = True
+                    v["duration_bounds"] = flex
+
+            updated_venue_dict = reconstruct_venue_availability(bookings, venue_dict)
+            # Pre-compute the bookable start times per slot so voice-ai
+            # consumers don't have to re-derive fitness from slot width
+            # at request time. Single source of truth for "what starts
+            # actually work" lives here.
+            updated_venue_dict = annotate_bookable_starts(updated_venue_dict)
+            venue_key_name = "tables" if is_dining_table else "venue_units"
+            availability[venue_key_name] = list(updated_venue_dict.values())
+
+            hours = schedule.open_hours(location_hours, current_date_str, db_day)
+            if hours is None:
+                availability["holiday"] = True
+                availability["is_open"] = False
+            else:
+                availability["open_hours"] = hours
+                if not availability["open_hours"]:
+                    availability["is_open"] = False
+
+            response["availabilities"].append(availability)
+            computed_days[current_date_str] = availability
+
+        chunk_start_date = start_date + timedelta(days=chunk_start)
+        chunk_start_date_str = chunk_start_date.strftime("%Y-%m-%d")
+        cache_key = f"availability:tenant_{tenant_id}:location_{location_id}:start_date_{chunk_start_date_str}"
+
+        if not is_regen:
+            prev_day = chunk_start_date - timedelta(days=1)
+            prev_day_key = f"availability:tenant_{tenant_id}:location_{location_id}:start_date_{prev_day.strftime('%Y-%m-%d')}"
+            deleted = valkey_client.delete(prev_day_key)
+            if deleted:
+                logger.info(f"[LOCAL TEST] Deleted previous cache key: {prev_day_key}")
+            else:
+                logger.info(f"[LOCAL TEST] No previous cache key to delete: {prev_day_key}")
+
+        valkey_client.set(cache_key, json.dumps(response))
+        logger.info(f"🗝️ [CACHE WRITE] Writing cache key: {cache_key}")
+        if progress:
+            progress(min(chunk_start + chunk_size, days_range), days_range)
+
+    day_store.write_days(valkey_client, tenant_id, location_id, "venue", computed_days, computed_at)
+    # Slot-search index (tasks/utils/slot_index.py): regen replaces the days
+    # it computed; every other run rebuilds the whole window from the days it
+    # just cached, reused ones included, so a lost index (or one that missed
+    # a failed write) is whole again after the next midnight roll.
+    if is_regen:
+        slot_index.write_days(valkey_client, tenant_id, location_id, computed_days, services=services)
+    else:
+        slot_index.write_days(valkey_client, tenant_id, location_id, {**reusable_days, **computed_days},
+                              services=services, rebuild=True)
+
+    # Update availability_change_log to mark changes as published
+    try:
+        cur.execute("""
+            UPDATE availability_change_log
+            SET is_published = TRUE, published_at = CURRENT_TIMESTAMP
+            WHERE tenant_id = %s AND location_id = %s AND is_published = FALSE
+            RETURNING change_id, entity_type, entity_id, action
+        """, (tenant_id, location_id))
+        published_changes = cur.fetchall()
+        pg_conn.commit()
+        if published_changes:
+            logger.info(f"[PUBLISH] Marked {len(published_changes)} availability changes as published for tenant={tenant_id}, location={location_id}")
+            for change_id, entity_type, entity_id, action in published_changes:
+                logger.debug(f"[PUBLISH] change_id={change_id}, {entity_type}={entity_id}, action={action}")
+        else:
+            logger.info(f"[PUBLISH] No unpublished changes found for tenant={tenant_id}, location={location_id}")
+    except Exception as publish_e:
+        logger.warning(f"[PUBLISH] Failed to update availability_change_log: {publish_e}")
+        # Don't fail the task if publish update fails
+
+    cur.close()
+    logger.info(f"[DEBUG] All chunks cached successfully for tenant={tenant_id}, location={location_id}")
+    return {"status": "success", "days_generated": days_range, "days_computed": len(computed_days)}
 
 
 @app.task(bind=True, acks_late=True, reject_on_worker_lost=True)
-def gen_availability_venue(self, tenant_id, location_id, location_tz, affected_date=None, task_id=None):
+def gen_availability_venue(self, tenant_id, location_id, location_tz, affected_date=None, task_id=None, rolling=False):
     logger.info(f"[LOCAL TEST] Generating availability for tenant={tenant_id}, location={location_id}")
 
     db_url = os.getenv("DATABASE_URL")
@@ -401,6 +700,7 @@ def gen_availability_venue(self, tenant_id, location_id, location_tz, affected_d
                 logger.warning(f"mark_task_failed (config_error) failed: {db_e}")
         return
 
+    pg_conn = None
     try:
         pg_conn = psycopg2.connect(db_url)
         logger.info("✅ Connected to PostgreSQL")
@@ -417,344 +717,11 @@ def gen_availability_venue(self, tenant_id, location_id, location_tz, affected_d
             except Exception as db_e:
                 logger.warning(f"mark_task_running failed: {db_e}")
 
-        cur = pg_conn.cursor()
-        chunk_size = 3
-        is_regen = affected_date is not None
-
-        if is_regen:
-            from dateutil import parser
-            dt = parser.parse(affected_date)
-            affected_dt = dt.replace(hour=0, minute=0, second=0, microsecond=0)
-            # Ensure affected_dt has the same timezone as location_tz
-            if affected_dt.tzinfo is None:
-                affected_dt = affected_dt.replace(tzinfo=ZoneInfo(location_tz))
-            # Compute current midnight in location_tz for chunk calculation
-            now_local = datetime.now(ZoneInfo(location_tz))
-            current_start = now_local.replace(hour=0, minute=0, second=0, microsecond=0)
-            day_offset = (affected_dt - current_start).days
-            if day_offset < 0:
-                logger.info(f"[SKIP] Affected date {affected_date} is in the past for tenant={tenant_id}, location={location_id}")
-                if task_id:
-                    try:
-                        mark_task_succeeded(task_id=str(task_id), celery_task_id=str(self.request.id),
-                                            details={'tenant_id': tenant_id, 'location_id': location_id, 'status': 'skipped', 'reason': 'date_in_past'},
-                                            actor='celery', progress=100)
-                    except Exception as db_e:
-                        logger.warning(f"mark_task_succeeded (skipped) failed: {db_e}")
-                return {"status": "skipped"}
-            chunk_index = day_offset // chunk_size
-            chunk_start_offset = chunk_index * chunk_size
-            chunk_start_day = current_start + timedelta(days=chunk_start_offset)
-            start_date = chunk_start_day
-            days_range = chunk_size  # 3 days for regen
-            start_date = start_date.replace(tzinfo=ZoneInfo(location_tz))
-            logger.info(f"[REGEN] Regenerating chunk starting {chunk_start_day.date().isoformat()} for affected_date={affected_date}")
-        else:
-            start_date = datetime.now(ZoneInfo(location_tz)).replace(hour=0, minute=0, second=0, microsecond=0)
-            days_range = 60
-            logger.info(f"[FULL] Generating full availability starting from {start_date.date().isoformat()}")
-
-        # Preload services
-        # Flexible-duration columns (Phase 2) are loaded additively: a service
-        # only carries is_flexible_duration + min/max/increment when it opted in
-        # AND has complete bounds. Fixed services keep the exact {id,name,duration}
-        # shape, so the cache is byte-identical for non-flexible tenants.
-        services = []
-        cur.execute("""
-            SELECT s.service_id, s.name, EXTRACT(EPOCH FROM s.duration)/60,
-                   s.is_flexible_duration, s.min_duration_minutes,
-                   s.max_duration_minutes, s.duration_increment_minutes
-            FROM location_services ls
-            JOIN services s ON ls.tenant_id = s.tenant_id AND ls.service_id = s.service_id
-            WHERE ls.tenant_id = %s AND ls.location_id = %s AND s.is_active = TRUE
-            ORDER BY s.service_id
-        """, (tenant_id, location_id))
-        for row in cur.fetchall():
-            svc = {"id": row[0], "name": row[1], "duration": int(row[2])}
-            if row[3] and row[4] is not None and row[5] is not None and row[6] is not None:
-                svc["is_flexible_duration"] = True
-                svc["min_duration_minutes"] = int(row[4])
-                svc["max_duration_minutes"] = int(row[5])
-                svc["duration_increment_minutes"] = int(row[6])
-            services.append(svc)
-
-        # Bounds lookups for marking flexible venue units below.
-        service_bounds_by_id = {
-            s["id"]: {
-                "min": s["min_duration_minutes"],
-                "max": s["max_duration_minutes"],
-                "increment": s["duration_increment_minutes"],
-            }
-            for s in services if s.get("is_flexible_duration")
-        }
-        flexible_service_ids = set(service_bounds_by_id.keys())
-
-        # Option B — restaurant venue-wide flexible duration. A `rest` location can
-        # be flexible as a whole via locations.flexible_booking_enabled + four
-        # location-level bound columns (one activity per location, v1). When the
-        # flag is on AND the bounds are valid, EVERY venue unit is marked flexible
-        # with these bounds (takes precedence over the per-service-link logic). This
-        # is the only function that serves rest venues, so no location_type gate is
-        # needed. Dark-by-default: disabled, or enabled-with-invalid-bounds, leaves
-        # location_flex_bounds = None and the legacy per-link path runs unchanged.
-        cur.execute(
-            """
-            SELECT flexible_booking_enabled, flexible_min_duration_minutes,
-                   flexible_max_duration_minutes, flexible_duration_increment_minutes
-            FROM locations WHERE tenant_id = %s AND location_id = %s
-            """,
-            (tenant_id, location_id),
-        )
-        _loc_flex_row = cur.fetchone()
-        location_flex_bounds = None
-        if _loc_flex_row and _loc_flex_row[0]:
-            _mn, _mx, _inc = _loc_flex_row[1], _loc_flex_row[2], _loc_flex_row[3]
-            location_flex_bounds = resolve_location_flex_bounds(True, _mn, _mx, _inc)
-            if location_flex_bounds is None:
-                logger.warning(
-                    "[gen_availability_venue] flexible_booking_enabled is true for "
-                    "tenant_id=%s location_id=%s but location-level bounds are invalid "
-                    "(min=%s max=%s increment=%s); treating venue as fixed.",
-                    tenant_id, location_id, _mn, _mx, _inc,
-                )
-
-        # Preload service mappings
-        venue_unit_services = {}
-        location_services = set()
-        cur.execute("SELECT venue_unit_id, service_id FROM venue_unit_services WHERE tenant_id = %s", (tenant_id,))
-        for vuid, svc_id in cur.fetchall():
-            venue_unit_services.setdefault(vuid, []).append(svc_id)
-
-        cur.execute("SELECT service_id FROM location_services WHERE tenant_id = %s AND location_id = %s", (tenant_id, location_id))
-        location_services = {r[0] for r in cur.fetchall()}
-
-        # Preload venue tags for this location
-        venue_tags = {}
-        location_zone_tags = []
-        cur.execute("""
-            SELECT tag_id, name, slug
-            FROM location_tag 
-            WHERE tenant_id = %s AND location_id = %s AND is_active = TRUE AND category_id = 1
-            ORDER BY name
-        """, (tenant_id, location_id))
-        for tag_id, tag_name, tag_slug in cur.fetchall():
-            venue_tags[tag_id] = tag_name  # Keep for lookup
-            location_zone_tags.append({
-                "id": tag_id,
-                "name": tag_name,
-                "slug": tag_slug
-            })
-
-        for chunk_start in range(0, days_range, chunk_size):
-            response = {
-                "tenant_id": tenant_id,
-                "location_id": location_id,
-                "services": services,
-                "location_zone_tags": location_zone_tags,
-                "availabilities": []
-            }
-
-            for day_offset in range(chunk_start, min(chunk_start + chunk_size, days_range)):
-                current_date = start_date + timedelta(days=day_offset)
-                current_date_str = current_date.strftime("%Y-%m-%d")
-                python_day = current_date.weekday()
-                db_day = (python_day + 1) % 7
-
-                availability = {
-                    "date": current_date_str,
-                    "holiday": None,
-                    "is_open": True,
-                    "open_hours": []
-                }
-
-                # Step 1: Get one-time venue availability entries for this specific date
-                # Walk-in units are excluded from the cache — they're not bookable via voice-AI or the public page.
-                cur.execute("""
-                    SELECT vu.venue_unit_id, vu.name, vu.venue_unit_type, vu.capacity, vu.min_capacity, va.service_duration, va.start_time, va.end_time, va.availability_id, va.is_closed, vu.zone_tag_ids
-                    FROM venue_unit vu
-                    JOIN venue_availability va ON vu.tenant_id = va.tenant_id AND vu.venue_unit_id = va.venue_unit_id
-                    WHERE vu.tenant_id = %s AND va.location_id = %s AND va.type = 'one_time'
-                    AND va.specific_date = %s AND va.is_active = TRUE AND vu.is_active = TRUE
-                    AND vu.is_walk_in = FALSE
-                """, (tenant_id, location_id, current_date_str))
-                one_time_venue_rows = cur.fetchall()
-                
-                # Get venue unit IDs that have one-time entries
-                venues_with_one_time = {row[0] for row in one_time_venue_rows}
-                
-                # Step 2: Get recurring availability for venues who don't have one-time entries
-                if venues_with_one_time:
-                    cur.execute("""
-                        SELECT vu.venue_unit_id, vu.name, vu.venue_unit_type, vu.capacity, vu.min_capacity, va.service_duration, va.start_time, va.end_time, va.availability_id, vu.zone_tag_ids
-                        FROM venue_unit vu
-                        JOIN venue_availability va ON vu.tenant_id = va.tenant_id AND vu.venue_unit_id = va.venue_unit_id
-                        WHERE vu.tenant_id = %s AND va.location_id = %s AND va.type = 'recurring'
-                        AND va.day_of_week = %s AND (va.specific_date IS NULL OR va.specific_date <> %s)
-                        AND va.is_active = TRUE AND vu.is_active = TRUE
-                        AND vu.is_walk_in = FALSE
-                        AND vu.venue_unit_id NOT IN %s
-                    """, (tenant_id, location_id, db_day, current_date_str, tuple(venues_with_one_time)))
-                else:
-                    cur.execute("""
-                        SELECT vu.venue_unit_id, vu.name, vu.venue_unit_type, vu.capacity, vu.min_capacity, va.service_duration, va.start_time, va.end_time, va.availability_id, vu.zone_tag_ids
-                        FROM venue_unit vu
-                        JOIN venue_availability va ON vu.tenant_id = va.tenant_id AND vu.venue_unit_id = va.venue_unit_id
-                        WHERE vu.tenant_id = %s AND va.location_id = %s AND va.type = 'recurring'
-                        AND va.day_of_week = %s AND (va.specific_date IS NULL OR va.specific_date <> %s)
-                        AND va.is_active = TRUE AND vu.is_active = TRUE
-                        AND vu.is_walk_in = FALSE
-                    """, (tenant_id, location_id, db_day, current_date_str))
-                recurring_venue_rows = cur.fetchall()
-
-                cur.execute("""
-                    SELECT venue_unit_id, customer_id, start_time, end_time
-                    FROM bookings
-                    WHERE tenant_id = %s AND location_id = %s
-                    AND start_time >= %s AND start_time < %s::date + INTERVAL '1 day'
-                    AND status IN ('confirmed', 'pending_guarantee')
-                """, (tenant_id, location_id, current_date_str, current_date_str))
-                booking_rows = cur.fetchall()
-                bookings = [{"venue_unit_id": r[0], "customer_id": r[1], "start_time": r[2].strftime("%Y-%m-%d %H:%M:%S"), "end_time": r[3].strftime("%Y-%m-%d %H:%M:%S")} for r in booking_rows]
-
-                venue_dict = {}
-                is_dining_table = False
-
-                # Process one-time venue availability first (highest priority)
-                for vuid, name, venue_unit_type, capacity, min_capacity, service_duration, start, end, va_availability_id, is_closed, zone_tag_ids in one_time_venue_rows:
-                    if venue_unit_type == "dining_table":
-                        is_dining_table = True
-                    if not is_closed:  # Only add if not closed for the day
-                        zone_tags = resolve_tag_names(zone_tag_ids, venue_tags)
-                        venue_dict.setdefault(vuid, {
-                            "id": vuid,
-                            "name": name,
-                            "capacity": capacity,
-                            "min_capacity": min_capacity,
-                            "service": [svc for svc in venue_unit_services.get(vuid, []) if svc in location_services],
-                            "zone_tags": zone_tags,
-                            "zone_tag_ids": zone_tag_ids or [],
-                            "slots": []
-                        })["slots"].append({"start": str(start), "end": str(end), "service_duration": str(service_duration)})
-                    # If is_closed = true, venue is completely unavailable (don't add to venue_dict)
-
-                # Process recurring availability for venues without one-time entries
-                for vuid, name, venue_unit_type, capacity, min_capacity, service_duration, start, end, va_availability_id, zone_tag_ids in recurring_venue_rows:
-                    if venue_unit_type == "dining_table":
-                        is_dining_table = True
-                    zone_tags = resolve_tag_names(zone_tag_ids, venue_tags)
-                    venue_dict.setdefault(vuid, {
-                        "id": vuid,
-                        "name": name,
-                        "capacity": capacity,
-                        "min_capacity": min_capacity,
-                        "service": [svc for svc in venue_unit_services.get(vuid, []) if svc in location_services],
-                        "zone_tags": zone_tags,
-                        "zone_tag_ids": zone_tag_ids or [],
-                        "slots": []
-                    })["slots"].append({"start": str(start), "end": str(end), "service_duration": str(service_duration)})
-
-                # Mark flexible venue units (Phase 2): a unit is flexible when any
-                # of its linked services is flexible. Bounds live at the venue
-                # level (they survive reconstruct's deepcopy); annotate_bookable_starts
-                # reads them to compute starts + expose bounds on each slot. Units
-                # with no flexible service are untouched (fixed behavior preserved).
-                for v in venue_dict.values():
-                    if location_flex_bounds is not None:
-                        # Venue-wide flexible (Option B): every unit, location bounds.
-                        v["is_flexible"] = True
-                        v["duration_bounds"] = location_flex_bounds
-                        continue
-                    flex = next(
-                        (service_bounds_by_id[s] for s in v.get("service", []) if s in flexible_service_ids),
-                        None,
-                    )
-                    if flex:
-                        v["is_flexible"] = True
-                        v["duration_bounds"] = flex
-
-                updated_venue_dict = reconstruct_venue_availability(bookings, venue_dict)
-                # Pre-compute the bookable start times per slot so voice-ai
-                # consumers don't have to re-derive fitness from slot width
-                # at request time. Single source of truth for "what starts
-                # actually work" lives here.
-                updated_venue_dict = annotate_bookable_starts(updated_venue_dict)
-                venue_key_name = "tables" if is_dining_table else "venue_units"
-                availability[venue_key_name] = list(updated_venue_dict.values())
-
-                cur.execute("""
-                    SELECT COUNT(*)
-                    FROM location_availability
-                    WHERE tenant_id = %s AND location_id = %s AND type = 'one_time'
-                    AND specific_date = %s AND is_active = true AND is_closed = true
-                """, (tenant_id, location_id, current_date_str))
-                if cur.fetchone()[0] > 0:
-                    availability["holiday"] = True
-                    availability["is_open"] = False
-                else:
-                    cur.execute("""
-                        SELECT start_time, end_time
-                        FROM location_availability
-                        WHERE tenant_id = %s AND location_id = %s AND is_active = true AND is_closed = false
-                        AND ((type = 'recurring' AND day_of_week = %s) OR (type = 'one_time' AND specific_date = %s))
-                        ORDER BY start_time
-                    """, (tenant_id, location_id, db_day, current_date_str))
-                    hours = cur.fetchall()
-                    for s, e in hours:
-                        availability["open_hours"].append({"start": s.strftime("%H:%M"), "end": e.strftime("%H:%M")})
-                    if not availability["open_hours"]:
-                        availability["is_open"] = False
-
-                response["availabilities"].append(availability)
-
-            chunk_start_date = start_date + timedelta(days=chunk_start)
-            chunk_start_date_str = chunk_start_date.strftime("%Y-%m-%d")
-            cache_key = f"availability:tenant_{tenant_id}:location_{location_id}:start_date_{chunk_start_date_str}"
-
-            if not is_regen:
-                prev_day = chunk_start_date - timedelta(days=1)
-                prev_day_key = f"availability:tenant_{tenant_id}:location_{location_id}:start_date_{prev_day.strftime('%Y-%m-%d')}"
-                deleted = valkey_client.delete(prev_day_key)
-                if deleted:
-                    logger.info(f"[LOCAL TEST] Deleted previous cache key: {prev_day_key}")
-                else:
-                    logger.info(f"[LOCAL TEST] No previous cache key to delete: {prev_day_key}")
-
-            valkey_client.set(cache_key, json.dumps(response))
-            logger.info(f"🗝️ [CACHE WRITE] Writing cache key: {cache_key}")
-
-        # Update availability_change_log to mark changes as published
-        try:
-            cur.execute("""
-                UPDATE availability_change_log
-                SET is_published = TRUE, published_at = CURRENT_TIMESTAMP
-                WHERE tenant_id = %s AND location_id = %s AND is_published = FALSE
-                RETURNING change_id, entity_type, entity_id, action
-            """, (tenant_id, location_id))
-            published_changes = cur.fetchall()
-            pg_conn.commit()
-            if published_changes:
-                logger.info(f"[PUBLISH] Marked {len(published_changes)} availability changes as published for tenant={tenant_id}, location={location_id}")
-                for change_id, entity_type, entity_id, action in published_changes:
-                    logger.debug(f"[PUBLISH] change_id={change_id}, {entity_type}={entity_id}, action={action}")
-            else:
-                logger.info(f"[PUBLISH] No unpublished changes found for tenant={tenant_id}, location={location_id}")
-        except Exception as publish_e:
-            logger.warning(f"[PUBLISH] Failed to update availability_change_log: {publish_e}")
-            # Don't fail the task if publish update fails
-
-        cur.close()
-        logger.info(f"[DEBUG] All chunks cached successfully for tenant={tenant_id}, location={location_id}")
-
-        # Mark task as succeeded before returning
-        if task_id:
-            try:
-                mark_task_succeeded(task_id=str(task_id), celery_task_id=str(self.request.id),
-                                    details={'tenant_id': tenant_id, 'location_id': location_id, 'days_generated': days_range},
-                                    actor='celery', progress=100)
-            except Exception as db_e:
-                logger.warning(f"mark_task_succeeded failed: {db_e}")
-
-        return {"status": "success"}
+        result = generate_venue_location(pg_conn, valkey_client, tenant_id, location_id, location_tz,
+                                         affected_date, rolling=rolling,
+                                         progress=_progress_reporter(self))
+        _mark_generated(self, task_id, tenant_id, location_id, result)
+        return {"status": result["status"]}
 
     except Exception as e:
         import traceback
@@ -769,3 +736,51 @@ def gen_availability_venue(self, tenant_id, location_id, location_tz, affected_d
             except Exception as db_e:
                 logger.warning(f"mark_task_failed failed: {db_e}")
         return None
+    finally:
+        if pg_conn is not None:
+            pg_conn.close()
+
+
+@app.task(bind=True, acks_late=True, reject_on_worker_lost=True)
+def gen_availability_tenant(self, tenant_id, locations, rolling=False):
+    """Full (or rolling) generation for several locations of one tenant on one
+    connection. `locations` is [{"location_id", "location_tz",
+    "location_type"}]; restaurants ("rest") use the venue generator. The
+    tenant-scoped service maps are read once for the batch, and one location
+    failing is rolled back and reported without stopping the others."""
+    logger.info(f"[TENANT] Generating availability for tenant={tenant_id}, {len(locations)} location(s)")
+
+    db_url = os.getenv("DATABASE_URL")
+    redis_url = os.getenv("REDIS_URL")
+
+    if not db_url or not redis_url:
+        logger.error("Missing DATABASE_URL or REDIS_URL in .env")
+        return
+
+    pg_conn = psycopg2.connect(db_url)
+    try:
+        valkey_client = redis.Redis.from_url(redis_url, decode_responses=True)
+        types = {loc.get("location_type") for loc in locations}
+        cur = pg_conn.cursor()
+        tenant_scope = load_tenant_scope(cur, tenant_id,
+                                         staff=bool(types - {"rest"}), venue="rest" in types)
+        cur.close()
+
+        results = {}
+        for loc in locations:
+            location_id = loc["location_id"]
+            generate = generate_venue_location if loc.get("location_type") == "rest" else generate_staff_location
+            try:
+                result = generate(pg_conn, valkey_client, tenant_id, location_id, loc["location_tz"],
+                                  rolling=rolling, tenant_scope=tenant_scope)
+                results[str(location_id)] = result["status"]
+            except Exception as e:
+                pg_conn.rollback()
+                logger.error(f"[TENANT] tenant={tenant_id}, location={location_id} failed: {e}")
+                results[str(location_id)] = "failed"
+
+        failed = sum(1 for status in results.values() if status == "failed")
+        logger.info(f"[TENANT] tenant={tenant_id}: {len(results) - failed} generated, {failed} failed")
+        return {"status": "partial" if failed else "success", "locations": results}
+    finally:
+        pg_conn.close()
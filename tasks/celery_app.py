@@ -1,4 +1,5 @@
 from celery import Celery
+from celery.utils.log import get_task_logger
 import os
 from dotenv import load_dotenv
 
@@ -23,14 +24,15 @@ app.conf.update(task_track_started=True)
 app.conf.update(worker_send_task_events=True, task_send_sent_event=True)
 
 # ── Worker memory hygiene (added 2026-07-29) ─────────────────────────────────
-# This is a single monolithic worker that imports EVERY task module below
+# This is a single monolithic worker that imports EVERY task module
 # (playwright, pandas, OpenAI, agent-publishing, scraping, ...), so each prefork
 # child carries a heavy baseline. On the 512MB instance that let the worker OOM
 # under a small burst of concurrent tasks (which silently dropped in-flight
 # availability-regen tasks). These settings bound per-child memory and recycle
 # children so RSS can't grow unbounded over the worker's lifetime. The durable
 # fix (splitting heavy tasks onto a dedicated queue/worker) is sketched in
-# docs/plans/celery-worker-memory-hardening.md.
+# docs/plans/celery-worker-memory-hardening.md; the per-queue module loading
+# at the bottom of this file is what makes such a split possible.
 app.conf.update(
     worker_max_tasks_per_child=50,        # recycle a forked child after 50 tasks
     worker_max_memory_per_child=200000,   # KB (~200MB): recycle a child once it exceeds this
@@ -65,24 +67,33 @@ app.conf.update(
 
 app.autodiscover_tasks(['tasks'])
 
-# 👇 Add this line
-import tasks.availability
-import tasks.sms
-import tasks.availability_gen_regen
-import tasks.analyze_knowledge
-import tasks.scrape_url
-import tasks.scrape_business_profile
-import tasks.sync_speako_data
-import tasks.publish_elevenlabs_agent
-import tasks.sync_elevenlabs_conversations
-import tasks.generate_dashboard_metrics
-import tasks.create_ai_agent
-import tasks.purchase_twilio_number
-import tasks.update_twilio_friendly_name
-import tasks.refresh_annual_minutes
-import tasks.publish_native_agent
-import tasks.retry_audio_upload
-import tasks.provision_sip_location
-import tasks.rebuild_knowledge_chunks
-import tasks.embed_knowledge_param
-import tasks.summarize_chat_sessions
\ No newline at end of file
+# ── Queues and task-module loading (see tasks/task_registry.py) ──────────────
+# Every task is routed to its module's queue. A worker started without -Q
+# consumes all of them (the current single worker); a dedicated worker, e.g.
+#   celery --app tasks.celery_app worker -Q sms,availability
+# imports only the modules on its queues. Producers (app.py, dispatch/*) import
+# the task modules they call directly and never need the full set.
+from celery import signals  # noqa: E402
+
+from tasks.task_registry import DEFAULT_QUEUE, load_task_modules, queue_declarations, route_task  # noqa: E402
+
+app.conf.update(
+    task_queues=queue_declarations(),
+    task_default_queue=DEFAULT_QUEUE,
+    task_routes=(route_task,),
+)
+
+
+@signals.celeryd_init.connect
+def _load_worker_task_modules(sender=None, conf=None, options=None, **kwargs):
+    options = options or {}
+    loaded = load_task_modules(
+        app,
+        queues=options.get('queues'),
+        exclude=options.get('exclude_queues'),
+        logger=get_task_logger(__name__),
+    )
+    get_task_logger(__name__).info(
+        "[celery_app] task modules imported=%d stubbed=%d (queues=%s)",
+        len(loaded['imported']), len(loaded['stubbed']), options.get('queues') or 'all',
+    )
@@ -1,12 +1,26 @@
 #!/usr/bin/env python3
 """
 Email template utilities for rendering HTML email templates.
+
+The templates in email_templates/ use mustache-style tags: ``{{name}}`` for a
+value, ``{{#section}}...{{/section}}`` for an optional block and
+``{{^section}}...{{/section}}`` for its inverse. Each file is read and compiled
+to a Jinja2 template once per process (one cached Environment), so a render is
+a single pass over the compiled template instead of a disk read plus one
+``str.replace``/``re.sub`` scan of the whole HTML body per placeholder and
+section.
+
+With ENVIRONMENT=dev the Environment checks file mtimes on every render, so
+edits to a template show up without restarting the worker.
 """
 
 import os
 import re
+import threading
 from datetime import datetime
 
+import jinja2
+
 def format_time_12hour(time_obj) -> str:
     """
     Format time object to 12-hour format with am/pm.
@@ -41,23 +55,108 @@ def format_time_12hour(time_obj) -> str:
     else:
         return f"{hour-12}:{minute:02d}pm"
 
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'email_templates')
+
+# Any {{...}} tag: group 1 is the sigil (# open, ^ inverted, / close), group 2 the name.
+_TAG = re.compile(r'{{([#^/]?)([^}]+)}}')
+_NAME = re.compile(r'\w+')
+
+
+def _auto_reload() -> bool:
+    """Hot-reload templates from disk — dev only."""
+    return os.getenv("ENVIRONMENT", "").lower() in ("dev", "development")
+
+
+def _to_jinja(source: str) -> str:
+    """
+    Translate a mustache-style email template into Jinja2 source.
+
+    Values come from ``v`` and section flags from ``s`` (both dicts). A section
+    or inverted section with no flag is shown, and tags that aren't a plain
+    name render as nothing — the same result the old string-replacement
+    renderer produced for them.
+    """
+    out = []
+    pos = 0
+    for match in _TAG.finditer(source):
+        literal = source[pos:match.start()]
+        if literal:
+            out.append('{% raw %}' + literal + '{% endraw %}' if '{' in literal else literal)
+        pos = match.end()
+        sigil, name = match.group(1), match.group(2).strip()
+        if not _NAME.fullmatch(name):
+            continue
+        if sigil == '#':
+            out.append('{%% if s.get(%r, true) %%}' % name)
+        elif sigil == '^':
+            out.append('{%% if not s.get(%r, false) %%}' % name)
+        elif sigil == '/':
+            out.append('{% endif %}')
+        else:
+            out.append('{{ v.get(%r, "") }}' % name)
+    literal = source[pos:]
+    if literal:
+        out.append('{% raw %}' + literal + '{% endraw %}' if '{' in literal else literal)
+    return ''.join(out)
+
+
+class _MustacheLoader(jinja2.FileSystemLoader):
+    def get_source(self, environment, template):
+        source, filename, uptodate = super().get_source(environment, template)
+        return _to_jinja(source), filename, uptodate
+
+
+_env_lock = threading.Lock()
+_env = None
+
+
+def _environment() -> jinja2.Environment:
+    global _env
+    if _env is None:
+        with _env_lock:
+            if _env is None:
+                _env = jinja2.Environment(
+                    loader=_MustacheLoader(TEMPLATE_DIR),
+                    autoescape=False,  # values are inserted verbatim, as before
+                    auto_reload=_auto_reload(),
+                    keep_trailing_newline=True,
+                )
+    return _env
+
+
+def _render(template_name: str, values: dict, sections: dict) -> str:
+    try:
+        template = _environment().get_template(template_name)
+    except jinja2.TemplateNotFound:
+        print(f"[EMAIL_TEMPLATE] Template file not found: {template_name}")
+        return ""
+    return template.render(v=values, s=sections)
+
+
+_raw_cache = {}
+
+
 def load_email_template(template_name: str) -> str:
     """
     Load an email template from the email_templates directory.
     
+    The raw file content is cached per process (re-read on every call in dev).
+    
     Args:
         template_name (str): Name of the template file (e.g., 'booking_confirmation.html')
     
     Returns:
         str: Template content as a string, or empty string if not found
     """
+    if not _auto_reload() and template_name in _raw_cache:
+        return _raw_cache[template_name]
     try:
-        # Get the directory where this file is located
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        template_path = os.path.join(current_dir, 'email_templates', template_name)
+        template_path = os.path.join(TEMPLATE_DIR, template_name)
         
         with open(template_path, 'r', encoding='utf-8') as file:
-            return file.read()
+            content = file.read()
+        _raw_cache[template_name] = content
+        return content
     except FileNotFoundError:
         print(f"[EMAIL_TEMPLATE] Template file not found: {template_name}")
         return ""
@@ -65,6 +164,53 @@ def load_email_template(template_name: str) -> str:
         print(f"[EMAIL_TEMPLATE] Error loading template {template_name}: {e}")
         return ""
 
+
+def _has_text(value) -> bool:
+    return bool(value and value.strip())
+
+
+def _zone_list(value):
+    if isinstance(value, list):
+        return ', '.join(str(zone) for zone in value) if value else 'Not Assigned'
+    return value
+
+
+def _location_sections(kwargs: dict) -> dict:
+    """Location info block; the per-field flags are only set when it's shown."""
+    location_address = kwargs.get('location_address')
+    location_phone = kwargs.get('location_phone')
+    location_website = kwargs.get('location_website')
+    if not (location_address or location_phone or location_website):
+        return {'location_info_section': False}
+    return {
+        'location_info_section': True,
+        'location_phone': _has_text(location_phone),
+        'location_address': _has_text(location_address),
+        'location_website': _has_text(location_website),
+    }
+
+
+def _booking_sections(kwargs: dict, is_restaurant: bool) -> dict:
+    """Sections shared by the merchant and customer templates."""
+    if is_restaurant:
+        # Restaurant booking - venue section and party size, no staff section
+        sections = {'venue_section': True, 'party_section': True, 'staff_section': False}
+    elif kwargs.get('staff_name') or kwargs.get('service_name'):
+        # Service booking - staff section, no venue section or party size
+        sections = {'venue_section': False, 'party_section': False, 'staff_section': True}
+    else:
+        sections = {'venue_section': False, 'party_section': False, 'staff_section': False}
+    is_modification = bool(kwargs.get('is_modification'))
+    sections['is_modification'] = is_modification
+    sections['is_cancellation'] = bool(kwargs.get('is_cancellation'))
+    sections['original_booking_section'] = bool(
+        is_modification and (kwargs.get('original_booking_date') or kwargs.get('original_start_time'))
+    )
+    sections.update(_location_sections(kwargs))
+    sections['manage_booking_section'] = _has_text(kwargs.get('booking_page_alias'))
+    return sections
+
+
 def render_booking_confirmation_template(**kwargs) -> str:
     """
     Render the booking confirmation email template with provided data.
@@ -93,117 +239,21 @@ def render_booking_confirmation_template(**kwargs) -> str:
         str: Rendered HTML template, or empty string if template loading fails
     """
     try:
-        # Load the base template
-        template = load_email_template('booking_confirmation.html')
-        
-        if not template:
-            return ""
-        
-        # Replace all placeholders with provided values
+        values = {}
         for key, value in kwargs.items():
-            placeholder = f"{{{{{key}}}}}"
-            
             # Convert None values to empty string or appropriate default
             if value is None:
-                if key in ['venue_unit_name', 'staff_name', 'service_name']:
-                    value = 'Not Assigned'
-                elif key in ['venue_unit_id', 'staff_id', 'service_id']:
+                if key in ['venue_unit_name', 'venue_unit_id', 'staff_name', 'staff_id',
+                           'service_name', 'service_id']:
                     value = 'Not Assigned'
                 else:
                     value = ''
-            
-            # Convert to string
-            template = template.replace(placeholder, str(value))
-        
-        # Handle optional sections based on presence of venue/staff data
-        if kwargs.get('venue_unit_name') or kwargs.get('venue_unit_id'):
-            # This is a restaurant booking - show venue section and party size, hide staff section
-            template = template.replace('{{#venue_section}}', '')
-            template = template.replace('{{/venue_section}}', '')
-            template = template.replace('{{#party_section}}', '')
-            template = template.replace('{{/party_section}}', '')
-            template = re.sub(r'{{#staff_section}}.*?{{/staff_section}}', '', template, flags=re.DOTALL)
-        elif kwargs.get('staff_name') or kwargs.get('service_name'):
-            # This is a service booking - show staff section, hide venue section and party size
-            template = template.replace('{{#staff_section}}', '')
-            template = template.replace('{{/staff_section}}', '')
-            template = re.sub(r'{{#venue_section}}.*?{{/venue_section}}', '', template, flags=re.DOTALL)
-            template = re.sub(r'{{#party_section}}.*?{{/party_section}}', '', template, flags=re.DOTALL)
-        else:
-            # No specific venue or staff info - hide all optional sections
-            template = re.sub(r'{{#venue_section}}.*?{{/venue_section}}', '', template, flags=re.DOTALL)
-            template = re.sub(r'{{#staff_section}}.*?{{/staff_section}}', '', template, flags=re.DOTALL)
-            template = re.sub(r'{{#party_section}}.*?{{/party_section}}', '', template, flags=re.DOTALL)
-        
-        # Handle modification styling
-        if kwargs.get('is_modification'):
-            template = template.replace('{{#is_modification}}', '')
-            template = template.replace('{{/is_modification}}', '')
-        else:
-            template = re.sub(r'{{#is_modification}}.*?{{/is_modification}}', '', template, flags=re.DOTALL)
-        
-        # Handle cancellation styling
-        if kwargs.get('is_cancellation'):
-            template = template.replace('{{#is_cancellation}}', '')
-            template = template.replace('{{/is_cancellation}}', '')
-        else:
-            template = re.sub(r'{{#is_cancellation}}.*?{{/is_cancellation}}', '', template, flags=re.DOTALL)
-        
-        # Handle original booking section (for modifications)
-        if kwargs.get('is_modification') and (kwargs.get('original_booking_date') or kwargs.get('original_start_time')):
-            template = template.replace('{{#original_booking_section}}', '')
-            template = template.replace('{{/original_booking_section}}', '')
-        else:
-            template = re.sub(r'{{#original_booking_section}}.*?{{/original_booking_section}}', '', template, flags=re.DOTALL)
-        
-        # Handle location information section
-        location_address = kwargs.get('location_address')
-        location_phone = kwargs.get('location_phone')
-        location_website = kwargs.get('location_website')
-        
-        if location_address or location_phone or location_website:
-            # Show location info section
-            template = template.replace('{{#location_info_section}}', '')
-            template = template.replace('{{/location_info_section}}', '')
-            
-            # Handle individual location fields
-            if location_phone and location_phone.strip():
-                template = template.replace('{{#location_phone}}', '')
-                template = template.replace('{{/location_phone}}', '')
-            else:
-                template = re.sub(r'{{#location_phone}}.*?{{/location_phone}}', '', template, flags=re.DOTALL)
-            
-            if location_address and location_address.strip():
-                template = template.replace('{{#location_address}}', '')
-                template = template.replace('{{/location_address}}', '')
-            else:
-                template = re.sub(r'{{#location_address}}.*?{{/location_address}}', '', template, flags=re.DOTALL)
-            
-            if location_website and location_website.strip():
-                template = template.replace('{{#location_website}}', '')
-                template = template.replace('{{/location_website}}', '')
-            else:
-                template = re.sub(r'{{#location_website}}.*?{{/location_website}}', '', template, flags=re.DOTALL)
-        else:
-            # Hide entire location info section if no data
-            template = re.sub(r'{{#location_info_section}}.*?{{/location_info_section}}', '', template, flags=re.DOTALL)
+            values[key] = str(value)
         
-        # Handle manage booking section
-        booking_page_alias = kwargs.get('booking_page_alias')
-        if booking_page_alias and booking_page_alias.strip():
-            template = template.replace('{{#manage_booking_section}}', '')
-            template = template.replace('{{/manage_booking_section}}', '')
-        else:
-            template = re.sub(r'{{#manage_booking_section}}.*?{{/manage_booking_section}}', '', template, flags=re.DOTALL)
-        
-        # Clean up any remaining placeholder sections
-        template = re.sub(r'{{#\w+}}', '', template)
-        template = re.sub(r'{{/\w+}}', '', template)
-        
-        # Clean up any remaining placeholders that weren't provided
-        template = re.sub(r'{{[^}]+}}', '', template)
-        
-        return template
+        sections = _booking_sections(
+            kwargs, is_restaurant=bool(kwargs.get('venue_unit_name') or kwargs.get('venue_unit_id'))
+        )
+        return _render('booking_confirmation.html', values, sections)
         
     except Exception as e:
         print(f"[EMAIL_TEMPLATE] Error rendering template: {e}")
@@ -253,170 +303,46 @@ def render_customer_booking_confirmation_template(**kwargs) -> str:
         str: Rendered HTML template, or empty string if template loading fails
     """
     try:
-        # Load the customer template
-        template = load_email_template('customer_booking_confirmation.html')
-        
-        if not template:
-            return ""
-        
-        # Replace all placeholders with provided values
+        values = {}
         for key, value in kwargs.items():
-            placeholder = f"{{{{{key}}}}}"
-            
             # Convert None values to empty string or appropriate default
             if value is None:
-                if key in ['zone_names', 'venue_unit_name', 'staff_name', 'service_name']:
+                if key in ['zone_names', 'venue_unit_name', 'venue_unit_id', 'staff_name',
+                           'staff_id', 'service_name', 'service_id']:
                     value = 'Not Assigned'
-                elif key in ['venue_unit_id', 'staff_id', 'service_id']:
-                    value = 'Not Assigned'
-                elif key in ['logo_url', 'banner_url']:
-                    value = ''
                 else:
                     value = ''
             
-            # Handle zone_names special case - convert list to string
-            if key == 'zone_names' and isinstance(value, list):
-                if value:
-                    value = ', '.join(str(zone) for zone in value)
-                else:
-                    value = 'Not Assigned'
-            
-            # Handle original_zone_names special case - convert list to string
-            if key == 'original_zone_names' and isinstance(value, list):
-                if value:
-                    value = ', '.join(str(zone) for zone in value)
-                else:
-                    value = 'Not Assigned'
+            # Zone lists render as "A, B" (or Not Assigned when empty)
+            if key in ('zone_names', 'original_zone_names'):
+                value = _zone_list(value)
             
-            # Convert to string
-            template = template.replace(placeholder, str(value))
-        
-        # Handle manage booking URL construction
-        booking_page_alias = kwargs.get('booking_page_alias')
-        booking_access_token = kwargs.get('booking_access_token')
-        
-        if booking_page_alias and booking_page_alias.strip():
-            if booking_access_token and booking_access_token.strip():
-                # Construct URL with token parameter
-                manage_booking_url = f"{os.getenv('BOOKING_LINK_BASE_URL', 'https://speako.ai')}/customer/booking/{booking_page_alias.strip()}/view?token={booking_access_token.strip()}"
-            else:
-                # Fallback URL without token
-                manage_booking_url = f"{os.getenv('BOOKING_LINK_BASE_URL', 'https://speako.ai')}/customer/booking/{booking_page_alias.strip()}/view"
-            template = template.replace('{{manage_booking_url}}', manage_booking_url)
-        else:
-            template = template.replace('{{manage_booking_url}}', '')
-        
-        # Handle button color defaults
-        if 'button_color_start' not in kwargs or not kwargs.get('button_color_start'):
-            # Default to green gradient for new bookings
-            template = template.replace('{{button_color_start}}', '#28a745')
-        if 'button_color_end' not in kwargs or not kwargs.get('button_color_end'):
-            # Default to green gradient for new bookings
-            template = template.replace('{{button_color_end}}', '#20c997')
-        
-        # Handle optional sections based on presence of venue/staff data
-        if kwargs.get('zone_names') or kwargs.get('venue_unit_name') or kwargs.get('venue_unit_id'):
-            # This is a restaurant booking - show venue section and party size, hide staff section
-            template = template.replace('{{#venue_section}}', '')
-            template = template.replace('{{/venue_section}}', '')
-            template = template.replace('{{#party_section}}', '')
-            template = template.replace('{{/party_section}}', '')
-            template = re.sub(r'{{#staff_section}}.*?{{/staff_section}}', '', template, flags=re.DOTALL)
-        elif kwargs.get('staff_name') or kwargs.get('service_name'):
-            # This is a service booking - show staff section, hide venue section and party size
-            template = template.replace('{{#staff_section}}', '')
-            template = template.replace('{{/staff_section}}', '')
-            template = re.sub(r'{{#venue_section}}.*?{{/venue_section}}', '', template, flags=re.DOTALL)
-            template = re.sub(r'{{#party_section}}.*?{{/party_section}}', '', template, flags=re.DOTALL)
-        else:
-            # No specific venue or staff info - hide all optional sections
-            template = re.sub(r'{{#venue_section}}.*?{{/venue_section}}', '', template, flags=re.DOTALL)
-            template = re.sub(r'{{#staff_section}}.*?{{/staff_section}}', '', template, flags=re.DOTALL)
-            template = re.sub(r'{{#party_section}}.*?{{/party_section}}', '', template, flags=re.DOTALL)
-        
-        # Handle logo section
-        if kwargs.get('logo_url') and kwargs.get('logo_url').strip():
-            template = template.replace('{{#logo_section}}', '')
-            template = template.replace('{{/logo_section}}', '')
-        else:
-            template = re.sub(r'{{#logo_section}}.*?{{/logo_section}}', '', template, flags=re.DOTALL)
-        
-        # Handle banner section
-        if kwargs.get('banner_url') and kwargs.get('banner_url').strip():
-            template = template.replace('{{#banner_section}}', '')
-            template = template.replace('{{/banner_section}}', '')
-        else:
-            template = re.sub(r'{{#banner_section}}.*?{{/banner_section}}', '', template, flags=re.DOTALL)
-        
-        # Handle modification styling
-        if kwargs.get('is_modification'):
-            template = template.replace('{{#is_modification}}', '')
-            template = template.replace('{{/is_modification}}', '')
-        else:
-            template = re.sub(r'{{#is_modification}}.*?{{/is_modification}}', '', template, flags=re.DOTALL)
-        
-        # Handle cancellation styling
-        if kwargs.get('is_cancellation'):
-            template = template.replace('{{#is_cancellation}}', '')
-            template = template.replace('{{/is_cancellation}}', '')
-        else:
-            template = re.sub(r'{{#is_cancellation}}.*?{{/is_cancellation}}', '', template, flags=re.DOTALL)
-        
-        # Handle original booking section (for modifications)
-        if kwargs.get('is_modification') and (kwargs.get('original_booking_date') or kwargs.get('original_start_time')):
-            template = template.replace('{{#original_booking_section}}', '')
-            template = template.replace('{{/original_booking_section}}', '')
-        else:
-            template = re.sub(r'{{#original_booking_section}}.*?{{/original_booking_section}}', '', template, flags=re.DOTALL)
-        
-        # Handle location information section
-        location_address = kwargs.get('location_address')
-        location_phone = kwargs.get('location_phone')
-        location_website = kwargs.get('location_website')
-        
-        if location_address or location_phone or location_website:
-            # Show location info section
-            template = template.replace('{{#location_info_section}}', '')
-            template = template.replace('{{/location_info_section}}', '')
-            
-            # Handle individual location fields
-            if location_phone and location_phone.strip():
-                template = template.replace('{{#location_phone}}', '')
-                template = template.replace('{{/location_phone}}', '')
-            else:
-                template = re.sub(r'{{#location_phone}}.*?{{/location_phone}}', '', template, flags=re.DOTALL)
-            
-            if location_address and location_address.strip():
-                template = template.replace('{{#location_address}}', '')
-                template = template.replace('{{/location_address}}', '')
-            else:
-                template = re.sub(r'{{#location_address}}.*?{{/location_address}}', '', template, flags=re.DOTALL)
-            
-            if location_website and location_website.strip():
-                template = template.replace('{{#location_website}}', '')
-                template = template.replace('{{/location_website}}', '')
-            else:
-                template = re.sub(r'{{#location_website}}.*?{{/location_website}}', '', template, flags=re.DOTALL)
-        else:
-            # Hide entire location info section if no data
-            template = re.sub(r'{{#location_info_section}}.*?{{/location_info_section}}', '', template, flags=re.DOTALL)
-        
-        # Handle manage booking section
-        booking_page_alias = kwargs.get('booking_page_alias')
-        if booking_page_alias and booking_page_alias.strip():
-            template = template.replace('{{#manage_booking_section}}', '')
-            template = template.replace('{{/manage_booking_section}}', '')
-        else:
-            template = re.sub(r'{{#manage_booking_section}}.*?{{/manage_booking_section}}', '', template, flags=re.DOTALL)
-        
-        # Clean up any remaining placeholder sections
-        template = re.sub(r'{{#\w+}}', '', template)
-        template = re.sub(r'{{/\w+}}', '', template)
-        
-        # Clean up any remaining placeholders that weren't provided
-        template = re.sub(r'{{[^}]+}}', '', template)
-        
-        return template
+            values[key] = str(value)
+        
+        # Manage booking URL, unless the caller passed one
+        if 'manage_booking_url' not in kwargs:
+            booking_page_alias = kwargs.get('booking_page_alias')
+            booking_access_token = kwargs.get('booking_access_token')
+            manage_booking_url = ''
+            if _has_text(booking_page_alias):
+                base_url = os.getenv('BOOKING_LINK_BASE_URL', 'https://speako.ai')
+                manage_booking_url = f"{base_url}/customer/booking/{booking_page_alias.strip()}/view"
+                if _has_text(booking_access_token):
+                    manage_booking_url += f"?token={booking_access_token.strip()}"
+            values['manage_booking_url'] = manage_booking_url
+        
+        # Default to the green gradient used for new bookings
+        values.setdefault('button_color_start', '#28a745')
+        values.setdefault('button_color_end', '#20c997')
+        
+        sections = _booking_sections(
+            kwargs,
+            is_restaurant=bool(kwargs.get('zone_names') or kwargs.get('venue_unit_name')
+                               or kwargs.get('venue_unit_id')),
+        )
+        sections['logo_section'] = _has_text(kwargs.get('logo_url'))
+        sections['banner_section'] = _has_text(kwargs.get('banner_url'))
+        return _render('customer_booking_confirmation.html', values, sections)
         
     except Exception as e:
         print(f"[EMAIL_TEMPLATE] Error rendering customer template: {e}")
@@ -3,6 +3,9 @@ Generate aggregated dashboard metrics for tenants.
 
 This task collects business operation data from the database and generates
 a comprehensive JSON report including bookings, customers, calls, and trends.
+Booking and call figures come from the daily_location_metrics rollup
+(tasks/utils/daily_location_metrics.py), which refresh_daily_location_metrics
+keeps current.
 """
 
 from dotenv import load_dotenv
@@ -19,54 +22,22 @@ import json
 from datetime import datetime, timedelta
 from decimal import Decimal
 
+from tasks.utils import daily_location_metrics as rollup
+from tasks.utils.tenant_metrics_writer import MetricsWriter
+from tasks.utils.trends_engine import TrendCube, window_dates, window_end
+
 logger = get_task_logger(__name__)
 
 
-# ============================================================================
-# Channel bands
-# ============================================================================
-#
-# ADDING A CHANNEL: a booking whose source appears in no band is counted in NO
-# band -- it silently vanishes from the dashboard chart rather than falling into
-# an "other" bucket. That is how 'web-widget' left two prod tenants staring at an
-# empty chart while holding real bookings. If you add a booking_source value, add
-# it here AND in speako-web/src/lib/dashboard-metrics-generator.ts, then bump
-# TRENDS_CACHE_VERSION below so every tenant rebuilds.
-#
-# 'onboarding' is mapped for completeness only -- obsolete, zero rows on dev and
-# prod.
-CHANNEL_BANDS = [
-    ("bookings_ai", ("voice-ai",)),
-    ("bookings_web", ("web",)),
-    ("bookings_dashboard", ("dashboard", "onboarding")),
-    ("bookings_chat", ("facebook", "instagram", "web-widget")),
-]
-
-BAND_FIELDS = [field for field, _ in CHANNEL_BANDS]
-
-# Booking states that count as real business.
-#
-# 'completed' is included deliberately: applying a terminal service tag moves a
-# booking there (to release the venue-unit EXCLUDE constraint), and counting only
-# 'confirmed' made a tenant's own numbers shrink as they marked work done.
-# 'cancelled' didn't happen; 'modified' rows are superseded originals and would
-# double-count every modification; a pending guarantee isn't a booking yet.
-COUNTED_STATUSES = "('confirmed','completed')"
+# Channel bands (CHANNEL_BANDS, BAND_FIELDS) and COUNTED_STATUSES live with the
+# daily_location_metrics rollup the dashboard reads from; see the ADDING A
+# CHANNEL note there.
 
 # Bumped when the cached JSON shape changes. Without a bump, tenants keep
 # appending to an old-shaped tally and any new band stays empty forever.
-TRENDS_CACHE_VERSION = "v3"
-
-
-def _band_count_sql(prefix=""):
-    """One COUNT per band, so the SQL can never drift from CHANNEL_BANDS."""
-    col = f"{prefix}source" if prefix else "source"
-    return ",\n                    ".join(
-        "COUNT(*) FILTER (WHERE {} IN ({})) as {}".format(
-            col, ", ".join("'{}'".format(src) for src in sources), field
-        )
-        for field, sources in CHANNEL_BANDS
-    )
+# v4: the window ends on the tenant's local today and catches up over gaps;
+# v3 caches could carry a repeated date from the old one-day append.
+TRENDS_CACHE_VERSION = "v4"
 
 
 # ============================================================================
@@ -90,19 +61,23 @@ def get_db_connection():
 # Metrics Collection Functions
 # ============================================================================
 
-def collect_summary_metrics(tenant_id, location_ids):
+def collect_summary_metrics(tenant_id, location_ids, conn=None):
     """
     Collect summary metrics for all locations and by location.
     
-    Uses optimized queries with FILTER clauses to minimize DB load.
+    Bookings and calls are summed from the daily_location_metrics rollup.
     Calculates growth percentages by comparing current vs previous 30-day periods.
     
+    Args:
+        conn: Shared connection for the run (default: a new one, closed here)
+    
     Returns:
         dict: Summary section of the metrics JSON
     """
     logger.info(f"[Tenant {tenant_id}] Collecting summary metrics...")
     
-    conn = get_db_connection()
+    own_conn = conn is None
+    conn = conn or get_db_connection()
     
     try:
         # Initialize structure
@@ -133,33 +108,23 @@ def collect_summary_metrics(tenant_id, location_ids):
             for row in cur.fetchall():
                 location_names[row[0]] = row[1]
         
-        # Query 1: Bookings (current + previous 30 days)
+        # Query 1: Bookings and calls (current + previous 30 days), summed from
+        # the daily_location_metrics rollup instead of the raw tables.
         bookings_data = {}
+        calls_data = {}
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT 
-                    location_id,
-                    COUNT(*) FILTER (WHERE start_time >= NOW() - INTERVAL '30 days') as current_count,
-                    COUNT(*) FILTER (WHERE start_time >= NOW() - INTERVAL '60 days' 
-                                     AND start_time < NOW() - INTERVAL '30 days') as previous_count
-                FROM bookings
-                WHERE tenant_id = %s 
-                  AND location_id = ANY(%s)
-                  AND start_time >= NOW() - INTERVAL '60 days'
-                  AND status IN ('confirmed','completed')
-                GROUP BY location_id
-            """, (tenant_id, location_ids))
-            
-            for row in cur.fetchall():
-                loc_id = row[0]
-                current = row[1] or 0
-                previous = row[2] or 0
-                growth = calculate_growth_pct(current, previous)
-                
-                bookings_data[loc_id] = {
-                    "current": current,
-                    "growth_pct": growth
-                }
+            totals = rollup.period_totals(cur, tenant_id, location_ids, datetime.now().date())
+        for loc_id, t in totals.items():
+            bookings_data[loc_id] = {
+                "current": t["bookings_current"],
+                "growth_pct": calculate_growth_pct(t["bookings_current"], t["bookings_previous"])
+            }
+            calls_data[loc_id] = {
+                "current_count": t["calls_current"],
+                "calls_growth_pct": calculate_growth_pct(t["calls_current"], t["calls_previous"]),
+                "current_avg_duration": t["avg_duration_current"],
+                "duration_growth_pct": calculate_growth_pct(t["avg_duration_current"], t["avg_duration_previous"])
+            }
         
         # Query 2: Customers (tenant-level active customer count)
         total_customers = 0
@@ -180,43 +145,6 @@ def collect_summary_metrics(tenant_id, location_ids):
                 total_customers = current
                 customers_growth_pct = calculate_growth_pct(current, previous)
         
-        # Query 3: Calls (current + previous 30 days with avg duration)
-        calls_data = {}
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT 
-                    location_id,
-                    COUNT(*) FILTER (WHERE call_start_time >= NOW() - INTERVAL '30 days') as current_count,
-                    COUNT(*) FILTER (WHERE call_start_time >= NOW() - INTERVAL '60 days' 
-                                     AND call_start_time < NOW() - INTERVAL '30 days') as previous_count,
-                    AVG(call_duration_secs) FILTER (WHERE call_start_time >= NOW() - INTERVAL '30 days') as current_avg_duration,
-                    AVG(call_duration_secs) FILTER (WHERE call_start_time >= NOW() - INTERVAL '60 days' 
-                                                    AND call_start_time < NOW() - INTERVAL '30 days') as previous_avg_duration
-                FROM location_conversations
-                WHERE tenant_id = %s 
-                  AND location_id = ANY(%s)
-                  AND call_start_time >= NOW() - INTERVAL '60 days'
-                  AND call_successful = true
-                GROUP BY location_id
-            """, (tenant_id, location_ids))
-            
-            for row in cur.fetchall():
-                loc_id = row[0]
-                current_count = row[1] or 0
-                previous_count = row[2] or 0
-                current_avg = int(row[3]) if row[3] else 0
-                previous_avg = int(row[4]) if row[4] else 0
-                
-                calls_growth = calculate_growth_pct(current_count, previous_count)
-                duration_growth = calculate_growth_pct(current_avg, previous_avg)
-                
-                calls_data[loc_id] = {
-                    "current_count": current_count,
-                    "calls_growth_pct": calls_growth,
-                    "current_avg_duration": current_avg,
-                    "duration_growth_pct": duration_growth
-                }
-        
         # Aggregate by location
         for loc_id in location_ids:
             bookings = bookings_data.get(loc_id, {"current": 0, "growth_pct": 0.0})
@@ -320,7 +248,8 @@ def collect_summary_metrics(tenant_id, location_ids):
         logger.error(f"[Tenant {tenant_id}] Failed to collect summary metrics: {e}")
         raise
     finally:
-        conn.close()
+        if own_conn:
+            conn.close()
 
 
 def get_redis_client():
@@ -373,7 +302,8 @@ def save_trends_cache(tenant_id, trends_data):
     """
     try:
         redis_client = get_redis_client()
-        today_str = datetime.now().date().strftime("%Y-%m-%d")
+        # The window's last day (the tenant's local today), not the server date
+        today_str = trends_data["all_locations"]["90_days"]["dates"][-1]
         
         cache_key = f"dashboard_metrics:{tenant_id}:trends_data:{TRENDS_CACHE_VERSION}"
         last_update_key = f"dashboard_metrics:{tenant_id}:last_update:{TRENDS_CACHE_VERSION}"
@@ -388,208 +318,107 @@ def save_trends_cache(tenant_id, trends_data):
         logger.warning(f"[Tenant {tenant_id}] Failed to cache trends: {e}")
 
 
-def collect_trends(tenant_id, location_ids, location_names):
+def collect_trends(tenant_id, location_ids, location_names, location_timezones=None, conn=None):
     """
     Collect booking trends for 7/30/90 day time windows.
     
     Uses incremental updates with Redis caching:
     - First run: Full 90-day query
-    - Subsequent runs: Only query yesterday's data, append to cache
-    - Slides the 90-day window automatically
+    - Subsequent runs: Only query the days since the cached window's last day
+      (which was cut mid-day), shift the cached arrays, and append them, so a
+      missed run or several are caught up without a full re-scan
+    - A gap of a whole window or more falls back to the full query
     
-    Separates bookings by source: AI calls (voice-ai) vs Web (web/dashboard).
+    The window ends on the latest local date among the tenant's locations
+    (each location's counts are already bucketed by its own local date).
     
     Args:
         tenant_id (int): Tenant ID
         location_ids (list): List of location IDs
         location_names (dict): Map of location_id to location name
+        location_timezones (dict): Map of location_id to IANA timezone
+        conn: Shared connection for the run (default: a new one per query)
     
     Returns:
         dict: Trends section of the metrics JSON
     """
     logger.info(f"[Tenant {tenant_id}] Collecting booking trends...")
     
-    today = datetime.now().date()
-    yesterday = today - timedelta(days=1)
+    end = window_end((location_timezones or {}).values())
     
     # Try to get cached data
     cached_trends, last_update_str = get_cached_trends(tenant_id)
     
-    # Check if we can use incremental update
     if cached_trends and last_update_str:
-        last_update_date = datetime.strptime(last_update_str, "%Y-%m-%d").date()
-        
-        # If already updated today, return cached data
-        if last_update_date >= today:
-            logger.info(f"[Tenant {tenant_id}] Using today's cached trends data")
-            return cached_trends
-        
-        # If updated yesterday, do incremental update
-        if last_update_date == yesterday:
-            logger.info(f"[Tenant {tenant_id}] Performing incremental update (adding today's data)")
-            updated_trends = incremental_trends_update(
-                tenant_id, location_ids, location_names, cached_trends, today
-            )
+        updated_trends = incremental_trends_update(
+            tenant_id, location_ids, location_names, cached_trends, end, conn=conn
+        )
+        if updated_trends is not None:
             save_trends_cache(tenant_id, updated_trends)
             return updated_trends
     
     # Cache miss or too old - do full 90-day query
     logger.info(f"[Tenant {tenant_id}] Cache miss or stale - performing full 90-day query")
-    full_trends = full_trends_query(tenant_id, location_ids, location_names)
+    full_trends = full_trends_query(tenant_id, location_ids, location_names, end, conn=conn)
     save_trends_cache(tenant_id, full_trends)
     return full_trends
 
 
-def incremental_trends_update(tenant_id, location_ids, location_names, cached_trends, today):
+def incremental_trends_update(tenant_id, location_ids, location_names, cached_trends, end, conn=None):
     """
-    Update trends with yesterday's data only.
+    Catch the cached trends up to `end`, querying only the missing days.
+    
+    The cached JSON is loaded into a TrendCube (tasks/utils/trends_engine.py)
+    and advanced to `end`: the arrays shift by the gap, and the cached last
+    day plus every new day are re-read from the rollup. Locations missing
+    from the cache are backfilled over the window.
     
     Args:
         tenant_id (int): Tenant ID
         location_ids (list): List of location IDs
         location_names (dict): Map of location_id to location name
         cached_trends (dict): Existing cached trends data
-        today (date): Today's date
+        end (date): Last day of the window (the tenant's local today)
+        conn: Shared connection for the run (default: a new one, closed here)
         
     Returns:
-        dict: Updated trends data
+        dict: Updated trends data, or None when the gap is too large for an
+        incremental update
     """
-    yesterday = today - timedelta(days=1)
-    yesterday_str = yesterday.strftime("%Y-%m-%d")
+    cube = TrendCube.from_json(cached_trends)
+    refresh_from = cube.advance_to(end)
+    if refresh_from is None:
+        return None
+    logger.info(f"[Tenant {tenant_id}] Incremental update: re-reading {refresh_from} to {end}")
     
-    conn = get_db_connection()
+    own_conn = conn is None
+    conn = conn or get_db_connection()
     
     try:
-        # Query only yesterday's data (using location timezone for date extraction)
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT 
-                    b.location_id,
-                    """ + _band_count_sql("b.") + """
-                FROM bookings b
-                WHERE b.tenant_id = %s
-                  AND b.location_id = ANY(%s)
-                  AND DATE(b.start_time) = %s
-                  AND b.status IN """ + COUNTED_STATUSES + """
-                GROUP BY b.location_id
-            """, (tenant_id, location_ids, yesterday))
-            
-            yesterday_data = {}
-            for row in cur.fetchall():
-                loc_id = str(row[0])
-                # row is (location_id, <one count per band, in CHANNEL_BANDS order>)
-                yesterday_data[loc_id] = {
-                    field: row[i + 1] or 0 for i, field in enumerate(BAND_FIELDS)
-                }
-        
-        # Update each location's data
-        for loc_id_str in cached_trends["by_location"].keys():
-            loc_data = cached_trends["by_location"][loc_id_str]
-            
-            counts = yesterday_data.get(loc_id_str, {})
-
-            # Update 90_days data (append + slide window)
-            loc_data["90_days"]["dates"].append(yesterday_str)
-            loc_data["90_days"]["dates"].pop(0)  # Remove oldest day
-
-            for field in BAND_FIELDS:
-                # A tally cached before this band existed has no such key; start
-                # it at the right length so the windows stay aligned.
-                series = loc_data["90_days"].setdefault(field, [0] * 90)
-                series.append(counts.get(field, 0))
-                series.pop(0)
-
-            # Update 30_days and 7_days (slices from 90_days)
-            loc_data["30_days"]["dates"] = loc_data["90_days"]["dates"][-30:]
-            loc_data["7_days"]["dates"] = loc_data["90_days"]["dates"][-7:]
-            for field in BAND_FIELDS:
-                loc_data["30_days"][field] = loc_data["90_days"][field][-30:]
-                loc_data["7_days"][field] = loc_data["90_days"][field][-7:]
-        
-        # Handle new locations that weren't in cache
-        for loc_id in location_ids:
-            loc_id_str = str(loc_id)
-            if loc_id_str not in cached_trends["by_location"]:
+            # Handle new locations that weren't in cache: backfill the window
+            new_locations = [loc_id for loc_id in location_ids if loc_id not in cube.location_ids]
+            for loc_id in new_locations:
                 logger.info(f"[Tenant {tenant_id}] New location {loc_id} detected - adding to trends")
-                # For new locations, we need to backfill - use full query
-                conn_backfill = get_db_connection()
-                try:
-                    with conn_backfill.cursor() as cur:
-                        cur.execute("""
-                            SELECT 
-                                DATE(b.start_time) as booking_date,
-                            """ + _band_count_sql("b.") + """
-                            FROM bookings b
-                            WHERE b.tenant_id = %s
-                              AND b.location_id = %s
-                              AND b.start_time >= CURRENT_DATE - INTERVAL '89 days'
-                              AND b.status IN """ + COUNTED_STATUSES + """
-                            GROUP BY DATE(b.start_time)
-                        """, (tenant_id, loc_id))
-                        
-                        # Build 90-day arrays
-                        date_range_90 = [(today - timedelta(days=i)) for i in range(89, -1, -1)]
-                        date_strings_90 = [d.strftime("%Y-%m-%d") for d in date_range_90]
-                        band_series = {field: [0] * 90 for field in BAND_FIELDS}
-
-                        for row in cur.fetchall():
-                            date_str = row[0].strftime("%Y-%m-%d")
-                            if date_str in date_strings_90:
-                                idx = date_strings_90.index(date_str)
-                                # row is (booking_date, <one count per band>)
-                                for i, field in enumerate(BAND_FIELDS):
-                                    band_series[field][idx] = row[i + 1] or 0
-                        
-                        cached_trends["by_location"][loc_id_str] = {
-                            "location_name": location_names.get(loc_id, f"Location {loc_id}"),
-                            "7_days": dict(
-                                {"dates": date_strings_90[-7:]},
-                                **{f: band_series[f][-7:] for f in BAND_FIELDS},
-                            ),
-                            "30_days": dict(
-                                {"dates": date_strings_90[-30:]},
-                                **{f: band_series[f][-30:] for f in BAND_FIELDS},
-                            ),
-                            "90_days": dict(
-                                {"dates": date_strings_90},
-                                **{f: band_series[f] for f in BAND_FIELDS},
-                            )
-                        }
-                finally:
-                    conn_backfill.close()
-        
-        # Update all_locations dates (slide window to match by_location)
-        cached_trends["all_locations"]["90_days"]["dates"].append(yesterday_str)
-        cached_trends["all_locations"]["90_days"]["dates"].pop(0)
-
-        # Recalculate all_locations aggregation
-        all_locations_90 = {field: [0] * 90 for field in BAND_FIELDS}
-
-        for loc_data in cached_trends["by_location"].values():
-            for field in BAND_FIELDS:
-                series = loc_data["90_days"].get(field, [0] * 90)
-                for i in range(90):
-                    all_locations_90[field][i] += series[i]
-
-        # Update all_locations
-        cached_trends["all_locations"]["30_days"]["dates"] = cached_trends["all_locations"]["90_days"]["dates"][-30:]
-        cached_trends["all_locations"]["7_days"]["dates"] = cached_trends["all_locations"]["90_days"]["dates"][-7:]
-        for field in BAND_FIELDS:
-            cached_trends["all_locations"]["90_days"][field] = all_locations_90[field]
-            cached_trends["all_locations"]["30_days"][field] = all_locations_90[field][-30:]
-            cached_trends["all_locations"]["7_days"][field] = all_locations_90[field][-7:]
+                cube.add_location(loc_id, location_names.get(loc_id, f"Location {loc_id}"))
+            if new_locations:
+                cube.fill(rollup.band_counts_by_day(cur, tenant_id, new_locations, cube.dates[0], end))
+            
+            # Query only the missing days (pre-aggregated per location and day)
+            cube.fill(rollup.band_counts_by_day(cur, tenant_id, location_ids, refresh_from, end))
         
         logger.info(f"[Tenant {tenant_id}] ✓ Incremental update complete")
-        return cached_trends
+        return cube.to_json(location_names)
         
     except Exception as e:
         logger.error(f"[Tenant {tenant_id}] Incremental update failed: {e}")
         raise
     finally:
-        conn.close()
+        if own_conn:
+            conn.close()
 
 
-def full_trends_query(tenant_id, location_ids, location_names):
+def full_trends_query(tenant_id, location_ids, location_names, end=None, conn=None):
     """
     Perform full 90-day trends query (bootstrap or cache miss).
     
@@ -597,101 +426,25 @@ def full_trends_query(tenant_id, location_ids, location_names):
         tenant_id (int): Tenant ID
         location_ids (list): List of location IDs
         location_names (dict): Map of location_id to location name
+        end (date): Last day of the window (default: today, server date)
+        conn: Shared connection for the run (default: a new one, closed here)
         
     Returns:
         dict: Complete trends data structure
     """
-    conn = get_db_connection()
+    own_conn = conn is None
+    conn = conn or get_db_connection()
     
     try:
-        # Generate 90-day date range (today back to day -89)
-        today = datetime.now().date()
-        date_range_90 = [(today - timedelta(days=i)) for i in range(89, -1, -1)]
-        date_strings_90 = [d.strftime("%Y-%m-%d") for d in date_range_90]
-        
-        # Initialize data structure for all locations
-        location_data = {}
-        for loc_id in location_ids:
-            location_data[loc_id] = dict(
-                {"dates": date_strings_90.copy()},
-                **{field: [0] * 90 for field in BAND_FIELDS},
-            )
+        # Generate 90-day date range (end back to day -89)
+        end = end or datetime.now().date()
+        date_strings_90 = window_dates(end)
         
-        # Query: Get 90 days of booking data by source (using location timezone for date extraction)
+        # Query: 90 days of booking counts by band from the daily rollup
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT 
-                    b.location_id,
-                    DATE(b.start_time) as booking_date,
-                    """ + _band_count_sql("b.") + """
-                FROM bookings b
-                WHERE b.tenant_id = %s
-                  AND b.location_id = ANY(%s)
-                  AND b.start_time >= CURRENT_DATE - INTERVAL '89 days'
-                  AND b.status IN """ + COUNTED_STATUSES + """
-                GROUP BY b.location_id, DATE(b.start_time)
-                ORDER BY booking_date
-            """, (tenant_id, location_ids))
-            
-            # Fill in the data from query results
-            for row in cur.fetchall():
-                loc_id = row[0]
-                booking_date = row[1]
-
-                # Find index in date array
-                date_str = booking_date.strftime("%Y-%m-%d")
-                if date_str in date_strings_90:
-                    idx = date_strings_90.index(date_str)
-                    # row is (location_id, booking_date, <one count per band>)
-                    for i, field in enumerate(BAND_FIELDS):
-                        location_data[loc_id][field][idx] = row[i + 2] or 0
-        
-        # Build trends structure with 7/30/90 day windows
-        trends = {
-            "all_locations": {},
-            "by_location": {}
-        }
-        
-        # Aggregate all_locations data
-        all_locations_90 = {field: [0] * 90 for field in BAND_FIELDS}
-        for loc_id in location_ids:
-            for field in BAND_FIELDS:
-                for i in range(90):
-                    all_locations_90[field][i] += location_data[loc_id][field][i]
-
-        # Create time windows for all_locations
-        trends["all_locations"]["7_days"] = dict(
-            {"dates": date_strings_90[-7:]},
-            **{f: all_locations_90[f][-7:] for f in BAND_FIELDS},
-        )
-        trends["all_locations"]["30_days"] = dict(
-            {"dates": date_strings_90[-30:]},
-            **{f: all_locations_90[f][-30:] for f in BAND_FIELDS},
-        )
-        trends["all_locations"]["90_days"] = dict(
-            {"dates": date_strings_90},
-            **{f: all_locations_90[f] for f in BAND_FIELDS},
-        )
+            rows = rollup.band_counts_by_day(cur, tenant_id, location_ids, date_strings_90[0], end)
         
-        # Create time windows for each location
-        for loc_id in location_ids:
-            loc_data = location_data[loc_id]
-            
-            trends["by_location"][str(loc_id)] = {
-                "location_name": location_names.get(loc_id, f"Location {loc_id}"),
-                "7_days": dict(
-                    {"dates": loc_data["dates"][-7:]},
-                    **{f: loc_data[f][-7:] for f in BAND_FIELDS},
-                ),
-                "30_days": dict(
-                    {"dates": loc_data["dates"][-30:]},
-                    **{f: loc_data[f][-30:] for f in BAND_FIELDS},
-                ),
-                "90_days": dict(
-                    {"dates": loc_data["dates"]},
-                    **{f: loc_data[f] for f in BAND_FIELDS},
-                )
-            }
+        trends = TrendCube.from_rows(location_ids, date_strings_90, rows).to_json(location_names)
         
         logger.info(f"[Tenant {tenant_id}] ✓ Booking trends collected")
         return trends
@@ -700,7 +453,8 @@ def full_trends_query(tenant_id, location_ids, location_names):
         logger.error(f"[Tenant {tenant_id}] Failed to collect booking trends: {e}")
         raise
     finally:
-        conn.close()
+        if own_conn:
+            conn.close()
 
 
 
@@ -710,67 +464,54 @@ def full_trends_query(tenant_id, location_ids, location_names):
 # Metrics Storage
 # ============================================================================
 
-def save_metrics_to_database(tenant_id, metrics_json):
+def save_metrics_to_database(tenant_id, metrics_json, conn=None):
     """
     Save or update the aggregated metrics in the database.
     
     Uses INSERT ... ON CONFLICT to either insert new record or update existing.
+    A single-row flush of MetricsWriter (tasks/utils/tenant_metrics_writer.py);
+    batch runs buffer many tenants in one writer instead.
     
     Args:
         tenant_id (int): Tenant ID
         metrics_json (dict): The complete metrics dictionary
+        conn: Shared connection for the run (default: a new one, closed here)
     """
     logger.info(f"[Tenant {tenant_id}] Saving metrics to database...")
     
-    conn = get_db_connection()
+    own_conn = conn is None
+    conn = conn or get_db_connection()
     
     try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO tenant_aggregated_metrics 
-                    (tenant_id, generated_at, metrics, metrics_version)
-                VALUES 
-                    (%s, %s, %s, %s)
-                ON CONFLICT (tenant_id) 
-                DO UPDATE SET
-                    generated_at = EXCLUDED.generated_at,
-                    metrics = EXCLUDED.metrics,
-                    metrics_version = EXCLUDED.metrics_version
-            """, (
-                tenant_id,
-                datetime.now(),
-                json.dumps(metrics_json),
-                # v2 = four channel bands + 'completed' counted. Kept in step
-                # with speako-web's generator, which writes the same string.
-                'v2'
-            ))
-            
-            conn.commit()
-            logger.info(f"[Tenant {tenant_id}] ✓ Metrics saved successfully")
+        with MetricsWriter(conn) as writer:
+            writer.add(tenant_id, metrics_json)
+        logger.info(f"[Tenant {tenant_id}] ✓ Metrics saved successfully")
             
     except Exception as e:
-        conn.rollback()
         logger.error(f"[Tenant {tenant_id}] Failed to save metrics: {e}")
         raise
     finally:
-        conn.close()
+        if own_conn:
+            conn.close()
 
 
 # ============================================================================
 # Helper Functions
 # ============================================================================
 
-def get_active_locations_for_tenant(tenant_id):
+def get_active_locations_for_tenant(tenant_id, conn=None):
     """
     Get all active location IDs for a tenant.
     
     Args:
         tenant_id (int): Tenant ID
+        conn: Shared connection for the run (default: a new one, closed here)
         
     Returns:
         list: List of location IDs
     """
-    conn = get_db_connection()
+    own_conn = conn is None
+    conn = conn or get_db_connection()
     location_ids = []
     
     try:
@@ -789,7 +530,8 @@ def get_active_locations_for_tenant(tenant_id):
         logger.error(f"[Tenant {tenant_id}] Failed to fetch locations: {e}")
         raise
     finally:
-        conn.close()
+        if own_conn:
+            conn.close()
     
     return location_ids
 
@@ -844,9 +586,91 @@ def generate_month_labels(num_months=12):
 
 
 # ============================================================================
-# Main Celery Task
+# Daily Rollup
+# ============================================================================
+
+@app.task
+def refresh_daily_location_metrics(full=False):
+    """
+    Bring the daily_location_metrics rollup up to date (all tenants).
+    
+    Only days touched since the last clean run are recomputed; the first run,
+    a lost watermark or full=True rebuilds the retained window. Run before
+    the per-tenant metrics tasks so they read current rows.
+    
+    Returns:
+        dict: mode, days_upserted and the new watermark
+    """
+    since = None if full else rollup.read_watermark()
+    conn = get_db_connection()
+    try:
+        result = rollup.refresh(conn, since=since)
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"[Rollup] daily_location_metrics refresh failed: {e}")
+        raise
+    finally:
+        conn.close()
+    rollup.write_watermark(result["watermark"])
+    logger.info(f"[Rollup] ✓ daily_location_metrics {result['mode']} refresh: {result['days_upserted']} day(s) upserted")
+    return result
+
+
+# ============================================================================
+# Main Celery Tasks
 # ============================================================================
 
+def build_tenant_metrics(tenant_id, conn):
+    """
+    Collect one tenant's metrics JSON, reading everything over `conn`.
+    
+    Args:
+        tenant_id (int): Tenant ID
+        conn: Connection shared across the run
+        
+    Returns:
+        tuple: (metrics dict, location_ids), or (None, []) when the tenant
+        has no active locations
+    """
+    # Step 1: Get active locations for tenant
+    location_ids = get_active_locations_for_tenant(tenant_id, conn=conn)
+    
+    if not location_ids:
+        logger.warning(f"[Tenant {tenant_id}] No active locations found")
+        return None, []
+    
+    logger.info(f"[Tenant {tenant_id}] Found {len(location_ids)} active locations: {location_ids}")
+    
+    # Get location names and timezones
+    location_names = {}
+    location_timezones = {}
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT location_id, name, timezone
+            FROM locations
+            WHERE tenant_id = %s
+              AND location_id = ANY(%s)
+        """, (tenant_id, location_ids))
+        
+        for row in cur.fetchall():
+            location_names[row[0]] = row[1]
+            if row[2]:
+                location_timezones[row[0]] = row[2]
+    
+    # Step 2: Collect all metrics
+    summary = collect_summary_metrics(tenant_id, location_ids, conn=conn)
+    trends = collect_trends(tenant_id, location_ids, location_names, location_timezones, conn=conn)
+    
+    # Step 3: Assemble complete metrics JSON
+    metrics = {
+        "summary": summary,
+        "trends": trends
+    }
+    
+    logger.info(f"[Tenant {tenant_id}] Metrics collection complete")
+    return metrics, location_ids
+
+
 @app.task(bind=True)
 def generate_dashboard_metrics_for_tenant(self, tenant_id):
     """
@@ -855,9 +679,10 @@ def generate_dashboard_metrics_for_tenant(self, tenant_id):
     This task:
     1. Fetches all active locations for the tenant
     2. Collects summary metrics (bookings, customers, calls)
-    3. Collects 12-month trends for bookings
-    4. Collects call statistics
-    5. Saves the complete JSON to tenant_aggregated_metrics table
+    3. Collects 7/30/90-day booking trends
+    4. Saves the complete JSON to tenant_aggregated_metrics table
+    
+    All of it runs over one connection.
     
     Args:
         tenant_id (int): The tenant ID to generate metrics for
@@ -870,51 +695,19 @@ def generate_dashboard_metrics_for_tenant(self, tenant_id):
     logger.info(f"[TASK ID] {self.request.id}")
     logger.info("=" * 80)
     
+    conn = get_db_connection()
     try:
-        # Step 1: Get active locations for tenant
-        location_ids = get_active_locations_for_tenant(tenant_id)
+        metrics, location_ids = build_tenant_metrics(tenant_id, conn)
         
-        if not location_ids:
-            logger.warning(f"[Tenant {tenant_id}] No active locations found")
+        if metrics is None:
             return {
                 "status": "skipped",
                 "tenant_id": tenant_id,
                 "reason": "no_active_locations"
             }
         
-        logger.info(f"[Tenant {tenant_id}] Found {len(location_ids)} active locations: {location_ids}")
-        
-        # Get location names
-        location_names = {}
-        conn = get_db_connection()
-        try:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT location_id, name
-                    FROM locations
-                    WHERE tenant_id = %s
-                      AND location_id = ANY(%s)
-                """, (tenant_id, location_ids))
-                
-                for row in cur.fetchall():
-                    location_names[row[0]] = row[1]
-        finally:
-            conn.close()
-        
-        # Step 2: Collect all metrics
-        summary = collect_summary_metrics(tenant_id, location_ids)
-        trends = collect_trends(tenant_id, location_ids, location_names)
-        
-        # Step 3: Assemble complete metrics JSON
-        metrics = {
-            "summary": summary,
-            "trends": trends
-        }
-        
-        logger.info(f"[Tenant {tenant_id}] Metrics collection complete")
-        
         # Step 4: Save to database
-        save_metrics_to_database(tenant_id, metrics)
+        save_metrics_to_database(tenant_id, metrics, conn=conn)
         
         # Step 5: Return success
         result = {
@@ -938,3 +731,60 @@ def generate_dashboard_metrics_for_tenant(self, tenant_id):
         
         # Re-raise so Celery marks task as failed
         raise
+    finally:
+        conn.close()
+
+
+@app.task(bind=True)
+def generate_dashboard_metrics_batch(self, tenant_ids):
+    """
+    Generate dashboard metrics for many tenants over one connection.
+    
+    Each tenant is collected as in generate_dashboard_metrics_for_tenant, but
+    the results are buffered in a MetricsWriter and upserted together with
+    one multi-row statement (per BATCH_SIZE tenants), not one connect and
+    one INSERT per tenant. A tenant that fails is rolled back and reported;
+    the rest of the batch carries on.
+    
+    Args:
+        tenant_ids (list): Tenant IDs to generate metrics for
+        
+    Returns:
+        dict: status (success|partial) and a per-tenant result map
+    """
+    logger.info("=" * 80)
+    logger.info(f"[TASK START] Generate Dashboard Metrics - {len(tenant_ids)} tenant(s)")
+    logger.info(f"[TASK ID] {self.request.id}")
+    logger.info("=" * 80)
+    
+    results = {}
+    conn = get_db_connection()
+    try:
+        with MetricsWriter(conn) as writer:
+            for tenant_id in tenant_ids:
+                try:
+                    metrics, location_ids = build_tenant_metrics(tenant_id, conn)
+                except Exception as e:
+                    conn.rollback()
+                    logger.error(f"[Tenant {tenant_id}] Metrics generation failed: {e}")
+                    results[tenant_id] = {"status": "failed", "error": str(e)}
+                    continue
+                if metrics is None:
+                    results[tenant_id] = {"status": "skipped", "reason": "no_active_locations"}
+                    continue
+                # A failed flush is not one tenant's fault: let it fail the task
+                writer.add(tenant_id, metrics)
+                results[tenant_id] = {"status": "success", "locations_processed": len(location_ids)}
+        
+        failed = sum(1 for r in results.values() if r["status"] == "failed")
+        logger.info("=" * 80)
+        logger.info(f"[TASK COMPLETE] {writer.written} tenant(s) saved, {failed} failed")
+        logger.info("=" * 80)
+        
+        return {
+            "status": "partial" if failed else "success",
+            "generated_at": datetime.now().isoformat(),
+            "tenants": results
+        }
+    finally:
+        conn.close()
@@ -40,6 +40,13 @@ Design constraints, all deliberate:
   backlog after an outage cannot balloon the worker's RSS.
 * **Idempotent.** R2 keys are deterministic and the raw_metadata merge is
   additive, so overlapping windows and re-runs are free.
+* **Each call finalised once.** With Redis available, every sweep folds its
+  lines into a per-call partial trace (tasks/utils/call_trace_store.py) and a
+  call is uploaded and analysed once, when its terminal marker has arrived or
+  it has been quiet for SETTLE_SECONDS. The cursor then only re-reads
+  INGEST_LAG_SECONDS of overlap instead of SETTLE_SECONDS, so calls spanning
+  sweeps cost no repeat API requests. Without Redis (or with an explicit
+  window) the sweep falls back to the overlap re-read.
 * **No silent truncation.** Every cap that bites is named in the summary line.
 """
 
@@ -55,6 +62,7 @@ from tasks.celery_app import app
 from tasks.utils import call_quality_llm as cq_llm
 from tasks.utils import call_quality_rules as cq_rules
 from tasks.utils import call_quality_store as cq_store
+from tasks.utils import call_trace_store as traces
 from tasks.utils.publish_r2 import upload_call_log_to_r2
 from tasks.utils.render_log_parse import (
     CHANNEL_MARKER,
@@ -76,6 +84,12 @@ INGEST_LAG_SECONDS = 60         # don't read the very edge; Render needs a momen
 # Re-read margin: calls still in flight at the window edge get picked up again
 # on the next sweep. Cheap because artifact writes are idempotent.
 SETTLE_SECONDS = 240
+# A call whose terminal marker is in still waits this long, because voice-ai
+# writes the conversation row at finalize, just after the call ends.
+FINALIZE_GRACE_SECONDS = 60
+# Finalising a call retries on later sweeps while its conversation row is
+# missing or the upload fails, this many times before giving up on it.
+MAX_FINALIZE_ATTEMPTS = 3
 
 
 class RateLimited(Exception):
@@ -289,6 +303,21 @@ def _store_findings_quietly(conn, call, conversation_id, findings):
         return 0
 
 
+def _settle_trace(store, call, done):
+    """Drop a finalised call's trace, or hand it back for a later sweep until
+    MAX_FINALIZE_ATTEMPTS. Returns False if it was handed back. Best-effort:
+    an unreleased claim just means the call is not retried."""
+    try:
+        if done or call["attempts"] + 1 >= MAX_FINALIZE_ATTEMPTS:
+            traces.discard(store, call["call_sid"])
+            return True
+        traces.release(store, call["call_sid"])
+        return False
+    except Exception as exc:
+        logger.warning("[RenderLogs] %s trace not settled: %s", call["call_sid"], exc)
+        return True
+
+
 # ── Cursor ───────────────────────────────────────────────────────────────────
 
 def _cursor_key(resource):
@@ -360,6 +389,9 @@ def pull_render_logs(self, service_id=None, is_dev=False, window_minutes=None,
 
     # ── Window ──
     now = datetime.now(timezone.utc)
+    # A hand-picked window (backfilling one call) is self-contained: it must
+    # not feed or drain the trace store the scheduled sweeps share.
+    explicit_window = bool(start_time or end_time)
     if not end_time:
         end_time = (now - timedelta(seconds=INGEST_LAG_SECONDS)).isoformat()
     if not start_time:
@@ -382,21 +414,29 @@ def pull_render_logs(self, service_id=None, is_dev=False, window_minutes=None,
         start_time = earliest.isoformat()
 
     window = {"start": start_time, "end": end_time}
+    store = None
+    if not explicit_window:
+        try:
+            store = traces._client()
+        except Exception as exc:
+            logger.warning("[RenderLogs] trace store unavailable (%s) — re-reading overlap", exc)
+
     entries, stats = _sweep(api_key, owner_id, service_id, start_time, end_time)
     calls = _group_by_call(entries)
 
-    # ── Persist ──
-    uploaded = attached = skipped_inflight = failed = 0
-    gap_calls = 0
-    analyzed = findings_written = 0
-    # Mutable so _analyze_quietly can decrement it across calls in this run.
-    llm_budget = [cq_llm.MAX_CALLS_PER_RUN if cq_llm.is_enabled() else 0]
-    conn = None
-    try:
-        db_url = os.getenv("DATABASE_URL")
-        conn = psycopg2.connect(db_url) if db_url else None
-
-        for call_sid, call in calls.items():
+    # ── Select finished calls ──
+    skipped_inflight = 0
+    if store is not None:
+        try:
+            traces.merge(store, calls, ingested_at=now)
+            ready = traces.claim_ready(store, now, SETTLE_SECONDS, FINALIZE_GRACE_SECONDS)
+            skipped_inflight = traces.open_count(store) - len(ready)
+        except Exception as exc:
+            logger.warning("[RenderLogs] trace store failed (%s) — re-reading overlap", exc)
+            store = None
+    if store is None:
+        ready = []
+        for call in calls.values():
             # A call still in progress at the window edge is left for the next
             # sweep, which re-reads SETTLE_SECONDS of overlap.
             if not call["complete"] and call["lines"]:
@@ -408,7 +448,22 @@ def pull_render_logs(self, service_id=None, is_dev=False, window_minutes=None,
                         continue
                 except ValueError:
                     pass
+            ready.append(call)
 
+    # ── Persist ──
+    uploaded = attached = failed = retried = 0
+    gap_calls = 0
+    analyzed = findings_written = 0
+    # Mutable so _analyze_quietly can decrement it across calls in this run.
+    llm_budget = [cq_llm.MAX_CALLS_PER_RUN if cq_llm.is_enabled() else 0]
+    conn = None
+    try:
+        db_url = os.getenv("DATABASE_URL")
+        conn = psycopg2.connect(db_url) if db_url else None
+
+        for call in ready:
+            call_sid = call["call_sid"]
+            done = False
             try:
                 call_date = (call["lines"][0]["ts"] or now.isoformat())[:10]
                 r2_key = upload_call_log_to_r2(
@@ -439,10 +494,16 @@ def pull_render_logs(self, service_id=None, is_dev=False, window_minutes=None,
                     analyzed += 1
                     findings_written += _store_findings_quietly(
                         conn, call, conversation_id, findings)
+                # No row yet for a call we could attach: the overlap re-read
+                # used to pick it up later, the trace store retries it instead.
+                done = bool(conversation_id) or not (conn and call["tenant_id"])
             except Exception as exc:
                 failed += 1
                 logger.error("[RenderLogs] %s failed: %s", call_sid, exc)
 
+            if store is not None and not _settle_trace(store, call, done):
+                retried += 1
+
         if conn:
             conn.commit()
     finally:
@@ -450,12 +511,14 @@ def pull_render_logs(self, service_id=None, is_dev=False, window_minutes=None,
             conn.close()
 
     # Advance the cursor with overlap so a call spanning the boundary is
-    # re-read rather than half-captured. Not advanced past a truncated sweep.
+    # re-read rather than half-captured — only the ingest lag when the trace
+    # store holds the partial calls. Not advanced past a truncated sweep.
     if not stats["truncated"]:
+        overlap = INGEST_LAG_SECONDS if store is not None else SETTLE_SECONDS
         _write_cursor(
             service_id,
             (datetime.fromisoformat(end_time.replace("Z", "+00:00"))
-             - timedelta(seconds=SETTLE_SECONDS)).isoformat(),
+             - timedelta(seconds=overlap)).isoformat(),
         )
 
     summary = {
@@ -471,6 +534,10 @@ def pull_render_logs(self, service_id=None, is_dev=False, window_minutes=None,
         "skipped_inflight": skipped_inflight,
         "calls_with_gaps": gap_calls,
         "failed": failed,
+        # `trace_store` is False when this sweep fell back to the overlap
+        # re-read; `retried` counts calls handed back for a later sweep.
+        "trace_store": store is not None,
+        "retried": retried,
         "truncated": stats["truncated"],
         # Phase 3. `analyzed` counts calls that reached a conversation row;
         # `findings` counts NEW rows, so a re-swept call contributes 0 without
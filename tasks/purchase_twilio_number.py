@@ -26,9 +26,12 @@ env_path = Path(__file__).parent.parent / '.env'
 load_dotenv(env_path)
 
 import argparse
+import threading
 import psycopg2
 from psycopg2.extras import RealDictCursor
-from twilio.rest import Client
+
+from tasks.utils import number_inventory as inventory
+from tasks.utils.provider_clients import twilio_client
 
 # Only import Celery when running as a task, not for CLI
 try:
@@ -108,10 +111,11 @@ MAX_PURCHASE_PER_RUN = 20
 
 
 def get_twilio_client():
-    """Initialize and return Twilio client."""
+    """Return the process-wide Twilio client (pooled keep-alive session,
+    safe to share across the inventory threads)."""
     if not TWILIO_ACCOUNT_SID or not TWILIO_AUTH_TOKEN:
         raise ValueError("TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN must be set in environment")
-    return Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+    return twilio_client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
 
 
 def get_db_connection():
@@ -230,32 +234,21 @@ def search_available_numbers(
     return results
 
 
-def purchase_number(
+def buy_and_configure_number(
+    client,
     phone_number: str,
     friendly_name: str = None,
-    area_code: str = None,
-    region: str = None,
-    country_code: str = "AU",
     address_sid: str = None,
     bundle_sid: str = None
 ) -> dict:
     """
-    Purchase a Twilio phone number, configure webhook, and save to database.
+    Purchase a Twilio phone number and point its voice webhook at us (no
+    database write; see purchase_number).
 
-    Args:
-        phone_number: Phone number in E.164 format (e.g., '+61212345678')
-        friendly_name: Optional display name
-        area_code: Area code (for database storage)
-        region: State/province (for database storage)
-        country_code: ISO country code
-        address_sid: Twilio Address SID for address verification
-        bundle_sid: Twilio Bundle SID for regulatory compliance
-        
     Returns:
-        Dictionary with purchase details
+        Dictionary with phone_number, twilio_sid, friendly_name and
+        webhook_configured
     """
-    client = get_twilio_client()
-    
     # Step 1: Purchase the number
     print(f"🛒 Purchasing {phone_number}...")
     
@@ -271,7 +264,7 @@ def purchase_number(
         purchase_params['bundle_sid'] = bundle_sid
         print(f"   Using bundle: {bundle_sid}")
     
-    purchased_number = client.incoming_phone_numbers.create(**purchase_params)
+    purchased_number = inventory.with_rate_limit_retry(client.incoming_phone_numbers.create, **purchase_params)
     
     print(f"✅ Successfully purchased!")
     print(f"   SID: {purchased_number.sid}")
@@ -280,9 +273,10 @@ def purchase_number(
     # Step 2: Configure webhook
     webhook_configured = False
     if TWILIO_WEBHOOK_URL:
-        print(f"\n🔗 Configuring webhook...")
+        print(f"\n🔗 Configuring webhook for {purchased_number.phone_number}...")
         try:
-            updated_number = client.incoming_phone_numbers(purchased_number.sid).update(
+            updated_number = inventory.with_rate_limit_retry(
+                client.incoming_phone_numbers(purchased_number.sid).update,
                 voice_url=TWILIO_WEBHOOK_URL,
                 voice_method='POST'
             )
@@ -296,60 +290,112 @@ def purchase_number(
     else:
         print(f"\n⚠️  TWILIO_WEBHOOK_URL not set, skipping webhook configuration")
     
-    # Step 3: Save to database
-    print(f"\n💾 Saving to database...")
+    return {
+        'phone_number': purchased_number.phone_number,
+        'twilio_sid': purchased_number.sid,
+        'friendly_name': purchased_number.friendly_name,
+        'webhook_configured': webhook_configured,
+        'webhook_url': TWILIO_WEBHOOK_URL if webhook_configured else None
+    }
+
+
+def save_purchased_numbers(purchases: list, conn=None) -> dict:
+    """
+    Save purchased numbers as 'available' with one bulk insert.
     
-    conn = get_db_connection()
+    The numbers are already paid for in Twilio, so a failed save is reported
+    loudly with every unsaved SID (they are tagged "Pending <mode>", which
+    dispatch/import_twilio_numbers_dispatch.py does not pick up).
+    
+    Args:
+        purchases: Dicts from buy_and_configure_number, plus friendly_name,
+            country_code, area_code and region for storage
+        conn: Shared connection (default: a new one, closed here)
+        
+    Returns:
+        {phone_number: phone_number_id} for the rows saved ({} on failure)
+    """
+    if not purchases:
+        return {}
+    print(f"\n💾 Saving {len(purchases)} number(s) to database...")
+    
+    own_conn = conn is None
+    conn = conn or get_db_connection()
     cur = conn.cursor()
     
     try:
-        # Truncate area_code to fit varchar(10) column
-        safe_area_code = area_code[:10] if area_code else None
-        cur.execute("""
-            INSERT INTO twilio_phone_numbers (
-                phone_number,
-                friendly_name,
-                country_code,
-                area_code,
-                region,
-                twilio_sid,
-                status,
-                created_at,
-                updated_at
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-            RETURNING phone_number_id
-        """, (
-            purchased_number.phone_number,
-            friendly_name or purchased_number.friendly_name,
-            country_code,
-            safe_area_code,
-            region,
-            purchased_number.sid,
-            'available'
-        ))
-        
-        phone_number_id = cur.fetchone()[0]
+        saved = inventory.insert_numbers(cur, [
+            inventory.number_row(
+                p['phone_number'], p['friendly_name'], p['country_code'],
+                p.get('area_code'), p.get('region'), p['twilio_sid']
+            )
+            for p in purchases
+        ])
         conn.commit()
-        print(f"✅ Saved to database (phone_number_id: {phone_number_id})")
+        print(f"✅ Saved {len(saved)} number(s) to database")
+        return saved
         
     except Exception as e:
         conn.rollback()
-        print(f"⚠️  Warning: Failed to save to database: {e}")
-        phone_number_id = None
+        print(f"🚨 PURCHASED BUT NOT SAVED to database ({e}) — add these by hand:")
+        for p in purchases:
+            print(f"🚨   {p['phone_number']} sid={p['twilio_sid']} country={p['country_code']} region={p.get('region')}")
+        return {}
     finally:
         cur.close()
-        conn.close()
+        if own_conn:
+            conn.close()
+
+
+def purchase_number(
+    phone_number: str,
+    friendly_name: str = None,
+    area_code: str = None,
+    region: str = None,
+    country_code: str = "AU",
+    address_sid: str = None,
+    bundle_sid: str = None
+) -> dict:
+    """
+    Purchase a Twilio phone number, configure webhook, and save to database.
+
+    Args:
+        phone_number: Phone number in E.164 format (e.g., '+61212345678')
+        friendly_name: Optional display name
+        area_code: Area code (for database storage)
+        region: State/province (for database storage)
+        country_code: ISO country code
+        address_sid: Twilio Address SID for address verification
+        bundle_sid: Twilio Bundle SID for regulatory compliance
+        
+    Returns:
+        Dictionary with purchase details
+    """
+    client = get_twilio_client()
+    purchased = buy_and_configure_number(
+        client, phone_number, friendly_name=friendly_name,
+        address_sid=address_sid, bundle_sid=bundle_sid
+    )
+    
+    # Step 3: Save to database
+    purchased.update({
+        'friendly_name': friendly_name or purchased['friendly_name'],
+        'country_code': country_code,
+        'area_code': area_code,
+        'region': region,
+    })
+    saved = save_purchased_numbers([purchased])
     
     return {
-        'phone_number_id': phone_number_id,
-        'phone_number': purchased_number.phone_number,
-        'twilio_sid': purchased_number.sid,
-        'friendly_name': purchased_number.friendly_name,
+        'phone_number_id': saved.get(purchased['phone_number']),
+        'phone_number': purchased['phone_number'],
+        'twilio_sid': purchased['twilio_sid'],
+        'friendly_name': purchased['friendly_name'],
         'country_code': country_code,
         'area_code': area_code,
         'region': region,
-        'webhook_configured': webhook_configured,
-        'webhook_url': TWILIO_WEBHOOK_URL if webhook_configured else None
+        'webhook_configured': purchased['webhook_configured'],
+        'webhook_url': purchased['webhook_url']
     }
 
 
@@ -396,6 +442,73 @@ def get_available_count_by_region(conn, country_code: str) -> dict:
     return result
 
 
+def get_available_counts(conn) -> dict:
+    """Available numbers per country, then per region (or _national), in one query."""
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT country_code, COALESCE(region, '_national'), COUNT(*) as count
+        FROM twilio_phone_numbers
+        WHERE status = 'available'
+        GROUP BY country_code, COALESCE(region, '_national')
+    """)
+    result = {}
+    for country_code, region, count in cur.fetchall():
+        result.setdefault(country_code, {})[region] = count
+    cur.close()
+    return result
+
+
+def _replenish_region(client, country_code: str, region: str, needed: int, dry_run: bool, save=None) -> dict:
+    """
+    Search one plan entry's region (through the search cache) and, unless
+    dry_run, buy until `needed` numbers are bought or the candidates run out.
+    A candidate that fails to buy is replaced by the next one. Each bought
+    number is passed to save(purchased) -> phone_number_id straight away, so
+    a crash loses at most the number being bought.
+
+    Returns:
+        Dictionary with candidates (dry run), purchased and errors
+    """
+    config = COUNTRY_CONFIG[country_code]
+    search_region = None if region == '_national' else region
+    candidates = inventory.cached_search(
+        search_available_numbers, country_code, search_region, config['number_type'], needed
+    )
+    outcome = {'candidates': candidates[:needed], 'purchased': [], 'errors': []}
+    if dry_run:
+        return outcome
+
+    for num_info in candidates:
+        if len(outcome['purchased']) >= needed:
+            break
+        phone = num_info['phone_number']
+        try:
+            # Tag replenished pool numbers with "Pending DEV"/"Pending PROD"
+            # so they're easy to identify in the Twilio console and so cleanup
+            # tooling can recognize them as safe-to-release pool numbers.
+            friendly_name = f'Pending {TWILIO_NUMBER_MODE}'
+            purchased = buy_and_configure_number(
+                client, phone,
+                friendly_name=friendly_name,
+                address_sid=config['address_sid'],
+                bundle_sid=config.get('bundle_sid')
+            )
+            purchased.update({
+                'friendly_name': friendly_name,
+                'country_code': country_code,
+                'area_code': num_info.get('locality'),
+                'region': num_info.get('region') or search_region,
+            })
+            purchased['phone_number_id'] = save(purchased) if save else None
+            outcome['purchased'].append(purchased)
+        except Exception as e:
+            outcome['errors'].append(f"Error purchasing {phone}: {e}")
+        finally:
+            # Bought or not, this number is no longer a candidate
+            inventory.search_cache.discard([phone])
+    return outcome
+
+
 def maintain_phone_number_availability(dry_run: bool = True) -> dict:
     """
     Maintain phone number availability across all supported countries.
@@ -403,6 +516,12 @@ def maintain_phone_number_availability(dry_run: bool = True) -> dict:
     Checks current availability against COUNTRY_AVAILABILITY_TARGETS
     and purchases numbers to fill any shortfall per country/region.
 
+    Every short region is searched and bought at the same time, with at most
+    TWILIO_INVENTORY_CONCURRENCY Twilio requests in flight (429s are retried
+    with backoff), and search results are cached briefly
+    (tasks/utils/number_inventory.py). Each number is saved on one shared
+    connection as soon as it is bought: it is already paid for.
+
     Respects TWILIO_NUMBER_MODE:
     - DEV: Maintain 1 available number per country
     - PROD: Use full targets per country/region
@@ -437,15 +556,18 @@ def maintain_phone_number_availability(dry_run: bool = True) -> dict:
         'details': {}
     }
 
-    total_needed_all = 0
-    purchase_plan = []  # List of (country_code, region, needed) tuples
-
     # Phase 1: Check availability and calculate shortfall for all countries
     print("Checking availability across all countries...\n")
 
+    try:
+        counts_by_country = get_available_counts(conn)
+    except Exception:
+        conn.close()
+        raise
+
     for country_code, targets in COUNTRY_AVAILABILITY_TARGETS.items():
         config = COUNTRY_CONFIG[country_code]
-        current_counts = get_available_count_by_region(conn, country_code)
+        current_counts = counts_by_country.get(country_code, {})
 
         print(f"  [{country_code}] (type: {config['number_type']})")
         print(f"  {'Region':<12} {'Target':<8} {'Current':<9} {'Needed':<8}")
@@ -461,108 +583,92 @@ def maintain_phone_number_availability(dry_run: bool = True) -> dict:
             display_region = region if region != '_national' else '(national)'
             print(f"  {display_region:<12} {target:<8} {current:<9} {needed:<8}")
 
-            if needed > 0:
-                purchase_plan.append((country_code, region, needed))
-                total_needed_all += needed
-
         print()
 
-    conn.close()
+    purchase_plan, total_needed_all = inventory.plan_shortfall(
+        COUNTRY_AVAILABILITY_TARGETS, counts_by_country, MAX_PURCHASE_PER_RUN
+    )
 
     results['total_needed'] = total_needed_all
     print(f"Total to purchase: {total_needed_all} numbers")
 
     if total_needed_all == 0:
         print("\nAll countries have sufficient availability. No purchases needed.")
+        conn.close()
         return results
 
     # Apply safety limit
     if total_needed_all > MAX_PURCHASE_PER_RUN:
         print(f"\nLimiting to {MAX_PURCHASE_PER_RUN} purchases (safety limit)")
-        remaining_limit = MAX_PURCHASE_PER_RUN
-        capped_plan = []
-        for cc, region, needed in purchase_plan:
-            take = min(needed, remaining_limit)
-            if take > 0:
-                capped_plan.append((cc, region, take))
-                remaining_limit -= take
-            if remaining_limit <= 0:
-                break
-        purchase_plan = capped_plan
-
-    # Phase 2: Purchase numbers
+
+    # Phase 2: Search and purchase, all regions at once
     print("\n" + "-" * 70)
     if dry_run:
         print("Numbers that would be purchased:")
     else:
-        print("Purchasing...")
+        print(f"Purchasing ({len(purchase_plan)} region(s) in parallel)...")
     print("-" * 70)
 
-    for country_code, region, needed in purchase_plan:
+    # Each number is saved as soon as it is bought, on the one connection
+    # (the lock keeps the region threads' transactions apart)
+    save_lock = threading.Lock()
+
+    def save(purchased):
+        with save_lock:
+            return save_purchased_numbers([purchased], conn=conn).get(purchased['phone_number'])
+
+    try:
+        outcomes = inventory.run_parallel(
+            lambda entry: _replenish_region(client, *entry, dry_run=dry_run, save=save),
+            purchase_plan
+        )
+    finally:
+        conn.close()
+
+    for (country_code, region, needed), outcome, error in outcomes:
         config = COUNTRY_CONFIG[country_code]
-        search_region = None if region == '_national' else region
         display_region = region if region != '_national' else '(national)'
         detail_key = f"{country_code}/{display_region}"
 
         print(f"\n[{country_code}] {display_region} (need {needed}, type: {config['number_type']}):")
-        results['details'][detail_key] = {'needed': needed, 'purchased': [], 'errors': []}
+        detail = {'needed': needed, 'purchased': [], 'errors': []}
+        results['details'][detail_key] = detail
 
-        # Search for available numbers
-        try:
-            available_numbers = search_available_numbers(
-                country_code=country_code,
-                region=search_region,
-                number_type=config['number_type'],
-                limit=needed
-            )
+        if error is not None:
+            error_msg = f"Error searching for {country_code} {display_region} numbers: {error}"
+            print(f"  Error: {error_msg}")
+            detail['errors'].append(error_msg)
+            results['failed'] += needed
+            continue
+
+        if not outcome['candidates']:
+            msg = f"No available numbers found for {country_code} {display_region}"
+            print(f"  Warning: {msg}")
+            detail['errors'].append(msg)
+            results['failed'] += needed
+            continue
 
-            if not available_numbers:
-                msg = f"No available numbers found for {country_code} {display_region}"
-                print(f"  Warning: {msg}")
-                results['details'][detail_key]['errors'].append(msg)
-                results['failed'] += needed
-                continue
-
-            # Purchase each number
-            for num_info in available_numbers[:needed]:
-                phone = num_info['phone_number']
-
-                if dry_run:
-                    print(f"  Would purchase: {phone}")
-                    locality = num_info.get('locality', 'N/A')
-                    print(f"    Location: {locality}, {display_region}")
-                else:
-                    try:
-                        # Tag replenished pool numbers with "Pending DEV"/"Pending PROD"
-                        # so they're easy to identify in the Twilio console and so cleanup
-                        # tooling can recognize them as safe-to-release pool numbers.
-                        result = purchase_number(
-                            phone_number=phone,
-                            friendly_name=f'Pending {TWILIO_NUMBER_MODE}',
-                            area_code=num_info.get('locality'),
-                            region=num_info.get('region') or search_region,
-                            country_code=country_code,
-                            address_sid=config['address_sid'],
-                            bundle_sid=config.get('bundle_sid')
-                        )
-
-                        if result.get('phone_number_id'):
-                            results['purchased'] += 1
-                            results['details'][detail_key]['purchased'].append(result)
-                        else:
-                            results['failed'] += 1
-                            results['details'][detail_key]['errors'].append(f"Failed to save {phone}")
-                    except Exception as e:
-                        error_msg = f"Error purchasing {phone}: {e}"
-                        print(f"  Error: {error_msg}")
-                        results['details'][detail_key]['errors'].append(error_msg)
-                        results['failed'] += 1
+        if dry_run:
+            for num_info in outcome['candidates']:
+                print(f"  Would purchase: {num_info['phone_number']}")
+                locality = num_info.get('locality', 'N/A')
+                print(f"    Location: {locality}, {display_region}")
+            continue
 
-        except Exception as e:
-            error_msg = f"Error searching for {country_code} {display_region} numbers: {e}"
+        for error_msg in outcome['errors']:
             print(f"  Error: {error_msg}")
-            results['details'][detail_key]['errors'].append(error_msg)
-            results['failed'] += needed
+            detail['errors'].append(error_msg)
+        for purchased in outcome['purchased']:
+            phone_number_id = purchased['phone_number_id']
+            if phone_number_id:
+                detail['purchased'].append(purchased)
+                print(f"  Purchased: {purchased['phone_number']} (phone_number_id: {phone_number_id})")
+            else:
+                msg = f"Purchased but not saved: {purchased['phone_number']} (sid {purchased['twilio_sid']})"
+                print(f"  🚨 {msg}")
+                detail['errors'].append(msg)
+        results['purchased'] += len(detail['purchased'])
+        results['failed'] += needed - len(detail['purchased'])
 
     # Summary
     print("\n" + "=" * 70)
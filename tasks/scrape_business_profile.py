@@ -35,6 +35,7 @@ try:
 except Exception:
     OpenAI = None
 
+from .utils import scrape_cache
 from .utils.knowledge_utils import build_scrape_artifact_paths, parse_model_json_output
 from .utils.task_db import (
     mark_task_running,
@@ -192,13 +193,17 @@ WEBSITE CONTENT:
 """
 
 
+def _profile_model() -> str:
+    return os.getenv("BUSINESS_PROFILE_OPENAI_MODEL", os.getenv("OPENAI_MODEL", "gpt-4o-mini"))
+
+
 def extract_profile(corpus: str) -> dict:
     if OpenAI is None:
         raise RuntimeError("openai SDK not available")
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY not set")
-    model = os.getenv("BUSINESS_PROFILE_OPENAI_MODEL", os.getenv("OPENAI_MODEL", "gpt-4o-mini"))
+    model = _profile_model()
     client = OpenAI(api_key=api_key)
     resp = client.chat.completions.create(
         model=model,
@@ -214,6 +219,20 @@ def extract_profile(corpus: str) -> dict:
     return {"basics": basics if isinstance(basics, dict) else {}, "narrative": narrative}
 
 
+def extract_profile_cached(corpus: str, *, refresh: bool = False) -> tuple[dict, bool]:
+    """extract_profile, skipped when this exact corpus was already extracted
+    with the same model and prompt. Returns (profile, cache_hit)."""
+    digest = scrape_cache.content_hash(_profile_model(), EXTRACTION_PROMPT, corpus)
+    if not refresh:
+        cached = scrape_cache.get_extraction("business_profile", digest)
+        if isinstance(cached, dict):
+            return cached, True
+    profile = extract_profile(corpus)
+    if profile.get("narrative"):
+        scrape_cache.put_extraction("business_profile", digest, profile)
+    return profile, False
+
+
 def _digits(s: str) -> str:
     return re.sub(r"\D", "", s or "")
 
@@ -375,7 +394,8 @@ def get_location_provider(tenant_id: int, location_id: int) -> str:
 def scrape_business_profile(self, *, tenant_id: str, location_id: str, url: str,
                             speako_task_id: str | None = None,
                             page_limit: int | None = None,
-                            trigger_publish: bool = True) -> dict:
+                            trigger_publish: bool = True,
+                            refresh_cache: bool = False) -> dict:
     start_ts = time.time()
     started_at = datetime.utcnow().isoformat() + "Z"
     page_limit = int(page_limit or DEFAULT_PAGE_LIMIT)
@@ -416,11 +436,15 @@ def scrape_business_profile(self, *, tenant_id: str, location_id: str, url: str,
         except Exception as db_e:
             logger.warning(f"mark_task_running failed: {db_e}")
 
-    # 1. Crawl
-    try:
-        pages = fetch_site_corpus(url, page_limit)
-    except Exception as e:
-        return _fail("firecrawl_failed", f"Firecrawl crawl failed: {e}")
+    # 1. Crawl — a repeat run inside SCRAPE_CACHE_TTL_SECONDS reuses the last crawl
+    pages = None if refresh_cache else scrape_cache.get_crawl(url, page_limit)
+    crawl_cache_hit = pages is not None
+    if not crawl_cache_hit:
+        try:
+            pages = fetch_site_corpus(url, page_limit)
+        except Exception as e:
+            return _fail("firecrawl_failed", f"Firecrawl crawl failed: {e}")
+        scrape_cache.put_crawl(url, page_limit, pages)
     if not pages:
         return _fail("empty_crawl", "Firecrawl returned no readable pages")
     corpus = compose_corpus(pages)
@@ -449,7 +473,7 @@ def scrape_business_profile(self, *, tenant_id: str, location_id: str, url: str,
 
     # 3. Extract + validate
     try:
-        profile = extract_profile(corpus)
+        profile, extraction_cache_hit = extract_profile_cached(corpus, refresh=refresh_cache)
     except Exception as e:
         return _fail("extraction_failed", f"OpenAI extraction failed: {e}")
     basics, dropped = validate_basics(profile["basics"], corpus)
@@ -528,6 +552,8 @@ def scrape_business_profile(self, *, tenant_id: str, location_id: str, url: str,
 
     summary = {
         "pages_crawled": len(pages),
+        "crawl_cache_hit": crawl_cache_hit,
+        "extraction_cache_hit": extraction_cache_hit,
         "corpus_chars": len(corpus),
         "narrative_chars": len(narrative),
         "basics_extracted": sorted(basics.keys()),
@@ -24,6 +24,8 @@ from .utils.knowledge_utils import (
     extract_dual_output,
 )
 from .utils.task_db import mark_task_running, mark_task_failed, mark_task_succeeded, record_task_artifact, upsert_tenant_integration_param
+from .utils import scrape_cache
+from .utils.scrape_cache import _norm_url
 
 logger = get_task_logger(__name__)
 
@@ -139,9 +141,19 @@ def firecrawl_scrape(url: str, *, formats: list[str] | None = None,
     return data.get("data") or {}
 
 
-def _norm_url(u: str) -> str:
-    """Normalize a URL for dedup: lowercase + strip trailing slash/whitespace."""
-    return (u or "").strip().rstrip("/").lower()
+def firecrawl_scrape_cached(url: str, *, refresh: bool = False) -> tuple[dict, bool]:
+    """Markdown scrape of one URL, served from the scrape cache when fresh.
+
+    Returns (data, cache_hit). `refresh=True` bypasses the read but still
+    re-populates the cache with what Firecrawl returns.
+    """
+    if not refresh:
+        cached = scrape_cache.get_page(url)
+        if cached is not None:
+            return cached, True
+    data = firecrawl_scrape(url)
+    scrape_cache.put_page(url, data)
+    return data, False
 
 
 def select_urls(pasted_url: str, ranked_links: list[str], max_pages: int) -> list[str]:
@@ -191,11 +203,16 @@ def compose_topic_corpus(pages: list[dict], max_bytes: int) -> str:
 
 
 def build_topic_corpus(url: str, knowledge_type: str | None, *,
-                       max_pages: int, max_bytes: int) -> tuple[str, list[str], dict]:
+                       max_pages: int, max_bytes: int,
+                       refresh_cache: bool = False) -> tuple[str, list[str], dict]:
     """Firecrawl map -> select topic-relevant URLs -> scrape each -> corpus.
 
     Returns (corpus_markdown, scraped_urls, discovery_meta).
 
+    Pages scraped within SCRAPE_CACHE_TTL_SECONDS are served from the scrape
+    cache (see tasks/utils/scrape_cache.py); `discovery_meta["cache_hits"]`
+    counts them.
+
     Discovery is best-effort and NEVER hard-fails the task: if map errors or
     returns nothing usable we fall back to scraping only the pasted URL. A hard
     failure is raised ONLY if not a single page (including the pasted URL) could
@@ -207,6 +224,7 @@ def build_topic_corpus(url: str, knowledge_type: str | None, *,
         "discovery_used": bool(search_term),
         "discovery_fallback": False,
         "discovered_urls": [],
+        "cache_hits": 0,
     }
 
     selected = [url]
@@ -228,7 +246,9 @@ def build_topic_corpus(url: str, knowledge_type: str | None, *,
     scraped_urls: list[str] = []
     for u in selected:
         try:
-            data = firecrawl_scrape(u)
+            data, hit = firecrawl_scrape_cached(u, refresh=refresh_cache)
+            if hit:
+                discovery["cache_hits"] += 1
             md = (data.get("markdown") or "").strip()
             if not md:
                 logger.warning(f"⚠️ [scrape_url] Firecrawl scrape returned empty markdown for {u}")
@@ -257,7 +277,8 @@ def scrape_url_to_markdown(self, *, tenant_id: str, location_id: str, url: str,
                            pipeline: str = 'markdown-only', knowledge_type: str | None = None,
                            save_raw_html: bool = False,
                            speako_task_id: str | None = None,
-                           tenant_integration_param: dict | None = None) -> dict:
+                           tenant_integration_param: dict | None = None,
+                           refresh_cache: bool = False) -> dict:
     start_ts = time.time()
     started_at = datetime.utcnow().isoformat() + 'Z'
 
@@ -331,7 +352,8 @@ def scrape_url_to_markdown(self, *, tenant_id: str, location_id: str, url: str,
             f"knowledge_type={knowledge_type} max_pages={max_pages}"
         )
         markdown, scraped_urls, discovery = build_topic_corpus(
-            url, knowledge_type, max_pages=max_pages, max_bytes=max_bytes
+            url, knowledge_type, max_pages=max_pages, max_bytes=max_bytes,
+            refresh_cache=refresh_cache,
         )
         scraper_source = 'firecrawl'
         headers = {
@@ -339,10 +361,11 @@ def scrape_url_to_markdown(self, *, tenant_id: str, location_id: str, url: str,
             'X-Firecrawl-Search-Term': discovery.get('search_term'),
             'X-Firecrawl-Pages-Scraped': str(len(scraped_urls)),
             'X-Firecrawl-Discovery-Fallback': str(discovery.get('discovery_fallback')),
+            'X-Scrape-Cache-Hits': str(discovery.get('cache_hits', 0)),
         }
         logger.info(
             f"✅ [scrape_url_to_markdown] Firecrawl corpus built — pages={len(scraped_urls)} "
-            f"chars={len(markdown)} urls={scraped_urls}"
+            f"cache_hits={discovery.get('cache_hits', 0)} chars={len(markdown)} urls={scraped_urls}"
         )
 
         keys = build_scrape_artifact_paths(tenant_id, location_id, url)
@@ -390,6 +413,8 @@ def scrape_url_to_markdown(self, *, tenant_id: str, location_id: str, url: str,
             'discovery_fallback': discovery.get('discovery_fallback'),
             'discovered_urls': discovery.get('discovered_urls'),
             'scraped_urls': scraped_urls,
+            'cache_hits': discovery.get('cache_hits', 0),
+            'content_hash': scrape_cache.content_hash(markdown),
         }
         meta_bytes = _json.dumps(meta).encode('utf-8')
         put_meta = r2.put_object(
@@ -469,24 +494,36 @@ def scrape_url_to_markdown(self, *, tenant_id: str, location_id: str, url: str,
                     md_text = markdown
                     if len(md_text.encode('utf-8', errors='ignore')) > max_bytes:
                         md_text = md_text.encode('utf-8', errors='ignore')[:max_bytes].decode('utf-8', errors='ignore')
-                    resp = client.responses.create(
-                        model=os.getenv('OPENAI_KNOWLEDGE_MODEL', 'gpt-4o-mini'),
-                        input=[{
-                            "role": "user",
-                            "content": [
-                                {"type": "input_text", "text": prompt},
-                                {"type": "input_text", "text": md_text}
-                            ]
-                        }],
-                        temperature=0.2
+                    model = os.getenv('OPENAI_KNOWLEDGE_MODEL', 'gpt-4o-mini')
+                    # Same model + prompt + corpus => same answer. Skip the
+                    # OpenAI call when an identical corpus was already analysed.
+                    extraction_digest = scrape_cache.content_hash(model, prompt, md_text)
+                    analysis_text = None if refresh_cache else scrape_cache.get_extraction(
+                        'knowledge', extraction_digest
                     )
-                    analysis_text = getattr(resp, 'output_text', None)
-                    if analysis_text is None and getattr(resp, 'choices', None):
-                        try:
-                            analysis_text = resp.choices[0].message.content
-                        except Exception:
-                            analysis_text = None
+                    if analysis_text is not None:
+                        logger.info(f"♻️ [scrape_url_to_markdown] Corpus unchanged — reusing cached analysis ({extraction_digest[:12]})")
+                    else:
+                        resp = client.responses.create(
+                            model=model,
+                            input=[{
+                                "role": "user",
+                                "content": [
+                                    {"type": "input_text", "text": prompt},
+                                    {"type": "input_text", "text": md_text}
+                                ]
+                            }],
+                            temperature=0.2
+                        )
+                        analysis_text = getattr(resp, 'output_text', None)
+                        if analysis_text is None and getattr(resp, 'choices', None):
+                            try:
+                                analysis_text = resp.choices[0].message.content
+                            except Exception:
+                                analysis_text = None
                     parsed, raw = parse_model_json_output(analysis_text)
+                    if parsed is not None:
+                        scrape_cache.put_extraction('knowledge', extraction_digest, analysis_text)
 
                     # Extract json_data and markdown_data from the parsed response
                     json_payload, markdown_text = extract_dual_output(parsed)
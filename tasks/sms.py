@@ -5,59 +5,23 @@ import urllib.parse
 import json
 from datetime import datetime, timezone
 from tasks.celery_app import app
-from twilio.rest import Client
 import psycopg2
 import os
 import re
-import requests
-from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail
 from tasks.email_template_utils import render_booking_confirmation_template, render_customer_booking_confirmation_template, format_time_12hour
 from tasks.utils.display_format import format_display_datetime, format_display_booking_window
+from tasks.utils.booking_context import load_booking_context
+from tasks.utils import short_links
+from tasks.utils.provider_clients import sendgrid_client, twilio_client
 
 def create_tiny_url(long_url: str) -> str:
     """
-    Create a shortened URL using TinyURL API.
-    Returns the original URL if shortening fails.
+    Short link for an SMS (see tasks/utils/short_links.py): served from the
+    short-link store when this URL was shortened before, else minted locally
+    or via TinyURL. Returns the original URL if shortening fails.
     """
-    try:
-        api_token = os.getenv("TINYURL_API_TOKEN")
-        if not api_token:
-            print("[TinyURL] API token not found, returning original URL")
-            return long_url
-        
-        headers = {
-            "Authorization": f"Bearer {api_token}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "url": long_url
-        }
-        
-        response = requests.post(
-            "https://api.tinyurl.com/create",
-            headers=headers,
-            json=data,
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            tiny_url = result.get("data", {}).get("tiny_url")
-            if tiny_url:
-                print(f"[TinyURL] Successfully shortened URL: {long_url} -> {tiny_url}")
-                return tiny_url
-            else:
-                print(f"[TinyURL] No tiny_url in response, returning original URL")
-                return long_url
-        else:
-            print(f"[TinyURL] API error {response.status_code}: {response.text}")
-            return long_url
-            
-    except Exception as e:
-        print(f"[TinyURL] Error creating short URL: {e}")
-        return long_url
+    return short_links.shorten(long_url)
 
 # Chat channels whose bookings carry a platform user id (Messenger/Instagram PSID)
 # in customer_phone rather than a real phone — an SMS would target a nonsense
@@ -65,16 +29,113 @@ def create_tiny_url(long_url: str) -> str:
 # Web-widget bookings DO carry a real phone (contact form) and send as normal.
 CHAT_SMS_SKIP_SOURCES = ("facebook", "instagram")
 
-def _skip_sms_for_source(cur, booking_id: int, task: str) -> bool:
-    cur.execute("SELECT source FROM bookings WHERE booking_id = %s", (booking_id,))
-    row = cur.fetchone()
-    source = row[0] if row else None
+def _skip_sms_for_source(ctx: dict | None, booking_id: int, task: str) -> bool:
+    source = ctx.get("source") if ctx else None
     if source in CHAT_SMS_SKIP_SOURCES:
         print(f"[SMS] Skipping {task} for booking {booking_id}: source={source} "
               f"(chat channel — confirmed in-chat; phone field is a platform id)")
         return True
     return False
 
+
+# ── Booking context helpers ──────────────────────────────────────────────────
+# Every task below reads its booking through load_booking_context (one query,
+# shared across the tasks of the same booking event via Redis); these turn the
+# context into the pieces the SMS/email bodies are built from.
+
+def _ctx_fields(ctx: dict, *names: str) -> tuple:
+    return tuple(ctx[name] for name in names)
+
+
+def _booking_when(ctx: dict) -> str:
+    # A flexible booking's length was the customer's choice, so the message
+    # must say when it ends and how long it runs. Fixed bookings are
+    # unaffected and their wording is unchanged.
+    is_flexible_booking = bool(
+        (ctx["location_type"] == "rest" and ctx["flexible_booking_enabled"]) or ctx["is_flexible_duration"]
+    )
+    return format_display_booking_window(
+        ctx["start_time"], ctx["end_time"], ctx["duration"], is_flexible_booking
+    )
+
+
+def _manage_booking_url(ctx: dict) -> str:
+    """Customer manage-booking URL, with the latest 'view' token if one was issued."""
+    alias = ctx["booking_page_alias"]
+    if not (alias and alias.strip()):
+        return ""
+    base = os.getenv("BOOKING_LINK_BASE_URL", "https://speako.ai")
+    token = ctx["access_token"]
+    if token and token.strip():
+        return f"{base}/customer/booking/{alias.strip()}/view?token={token.strip()}"
+    return f"{base}/customer/booking/{alias.strip()}/view"
+
+
+def _merchant_emails(ctx: dict, booking_id: int) -> list | None:
+    """locations.booking_email_recipients split and validated, falling back to
+    FALLBACK_EMAIL. None when there is nobody to send to."""
+    recipients = ctx["booking_email_recipients"]
+    if not recipients:
+        fallback_email = os.getenv("FALLBACK_EMAIL")
+        if not fallback_email:
+            print(f"[EMAIL] No email recipients or fallback email for booking {booking_id}.")
+            return None
+        return [fallback_email]
+    # Split by comma or semicolon, strip whitespace, filter valid emails
+    to_emails = []
+    for email in re.split('[,;]', recipients):
+        email = email.strip()
+        if email and re.match(EMAIL_REGEX, email):
+            to_emails.append(email)
+        else:
+            print(f"[EMAIL] Invalid email skipped: {email}")
+    if not to_emails:
+        fallback_email = os.getenv("FALLBACK_EMAIL")
+        if not fallback_email:
+            print(f"[EMAIL] No valid email recipients or fallback email for booking {booking_id}.")
+            return None
+        to_emails = [fallback_email]
+    return to_emails
+
+
+def _customer_email(ctx: dict) -> str | None:
+    """bookings.customer_email, else customers.email for the booking's customer_id."""
+    customer_email = ctx["customer_email"]
+    if customer_email and customer_email.strip() and re.match(EMAIL_REGEX, customer_email.strip()):
+        print(f"[CUSTOMER_EMAIL] Using customer_email from booking: {customer_email.strip()}")
+        return customer_email.strip()
+    if ctx["customer_id"] and ctx["customer_table_email"]:
+        customer_table_email = ctx["customer_table_email"].strip()
+        if re.match(EMAIL_REGEX, customer_table_email):
+            print(f"[CUSTOMER_EMAIL] Using email from customers table: {customer_table_email}")
+            return customer_table_email
+        print(f"[CUSTOMER_EMAIL] Invalid email in customers table: {customer_table_email}")
+    return None
+
+@app.task
+def warm_manage_link(booking_id: int):
+    """Shorten a booking's manage-booking URL ahead of its first SMS, so the
+    reminders (which fire in bursts) find it in the short-link store."""
+    try:
+        conn = psycopg2.connect(os.getenv("DATABASE_URL"))
+        cur = conn.cursor()
+        ctx = load_booking_context(cur, booking_id)
+        if not ctx or ctx["source"] in CHAT_SMS_SKIP_SOURCES:
+            return None
+        manage_booking_url = _manage_booking_url(ctx)
+        if not manage_booking_url:
+            return None
+        return create_tiny_url(manage_booking_url)
+    except Exception as e:
+        print(f"[SMS] Error warming manage link for booking {booking_id}: {e}")
+        return None
+    finally:
+        if 'cur' in locals():
+            cur.close()
+        if 'conn' in locals():
+            conn.close()
+
+
 @app.task
 def send_sms_confirmation_new(booking_id: int):
     try:
@@ -82,17 +143,17 @@ def send_sms_confirmation_new(booking_id: int):
         conn = psycopg2.connect(os.getenv("DATABASE_URL"))
         cur = conn.cursor()
 
+        ctx = load_booking_context(cur, booking_id)
+        if not ctx:
+            print(f"[SMS] Booking {booking_id} not found.")
+            return
+
         # Booking Guarantee (Phase 3): pending bookings get a "secure your
         # reservation" SMS with a payment link instead of a confirmation.
-        cur.execute(
-            "SELECT status, guarantee_amount, location_id, source FROM bookings WHERE booking_id = %s",
-            (booking_id,),
-        )
-        _grow = cur.fetchone()
-        _bk_status = _grow[0] if _grow else None
-        _guarantee_amount = _grow[1] if _grow else None
-        _guarantee_location_id = _grow[2] if _grow else None
-        _bk_source = _grow[3] if _grow else None
+        _bk_status = ctx["status"]
+        _guarantee_amount = ctx["guarantee_amount"]
+        _guarantee_location_id = ctx["location_id"]
+        _bk_source = ctx["source"]
 
         # Web-origin pending_guarantee bookings deliver the payment step via the
         # compulsory in-page Stripe redirect (speako-web), so the SMS payment link
@@ -102,51 +163,12 @@ def send_sms_confirmation_new(booking_id: int):
                 f"[SMS] Skipping web-origin pending_guarantee SMS for booking "
                 f"{booking_id} (web redirect handles the card save)."
             )
-            cur.close()
-            conn.close()
             return
 
         # Messenger/IG bookings: no real phone (PSID proxy) — confirmed in-chat.
         if _bk_source in CHAT_SMS_SKIP_SOURCES:
             print(f"[SMS] Skipping send_sms_confirmation_new for booking {booking_id}: "
                   f"source={_bk_source} (chat channel — confirmed in-chat)")
-            cur.close()
-            conn.close()
-            return
-
-        cur.execute("""
-            SELECT
-                b.tenant_id,
-                b.customer_name,
-                b.start_time,
-                b.booking_ref,
-                b.party_num,
-                b.customer_phone,
-                l.name AS location_name,
-                l.location_type,
-                s.name AS staff_name,
-                sv.name AS service_name,
-                bp.alias AS booking_page_alias,
-                b.end_time,
-                b.duration,
-                l.flexible_booking_enabled,
-                sv.is_flexible_duration
-            FROM bookings b
-            JOIN locations l
-              ON b.tenant_id = l.tenant_id AND b.location_id = l.location_id
-            LEFT JOIN staff s
-              ON b.tenant_id = s.tenant_id AND b.staff_id = s.staff_id
-            LEFT JOIN services sv
-              ON b.tenant_id = sv.tenant_id AND b.service_id = sv.service_id
-            LEFT JOIN booking_page bp
-              ON b.tenant_id = bp.tenant_id AND b.location_id = bp.location_id AND bp.is_active = true
-            WHERE b.booking_id = %s
-        """, (booking_id,))
-        
-        row = cur.fetchone()
-
-        if not row:
-            print(f"[SMS] Booking {booking_id} not found.")
             return
 
         (
@@ -160,47 +182,15 @@ def send_sms_confirmation_new(booking_id: int):
             location_type,
             staff_name,
             service_name,
-            booking_page_alias,
-            end_time,
-            duration_minutes,
-            location_flexible_enabled,
-            service_is_flexible,
-        ) = row
-
-        # A flexible booking's length was the customer's choice, so the message
-        # must say when it ends and how long it runs. Fixed bookings are
-        # unaffected and their wording is unchanged.
-        is_flexible_booking = bool(
-            (location_type == "rest" and location_flexible_enabled) or service_is_flexible
-        )
-        booking_when = format_display_booking_window(
-            start_time, end_time, duration_minutes, is_flexible_booking
+            booking_access_token,
+        ) = _ctx_fields(
+            ctx, "tenant_id", "customer_name", "start_time", "booking_ref", "party_num",
+            "customer_phone", "location_name", "location_type", "staff_name", "service_name",
+            "access_token",
         )
-        
-        # Get booking access token for manage booking URL
-        booking_access_token = None
-        cur.execute("""
-            SELECT token_id 
-            FROM booking_access_tokens 
-            WHERE tenant_id = %s AND booking_id = %s AND purpose = 'view'
-            ORDER BY created_at DESC
-            LIMIT 1
-        """, (tenant_id, booking_id))
-        
-        token_row = cur.fetchone()
-        if token_row:
-            booking_access_token = str(token_row[0])
-
-        # Construct manage booking URL
-        manage_booking_url = ""
-        if booking_page_alias and booking_page_alias.strip():
-            if booking_access_token and booking_access_token.strip():
-                # Construct URL with token parameter
-                manage_booking_url = f"{os.getenv('BOOKING_LINK_BASE_URL', 'https://speako.ai')}/customer/booking/{booking_page_alias.strip()}/view?token={booking_access_token.strip()}"
-            else:
-                # Fallback URL without token
-                manage_booking_url = f"{os.getenv('BOOKING_LINK_BASE_URL', 'https://speako.ai')}/customer/booking/{booking_page_alias.strip()}/view"
-        
+        booking_when = _booking_when(ctx)
+        manage_booking_url = _manage_booking_url(ctx)
+
         clean_ref = booking_ref[3:] if booking_ref.startswith("REF") else booking_ref
 
         # Booking Guarantee: a pending booking gets a "secure your reservation"
@@ -235,7 +225,7 @@ def send_sms_confirmation_new(booking_id: int):
                 f"fail to arrive. Complete within {hold_minutes} minutes or the booking will be cancelled. "
                 f"[Speako AI]"
             )
-            client = Client(os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN"))
+            client = twilio_client()
             client.messages.create(
                 body=pending_message,
                 from_=os.getenv("TWILIO_SEND_SMS_NUMBER"),
@@ -259,17 +249,7 @@ def send_sms_confirmation_new(booking_id: int):
         # Slice 3c: online bookings carry a meeting join link (a Zoom join_url or the
         # Google Meet URL), stored on the booking's live external artifact. Include it
         # so the customer can join. Non-online bookings have no such artifact → no-op.
-        cur.execute(
-            """
-            SELECT join_url FROM booking_external_artifact
-            WHERE tenant_id = %s AND booking_id = %s
-              AND state IN ('pending', 'active') AND join_url IS NOT NULL
-            ORDER BY artifact_id DESC LIMIT 1
-            """,
-            (tenant_id, booking_id),
-        )
-        _mrow = cur.fetchone()
-        meeting_link = _mrow[0] if _mrow else None
+        meeting_link = ctx["meeting_link"]
         if meeting_link:
             message += f" Join your meeting: {meeting_link}"
 
@@ -282,7 +262,7 @@ def send_sms_confirmation_new(booking_id: int):
         # Add Speako AI signature
         message += " [Speako AI]"
 
-        client = Client(os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN"))
+        client = twilio_client()
         client.messages.create(
             body=message,
             from_=os.getenv("TWILIO_SEND_SMS_NUMBER"),
@@ -300,10 +280,150 @@ def send_sms_confirmation_new(booking_id: int):
             conn.close()
 
 
+# ── Reminders ────────────────────────────────────────────────────────────────
+# Exactly-once: a reminder is sent only by the run that flips
+# booking_notification.reminders[offset] from absent to 'sending'. A claim is
+# released if the run fails before the Twilio call and kept otherwise — once
+# the SMS may have gone out, retrying would double-send.
+
+REMINDER_SEND_CONCURRENCY = int(os.getenv("REMINDER_SEND_CONCURRENCY", "8"))
+
+# Claims every still-unclaimed (booking, offset) of the batch in one statement.
+# The final NOT (reminders ?| keys) is re-checked against the latest row
+# version under READ COMMITTED, so a booking a concurrent run touched first is
+# skipped whole (its remaining offsets go out on the next dispatcher run).
+_CLAIM_REMINDERS_SQL = """
+    WITH req AS (
+        SELECT * FROM unnest(%(booking_ids)s::bigint[], %(offset_keys)s::text[]) AS r(booking_id, offset_key)
+    ), todo AS (
+        SELECT bn.tenant_id, bn.booking_id, array_agg(DISTINCT r.offset_key) AS keys
+          FROM req r
+          JOIN booking_notification bn ON bn.booking_id = r.booking_id
+         WHERE NOT (bn.reminders ? r.offset_key)
+         GROUP BY bn.tenant_id, bn.booking_id
+    )
+    UPDATE booking_notification bn
+       SET reminders = bn.reminders || (
+               SELECT jsonb_object_agg(k, '{"status": "sending"}'::jsonb) FROM unnest(t.keys) AS k
+           ),
+           updated_at = now()
+      FROM todo t
+     WHERE bn.tenant_id = t.tenant_id AND bn.booking_id = t.booking_id
+       AND NOT (bn.reminders ?| t.keys)
+    RETURNING bn.booking_id, t.keys
+"""
+
+
+def _claim_reminders(conn, cur, pairs) -> list:
+    """Claim [(booking_id, offset_minutes), ...]; returns the [(booking_id,
+    offset_key), ...] this run now owns."""
+    booking_ids = [int(b) for b, _ in pairs]
+    cur.execute(
+        """
+        INSERT INTO booking_notification (tenant_id, booking_id, reminders)
+        SELECT b.tenant_id, b.booking_id, '{}'::jsonb
+          FROM bookings b
+         WHERE b.booking_id = ANY(%s)
+        ON CONFLICT (tenant_id, booking_id) DO NOTHING
+        """,
+        (booking_ids,),
+    )
+    cur.execute(_CLAIM_REMINDERS_SQL, {
+        "booking_ids": booking_ids,
+        "offset_keys": [str(int(o)) for _, o in pairs],
+    })
+    claimed = [(booking_id, key) for booking_id, keys in cur.fetchall() for key in keys]
+    conn.commit()  # publish the claims so a concurrent run sees them
+    return claimed
+
+
+def _mark_reminder(conn, cur, tenant_id, booking_id: int, offset_key: str, state: dict) -> None:
+    cur.execute(
+        """
+        UPDATE booking_notification
+           SET reminders = jsonb_set(reminders, ARRAY[%s], %s::jsonb, true), updated_at = now()
+         WHERE tenant_id = %s AND booking_id = %s
+        """,
+        (offset_key, json.dumps(state), tenant_id, booking_id),
+    )
+    conn.commit()
+
+
+def _release_reminder(conn, cur, booking_id: int, offset_key: str) -> None:
+    try:
+        conn.rollback()
+        cur.execute(
+            "UPDATE booking_notification SET reminders = reminders - %s, updated_at = now() "
+            "WHERE booking_id = %s",
+            (offset_key, booking_id),
+        )
+        conn.commit()
+    except Exception:
+        pass
+
+
+def _reminder_suppression(ctx: dict, booking_id: int) -> str | None:
+    """Why this booking gets no reminder SMS, or None to send it."""
+    # Only remind for still-confirmed bookings. A reschedule marks the original
+    # 'modified' and creates a new booking_id (which gets its own reminders).
+    if ctx["status"] != "confirmed":
+        return ctx["status"]
+    # Chat sources carry a PSID, not a real phone.
+    if _skip_sms_for_source(ctx, booking_id, "send_reminder"):
+        return "chat_source"
+    if not ctx["customer_phone"]:
+        return "no_phone"
+    return None
+
+
+def _reminder_message(ctx: dict) -> str:
+    (customer_name, booking_ref, party_num, location_name, location_type,
+     staff_name, service_name) = _ctx_fields(
+        ctx, "customer_name", "booking_ref", "party_num", "location_name",
+        "location_type", "staff_name", "service_name",
+    )
+    booking_when = _booking_when(ctx)
+    clean_ref = booking_ref[3:] if booking_ref.startswith("REF") else booking_ref
+
+    if location_type == "rest":
+        message = (
+            f"Reminder: Hi {customer_name}, your booking (Ref: {clean_ref}) for {party_num} "
+            f"at {location_name} is on {booking_when}."
+        )
+    else:
+        message = (
+            f"Reminder: Hi {customer_name}, your booking (Ref: {clean_ref}) "
+            f"at {location_name} is on {booking_when} "
+            f"with {staff_name} for {service_name}."
+        )
+
+    # Latest meeting link for online bookings — keyed by booking_ref so a reschedule
+    # (new booking_id, stable ref) still resolves the current link. No artifact → no-op.
+    meeting_link = ctx["meeting_link_by_ref"]
+    if meeting_link:
+        message += f" Join your meeting: {meeting_link}"
+
+    # Manage-booking URL (same construction as the confirmation SMS).
+    manage_booking_url = _manage_booking_url(ctx)
+    if manage_booking_url:
+        message += f" Manage your booking: {create_tiny_url(manage_booking_url)}"
+
+    return message + " [Speako AI]"
+
+
+def _sent_state(msg) -> dict:
+    return {
+        "status": "sent",
+        "sent_at": datetime.now(timezone.utc).isoformat(),
+        "provider_message_id": getattr(msg, "sid", None),
+    }
+
+
 @app.task
 def send_reminder(booking_id: int, offset_minutes: int):
     """Send ONE customer reminder SMS for a booking, at a given offset (minutes before
-    start). Phase 4 / WP-C. Enqueued by dispatch/send_reminders_dispatch.py.
+    start). Phase 4 / WP-C. Superseded by send_reminders_batch in the dispatcher;
+    kept for in-flight messages and manual re-sends.
 
     Exactly-once: an atomic claim on booking_notification.reminders[offset] — a
     duplicate enqueue (e.g. overlapping dispatcher runs) claims nothing and returns
@@ -319,184 +439,154 @@ def send_reminder(booking_id: int, offset_minutes: int):
         conn = psycopg2.connect(os.getenv("DATABASE_URL"))
         cur = conn.cursor()
 
-        cur.execute("SELECT tenant_id, status FROM bookings WHERE booking_id = %s", (booking_id,))
-        brow = cur.fetchone()
-        if not brow:
+        ctx = load_booking_context(cur, booking_id)
+        if not ctx:
             print(f"[REMINDER] Booking {booking_id} not found.")
             return
-        tenant_id, status = brow
+        tenant_id = ctx["tenant_id"]
 
-        # --- Atomic exactly-once claim. Ensure the row exists, then flip this offset
-        # from absent -> 'sending' in one conditional UPDATE. rowcount 0 => another run
-        # already owns this offset -> do not send (no duplicate). ---
-        cur.execute(
-            """
-            INSERT INTO booking_notification (tenant_id, booking_id, reminders)
-            VALUES (%s, %s, '{}'::jsonb)
-            ON CONFLICT (tenant_id, booking_id) DO NOTHING
-            """,
-            (tenant_id, booking_id),
-        )
-        cur.execute(
-            """
-            UPDATE booking_notification
-               SET reminders = jsonb_set(reminders, ARRAY[%s], %s::jsonb, true),
-                   updated_at = now()
-             WHERE tenant_id = %s AND booking_id = %s
-               AND NOT (reminders ? %s)
-            """,
-            (offset_key, json.dumps({"status": "sending"}), tenant_id, booking_id, offset_key),
-        )
-        if cur.rowcount == 0:
-            conn.commit()
+        if not _claim_reminders(conn, cur, [(booking_id, offset_minutes)]):
             print(f"[REMINDER] booking {booking_id} offset {offset_key}m already claimed/sent — skip.")
             return
-        conn.commit()  # publish the claim so a concurrent run sees it
-
-        def _mark(state: dict):
-            cur.execute(
-                """
-                UPDATE booking_notification
-                   SET reminders = jsonb_set(reminders, ARRAY[%s], %s::jsonb, true), updated_at = now()
-                 WHERE tenant_id = %s AND booking_id = %s
-                """,
-                (offset_key, json.dumps(state), tenant_id, booking_id),
-            )
-            conn.commit()
 
-        # --- Suppress: only remind for still-confirmed bookings. A reschedule marks the
-        # original 'modified' and creates a new booking_id (which gets its own reminders). ---
-        if status != "confirmed":
-            _mark({"status": "suppressed", "reason": status})
-            print(f"[REMINDER] Suppressed booking {booking_id} offset {offset_key}m (status={status}).")
+        reason = _reminder_suppression(ctx, booking_id)
+        if reason:
+            _mark_reminder(conn, cur, tenant_id, booking_id, offset_key, {"status": "suppressed", "reason": reason})
+            print(f"[REMINDER] Suppressed booking {booking_id} offset {offset_key}m ({reason}).")
             return
 
-        # --- Chat sources carry a PSID, not a real phone — no reminder SMS. ---
-        if _skip_sms_for_source(cur, booking_id, "send_reminder"):
-            _mark({"status": "suppressed", "reason": "chat_source"})
-            return
-
-        # --- Load booking details (mirror send_sms_confirmation_new). ---
-        cur.execute("""
-            SELECT
-                b.tenant_id, b.customer_name, b.start_time, b.booking_ref, b.party_num,
-                b.customer_phone, l.name AS location_name, l.location_type,
-                s.name AS staff_name, sv.name AS service_name, bp.alias AS booking_page_alias,
-                b.end_time, b.duration, l.flexible_booking_enabled, sv.is_flexible_duration
-            FROM bookings b
-            JOIN locations l ON b.tenant_id = l.tenant_id AND b.location_id = l.location_id
-            LEFT JOIN staff s ON b.tenant_id = s.tenant_id AND b.staff_id = s.staff_id
-            LEFT JOIN services sv ON b.tenant_id = sv.tenant_id AND b.service_id = sv.service_id
-            LEFT JOIN booking_page bp ON b.tenant_id = bp.tenant_id AND b.location_id = bp.location_id AND bp.is_active = true
-            WHERE b.booking_id = %s
-        """, (booking_id,))
-        row = cur.fetchone()
-        if not row:
-            _mark({"status": "suppressed", "reason": "not_found"})
-            print(f"[REMINDER] Booking {booking_id} details vanished.")
-            return
-        (_tid, customer_name, start_time, booking_ref, party_num, customer_phone,
-         location_name, location_type, staff_name, service_name, booking_page_alias,
-         end_time, duration_minutes, location_flexible_enabled, service_is_flexible) = row
-
-        booking_when = format_display_booking_window(
-            start_time,
-            end_time,
-            duration_minutes,
-            bool((location_type == "rest" and location_flexible_enabled) or service_is_flexible),
-        )
-
-        if not customer_phone:
-            _mark({"status": "suppressed", "reason": "no_phone"})
-            print(f"[REMINDER] booking {booking_id} has no phone — skip.")
-            return
-
-        # Manage-booking URL (same construction as the confirmation SMS).
-        manage_booking_url = ""
-        booking_access_token = None
-        cur.execute("""
-            SELECT token_id FROM booking_access_tokens
-            WHERE tenant_id = %s AND booking_id = %s AND purpose = 'view'
-            ORDER BY created_at DESC LIMIT 1
-        """, (tenant_id, booking_id))
-        token_row = cur.fetchone()
-        if token_row:
-            booking_access_token = str(token_row[0])
-        if booking_page_alias and booking_page_alias.strip():
-            base = os.getenv("BOOKING_LINK_BASE_URL", "https://speako.ai")
-            if booking_access_token and booking_access_token.strip():
-                manage_booking_url = f"{base}/customer/booking/{booking_page_alias.strip()}/view?token={booking_access_token.strip()}"
-            else:
-                manage_booking_url = f"{base}/customer/booking/{booking_page_alias.strip()}/view"
-
-        clean_ref = booking_ref[3:] if booking_ref.startswith("REF") else booking_ref
-
-        if location_type == "rest":
-            message = (
-                f"Reminder: Hi {customer_name}, your booking (Ref: {clean_ref}) for {party_num} "
-                f"at {location_name} is on {booking_when}."
-            )
-        else:
-            message = (
-                f"Reminder: Hi {customer_name}, your booking (Ref: {clean_ref}) "
-                f"at {location_name} is on {booking_when} "
-                f"with {staff_name} for {service_name}."
-            )
-
-        # Latest meeting link for online bookings — keyed by booking_ref so a reschedule
-        # (new booking_id, stable ref) still resolves the current link. No artifact → no-op.
-        cur.execute(
-            """
-            SELECT join_url FROM booking_external_artifact
-            WHERE tenant_id = %s AND booking_ref = %s
-              AND state IN ('pending', 'active') AND join_url IS NOT NULL
-            ORDER BY artifact_id DESC LIMIT 1
-            """,
-            (tenant_id, booking_ref),
+        message = _reminder_message(ctx)
+        sent_attempted = True
+        msg = twilio_client().messages.create(
+            body=message, from_=os.getenv("TWILIO_SEND_SMS_NUMBER"), to=ctx["customer_phone"]
         )
-        _mrow = cur.fetchone()
-        meeting_link = _mrow[0] if _mrow else None
-        if meeting_link:
-            message += f" Join your meeting: {meeting_link}"
+        _mark_reminder(conn, cur, tenant_id, booking_id, offset_key, _sent_state(msg))
+        print(f"[REMINDER] Sent to {ctx['customer_phone']} (booking {booking_id}, offset {offset_key}m): {message}")
 
-        if manage_booking_url:
-            message += f" Manage your booking: {create_tiny_url(manage_booking_url)}"
+    except Exception as e:
+        print(f"[REMINDER] Error for booking {booking_id} offset {offset_key}m: {e}")
+        if not sent_attempted and conn is not None and cur is not None:
+            _release_reminder(conn, cur, booking_id, offset_key)
+    finally:
+        if cur is not None:
+            cur.close()
+        if conn is not None:
+            conn.close()
 
-        message += " [Speako AI]"
 
+def _send_reminder_sms(client, ctx: dict, on_attempt=None):
+    """Worker-thread half of send_reminders_batch: build and send one SMS.
+    Returns (message, twilio_message, sent_attempted, error). `on_attempt`
+    is called just before the Twilio call."""
+    sent_attempted = False
+    try:
+        message = _reminder_message(ctx)
         sent_attempted = True
-        client = Client(os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN"))
+        if on_attempt is not None:
+            on_attempt()
         msg = client.messages.create(
-            body=message, from_=os.getenv("TWILIO_SEND_SMS_NUMBER"), to=customer_phone
+            body=message, from_=os.getenv("TWILIO_SEND_SMS_NUMBER"), to=ctx["customer_phone"]
         )
-        _mark({
-            "status": "sent",
-            "sent_at": datetime.now(timezone.utc).isoformat(),
-            "provider_message_id": getattr(msg, "sid", None),
-        })
-        print(f"[REMINDER] Sent to {customer_phone} (booking {booking_id}, offset {offset_key}m): {message}")
+        return message, msg, True, None
+    except Exception as e:
+        return None, None, sent_attempted, e
+
+
+@app.task
+def send_reminders_batch(pairs: list) -> dict:
+    """Send many reminders — [[booking_id, offset_minutes], ...] — with one
+    claim statement, one DB connection and the shared Twilio session, at most
+    REMINDER_SEND_CONCURRENCY SMS in flight. Same exactly-once and suppression
+    rules as send_reminder. Enqueued by dispatch/send_reminders_dispatch.py."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    summary = {"claimed": 0, "sent": 0, "suppressed": 0, "failed": 0}
+    conn = None
+    cur = None
+    claimed = []
+    # Claims that reached a final state (marked, released, or handed to
+    # Twilio). Anything else is released if the batch fails part-way.
+    settled = set()
+    try:
+        # Before claiming: missing credentials must not strand the claims.
+        client = twilio_client()
+        conn = psycopg2.connect(os.getenv("DATABASE_URL"))
+        cur = conn.cursor()
+        claimed = _claim_reminders(conn, cur, pairs)
+        summary["claimed"] = len(claimed)
+        if len(claimed) < len(pairs):
+            print(f"[REMINDER] {len(pairs) - len(claimed)}/{len(pairs)} already claimed/sent — skip.")
+
+        # DB reads and writes stay on this thread; only message building
+        # (short links) and the Twilio calls run in the pool.
+        to_send = []
+        contexts = {}
+        for booking_id, offset_key in claimed:
+            try:
+                if booking_id not in contexts:
+                    contexts[booking_id] = load_booking_context(cur, booking_id)
+                ctx = contexts[booking_id]
+                reason = "not_found" if not ctx else _reminder_suppression(ctx, booking_id)
+                if reason:
+                    if ctx:
+                        _mark_reminder(conn, cur, ctx["tenant_id"], booking_id, offset_key,
+                                       {"status": "suppressed", "reason": reason})
+                    else:
+                        _release_reminder(conn, cur, booking_id, offset_key)
+                    settled.add((booking_id, offset_key))
+                    summary["suppressed"] += 1
+                    print(f"[REMINDER] Suppressed booking {booking_id} offset {offset_key}m ({reason}).")
+                    continue
+                to_send.append((booking_id, offset_key, ctx))
+            except Exception as e:
+                print(f"[REMINDER] Error for booking {booking_id} offset {offset_key}m: {e}")
+                _release_reminder(conn, cur, booking_id, offset_key)
+                settled.add((booking_id, offset_key))
+                summary["failed"] += 1
+
+        def send(item):
+            # set.add is atomic, so the worker threads can record attempts
+            return _send_reminder_sms(client, item[2], on_attempt=lambda: settled.add(item[:2]))
+
+        with ThreadPoolExecutor(max_workers=max(1, REMINDER_SEND_CONCURRENCY)) as pool:
+            results = list(pool.map(send, to_send))
+
+        for (booking_id, offset_key, ctx), (message, msg, sent_attempted, error) in zip(to_send, results):
+            if error is None:
+                try:
+                    _mark_reminder(conn, cur, ctx["tenant_id"], booking_id, offset_key, _sent_state(msg))
+                except Exception as e:
+                    # The SMS went out; leave the claim so nothing re-sends it.
+                    print(f"[REMINDER] Sent but not recorded (booking {booking_id}, offset {offset_key}m): {e}")
+                summary["sent"] += 1
+                print(f"[REMINDER] Sent to {ctx['customer_phone']} (booking {booking_id}, offset {offset_key}m): {message}")
+                continue
+            summary["failed"] += 1
+            print(f"[REMINDER] Error for booking {booking_id} offset {offset_key}m: {error}")
+            if not sent_attempted:
+                _release_reminder(conn, cur, booking_id, offset_key)
+                settled.add((booking_id, offset_key))
 
     except Exception as e:
-        print(f"[REMINDER] Error for booking {booking_id} offset {offset_key}m: {e}")
-        # If we failed BEFORE sending, release the claim so a later run can retry. If we
-        # failed AFTER the Twilio send (e.g. the mark-sent write), leave it claimed —
-        # the SMS already went out, so retrying would double-send.
-        if not sent_attempted and conn is not None and cur is not None:
+        print(f"[REMINDER] Batch error: {e}")
+        if conn is not None:
             try:
                 conn.rollback()
-                cur.execute(
-                    "UPDATE booking_notification SET reminders = reminders - %s, updated_at = now() "
-                    "WHERE booking_id = %s",
-                    (offset_key, booking_id),
-                )
-                conn.commit()
             except Exception:
                 pass
+            # Nothing was sent for these yet: free them for the next run.
+            stranded = [key for key in claimed if key not in settled]
+            for booking_id, offset_key in stranded:
+                _release_reminder(conn, cur, booking_id, offset_key)
+            if stranded:
+                print(f"[REMINDER] Released {len(stranded)} unsent claim(s) after the batch error.")
     finally:
         if cur is not None:
             cur.close()
         if conn is not None:
             conn.close()
+    print(f"[REMINDER] Batch done: {summary}")
+    return summary
 
 
 @app.task
@@ -509,21 +599,16 @@ def send_sms_guarantee_cancelled(booking_id: int):
     try:
         conn = psycopg2.connect(os.getenv("DATABASE_URL"))
         cur = conn.cursor()
-        if _skip_sms_for_source(cur, booking_id, "send_sms_guarantee_cancelled"):
+        ctx = load_booking_context(cur, booking_id)
+        if _skip_sms_for_source(ctx, booking_id, "send_sms_guarantee_cancelled"):
             return
-        cur.execute("""
-            SELECT b.customer_name, b.booking_ref, b.start_time, b.customer_phone, l.name
-            FROM bookings b
-            JOIN locations l
-              ON b.tenant_id = l.tenant_id AND b.location_id = l.location_id
-            WHERE b.booking_id = %s
-        """, (booking_id,))
-        row = cur.fetchone()
-        if not row:
+        if not ctx:
             print(f"[SMS] Booking {booking_id} not found (guarantee cancel).")
             return
 
-        customer_name, booking_ref, start_time, customer_phone, location_name = row
+        customer_name, booking_ref, start_time, customer_phone, location_name = _ctx_fields(
+            ctx, "customer_name", "booking_ref", "start_time", "customer_phone", "location_name"
+        )
         clean_ref = booking_ref[3:] if booking_ref and booking_ref.startswith("REF") else booking_ref
         message = (
             f"Hi {customer_name}, your booking (Ref: {clean_ref}) at {location_name} on "
@@ -531,7 +616,7 @@ def send_sms_guarantee_cancelled(booking_id: int):
             f"guarantee was not secured in time. You're welcome to book again anytime. [Speako AI]"
         )
 
-        client = Client(os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN"))
+        client = twilio_client()
         client.messages.create(
             body=message,
             from_=os.getenv("TWILIO_SEND_SMS_NUMBER"),
@@ -555,50 +640,15 @@ def send_sms_confirmation_mod(booking_id: int):
         conn = psycopg2.connect(os.getenv("DATABASE_URL"))
         cur = conn.cursor()
 
-        if _skip_sms_for_source(cur, booking_id, "send_sms_confirmation_mod"):
-            cur.close()
-            conn.close()
+        ctx = load_booking_context(cur, booking_id)
+        if _skip_sms_for_source(ctx, booking_id, "send_sms_confirmation_mod"):
             return
-
-        cur.execute("""
-            SELECT 
-                b.tenant_id,
-                b.customer_name,
-                b.start_time,
-                b.booking_ref,
-                b.party_num,
-                b.customer_phone,
-                l.name AS location_name,
-                l.location_type,
-                s.name AS staff_name,
-                sv.name AS service_name,
-                bp.alias AS booking_page_alias,
-                b.end_time,
-                b.duration,
-                l.flexible_booking_enabled,
-                sv.is_flexible_duration
-            FROM bookings b
-            JOIN locations l
-              ON b.tenant_id = l.tenant_id AND b.location_id = l.location_id
-            LEFT JOIN staff s
-              ON b.tenant_id = s.tenant_id AND b.staff_id = s.staff_id
-            LEFT JOIN services sv
-              ON b.tenant_id = sv.tenant_id AND b.service_id = sv.service_id
-            LEFT JOIN booking_page bp
-              ON b.tenant_id = bp.tenant_id AND b.location_id = bp.location_id AND bp.is_active = true
-            WHERE b.booking_id = %s
-        """, (booking_id,))
-        
-        row = cur.fetchone()
-
-        if not row:
+        if not ctx:
             print(f"[SMS] Booking {booking_id} not found.")
             return
 
         (
-            tenant_id,
             customer_name,
-            start_time,
             booking_ref,
             party_num,
             customer_phone,
@@ -606,47 +656,13 @@ def send_sms_confirmation_mod(booking_id: int):
             location_type,
             staff_name,
             service_name,
-            booking_page_alias,
-            end_time,
-            duration_minutes,
-            location_flexible_enabled,
-            service_is_flexible,
-        ) = row
-
-        # A flexible booking's length was the customer's choice, so the message
-        # must say when it ends and how long it runs. Fixed bookings are
-        # unaffected and their wording is unchanged.
-        is_flexible_booking = bool(
-            (location_type == "rest" and location_flexible_enabled) or service_is_flexible
+        ) = _ctx_fields(
+            ctx, "customer_name", "booking_ref", "party_num", "customer_phone",
+            "location_name", "location_type", "staff_name", "service_name",
         )
-        booking_when = format_display_booking_window(
-            start_time, end_time, duration_minutes, is_flexible_booking
-        )
-        
-        # Get booking access token for manage booking URL
-        booking_access_token = None
-        cur.execute("""
-            SELECT token_id 
-            FROM booking_access_tokens 
-            WHERE tenant_id = %s AND booking_id = %s AND purpose = 'view'
-            ORDER BY created_at DESC
-            LIMIT 1
-        """, (tenant_id, booking_id))
-        
-        token_row = cur.fetchone()
-        if token_row:
-            booking_access_token = str(token_row[0])
-
-        # Construct manage booking URL
-        manage_booking_url = ""
-        if booking_page_alias and booking_page_alias.strip():
-            if booking_access_token and booking_access_token.strip():
-                # Construct URL with token parameter
-                manage_booking_url = f"{os.getenv('BOOKING_LINK_BASE_URL', 'https://speako.ai')}/customer/booking/{booking_page_alias.strip()}/view?token={booking_access_token.strip()}"
-            else:
-                # Fallback URL without token
-                manage_booking_url = f"{os.getenv('BOOKING_LINK_BASE_URL', 'https://speako.ai')}/customer/booking/{booking_page_alias.strip()}/view"
-        
+        booking_when = _booking_when(ctx)
+        manage_booking_url = _manage_booking_url(ctx)
+
         clean_ref = booking_ref[3:] if booking_ref.startswith("REF") else booking_ref
 
         if location_type == "rest":
@@ -664,17 +680,7 @@ def send_sms_confirmation_mod(booking_id: int):
         # Online bookings: include the meeting join link (stable across a reschedule).
         # Resolved by booking_ref because a modify creates a new booking_id whose
         # artifact may still be relinking; the ref always finds the live meeting.
-        cur.execute(
-            """
-            SELECT join_url FROM booking_external_artifact
-            WHERE tenant_id = %s AND booking_ref = %s
-              AND state IN ('pending', 'active') AND join_url IS NOT NULL
-            ORDER BY artifact_id DESC LIMIT 1
-            """,
-            (tenant_id, booking_ref),
-        )
-        _mrow = cur.fetchone()
-        meeting_link = _mrow[0] if _mrow else None
+        meeting_link = ctx["meeting_link_by_ref"]
         if meeting_link:
             message += f" Join your meeting: {meeting_link}"
 
@@ -687,7 +693,7 @@ def send_sms_confirmation_mod(booking_id: int):
         # Add Speako AI signature
         message += " [Speako AI]"
 
-        client = Client(os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN"))
+        client = twilio_client()
         client.messages.create(
             body=message,
             from_=os.getenv("TWILIO_SEND_SMS_NUMBER"),
@@ -711,50 +717,15 @@ def send_sms_confirmation_can(booking_id: int):
         conn = psycopg2.connect(os.getenv("DATABASE_URL"))
         cur = conn.cursor()
 
-        if _skip_sms_for_source(cur, booking_id, "send_sms_confirmation_can"):
-            cur.close()
-            conn.close()
+        ctx = load_booking_context(cur, booking_id)
+        if _skip_sms_for_source(ctx, booking_id, "send_sms_confirmation_can"):
             return
-
-        cur.execute("""
-            SELECT 
-                b.tenant_id,
-                b.customer_name,
-                b.start_time,
-                b.booking_ref,
-                b.party_num,
-                b.customer_phone,
-                l.name AS location_name,
-                l.location_type,
-                s.name AS staff_name,
-                sv.name AS service_name,
-                bp.alias AS booking_page_alias,
-                b.end_time,
-                b.duration,
-                l.flexible_booking_enabled,
-                sv.is_flexible_duration
-            FROM bookings b
-            JOIN locations l
-              ON b.tenant_id = l.tenant_id AND b.location_id = l.location_id
-            LEFT JOIN staff s
-              ON b.tenant_id = s.tenant_id AND b.staff_id = s.staff_id
-            LEFT JOIN services sv
-              ON b.tenant_id = sv.tenant_id AND b.service_id = sv.service_id
-            LEFT JOIN booking_page bp
-              ON b.tenant_id = bp.tenant_id AND b.location_id = bp.location_id AND bp.is_active = true
-            WHERE b.booking_id = %s
-        """, (booking_id,))
-        
-        row = cur.fetchone()
-
-        if not row:
+        if not ctx:
             print(f"[SMS] Booking {booking_id} not found.")
             return
 
         (
-            tenant_id,
             customer_name,
-            start_time,
             booking_ref,
             party_num,
             customer_phone,
@@ -762,47 +733,13 @@ def send_sms_confirmation_can(booking_id: int):
             location_type,
             staff_name,
             service_name,
-            booking_page_alias,
-            end_time,
-            duration_minutes,
-            location_flexible_enabled,
-            service_is_flexible,
-        ) = row
-
-        # A flexible booking's length was the customer's choice, so the message
-        # must say when it ends and how long it runs. Fixed bookings are
-        # unaffected and their wording is unchanged.
-        is_flexible_booking = bool(
-            (location_type == "rest" and location_flexible_enabled) or service_is_flexible
-        )
-        booking_when = format_display_booking_window(
-            start_time, end_time, duration_minutes, is_flexible_booking
+        ) = _ctx_fields(
+            ctx, "customer_name", "booking_ref", "party_num", "customer_phone",
+            "location_name", "location_type", "staff_name", "service_name",
         )
-        
-        # Get booking access token for manage booking URL
-        booking_access_token = None
-        cur.execute("""
-            SELECT token_id 
-            FROM booking_access_tokens 
-            WHERE tenant_id = %s AND booking_id = %s AND purpose = 'view'
-            ORDER BY created_at DESC
-            LIMIT 1
-        """, (tenant_id, booking_id))
-        
-        token_row = cur.fetchone()
-        if token_row:
-            booking_access_token = str(token_row[0])
-
-        # Construct manage booking URL
-        manage_booking_url = ""
-        if booking_page_alias and booking_page_alias.strip():
-            if booking_access_token and booking_access_token.strip():
-                # Construct URL with token parameter
-                manage_booking_url = f"{os.getenv('BOOKING_LINK_BASE_URL', 'https://speako.ai')}/customer/booking/{booking_page_alias.strip()}/view?token={booking_access_token.strip()}"
-            else:
-                # Fallback URL without token
-                manage_booking_url = f"{os.getenv('BOOKING_LINK_BASE_URL', 'https://speako.ai')}/customer/booking/{booking_page_alias.strip()}/view"
-        
+        booking_when = _booking_when(ctx)
+        manage_booking_url = _manage_booking_url(ctx)
+
         clean_ref = booking_ref[3:] if booking_ref.startswith("REF") else booking_ref
 
         if location_type == "rest":
@@ -826,7 +763,7 @@ def send_sms_confirmation_can(booking_id: int):
         # Add Speako AI signature
         message += " [Speako AI]"
 
-        client = Client(os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN"))
+        client = twilio_client()
         client.messages.create(
             body=message,
             from_=os.getenv("TWILIO_SEND_SMS_NUMBER"),
@@ -862,47 +799,24 @@ def send_sms_merchant(booking_id: int, action: str):
         conn = psycopg2.connect(os.getenv("DATABASE_URL"))
         cur = conn.cursor()
 
-        cur.execute("""
-            SELECT
-                b.tenant_id,
-                b.customer_name,
-                b.start_time,
-                b.booking_ref,
-                b.party_num,
-                l.name AS location_name,
-                l.location_type,
-                s.name AS staff_name,
-                sv.name AS service_name
-            FROM bookings b
-            JOIN locations l
-              ON b.tenant_id = l.tenant_id AND b.location_id = l.location_id
-            LEFT JOIN staff s
-              ON b.tenant_id = s.tenant_id AND b.staff_id = s.staff_id
-            LEFT JOIN services sv
-              ON b.tenant_id = sv.tenant_id AND b.service_id = sv.service_id
-            WHERE b.booking_id = %s
-        """, (booking_id,))
-
-        row = cur.fetchone()
-        if not row:
+        ctx = load_booking_context(cur, booking_id)
+        if not ctx:
             print(f"[Merchant SMS] Booking {booking_id} not found.")
             return
 
         (
             tenant_id,
             customer_name,
-            start_time,
             booking_ref,
             party_num,
             location_name,
             location_type,
             staff_name,
             service_name,
-            end_time,
-            duration_minutes,
-            location_flexible_enabled,
-            service_is_flexible,
-        ) = row
+        ) = _ctx_fields(
+            ctx, "tenant_id", "customer_name", "booking_ref", "party_num",
+            "location_name", "location_type", "staff_name", "service_name",
+        )
 
         cur.execute("""
             SELECT phone_number
@@ -920,12 +834,7 @@ def send_sms_merchant(booking_id: int, action: str):
 
         clean_ref = booking_ref[3:] if booking_ref and booking_ref.startswith("REF") else (booking_ref or "")
         # The merchant is the one holding the room, so the window matters most here.
-        when = format_display_booking_window(
-            start_time,
-            end_time,
-            duration_minutes,
-            bool((location_type == "rest" and location_flexible_enabled) or service_is_flexible),
-        )
+        when = _booking_when(ctx)
 
         event = {
             "new": "New booking",
@@ -951,7 +860,7 @@ def send_sms_merchant(booking_id: int, action: str):
 
         message += " [Speako AI]"
 
-        client = Client(os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN"))
+        client = twilio_client()
         sent = 0
         for phone in recipients:
             try:
@@ -984,29 +893,8 @@ def send_email_confirmation_new_rest(booking_id: int) -> str:
         conn = psycopg2.connect(os.getenv("DATABASE_URL"))
         cur = conn.cursor()
 
-        cur.execute("""
-            SELECT 
-                b.customer_name,
-                b.start_time,
-                b.end_time,
-                b.booking_ref,
-                b.party_num,
-                b.customer_phone,
-                b.venue_unit_id,
-                l.name AS location_name,
-                l.booking_email_recipients,
-                vu.name AS venue_unit_name
-            FROM bookings b
-            JOIN locations l
-              ON b.tenant_id = l.tenant_id AND b.location_id = l.location_id
-            LEFT JOIN venue_unit vu
-              ON b.tenant_id = vu.tenant_id AND b.venue_unit_id = vu.venue_unit_id
-            WHERE b.booking_id = %s
-        """, (booking_id,))
-        
-        row = cur.fetchone()
-
-        if not row:
+        ctx = load_booking_context(cur, booking_id)
+        if not ctx:
             print(f"[EMAIL] Booking {booking_id} not found.")
             return "failed"
 
@@ -1019,32 +907,15 @@ def send_email_confirmation_new_rest(booking_id: int) -> str:
             customer_phone,
             venue_unit_id,
             location_name,
-            booking_email_recipients,
             venue_unit_name
-        ) = row
-
-        # Parse email recipients
-        if not booking_email_recipients:
-            fallback_email = os.getenv("FALLBACK_EMAIL")
-            if not fallback_email:
-                print(f"[EMAIL] No email recipients or fallback email for booking {booking_id}.")
-                return "failed"
-            to_emails = [fallback_email]
-        else:
-            # Split by comma or semicolon, strip whitespace, filter valid emails
-            to_emails = []
-            for email in re.split('[,;]', booking_email_recipients):
-                email = email.strip()
-                if email and re.match(EMAIL_REGEX, email):
-                    to_emails.append(email)
-                else:
-                    print(f"[EMAIL] Invalid email skipped: {email}")
-
-            if not to_emails:
-                fallback_email = os.getenv("FALLBACK_EMAIL")
-                if not fallback_email:
-                    print(f"[EMAIL] No valid email recipients or fallback email for booking {booking_id}.")
-                    return "failed"
+        ) = _ctx_fields(
+            ctx, "customer_name", "start_time", "end_time", "booking_ref", "party_num",
+            "customer_phone", "venue_unit_id", "location_name", "venue_unit_name",
+        )
+
+        to_emails = _merchant_emails(ctx, booking_id)
+        if not to_emails:
+            return "failed"
         print(f"[EMAIL] Will send to: {to_emails}")
 
         # Construct plain text email as fallback
@@ -1104,7 +975,7 @@ def send_email_confirmation_new_rest(booking_id: int) -> str:
             )
 
         # Send email via SendGrid
-        sg = SendGridAPIClient(os.getenv("SENDGRID_API_KEY"))
+        sg = sendgrid_client()
         response = sg.send(message)
 
         print(f"[EMAIL] Sent to {to_emails}: HTML email with booking confirmation")
@@ -1129,33 +1000,8 @@ def send_email_confirmation_new(booking_id: int) -> str:
         conn = psycopg2.connect(os.getenv("DATABASE_URL"))
         cur = conn.cursor()
 
-        cur.execute("""
-            SELECT 
-                b.customer_name,
-                b.start_time,
-                b.end_time,
-                b.booking_ref,
-                b.party_num,
-                b.customer_phone,
-                b.staff_id,
-                b.service_id,
-                l.name AS location_name,
-                l.booking_email_recipients,
-                s.name AS staff_name,
-                sv.name AS service_name
-            FROM bookings b
-            JOIN locations l
-              ON b.tenant_id = l.tenant_id AND b.location_id = l.location_id
-            LEFT JOIN staff s
-              ON b.tenant_id = s.tenant_id AND b.staff_id = s.staff_id
-            LEFT JOIN services sv
-              ON b.tenant_id = sv.tenant_id AND b.service_id = sv.service_id
-            WHERE b.booking_id = %s
-        """, (booking_id,))
-        
-        row = cur.fetchone()
-
-        if not row:
+        ctx = load_booking_context(cur, booking_id)
+        if not ctx:
             print(f"[EMAIL] Booking {booking_id} not found.")
             return "failed"
 
@@ -1169,34 +1015,17 @@ def send_email_confirmation_new(booking_id: int) -> str:
             staff_id,
             service_id,
             location_name,
-            booking_email_recipients,
             staff_name,
             service_name
-        ) = row
-
-        # Parse email recipients
-        if not booking_email_recipients:
-            fallback_email = os.getenv("FALLBACK_EMAIL")
-            if not fallback_email:
-                print(f"[EMAIL] No email recipients or fallback email for booking {booking_id}.")
-                return "failed"
-            to_emails = [fallback_email]
-        else:
-            # Split by comma or semicolon, strip whitespace, filter valid emails
-            to_emails = []
-            for email in re.split('[,;]', booking_email_recipients):
-                email = email.strip()
-                if email and re.match(EMAIL_REGEX, email):
-                    to_emails.append(email)
-                else:
-                    print(f"[EMAIL] Invalid email skipped: {email}")
-
-            if not to_emails:
-                fallback_email = os.getenv("FALLBACK_EMAIL")
-                if not fallback_email:
-                    print(f"[EMAIL] No valid email recipients or fallback email for booking {booking_id}.")
-                    return "failed"
-                to_emails = [fallback_email]
+        ) = _ctx_fields(
+            ctx, "customer_name", "start_time", "end_time", "booking_ref", "party_num",
+            "customer_phone", "staff_id", "service_id", "location_name", "staff_name",
+            "service_name",
+        )
+
+        to_emails = _merchant_emails(ctx, booking_id)
+        if not to_emails:
+            return "failed"
 
         # Construct plain text email as fallback
         plain_text_body = (
@@ -1259,7 +1088,7 @@ def send_email_confirmation_new(booking_id: int) -> str:
             )
 
         # Send email via SendGrid
-        sg = SendGridAPIClient(os.getenv("SENDGRID_API_KEY"))
+        sg = sendgrid_client()
         response = sg.send(message)
 
         print(f"[EMAIL] Sent to {to_emails}: HTML email with booking confirmation")
@@ -1284,30 +1113,8 @@ def send_email_confirmation_mod_rest(booking_id: int, original_booking_id: int)
         conn = psycopg2.connect(os.getenv("DATABASE_URL"))
         cur = conn.cursor()
 
-        # Fetch new booking details
-        cur.execute("""
-            SELECT 
-                b.customer_name,
-                b.start_time,
-                b.end_time,
-                b.booking_ref,
-                b.party_num,
-                b.customer_phone,
-                b.venue_unit_id,
-                l.name AS location_name,
-                l.booking_email_recipients,
-                vu.name AS venue_unit_name
-            FROM bookings b
-            JOIN locations l
-              ON b.tenant_id = l.tenant_id AND b.location_id = l.location_id
-            LEFT JOIN venue_unit vu
-              ON b.tenant_id = vu.tenant_id AND b.venue_unit_id = vu.venue_unit_id
-            WHERE b.booking_id = %s AND b.status = 'confirmed'
-        """, (booking_id,))
-        
-        new_booking = cur.fetchone()
-
-        if not new_booking:
+        ctx = load_booking_context(cur, booking_id)
+        if not ctx or ctx["status"] != "confirmed":
             print(f"[EMAIL] Confirmed booking {booking_id} not found or not in 'confirmed' status.")
             return "failed"
 
@@ -1320,52 +1127,20 @@ def send_email_confirmation_mod_rest(booking_id: int, original_booking_id: int)
             new_customer_phone,
             new_venue_unit_id,
             new_location_name,
-            booking_email_recipients,
-            new_venue_unit_name
-        ) = new_booking
+            new_venue_unit_name,
+        ) = _ctx_fields(
+            ctx, "customer_name", "start_time", "end_time", "booking_ref", "party_num",
+            "customer_phone", "venue_unit_id", "location_name", "venue_unit_name",
+        )
 
         # Fetch original booking details
-        cur.execute("""
-            SELECT 
-                b.customer_name,
-                b.start_time,
-                b.end_time,
-                b.booking_ref,
-                b.party_num,
-                b.customer_phone,
-                b.venue_unit_id,
-                vu.name AS venue_unit_name
-            FROM bookings b
-            LEFT JOIN venue_unit vu
-              ON b.tenant_id = vu.tenant_id AND b.venue_unit_id = vu.venue_unit_id
-            WHERE b.booking_id = %s AND b.status = 'modified'
-        """, (original_booking_id,))
-        
-        original_booking = cur.fetchone()
-
-        # Parse email recipients
-        if not booking_email_recipients:
-            fallback_email = os.getenv("FALLBACK_EMAIL")
-            if not fallback_email:
-                print(f"[EMAIL] No email recipients or fallback email for booking {booking_id}.")
-                return "failed"
-            to_emails = [fallback_email]
-        else:
-            # Split by comma or semicolon, strip whitespace, filter valid emails
-            to_emails = []
-            for email in re.split('[,;]', booking_email_recipients):
-                email = email.strip()
-                if email and re.match(EMAIL_REGEX, email):
-                    to_emails.append(email)
-                else:
-                    print(f"[EMAIL] Invalid email skipped: {email}")
-
-            if not to_emails:
-                fallback_email = os.getenv("FALLBACK_EMAIL")
-                if not fallback_email:
-                    print(f"[EMAIL] No valid email recipients or fallback email for booking {booking_id}.")
-                    return "failed"
-                to_emails = [fallback_email]
+        original_booking = load_booking_context(cur, original_booking_id)
+        if original_booking and original_booking["status"] != "modified":
+            original_booking = None
+
+        to_emails = _merchant_emails(ctx, booking_id)
+        if not to_emails:
+            return "failed"
 
         # Construct plain text email as fallback
         new_booking_details = (
@@ -1390,8 +1165,11 @@ def send_email_confirmation_mod_rest(booking_id: int, original_booking_id: int)
                 orig_party_num,
                 orig_customer_phone,
                 orig_venue_unit_id,
-                orig_venue_unit_name
-            ) = original_booking
+                orig_venue_unit_name,
+            ) = _ctx_fields(
+                original_booking, "customer_name", "start_time", "end_time", "booking_ref",
+                "party_num", "customer_phone", "venue_unit_id", "venue_unit_name",
+            )
 
             original_booking_details = (
                 f"Location: {new_location_name}\n"  # Assuming same location
@@ -1483,7 +1261,7 @@ def send_email_confirmation_mod_rest(booking_id: int, original_booking_id: int)
             )
 
         # Send email via SendGrid
-        sg = SendGridAPIClient(os.getenv("SENDGRID_API_KEY"))
+        sg = sendgrid_client()
         response = sg.send(message)
 
         print(f"[EMAIL] Sent to {to_emails}: HTML email with booking modification confirmation")
@@ -1508,34 +1286,8 @@ def send_email_confirmation_mod(booking_id: int, original_booking_id: int) -> st
         conn = psycopg2.connect(os.getenv("DATABASE_URL"))
         cur = conn.cursor()
 
-        # Fetch new booking details
-        cur.execute("""
-            SELECT 
-                b.customer_name,
-                b.start_time,
-                b.end_time,
-                b.booking_ref,
-                b.party_num,
-                b.customer_phone,
-                b.staff_id,
-                b.service_id,
-                l.name AS location_name,
-                l.booking_email_recipients,
-                s.name AS staff_name,
-                sv.name AS service_name
-            FROM bookings b
-            JOIN locations l
-              ON b.tenant_id = l.tenant_id AND b.location_id = l.location_id
-            LEFT JOIN staff s
-              ON b.tenant_id = s.tenant_id AND b.staff_id = s.staff_id
-            LEFT JOIN services sv
-              ON b.tenant_id = sv.tenant_id AND b.service_id = sv.service_id
-            WHERE b.booking_id = %s AND b.status = 'confirmed'
-        """, (booking_id,))
-        
-        new_booking = cur.fetchone()
-
-        if not new_booking:
+        ctx = load_booking_context(cur, booking_id)
+        if not ctx or ctx["status"] != "confirmed":
             print(f"[EMAIL] Confirmed booking {booking_id} not found or not in 'confirmed' status.")
             return "failed"
 
@@ -1549,57 +1301,22 @@ def send_email_confirmation_mod(booking_id: int, original_booking_id: int) -> st
             new_staff_id,
             new_service_id,
             new_location_name,
-            booking_email_recipients,
             new_staff_name,
-            new_service_name
-        ) = new_booking
+            new_service_name,
+        ) = _ctx_fields(
+            ctx, "customer_name", "start_time", "end_time", "booking_ref", "party_num",
+            "customer_phone", "staff_id", "service_id", "location_name", "staff_name",
+            "service_name",
+        )
 
         # Fetch original booking details
-        cur.execute("""
-            SELECT 
-                b.customer_name,
-                b.start_time,
-                b.end_time,
-                b.booking_ref,
-                b.party_num,
-                b.customer_phone,
-                b.staff_id,
-                b.service_id,
-                s.name AS staff_name,
-                sv.name AS service_name
-            FROM bookings b
-            LEFT JOIN staff s
-              ON b.tenant_id = s.tenant_id AND b.staff_id = s.staff_id
-            LEFT JOIN services sv
-              ON b.tenant_id = sv.tenant_id AND b.service_id = sv.service_id
-            WHERE b.booking_id = %s AND b.status = 'modified'
-        """, (original_booking_id,))
-        
-        original_booking = cur.fetchone()
-
-        # Parse email recipients
-        if not booking_email_recipients:
-            fallback_email = os.getenv("FALLBACK_EMAIL")
-            if not fallback_email:
-                print(f"[EMAIL] No email recipients or fallback email for booking {booking_id}.")
-                return "failed"
-            to_emails = [fallback_email]
-        else:
-            # Split by comma or semicolon, strip whitespace, filter valid emails
-            to_emails = []
-            for email in re.split('[,;]', booking_email_recipients):
-                email = email.strip()
-                if email and re.match(EMAIL_REGEX, email):
-                    to_emails.append(email)
-                else:
-                    print(f"[EMAIL] Invalid email skipped: {email}")
-
-            if not to_emails:
-                fallback_email = os.getenv("FALLBACK_EMAIL")
-                if not fallback_email:
-                    print(f"[EMAIL] No valid email recipients or fallback email for booking {booking_id}.")
-                    return "failed"
-                to_emails = [fallback_email]
+        original_booking = load_booking_context(cur, original_booking_id)
+        if original_booking and original_booking["status"] != "modified":
+            original_booking = None
+
+        to_emails = _merchant_emails(ctx, booking_id)
+        if not to_emails:
+            return "failed"
 
         # Construct plain text email as fallback
         new_booking_details = (
@@ -1628,8 +1345,12 @@ def send_email_confirmation_mod(booking_id: int, original_booking_id: int) -> st
                 orig_staff_id,
                 orig_service_id,
                 orig_staff_name,
-                orig_service_name
-            ) = original_booking
+                orig_service_name,
+            ) = _ctx_fields(
+                original_booking, "customer_name", "start_time", "end_time", "booking_ref",
+                "party_num", "customer_phone", "staff_id", "service_id", "staff_name",
+                "service_name",
+            )
 
             original_booking_details = (
                 f"Location: {new_location_name}\n"  # Assuming same location
@@ -1726,7 +1447,7 @@ def send_email_confirmation_mod(booking_id: int, original_booking_id: int) -> st
             )
 
         # Send email via SendGrid
-        sg = SendGridAPIClient(os.getenv("SENDGRID_API_KEY"))
+        sg = sendgrid_client()
         response = sg.send(message)
 
         print(f"[EMAIL] Sent to {to_emails}: HTML email with booking modification confirmation")
@@ -1751,30 +1472,8 @@ def send_email_confirmation_can_rest(booking_id: int) -> str:
         conn = psycopg2.connect(os.getenv("DATABASE_URL"))
         cur = conn.cursor()
 
-        # Fetch cancelled booking details
-        cur.execute("""
-            SELECT 
-                b.customer_name,
-                b.start_time,
-                b.end_time,
-                b.booking_ref,
-                b.party_num,
-                b.customer_phone,
-                b.venue_unit_id,
-                l.name AS location_name,
-                l.booking_email_recipients,
-                vu.name AS venue_unit_name
-            FROM bookings b
-            JOIN locations l
-              ON b.tenant_id = l.tenant_id AND b.location_id = l.location_id
-            LEFT JOIN venue_unit vu
-              ON b.tenant_id = vu.tenant_id AND b.venue_unit_id = vu.venue_unit_id
-            WHERE b.booking_id = %s AND b.status = 'cancelled'
-        """, (booking_id,))
-        
-        booking = cur.fetchone()
-
-        if not booking:
+        ctx = load_booking_context(cur, booking_id)
+        if not ctx or ctx["status"] != "cancelled":
             print(f"[EMAIL] Cancelled booking {booking_id} not found or not in 'cancelled' status.")
             return "failed"
 
@@ -1787,33 +1486,15 @@ def send_email_confirmation_can_rest(booking_id: int) -> str:
             customer_phone,
             venue_unit_id,
             location_name,
-            booking_email_recipients,
-            venue_unit_name
-        ) = booking
-
-        # Parse email recipients
-        if not booking_email_recipients:
-            fallback_email = os.getenv("FALLBACK_EMAIL")
-            if not fallback_email:
-                print(f"[EMAIL] No email recipients or fallback email for booking {booking_id}.")
-                return "failed"
-            to_emails = [fallback_email]
-        else:
-            # Split by comma or semicolon, strip whitespace, filter valid emails
-            to_emails = []
-            for email in re.split('[,;]', booking_email_recipients):
-                email = email.strip()
-                if email and re.match(EMAIL_REGEX, email):
-                    to_emails.append(email)
-                else:
-                    print(f"[EMAIL] Invalid email skipped: {email}")
-
-            if not to_emails:
-                fallback_email = os.getenv("FALLBACK_EMAIL")
-                if not fallback_email:
-                    print(f"[EMAIL] No valid email recipients or fallback email for booking {booking_id}.")
-                    return "failed"
-                to_emails = [fallback_email]
+            venue_unit_name,
+        ) = _ctx_fields(
+            ctx, "customer_name", "start_time", "end_time", "booking_ref", "party_num",
+            "customer_phone", "venue_unit_id", "location_name", "venue_unit_name",
+        )
+
+        to_emails = _merchant_emails(ctx, booking_id)
+        if not to_emails:
+            return "failed"
 
         # Construct email message with cancelled booking details
         plain_text_body = (
@@ -1873,7 +1554,7 @@ def send_email_confirmation_can_rest(booking_id: int) -> str:
             )
 
         # Send email via SendGrid
-        sg = SendGridAPIClient(os.getenv("SENDGRID_API_KEY"))
+        sg = sendgrid_client()
         response = sg.send(message)
 
         print(f"[EMAIL] Sent to {to_emails}: HTML email with booking cancellation notification")
@@ -1898,34 +1579,8 @@ def send_email_confirmation_can(booking_id: int) -> str:
         conn = psycopg2.connect(os.getenv("DATABASE_URL"))
         cur = conn.cursor()
 
-        # Fetch cancelled booking details
-        cur.execute("""
-            SELECT 
-                b.customer_name,
-                b.start_time,
-                b.end_time,
-                b.booking_ref,
-                b.party_num,
-                b.customer_phone,
-                b.staff_id,
-                b.service_id,
-                l.name AS location_name,
-                l.booking_email_recipients,
-                s.name AS staff_name,
-                sv.name AS service_name
-            FROM bookings b
-            JOIN locations l
-              ON b.tenant_id = l.tenant_id AND b.location_id = l.location_id
-            LEFT JOIN staff s
-              ON b.tenant_id = s.tenant_id AND b.staff_id = s.staff_id
-            LEFT JOIN services sv
-              ON b.tenant_id = sv.tenant_id AND b.service_id = sv.service_id
-            WHERE b.booking_id = %s AND b.status = 'cancelled'
-        """, (booking_id,))
-        
-        booking = cur.fetchone()
-
-        if not booking:
+        ctx = load_booking_context(cur, booking_id)
+        if not ctx or ctx["status"] != "cancelled":
             print(f"[EMAIL] Cancelled booking {booking_id} not found or not in 'cancelled' status.")
             return "failed"
 
@@ -1939,34 +1594,17 @@ def send_email_confirmation_can(booking_id: int) -> str:
             staff_id,
             service_id,
             location_name,
-            booking_email_recipients,
             staff_name,
-            service_name
-        ) = booking
-
-        # Parse email recipients
-        if not booking_email_recipients:
-            fallback_email = os.getenv("FALLBACK_EMAIL")
-            if not fallback_email:
-                print(f"[EMAIL] No email recipients or fallback email for booking {booking_id}.")
-                return "failed"
-            to_emails = [fallback_email]
-        else:
-            # Split by comma or semicolon, strip whitespace, filter valid emails
-            to_emails = []
-            for email in re.split('[,;]', booking_email_recipients):
-                email = email.strip()
-                if email and re.match(EMAIL_REGEX, email):
-                    to_emails.append(email)
-                else:
-                    print(f"[EMAIL] Invalid email skipped: {email}")
-
-            if not to_emails:
-                fallback_email = os.getenv("FALLBACK_EMAIL")
-                if not fallback_email:
-                    print(f"[EMAIL] No valid email recipients or fallback email for booking {booking_id}.")
-                    return "failed"
-                to_emails = [fallback_email]
+            service_name,
+        ) = _ctx_fields(
+            ctx, "customer_name", "start_time", "end_time", "booking_ref", "party_num",
+            "customer_phone", "staff_id", "service_id", "location_name", "staff_name",
+            "service_name",
+        )
+
+        to_emails = _merchant_emails(ctx, booking_id)
+        if not to_emails:
+            return "failed"
 
         # Construct email message with cancelled booking details
         plain_text_body = (
@@ -2030,7 +1668,7 @@ def send_email_confirmation_can(booking_id: int) -> str:
             )
 
         # Send email via SendGrid
-        sg = SendGridAPIClient(os.getenv("SENDGRID_API_KEY"))
+        sg = sendgrid_client()
         response = sg.send(message)
 
         print(f"[EMAIL] Sent to {to_emails}: HTML email with booking cancellation notification")
@@ -2064,51 +1702,8 @@ def send_email_confirmation_customer_new(booking_id: int) -> str:
         cur = conn.cursor()
 
         # First query: Get booking details and check for direct customer email
-        cur.execute("""
-            SELECT 
-                b.tenant_id,
-                b.location_id,
-                b.customer_name,
-                b.customer_email,
-                b.customer_id,
-                b.start_time,
-                b.end_time,
-                b.booking_ref,
-                b.party_num,
-                b.customer_phone,
-                b.staff_id,
-                b.service_id,
-                b.venue_unit_id,
-                l.name AS location_name,
-                l.location_type,
-                s.name AS staff_name,
-                sv.name AS service_name,
-                vu.zone_tag_ids,
-                bp.logo_url,
-                bp.banner_url,
-                bp.alias,
-                li.address AS location_address,
-                li.phone_with_country_code AS location_phone,
-                li.website_url AS location_website
-            FROM bookings b
-            JOIN locations l
-              ON b.tenant_id = l.tenant_id AND b.location_id = l.location_id
-            LEFT JOIN staff s
-              ON b.tenant_id = s.tenant_id AND b.staff_id = s.staff_id
-            LEFT JOIN services sv
-              ON b.tenant_id = sv.tenant_id AND b.service_id = sv.service_id
-            LEFT JOIN venue_unit vu
-              ON b.tenant_id = vu.tenant_id AND b.venue_unit_id = vu.venue_unit_id
-            LEFT JOIN booking_page bp
-              ON b.tenant_id = bp.tenant_id AND b.location_id = bp.location_id AND bp.is_active = true
-            LEFT JOIN location_info li
-              ON b.tenant_id = li.tenant_id AND b.location_id = li.location_id
-            WHERE b.booking_id = %s
-        """, (booking_id,))
-        
-        row = cur.fetchone()
-
-        if not row:
+        ctx = load_booking_context(cur, booking_id)
+        if not ctx:
             print(f"[CUSTOMER_EMAIL] Booking {booking_id} not found.")
             return "failed"
 
@@ -2116,8 +1711,6 @@ def send_email_confirmation_customer_new(booking_id: int) -> str:
             tenant_id,
             location_id,
             customer_name,
-            customer_email,
-            customer_id,
             start_time,
             end_time,
             booking_ref,
@@ -2130,70 +1723,27 @@ def send_email_confirmation_customer_new(booking_id: int) -> str:
             location_type,
             staff_name,
             service_name,
-            zone_tag_ids,
             logo_url,
             banner_url,
             booking_page_alias,
             location_address,
             location_phone,
-            location_website
-        ) = row
+            location_website,
+        ) = _ctx_fields(
+            ctx, "tenant_id", "location_id", "customer_name", "start_time", "end_time",
+            "booking_ref", "party_num", "customer_phone", "staff_id", "service_id",
+            "venue_unit_id", "location_name", "location_type", "staff_name", "service_name",
+            "logo_url", "banner_url", "booking_page_alias", "location_address",
+            "location_phone", "location_website",
+        )
+        booking_access_token = ctx["access_token"]
+
+        # Zone names for restaurant bookings
+        zone_names = ctx["zone_names"] if location_type == "rest" and ctx["zone_tag_ids"] else []
+
+        # Recipient: bookings.customer_email, else the customers table
+        recipient_email = _customer_email(ctx)
 
-        # Get booking access token for manage booking URL
-        booking_access_token = None
-        cur.execute("""
-            SELECT token_id 
-            FROM booking_access_tokens 
-            WHERE tenant_id = %s AND booking_id = %s AND purpose = 'view'
-            ORDER BY created_at DESC
-            LIMIT 1
-        """, (tenant_id, booking_id))
-        
-        token_row = cur.fetchone()
-        if token_row:
-            booking_access_token = str(token_row[0])
-
-        # Get zone information for restaurant bookings
-        zone_names = []
-        if location_type == "rest" and zone_tag_ids:
-            # Query location_tag table to get zone names
-            zone_ids_tuple = tuple(zone_tag_ids)
-            if zone_ids_tuple:
-                cur.execute("""
-                    SELECT name 
-                    FROM location_tag 
-                    WHERE tenant_id = %s AND tag_id = ANY(%s)
-                    ORDER BY name
-                """, (tenant_id, zone_tag_ids))
-                
-                zone_results = cur.fetchall()
-                zone_names = [zone[0] for zone in zone_results]
-
-        # Determine recipient email with fallback logic
-        recipient_email = None
-        
-        # Priority 1: Check customer_email field in bookings
-        if customer_email and customer_email.strip() and re.match(EMAIL_REGEX, customer_email.strip()):
-            recipient_email = customer_email.strip()
-            print(f"[CUSTOMER_EMAIL] Using customer_email from booking: {recipient_email}")
-        
-        # Priority 2: Check customers table if customer_id exists
-        elif customer_id:
-            cur.execute("""
-                SELECT email 
-                FROM customers 
-                WHERE tenant_id = %s AND customer_id = %s AND email IS NOT NULL AND email != ''
-            """, (tenant_id, customer_id))
-            
-            customer_row = cur.fetchone()
-            if customer_row and customer_row[0]:
-                customer_table_email = customer_row[0].strip()
-                if re.match(EMAIL_REGEX, customer_table_email):
-                    recipient_email = customer_table_email
-                    print(f"[CUSTOMER_EMAIL] Using email from customers table: {recipient_email}")
-                else:
-                    print(f"[CUSTOMER_EMAIL] Invalid email in customers table: {customer_table_email}")
-        
         # If no valid email found, skip sending
         if not recipient_email:
             print(f"[CUSTOMER_EMAIL] No valid customer email found for booking {booking_id}. Skipping email send.")
@@ -2335,7 +1885,7 @@ def send_email_confirmation_customer_new(booking_id: int) -> str:
             )
 
         # Send email via SendGrid
-        sg = SendGridAPIClient(os.getenv("SENDGRID_API_KEY"))
+        sg = sendgrid_client()
         response = sg.send(message)
 
         print(f"[CUSTOMER_EMAIL] Sent to {recipient_email}: Customer booking confirmation email")
@@ -2369,51 +1919,8 @@ def send_email_confirmation_customer_mod(booking_id: int, original_booking_id: i
         cur = conn.cursor()
 
         # First query: Get new booking details and check for direct customer email
-        cur.execute("""
-            SELECT 
-                b.tenant_id,
-                b.location_id,
-                b.customer_name,
-                b.customer_email,
-                b.customer_id,
-                b.start_time,
-                b.end_time,
-                b.booking_ref,
-                b.party_num,
-                b.customer_phone,
-                b.staff_id,
-                b.service_id,
-                b.venue_unit_id,
-                l.name AS location_name,
-                l.location_type,
-                s.name AS staff_name,
-                sv.name AS service_name,
-                vu.zone_tag_ids,
-                bp.logo_url,
-                bp.banner_url,
-                bp.alias,
-                li.address,
-                li.phone_with_country_code,
-                li.website_url
-            FROM bookings b
-            JOIN locations l
-              ON b.tenant_id = l.tenant_id AND b.location_id = l.location_id
-            LEFT JOIN staff s
-              ON b.tenant_id = s.tenant_id AND b.staff_id = s.staff_id
-            LEFT JOIN services sv
-              ON b.tenant_id = sv.tenant_id AND b.service_id = sv.service_id
-            LEFT JOIN venue_unit vu
-              ON b.tenant_id = vu.tenant_id AND b.venue_unit_id = vu.venue_unit_id
-            LEFT JOIN booking_page bp
-              ON b.tenant_id = bp.tenant_id AND b.location_id = bp.location_id AND bp.is_active = true
-            LEFT JOIN location_info li
-              ON b.tenant_id = li.tenant_id AND b.location_id = li.location_id
-            WHERE b.booking_id = %s AND b.status = 'confirmed'
-        """, (booking_id,))
-        
-        new_booking = cur.fetchone()
-
-        if not new_booking:
+        ctx = load_booking_context(cur, booking_id)
+        if not ctx or ctx["status"] != "confirmed":
             print(f"[CUSTOMER_EMAIL] Confirmed booking {booking_id} not found or not in 'confirmed' status.")
             return "failed"
 
@@ -2421,8 +1928,6 @@ def send_email_confirmation_customer_mod(booking_id: int, original_booking_id: i
             tenant_id,
             location_id,
             customer_name,
-            customer_email,
-            customer_id,
             start_time,
             end_time,
             booking_ref,
@@ -2435,94 +1940,32 @@ def send_email_confirmation_customer_mod(booking_id: int, original_booking_id: i
             location_type,
             staff_name,
             service_name,
-            zone_tag_ids,
             logo_url,
             banner_url,
             booking_page_alias,
             location_address,
             location_phone,
-            location_website
-        ) = new_booking
+            location_website,
+        ) = _ctx_fields(
+            ctx, "tenant_id", "location_id", "customer_name", "start_time", "end_time",
+            "booking_ref", "party_num", "customer_phone", "staff_id", "service_id",
+            "venue_unit_id", "location_name", "location_type", "staff_name", "service_name",
+            "logo_url", "banner_url", "booking_page_alias", "location_address",
+            "location_phone", "location_website",
+        )
+        booking_access_token = ctx["access_token"]
 
-        # Get booking access token for manage booking URL
-        booking_access_token = None
-        cur.execute("""
-            SELECT token_id 
-            FROM booking_access_tokens 
-            WHERE tenant_id = %s AND booking_id = %s AND purpose = 'view'
-            ORDER BY created_at DESC
-            LIMIT 1
-        """, (tenant_id, booking_id))
-        
-        token_row = cur.fetchone()
-        if token_row:
-            booking_access_token = str(token_row[0])
-
-        # Get zone information for restaurant bookings
-        zone_names = []
-        if location_type == "rest" and zone_tag_ids:
-            # Query location_tag table to get zone names
-            zone_ids_tuple = tuple(zone_tag_ids)
-            if zone_ids_tuple:
-                cur.execute("""
-                    SELECT name 
-                    FROM location_tag 
-                    WHERE tenant_id = %s AND tag_id = ANY(%s)
-                    ORDER BY name
-                """, (tenant_id, zone_tag_ids))
-                
-                zone_results = cur.fetchall()
-                zone_names = [zone[0] for zone in zone_results]
+        # Zone names for restaurant bookings
+        zone_names = ctx["zone_names"] if location_type == "rest" and ctx["zone_tag_ids"] else []
 
         # Fetch original booking details for context
-        cur.execute("""
-            SELECT 
-                b.start_time,
-                b.end_time,
-                b.party_num,
-                b.staff_id,
-                b.service_id,
-                b.venue_unit_id,
-                s.name AS staff_name,
-                sv.name AS service_name,
-                vu.name AS venue_unit_name
-            FROM bookings b
-            LEFT JOIN staff s
-              ON b.tenant_id = s.tenant_id AND b.staff_id = s.staff_id
-            LEFT JOIN services sv
-              ON b.tenant_id = sv.tenant_id AND b.service_id = sv.service_id
-            LEFT JOIN venue_unit vu
-              ON b.tenant_id = vu.tenant_id AND b.venue_unit_id = vu.venue_unit_id
-            WHERE b.booking_id = %s AND b.status = 'modified'
-        """, (original_booking_id,))
-        
-        original_booking = cur.fetchone()
+        original_booking = load_booking_context(cur, original_booking_id)
+        if original_booking and original_booking["status"] != "modified":
+            original_booking = None
+
+        # Recipient: bookings.customer_email, else the customers table
+        recipient_email = _customer_email(ctx)
 
-        # Determine recipient email with fallback logic
-        recipient_email = None
-        
-        # Priority 1: Check customer_email field in bookings
-        if customer_email and customer_email.strip() and re.match(EMAIL_REGEX, customer_email.strip()):
-            recipient_email = customer_email.strip()
-            print(f"[CUSTOMER_EMAIL] Using customer_email from booking: {recipient_email}")
-        
-        # Priority 2: Check customers table if customer_id exists
-        elif customer_id:
-            cur.execute("""
-                SELECT email 
-                FROM customers 
-                WHERE tenant_id = %s AND customer_id = %s AND email IS NOT NULL AND email != ''
-            """, (tenant_id, customer_id))
-            
-            customer_row = cur.fetchone()
-            if customer_row and customer_row[0]:
-                customer_table_email = customer_row[0].strip()
-                if re.match(EMAIL_REGEX, customer_table_email):
-                    recipient_email = customer_table_email
-                    print(f"[CUSTOMER_EMAIL] Using email from customers table: {recipient_email}")
-                else:
-                    print(f"[CUSTOMER_EMAIL] Invalid email in customers table: {customer_table_email}")
-        
         # If no valid email found, skip sending
         if not recipient_email:
             print(f"[CUSTOMER_EMAIL] No valid customer email found for booking {booking_id}. Skipping email send.")
@@ -2547,8 +1990,12 @@ def send_email_confirmation_customer_mod(booking_id: int, original_booking_id: i
                 orig_venue_unit_id,
                 orig_staff_name,
                 orig_service_name,
-                orig_venue_unit_name
-            ) = original_booking
+                orig_venue_unit_name,
+            ) = _ctx_fields(
+                original_booking, "start_time", "end_time", "party_num",
+                "staff_id", "service_id", "venue_unit_id", "staff_name",
+                "service_name", "venue_unit_name",
+            )
 
             # Set original booking variables for template
             orig_booking_date = orig_start_time.strftime('%Y-%m-%d')
@@ -2559,27 +2006,7 @@ def send_email_confirmation_customer_mod(booking_id: int, original_booking_id: i
             
             # Get original zone information for restaurant bookings
             if location_type == "rest" and orig_venue_unit_id:
-                # Query venue_unit to get zone_tag_ids for original booking
-                cur.execute("""
-                    SELECT zone_tag_ids 
-                    FROM venue_unit
-                    WHERE tenant_id = %s AND venue_unit_id = %s
-                """, (tenant_id, orig_venue_unit_id))
-                
-                orig_venue_unit = cur.fetchone()
-                if orig_venue_unit and orig_venue_unit[0]:
-                    orig_zone_tag_ids = orig_venue_unit[0]
-                    
-                    # Get zone names
-                    cur.execute("""
-                        SELECT name 
-                        FROM location_tag 
-                        WHERE tenant_id = %s AND tag_id = ANY(%s)
-                        ORDER BY name
-                    """, (tenant_id, orig_zone_tag_ids))
-                    
-                    orig_zone_results = cur.fetchall()
-                    orig_zone_names = [zone[0] for zone in orig_zone_results]
+                orig_zone_names = original_booking["zone_names"] or []
 
             if location_type == "rest":
                 original_details_message = (
@@ -2745,7 +2172,7 @@ def send_email_confirmation_customer_mod(booking_id: int, original_booking_id: i
             )
 
         # Send email via SendGrid
-        sg = SendGridAPIClient(os.getenv("SENDGRID_API_KEY"))
+        sg = sendgrid_client()
         response = sg.send(message)
 
         print(f"[CUSTOMER_EMAIL] Sent to {recipient_email}: Customer booking modification confirmation email")
@@ -2779,51 +2206,8 @@ def send_email_confirmation_customer_can(booking_id: int) -> str:
         cur = conn.cursor()
 
         # Query: Get cancelled booking details and check for direct customer email
-        cur.execute("""
-            SELECT 
-                b.tenant_id,
-                b.location_id,
-                b.customer_name,
-                b.customer_email,
-                b.customer_id,
-                b.start_time,
-                b.end_time,
-                b.booking_ref,
-                b.party_num,
-                b.customer_phone,
-                b.staff_id,
-                b.service_id,
-                b.venue_unit_id,
-                l.name AS location_name,
-                l.location_type,
-                s.name AS staff_name,
-                sv.name AS service_name,
-                vu.zone_tag_ids,
-                bp.logo_url,
-                bp.banner_url,
-                bp.alias,
-                li.address AS location_address,
-                li.phone_with_country_code AS location_phone,
-                li.website_url AS location_website
-            FROM bookings b
-            JOIN locations l
-              ON b.tenant_id = l.tenant_id AND b.location_id = l.location_id
-            LEFT JOIN staff s
-              ON b.tenant_id = s.tenant_id AND b.staff_id = s.staff_id
-            LEFT JOIN services sv
-              ON b.tenant_id = sv.tenant_id AND b.service_id = sv.service_id
-            LEFT JOIN venue_unit vu
-              ON b.tenant_id = vu.tenant_id AND b.venue_unit_id = vu.venue_unit_id
-            LEFT JOIN booking_page bp
-              ON b.tenant_id = bp.tenant_id AND b.location_id = bp.location_id AND bp.is_active = true
-            LEFT JOIN location_info li
-              ON b.tenant_id = li.tenant_id AND b.location_id = li.location_id
-            WHERE b.booking_id = %s AND b.status = 'cancelled'
-        """, (booking_id,))
-        
-        row = cur.fetchone()
-
-        if not row:
+        ctx = load_booking_context(cur, booking_id)
+        if not ctx or ctx["status"] != "cancelled":
             print(f"[CUSTOMER_EMAIL] Cancelled booking {booking_id} not found or not in 'cancelled' status.")
             return "failed"
 
@@ -2831,8 +2215,6 @@ def send_email_confirmation_customer_can(booking_id: int) -> str:
             tenant_id,
             location_id,
             customer_name,
-            customer_email,
-            customer_id,
             start_time,
             end_time,
             booking_ref,
@@ -2845,70 +2227,27 @@ def send_email_confirmation_customer_can(booking_id: int) -> str:
             location_type,
             staff_name,
             service_name,
-            zone_tag_ids,
             logo_url,
             banner_url,
             booking_page_alias,
             location_address,
             location_phone,
-            location_website
-        ) = row
+            location_website,
+        ) = _ctx_fields(
+            ctx, "tenant_id", "location_id", "customer_name", "start_time", "end_time",
+            "booking_ref", "party_num", "customer_phone", "staff_id", "service_id",
+            "venue_unit_id", "location_name", "location_type", "staff_name", "service_name",
+            "logo_url", "banner_url", "booking_page_alias", "location_address",
+            "location_phone", "location_website",
+        )
+        booking_access_token = ctx["access_token"]
+
+        # Zone names for restaurant bookings
+        zone_names = ctx["zone_names"] if location_type == "rest" and ctx["zone_tag_ids"] else []
+
+        # Recipient: bookings.customer_email, else the customers table
+        recipient_email = _customer_email(ctx)
 
-        # Get booking access token for manage booking URL
-        booking_access_token = None
-        cur.execute("""
-            SELECT token_id 
-            FROM booking_access_tokens 
-            WHERE tenant_id = %s AND booking_id = %s AND purpose = 'view'
-            ORDER BY created_at DESC
-            LIMIT 1
-        """, (tenant_id, booking_id))
-        
-        token_row = cur.fetchone()
-        if token_row:
-            booking_access_token = str(token_row[0])
-
-        # Get zone information for restaurant bookings
-        zone_names = []
-        if location_type == "rest" and zone_tag_ids:
-            # Query location_tag table to get zone names
-            zone_ids_tuple = tuple(zone_tag_ids)
-            if zone_ids_tuple:
-                cur.execute("""
-                    SELECT name 
-                    FROM location_tag 
-                    WHERE tenant_id = %s AND tag_id = ANY(%s)
-                    ORDER BY name
-                """, (tenant_id, zone_tag_ids))
-                
-                zone_results = cur.fetchall()
-                zone_names = [zone[0] for zone in zone_results]
-
-        # Determine recipient email with fallback logic
-        recipient_email = None
-        
-        # Priority 1: Check customer_email field in bookings
-        if customer_email and customer_email.strip() and re.match(EMAIL_REGEX, customer_email.strip()):
-            recipient_email = customer_email.strip()
-            print(f"[CUSTOMER_EMAIL] Using customer_email from booking: {recipient_email}")
-        
-        # Priority 2: Check customers table if customer_id exists
-        elif customer_id:
-            cur.execute("""
-                SELECT email 
-                FROM customers 
-                WHERE tenant_id = %s AND customer_id = %s AND email IS NOT NULL AND email != ''
-            """, (tenant_id, customer_id))
-            
-            customer_row = cur.fetchone()
-            if customer_row and customer_row[0]:
-                customer_table_email = customer_row[0].strip()
-                if re.match(EMAIL_REGEX, customer_table_email):
-                    recipient_email = customer_table_email
-                    print(f"[CUSTOMER_EMAIL] Using email from customers table: {recipient_email}")
-                else:
-                    print(f"[CUSTOMER_EMAIL] Invalid email in customers table: {customer_table_email}")
-        
         # If no valid email found, skip sending
         if not recipient_email:
             print(f"[CUSTOMER_EMAIL] No valid customer email found for booking {booking_id}. Skipping email send.")
@@ -3052,7 +2391,7 @@ def send_email_confirmation_customer_can(booking_id: int) -> str:
             )
 
         # Send email via SendGrid
-        sg = SendGridAPIClient(os.getenv("SENDGRID_API_KEY"))
+        sg = sendgrid_client()
         response = sg.send(message)
 
         print(f"[CUSTOMER_EMAIL] Sent to {recipient_email}: Customer booking cancellation confirmation email")
@@ -15,13 +15,33 @@ superseded segments need no rotation. The session stays status='active' (no expi
 long-idle cleanup is a separate future task). Legacy NULL-conversation messages are
 treated as one segment.
 
+A run reads every candidate's transcript in one transaction, summarises them with
+bounded concurrency, embeds all summaries in one batched embeddings request, and
+writes the episodes plus the rotations in a single bulk transaction.
+
 Invoked by a Render cron every 30 minutes. This project does NOT use Celery Beat.
+
+Candidate discovery is incremental. Each successful run stores a watermark (the
+DB clock at run start) in Redis; the next run only aggregates segments that have
+a message newer than `watermark - idle timeout - grace`. That window still
+catches every closure: a superseded segment's successor wrote a message inside
+it, and a segment can only cross the idle timeout between two runs if its last
+message is newer than `previous run - idle timeout`. A missing watermark (first
+run, Redis flushed) or `full_scan=True` falls back to the original whole-table
+scan. The incremental query relies on an index on chat_messages (created_at).
+
+A run with failed segments does not advance the watermark, so they are retried
+inside the next run's window. Failures are counted per segment in Redis; once a
+segment has failed MAX_SEGMENT_ATTEMPTS times it is logged and left behind (a
+later message in it, or a full scan, picks it up again) instead of pinning the
+watermark and growing every later window back to a full scan.
 """
 import os
 
 from celery.utils.log import get_task_logger
 
 from tasks.celery_app import app
+from .utils.knowledge_utils import _vector_literal
 from .utils.task_db import _get_conn
 
 logger = get_task_logger(__name__)
@@ -30,6 +50,67 @@ SUMMARY_MODEL = os.getenv("OPENAI_SUMMARY_MODEL", "gpt-4o-mini")
 EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
 IDLE_TIMEOUT_SECONDS = int(os.getenv("CHAT_IDLE_TIMEOUT_SECONDS", os.getenv("CHAT_SESSION_TTL", "7200")))
 MIN_USER_MESSAGES = 3
+# Chat completions in flight at once. Bounded so a backlog can't trip the
+# OpenAI rate limit or hold dozens of sockets open on the worker.
+SUMMARY_CONCURRENCY = int(os.getenv("CHAT_SUMMARY_CONCURRENCY", "4"))
+EMBEDDING_BATCH_SIZE = 256
+# Slack for messages whose transaction committed after the previous run read
+# the clock (created_at is stamped at insert, not at commit).
+WATERMARK_GRACE_SECONDS = 300
+WATERMARK_KEY = "chat_summaries:watermark"
+WATERMARK_TTL_SECONDS = 7 * 24 * 3600
+# {"<session_id>:<conversation_id>": failed runs} for segments not yet summarised.
+FAILURES_KEY = "chat_summaries:failures"
+MAX_SEGMENT_ATTEMPTS = int(os.getenv("CHAT_SUMMARY_MAX_ATTEMPTS", "5"))
+
+# Whole-history scan: used when there is no watermark to start from.
+_CANDIDATES_FULL_SQL = """
+    SELECT cs.session_id, cs.tenant_id, cs.channel, cs.channel_session_id,
+           cs.current_conversation_id, cm.conversation_id AS seg
+    FROM chat_messages cm
+    JOIN chat_sessions cs ON cs.session_id = cm.session_id
+    WHERE cs.channel_session_id IS NOT NULL AND cm.content IS NOT NULL
+    GROUP BY cs.session_id, cs.tenant_id, cs.channel, cs.channel_session_id,
+             cs.current_conversation_id, cm.conversation_id
+    HAVING count(*) FILTER (WHERE cm.role = 'user') >= %(min_user)s
+       AND ( cm.conversation_id IS DISTINCT FROM cs.current_conversation_id
+             OR max(cm.created_at) < now() - make_interval(secs => %(idle)s) )
+       AND NOT EXISTS (
+             SELECT 1 FROM customer_episodes ce
+             WHERE ce.tenant_id = cs.tenant_id
+               AND ce.channel_user_id = cs.channel_session_id
+               AND ce.conversation_id IS NOT DISTINCT FROM cm.conversation_id
+           )
+"""
+
+# Same predicate, restricted to segments with a message at or after %(since)s.
+# The aggregate still covers each touched segment's full history so the
+# user-message count and last-message time are exact.
+_CANDIDATES_SINCE_SQL = """
+    WITH touched AS (
+        SELECT DISTINCT session_id, conversation_id
+        FROM chat_messages
+        WHERE created_at >= %(since)s AND content IS NOT NULL
+    )
+    SELECT cs.session_id, cs.tenant_id, cs.channel, cs.channel_session_id,
+           cs.current_conversation_id, t.conversation_id AS seg
+    FROM touched t
+    JOIN chat_sessions cs ON cs.session_id = t.session_id
+    JOIN chat_messages cm ON cm.session_id = t.session_id
+                         AND cm.conversation_id IS NOT DISTINCT FROM t.conversation_id
+    WHERE cs.channel_session_id IS NOT NULL AND cm.content IS NOT NULL
+    GROUP BY cs.session_id, cs.tenant_id, cs.channel, cs.channel_session_id,
+             cs.current_conversation_id, t.conversation_id
+    HAVING count(*) FILTER (WHERE cm.role = 'user') >= %(min_user)s
+       AND ( t.conversation_id IS DISTINCT FROM cs.current_conversation_id
+             OR max(cm.created_at) < now() - make_interval(secs => %(idle)s) )
+       AND NOT EXISTS (
+             SELECT 1 FROM customer_episodes ce
+             WHERE ce.tenant_id = cs.tenant_id
+               AND ce.channel_user_id = cs.channel_session_id
+               AND ce.conversation_id IS NOT DISTINCT FROM t.conversation_id
+           )
+"""
 
 _PROMPT = (
     "Summarise this customer service conversation in 2-3 sentences. Focus on: "
@@ -38,29 +119,25 @@ _PROMPT = (
 )
 
 
-def _summarize_segment(conn, client, row) -> bool:
-    """Summarise one (session, conversation_id) segment. Rotate current_conversation_id
-    only if this segment is the CURRENT one. Returns True if an episode was written."""
-    from psycopg2.extras import RealDictCursor
-
-    seg = row["seg"]
-    with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute(
-            """
-            SELECT role, content FROM chat_messages
-            WHERE session_id = %s AND conversation_id IS NOT DISTINCT FROM %s AND content IS NOT NULL
-            ORDER BY created_at ASC
-            """,
-            (row["session_id"], seg),
-        )
-        msgs = cur.fetchall()
-    conn.commit()
-
+def _load_transcript(cur, row):
+    """Transcript text for one (session, conversation_id) segment, or None if it
+    has fewer than MIN_USER_MESSAGES user turns."""
+    cur.execute(
+        """
+        SELECT role, content FROM chat_messages
+        WHERE session_id = %s AND conversation_id IS NOT DISTINCT FROM %s AND content IS NOT NULL
+        ORDER BY created_at ASC
+        """,
+        (row["session_id"], row["seg"]),
+    )
+    msgs = cur.fetchall()
     if sum(1 for m in msgs if m["role"] == "user") < MIN_USER_MESSAGES:
-        return False
+        return None
+    return "\n".join(f"{m['role']}: {m['content']}" for m in msgs)
+
 
-    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in msgs)
-    summary = (
+def _summarize(client, transcript: str) -> str:
+    return (
         client.chat.completions.create(
             model=SUMMARY_MODEL,
             messages=[{"role": "user", "content": _PROMPT + transcript}],
@@ -70,30 +147,154 @@ def _summarize_segment(conn, client, row) -> bool:
         .choices[0]
         .message.content.strip()
     )
-    emb = client.embeddings.create(model=EMBEDDING_MODEL, input=[summary]).data[0].embedding
-    vec = "[" + ",".join(repr(float(x)) for x in emb) + "]"
-
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            INSERT INTO customer_episodes
-                (tenant_id, channel, channel_user_id, summary, embedding, conversation_id)
-            VALUES (%s, %s, %s, %s, %s::vector, %s)
-            """,
-            (row["tenant_id"], row["channel"], row["channel_session_id"], summary, vec, seg),
-        )
-        # Rotate only the CURRENT segment (so the visitor's next messages start fresh).
-        if seg == row["current_conversation_id"]:
-            cur.execute(
-                "UPDATE chat_sessions SET current_conversation_id = gen_random_uuid() WHERE session_id = %s",
-                (row["session_id"],),
+
+
+def _summarize_all(client, jobs):
+    """Run the chat completions for [(row, transcript), ...] with at most
+    SUMMARY_CONCURRENCY in flight. Returns ([(row, summary), ...], [failed row, ...])."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    done, failed = [], []
+    workers = max(1, min(SUMMARY_CONCURRENCY, len(jobs)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [(row, pool.submit(_summarize, client, transcript)) for row, transcript in jobs]
+        for row, fut in futures:
+            try:
+                done.append((row, fut.result()))
+            except Exception as e:
+                failed.append(row)
+                logger.warning("[summarize_chat_sessions] session %s seg %s failed: %s",
+                               row.get("session_id"), row.get("seg"), e)
+    return done, failed
+
+
+def _embed_all(client, texts):
+    """Embeddings for every summary, EMBEDDING_BATCH_SIZE inputs per request."""
+    out = []
+    for i in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+        batch = texts[i:i + EMBEDDING_BATCH_SIZE]
+        resp = client.embeddings.create(model=EMBEDDING_MODEL, input=batch)
+        out.extend(d.embedding for d in sorted(resp.data, key=lambda d: d.index))
+    return out
+
+
+def _write_episodes(conn, summarized, embeddings) -> None:
+    """Insert every episode and rotate every summarised CURRENT segment in one
+    transaction — either the whole run's output lands or none of it does."""
+    from psycopg2.extras import execute_values
+
+    rows = [
+        (row["tenant_id"], row["channel"], row["channel_session_id"], summary,
+         _vector_literal(emb), row["seg"])
+        for (row, summary), emb in zip(summarized, embeddings)
+    ]
+    # Rotate only the CURRENT segment (so the visitor's next messages start fresh).
+    rotate = [row["session_id"] for row, _ in summarized
+              if row["seg"] == row["current_conversation_id"]]
+    with conn:
+        with conn.cursor() as cur:
+            execute_values(
+                cur,
+                "INSERT INTO customer_episodes "
+                "(tenant_id, channel, channel_user_id, summary, embedding, conversation_id) VALUES %s",
+                rows, template="(%s,%s,%s,%s,%s::vector,%s)",
             )
-    conn.commit()
-    return True
+            for session_id in rotate:
+                cur.execute(
+                    "UPDATE chat_sessions SET current_conversation_id = gen_random_uuid() WHERE session_id = %s",
+                    (session_id,),
+                )
+
+
+def _redis():
+    url = os.getenv("REDIS_URL")
+    if not url:
+        return None
+    import redis
+    return redis.Redis.from_url(url, decode_responses=True)
+
+
+def _read_watermark():
+    """Run-start DB timestamp of the last clean run, or None. A missing/broken
+    watermark is not an error — the run just falls back to a full scan."""
+    try:
+        client = _redis()
+        if client is None:
+            return None
+        return client.get(WATERMARK_KEY) or None
+    except Exception as exc:
+        logger.warning("[summarize_chat_sessions] watermark read failed (%s) — full scan", exc)
+        return None
+
+
+def _write_watermark(value):
+    try:
+        client = _redis()
+        if client is None:
+            return
+        client.set(WATERMARK_KEY, value, ex=WATERMARK_TTL_SECONDS)
+    except Exception as exc:
+        logger.warning("[summarize_chat_sessions] watermark write failed (%s) — next run rescans", exc)
+
+
+def _segment_field(row):
+    return f"{row['session_id']}:{row['seg']}"
+
+
+def _record_failures(rows):
+    """Count one more failed run for each segment in `rows`. Returns how many
+    are still under MAX_SEGMENT_ATTEMPTS, i.e. worth holding the watermark
+    for. Without Redis every failure counts as retryable."""
+    if not rows:
+        return 0
+    try:
+        client = _redis()
+        if client is None:
+            return len(rows)
+        pipe = client.pipeline(transaction=False)
+        for row in rows:
+            pipe.hincrby(FAILURES_KEY, _segment_field(row), 1)
+        pipe.expire(FAILURES_KEY, WATERMARK_TTL_SECONDS)
+        attempts = pipe.execute()[:-1]
+    except Exception as exc:
+        logger.warning("[summarize_chat_sessions] failure count write failed (%s)", exc)
+        return len(rows)
+    retryable = 0
+    for row, n in zip(rows, attempts):
+        if n < MAX_SEGMENT_ATTEMPTS:
+            retryable += 1
+        else:
+            logger.error("[summarize_chat_sessions] session %s seg %s failed %d times — "
+                         "no longer holding the watermark for it", row["session_id"], row["seg"], n)
+    return retryable
+
+
+def _clear_failures(rows):
+    if not rows:
+        return
+    try:
+        client = _redis()
+        if client is not None:
+            client.hdel(FAILURES_KEY, *[_segment_field(row) for row in rows])
+    except Exception as exc:
+        logger.warning("[summarize_chat_sessions] failure count cleanup failed (%s)", exc)
+
+
+def find_candidates(cur, since=None):
+    """Closed, unsummarised segments. `since` (timestamptz or ISO string)
+    restricts the aggregate to segments touched at or after it; None scans all
+    of chat_messages."""
+    params = {"min_user": MIN_USER_MESSAGES, "idle": IDLE_TIMEOUT_SECONDS}
+    if since is None:
+        cur.execute(_CANDIDATES_FULL_SQL, params)
+    else:
+        params["since"] = since
+        cur.execute(_CANDIDATES_SINCE_SQL, params)
+    return cur.fetchall()
 
 
 @app.task(bind=True, name="tasks.summarize_chat_sessions.summarize_chat_sessions")
-def summarize_chat_sessions(self):
+def summarize_chat_sessions(self, full_scan=False):
     from openai import OpenAI
     from psycopg2.extras import RealDictCursor
 
@@ -102,45 +303,55 @@ def summarize_chat_sessions(self):
         raise RuntimeError("OPENAI_API_KEY not set")
     client = OpenAI(api_key=api_key)
 
+    watermark = None if full_scan else _read_watermark()
+
     conn = _get_conn()
     summarized = 0
+    failed_rows = []
     try:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(
-                """
-                SELECT cs.session_id, cs.tenant_id, cs.channel, cs.channel_session_id,
-                       cs.current_conversation_id, cm.conversation_id AS seg
-                FROM chat_messages cm
-                JOIN chat_sessions cs ON cs.session_id = cm.session_id
-                WHERE cs.channel_session_id IS NOT NULL AND cm.content IS NOT NULL
-                GROUP BY cs.session_id, cs.tenant_id, cs.channel, cs.channel_session_id,
-                         cs.current_conversation_id, cm.conversation_id
-                HAVING count(*) FILTER (WHERE cm.role = 'user') >= %s
-                   AND ( cm.conversation_id IS DISTINCT FROM cs.current_conversation_id
-                         OR max(cm.created_at) < now() - make_interval(secs => %s) )
-                   AND NOT EXISTS (
-                         SELECT 1 FROM customer_episodes ce
-                         WHERE ce.tenant_id = cs.tenant_id
-                           AND ce.channel_user_id = cs.channel_session_id
-                           AND ce.conversation_id IS NOT DISTINCT FROM cm.conversation_id
-                       )
-                """,
-                (MIN_USER_MESSAGES, IDLE_TIMEOUT_SECONDS),
-            )
-            rows = cur.fetchall()
+            cur.execute("SELECT now() AS run_start")
+            run_start = cur.fetchone()["run_start"]
+            since = None
+            if watermark:
+                cur.execute(
+                    "SELECT %s::timestamptz - make_interval(secs => %s) AS since",
+                    (watermark, IDLE_TIMEOUT_SECONDS + WATERMARK_GRACE_SECONDS),
+                )
+                since = cur.fetchone()["since"]
+            rows = find_candidates(cur, since)
         conn.commit()
 
-        for row in rows:
+        jobs = []
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            for row in rows:
+                transcript = _load_transcript(cur, row)
+                if transcript is not None:
+                    jobs.append((row, transcript))
+        conn.commit()
+
+        done, failed_rows = _summarize_all(client, jobs) if jobs else ([], [])
+        if done:
             try:
-                if _summarize_segment(conn, client, row):
-                    summarized += 1
+                embeddings = _embed_all(client, [summary for _, summary in done])
+                _write_episodes(conn, done, embeddings)
+                summarized = len(done)
+                _clear_failures([row for row, _ in done])
             except Exception as e:
-                conn.rollback()
-                logger.warning("[summarize_chat_sessions] session %s seg %s failed: %s",
-                               row.get("session_id"), row.get("seg"), e)
+                failed_rows += [row for row, _ in done]
+                logger.warning("[summarize_chat_sessions] writing %d episode(s) failed: %s",
+                               len(done), e)
+
+        # Hold the watermark back while a failed segment still has attempts
+        # left, so it stays inside the next run's window and is retried.
+        failed = len(failed_rows)
+        if not _record_failures(failed_rows):
+            _write_watermark(run_start.isoformat())
 
-        logger.info("[summarize_chat_sessions] summarised %d of %d candidate segment(s)",
-                    summarized, len(rows))
-        return {"summarized": summarized, "candidates": len(rows)}
+        logger.info("[summarize_chat_sessions] summarised %d of %d candidate segment(s) "
+                    "(%s, %d failed)", summarized, len(rows),
+                    f"since {since.isoformat()}" if since else "full scan", failed)
+        return {"summarized": summarized, "candidates": len(rows), "failed": failed,
+                "since": since.isoformat() if since else None}
     finally:
         conn.close()
@@ -0,0 +1,244 @@
+"""
+Which task module lives on which queue, and how a worker loads only its own.
+
+tasks/celery_app.py used to import every task module at startup, so every
+worker — and every prefork child — carried playwright, pandas, OpenAI, twilio,
+sendgrid and the publishing stack whether or not it would ever run them. This
+module replaces that import list with a table:
+
+* **Routing.** Every task is routed to the queue of the module that defines it.
+  A worker started without ``-Q`` consumes every queue declared here, so the
+  existing single worker keeps running everything.
+* **Per-queue loading.** A worker started with ``-Q sms,availability`` imports
+  only the modules on those queues (see ``load_task_modules``); scraping,
+  publishing and the rest are never imported in that process.
+* **Lazy stubs** (``CELERY_LAZY_TASK_MODULES=true``). Instead of importing a
+  module at startup, its task names are read from the source with ``ast`` and
+  registered as ``LazyTask`` stand-ins; the real module is imported the first
+  time one of its tasks executes. A child that only ever runs SMS tasks never
+  pays for the OpenAI/publishing imports. Off by default: under prefork, an
+  eager import in the parent is shared copy-on-write, while a lazy import is
+  paid again by every child that needs it — lazy wins only when most children
+  never touch the heavy modules.
+
+Nothing here imports a task module at import time.
+"""
+
+import ast
+import importlib
+import importlib.util
+import os
+import sys
+import threading
+
+from celery import Task
+from kombu import Queue
+
+DEFAULT_QUEUE = "celery"
+
+# module -> queue. Order is the old import order in celery_app.py.
+TASK_MODULES = {
+    "tasks.availability": "availability",
+    "tasks.sms": "sms",
+    "tasks.availability_gen_regen": "availability",
+    "tasks.analyze_knowledge": "knowledge",
+    "tasks.scrape_url": "scrape",
+    "tasks.scrape_business_profile": "scrape",
+    "tasks.sync_speako_data": "knowledge",
+    "tasks.publish_elevenlabs_agent": "agent",
+    "tasks.sync_elevenlabs_conversations": "reporting",
+    "tasks.generate_dashboard_metrics": "reporting",
+    "tasks.create_ai_agent": "agent",
+    "tasks.purchase_twilio_number": "telephony",
+    "tasks.update_twilio_friendly_name": "telephony",
+    "tasks.refresh_annual_minutes": "reporting",
+    "tasks.publish_native_agent": "agent",
+    "tasks.retry_audio_upload": "reporting",
+    "tasks.provision_sip_location": "telephony",
+    "tasks.rebuild_knowledge_chunks": "knowledge",
+    "tasks.embed_knowledge_param": "knowledge",
+    "tasks.summarize_chat_sessions": "knowledge",
+}
+
+# Decorator keywords that are not Task class attributes.
+_NON_ATTR_OPTIONS = {"name", "bind", "base", "shared", "filter", "lazy"}
+
+
+def all_queues() -> list[str]:
+    return [DEFAULT_QUEUE] + sorted(set(TASK_MODULES.values()))
+
+
+def queue_declarations() -> list:
+    """``task_queues`` for the app: one direct queue per name."""
+    return [Queue(q, routing_key=q) for q in all_queues()]
+
+
+def module_for_task(name: str) -> str | None:
+    """Module that defines a task, by name. Task names are either the default
+    ``<module>.<function>`` or an explicit ``name=`` equal to the module path
+    (``tasks.publish_native_agent``), so a prefix match covers both."""
+    best = None
+    for module in TASK_MODULES:
+        if name == module or name.startswith(module + "."):
+            if best is None or len(module) > len(best):
+                best = module
+    return best
+
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    """``task_routes`` router: send each task to its module's queue."""
+    module = module_for_task(name)
+    if module is None:
+        return None
+    return {"queue": TASK_MODULES[module]}
+
+
+def modules_for_queues(queues=None, exclude=None) -> list[str]:
+    """Task modules a worker consuming `queues` (None = all) must be able to run."""
+    selected = set(queues) if queues else set(all_queues())
+    selected -= set(exclude or ())
+    return [m for m, q in TASK_MODULES.items() if q in selected]
+
+
+# ── Static discovery ─────────────────────────────────────────────────────────
+
+def _is_task_decorator(node) -> bool:
+    target = node.func if isinstance(node, ast.Call) else node
+    if isinstance(target, ast.Attribute):
+        return target.attr in ("task", "shared_task")
+    return isinstance(target, ast.Name) and target.id == "shared_task"
+
+
+def discover_tasks(module: str) -> list[dict]:
+    """Tasks a module defines, read from its source without importing it.
+
+    Returns [{"name", "function", "options"}, ...]. Raises ValueError if a
+    decorator option is not a literal — such a module cannot be stubbed and is
+    imported eagerly instead.
+    """
+    spec = importlib.util.find_spec(module)
+    if spec is None or not spec.origin:
+        raise ValueError(f"{module}: source not found")
+    with open(spec.origin) as handle:
+        tree = ast.parse(handle.read(), filename=spec.origin)
+
+    found = []
+    for node in ast.walk(tree):
+        # `x_task = app.task(fn)` — registration by call rather than decorator.
+        if (isinstance(node, ast.Call) and _is_task_decorator(node)
+                and len(node.args) == 1 and isinstance(node.args[0], ast.Name)):
+            if node.keywords:
+                raise ValueError(f"{module}: call-style task registration with options")
+            fn = node.args[0].id
+            found.append({"name": f"{module}.{fn}", "function": fn, "options": {}})
+            continue
+        if not isinstance(node, ast.FunctionDef):
+            continue
+        for deco in node.decorator_list:
+            if not _is_task_decorator(deco):
+                continue
+            options = {}
+            if isinstance(deco, ast.Call):
+                for kw in deco.keywords:
+                    try:
+                        options[kw.arg] = ast.literal_eval(kw.value)
+                    except ValueError:
+                        raise ValueError(f"{module}.{node.name}: option {kw.arg!r} is not a literal")
+            found.append({
+                "name": options.pop("name", None) or f"{module}.{node.name}",
+                "function": node.name,
+                "options": {k: v for k, v in options.items() if k not in _NON_ATTR_OPTIONS},
+            })
+    return found
+
+
+# ── Lazy stubs ───────────────────────────────────────────────────────────────
+
+_resolve_lock = threading.RLock()
+
+
+class LazyTask(Task):
+    """Registered under a real task's name; imports the defining module on
+    first execution and runs the real function with this task as `self`, so
+    `self.request`, `self.retry()` and result state all behave as before."""
+
+    target_module = None
+    _target = None  # (function, bound)
+
+    def run(self, *args, **kwargs):
+        fn, bound = _resolve(self)
+        return fn(self, *args, **kwargs) if bound else fn(*args, **kwargs)
+
+
+def _resolve(stub):
+    if stub._target is not None:
+        return stub._target
+    with _resolve_lock:
+        if stub._target is not None:
+            return stub._target
+        app = stub.app
+        stubs = {name: t for name, t in list(app._tasks.items())
+                 if isinstance(t, LazyTask) and t.target_module == stub.target_module}
+        # Unregister the stand-ins so the module's own decorators create the
+        # real tasks (Celery returns an existing task instead of replacing it).
+        for name in stubs:
+            del app._tasks[name]
+        try:
+            loaded = sys.modules.get(stub.target_module)
+            if loaded is not None:
+                # Imported earlier as a dependency of another task while the
+                # stubs were still registered — its decorators returned the
+                # stubs, so run them again now that the names are free.
+                importlib.reload(loaded)
+            else:
+                importlib.import_module(stub.target_module)
+            for name, lazy in stubs.items():
+                real = app._tasks[name]
+                fn = type(real).__dict__["run"]
+                if isinstance(fn, staticmethod):
+                    lazy._target = (fn.__func__, False)
+                else:
+                    lazy._target = (fn, True)
+        finally:
+            # The consumer dispatches to the stub objects it saw at startup.
+            app._tasks.update(stubs)
+    return stub._target
+
+
+def register_lazy(app, module: str) -> list[str]:
+    """Register stand-ins for every task in `module`. Returns their names."""
+    names = []
+    for spec in discover_tasks(module):
+        attrs = dict(spec["options"])
+        attrs.update(name=spec["name"], target_module=module, __module__=module)
+        stub = type(spec["function"], (LazyTask,), attrs)
+        app.register_task(stub())
+        names.append(spec["name"])
+    return names
+
+
+def lazy_enabled() -> bool:
+    return os.getenv("CELERY_LAZY_TASK_MODULES", "false").lower() in ("1", "true", "yes")
+
+
+def load_task_modules(app, queues=None, exclude=None, lazy=None, logger=None) -> dict:
+    """Make the tasks of `queues` runnable in this process.
+
+    Eager: import each module. Lazy: register stubs, falling back to an eager
+    import for any module whose decorators can't be read statically.
+    Returns {"imported": [...], "stubbed": [...]}.
+    """
+    lazy = lazy_enabled() if lazy is None else lazy
+    imported, stubbed = [], []
+    for module in modules_for_queues(queues, exclude):
+        if lazy:
+            try:
+                register_lazy(app, module)
+                stubbed.append(module)
+                continue
+            except Exception as exc:
+                if logger:
+                    logger.warning("[task_registry] %s cannot be stubbed (%s) — importing", module, exc)
+        importlib.import_module(module)
+        imported.append(module)
+    return {"imported": imported, "stubbed": stubbed}
@@ -0,0 +1,145 @@
+"""
+Day-granular availability store behind the 3-day chunk cache.
+
+Consumers read ``availability:tenant_<t>:location_<l>:start_date_<D>`` chunks
+of three days anchored on the location's today, so every midnight the anchors
+shift and all 20 chunks of the 60-day window change — but only their framing:
+59 of the 60 days are the same days as yesterday. tasks/availability_gen_regen.py
+therefore also writes each computed day here, one key per date, and the
+midnight run re-slices stored days into the new chunks, querying the database
+only for days the store does not have (normally just the newly exposed day 60).
+
+* **Key.** ``availability_day:tenant_<t>:location_<l>:<kind>:date_<D>`` where
+  kind is ``staff`` or ``venue`` (the two generators emit different shapes).
+  The value holds the day's JSON exactly as it sits in a chunk, so a re-sliced
+  chunk is byte-identical to a freshly computed one, plus the database time
+  it was computed at.
+* **Freshness.** Only the midnight roll reads the store. Every other run (API
+  full generation, regen with ``affected_date``) computes its range and
+  rewrites those days, so the store tracks edits the same way the chunks do.
+  But a regen only rewrites the chunks around its ``affected_date`` while
+  marking every change-log row published, so an edit can reach days it did
+  not rewrite: the roll therefore ignores the store whenever the location has
+  an ``availability_change_log`` row that is unpublished, or was created or
+  published after the oldest stored day was computed. As a safety net for
+  changes that never reach the log, entries expire after
+  ``AVAILABILITY_DAY_TTL_SECONDS`` (default 7 days).
+  Bookings need no regen to be picked up: ``dates_with_booking_changes``
+  finds the dates with a booking touched since the stored days were computed,
+  and those are recomputed.
+
+Best-effort: a Redis error reads as "nothing stored" and the generator
+computes the day from the database as before.
+"""
+
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "availability_day"
+DAY_TTL_SECONDS = int(os.getenv("AVAILABILITY_DAY_TTL_SECONDS", str(7 * 24 * 3600)))
+
+
+def day_key(tenant_id, location_id, kind, date_str):
+    return f"{KEY_PREFIX}:tenant_{tenant_id}:location_{location_id}:{kind}:date_{date_str}"
+
+
+def read_days(client, tenant_id, location_id, kind, dates):
+    """{date_str: (computed_at, day dict)} for every date in `dates` that is stored."""
+    if not dates or DAY_TTL_SECONDS <= 0:
+        return {}
+    try:
+        raw = client.mget([day_key(tenant_id, location_id, kind, d) for d in dates])
+    except Exception as exc:
+        logger.warning("[availability_day_store] read failed (%s) — computing every day", exc)
+        return {}
+    days = {}
+    for date_str, value in zip(dates, raw):
+        if not value:
+            continue
+        try:
+            entry = json.loads(value)
+            days[date_str] = (entry["computed_at"], entry["day"])
+        except (ValueError, KeyError, TypeError):
+            continue
+    return days
+
+
+def write_days(client, tenant_id, location_id, kind, days, computed_at):
+    """Store computed days ({date_str: day dict}) as of `computed_at` (an ISO
+    database timestamp taken before they were queried). Returns how many were
+    written."""
+    if not days or DAY_TTL_SECONDS <= 0:
+        return 0
+    try:
+        pipe = client.pipeline(transaction=False)
+        for date_str, day in days.items():
+            pipe.set(day_key(tenant_id, location_id, kind, date_str),
+                     json.dumps({"computed_at": computed_at, "day": day}),
+                     ex=DAY_TTL_SECONDS)
+        pipe.execute()
+        return len(days)
+    except Exception as exc:
+        logger.warning("[availability_day_store] write failed (%s) — next run recomputes", exc)
+        return 0
+
+
+def database_now(cur):
+    """ISO timestamp of the database clock, to stamp days computed from here on."""
+    cur.execute("SELECT CURRENT_TIMESTAMP")
+    return cur.fetchone()[0].isoformat()
+
+
+def has_changes_since(cur, tenant_id, location_id, since):
+    """True when availability_change_log has a row that is unpublished, or was
+    logged or published after `since` (ISO timestamp), i.e. days computed at
+    `since` may predate an edit. Publishing alone proves nothing: a regen
+    publishes every row but only rewrites the days around its affected_date."""
+    cur.execute("""
+        SELECT EXISTS (
+            SELECT 1 FROM availability_change_log
+            WHERE tenant_id = %s AND location_id = %s
+            AND (is_published = FALSE
+                 OR created_at > %s::timestamptz
+                 OR published_at > %s::timestamptz)
+        )
+    """, (tenant_id, location_id, since, since))
+    return bool(cur.fetchone()[0])
+
+
+def dates_with_booking_changes(cur, tenant_id, location_id, first_date, last_date, since):
+    """Dates in [first_date, last_date] holding a booking created, moved or
+    cancelled after `since` (ISO timestamp)."""
+    cur.execute("""
+        SELECT DISTINCT start_time::date
+        FROM bookings
+        WHERE tenant_id = %s AND location_id = %s
+        AND start_time >= %s AND start_time < %s::date + INTERVAL '1 day'
+        AND updated_at > %s::timestamptz
+    """, (tenant_id, location_id, first_date, last_date, since))
+    return {row[0].strftime("%Y-%m-%d") for row in cur.fetchall()}
+
+
+def reusable_days(cur, client, kind, tenant_id, location_id, dates):
+    """Days of a midnight roll that can be re-sliced instead of recomputed:
+    {date_str: day}. Empty when the location has availability changes
+    unpublished or logged/published since the oldest stored day was computed;
+    dates with a booking touched since they were stored are left out. Any
+    failure means "recompute everything"."""
+    try:
+        stored = read_days(client, tenant_id, location_id, kind, dates)
+        if not stored:
+            return {}
+        since = min(computed_at for computed_at, _ in stored.values())
+        if has_changes_since(cur, tenant_id, location_id, since):
+            logger.info("[availability_day_store] availability changes since %s for %s/%s — recomputing every day",
+                        since, tenant_id, location_id)
+            return {}
+        changed = dates_with_booking_changes(cur, tenant_id, location_id, dates[0], dates[-1], since)
+    except Exception as exc:
+        logger.warning("[availability_day_store] reuse check failed (%s) — recomputing every day", exc)
+        cur.connection.rollback()
+        return {}
+    return {d: day for d, (_, day) in stored.items() if d not in changed}
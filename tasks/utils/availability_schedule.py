@@ -0,0 +1,222 @@
+# tasks/utils/availability_schedule.py
+"""
+Range loaders and per-date overlay for the availability generators.
+
+gen_availability / gen_availability_venue used to run six to seven queries per
+date — one-time rows, recurring rows, bookings, holiday check, open hours —
+so a 60-day run re-read and rebuilt the same recurring schedule for each of
+the ~9 dates that share a weekday. Here each input is read once for the whole
+date range and grouped: recurring rows by weekday (the compiled base schedule),
+one-time rows, pins, closures, open hours and bookings by date (the
+exceptions). The per-date builders then overlay a date's exceptions on its
+weekday's base with exactly the precedence the per-date SQL had:
+
+* staff: a one-time row at this location replaces the recurring schedule; a
+  staff member with an active one-time row at ANY location on the date is
+  pinned there and dropped from this location's recurring schedule.
+* venue units: a one-time row (closed or not) replaces that unit's recurring
+  schedule for the date.
+* a recurring row whose specific_date equals the date is skipped.
+* a one-time closure of the location makes the date a holiday; otherwise the
+  open hours are the weekday's recurring hours plus the date's one-time hours,
+  by start time.
+
+Weekdays use the DB convention (0 = Sunday), i.e. ``(date.weekday() + 1) % 7``.
+"""
+
+from collections import defaultdict
+
+
+def _iso(d):
+    return d.isoformat() if d is not None else None
+
+
+# ── Location hours ───────────────────────────────────────────────────────────
+
+def load_location_hours(cur, tenant_id, location_id, first_date, last_date):
+    cur.execute("""
+        SELECT type, day_of_week, specific_date, start_time, end_time, is_closed
+        FROM location_availability
+        WHERE tenant_id = %s AND location_id = %s AND is_active = true
+        AND (type = 'recurring' OR (type = 'one_time' AND specific_date BETWEEN %s AND %s))
+        ORDER BY start_time
+    """, (tenant_id, location_id, first_date, last_date))
+    hours = {"closed": set(), "recurring": defaultdict(list), "one_time": defaultdict(list)}
+    for kind, day_of_week, specific_date, start, end, is_closed in cur.fetchall():
+        if kind == "one_time" and is_closed:
+            hours["closed"].add(_iso(specific_date))
+        elif is_closed:
+            continue
+        elif kind == "recurring":
+            hours["recurring"][day_of_week].append((start, end))
+        else:
+            hours["one_time"][_iso(specific_date)].append((start, end))
+    return hours
+
+
+def open_hours(hours, date_str, db_day):
+    """The date's open hours as [{'start','end'}] ('HH:MM'), or None when a
+    one-time closure makes it a holiday."""
+    if date_str in hours["closed"]:
+        return None
+    rows = sorted(hours["recurring"].get(db_day, []) + hours["one_time"].get(date_str, []),
+                  key=lambda row: row[0])
+    return [{"start": s.strftime("%H:%M"), "end": e.strftime("%H:%M")} for s, e in rows]
+
+
+# ── Bookings ─────────────────────────────────────────────────────────────────
+
+_BOOKING_UNIT_COLUMNS = ("staff_id", "venue_unit_id")
+
+
+def load_bookings(cur, tenant_id, location_id, first_date, last_date, unit_column):
+    """{date_str: [booking]} in the shape reconstruct_*_availability expects."""
+    if unit_column not in _BOOKING_UNIT_COLUMNS:
+        raise ValueError(f"unknown booking unit column {unit_column!r}")
+    cur.execute(f"""
+        SELECT {unit_column}, customer_id, start_time, end_time
+        FROM bookings
+        WHERE tenant_id = %s AND location_id = %s
+        AND start_time >= %s AND start_time < %s::date + INTERVAL '1 day'
+        AND status IN ('confirmed', 'pending_guarantee')
+    """, (tenant_id, location_id, first_date, last_date))
+    by_date = defaultdict(list)
+    for unit_id, customer_id, start, end in cur.fetchall():
+        by_date[start.strftime("%Y-%m-%d")].append({
+            unit_column: unit_id,
+            "customer_id": customer_id,
+            "start_time": start.strftime("%Y-%m-%d %H:%M:%S"),
+            "end_time": end.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+    return by_date
+
+
+# ── Staff ────────────────────────────────────────────────────────────────────
+
+def load_staff_schedule(cur, tenant_id, location_id, first_date, last_date):
+    cur.execute("""
+        SELECT s.staff_id, s.name, sa.start_time, sa.end_time, sa.day_of_week, sa.specific_date
+        FROM staff s
+        JOIN staff_availability sa ON s.tenant_id = sa.tenant_id AND s.staff_id = sa.staff_id
+        WHERE s.tenant_id = %s AND sa.location_id = %s AND sa.type = 'recurring'
+        AND sa.is_active = TRUE AND s.is_active = TRUE
+    """, (tenant_id, location_id))
+    recurring = defaultdict(list)
+    for sid, name, start, end, day_of_week, specific_date in cur.fetchall():
+        recurring[day_of_week].append((sid, name, start, end, _iso(specific_date)))
+
+    cur.execute("""
+        SELECT s.staff_id, s.name, sa.start_time, sa.end_time, sa.is_closed, sa.specific_date
+        FROM staff s
+        JOIN staff_availability sa ON s.tenant_id = sa.tenant_id AND s.staff_id = sa.staff_id
+        WHERE s.tenant_id = %s AND sa.location_id = %s AND sa.type = 'one_time'
+        AND sa.specific_date BETWEEN %s AND %s AND sa.is_active = TRUE AND s.is_active = TRUE
+    """, (tenant_id, location_id, first_date, last_date))
+    one_time = defaultdict(list)
+    for sid, name, start, end, is_closed, specific_date in cur.fetchall():
+        one_time[_iso(specific_date)].append((sid, name, start, end, is_closed))
+
+    # Pins are tenant-wide: a one-time row at any location takes the staff
+    # member off every other location's recurring schedule for that date.
+    cur.execute("""
+        SELECT DISTINCT staff_id, specific_date
+        FROM staff_availability
+        WHERE tenant_id = %s AND type = 'one_time'
+        AND specific_date BETWEEN %s AND %s AND is_active = TRUE
+    """, (tenant_id, first_date, last_date))
+    pinned = {(sid, _iso(specific_date)) for sid, specific_date in cur.fetchall()}
+    return {"recurring": recurring, "one_time": one_time, "pinned": pinned}
+
+
+def staff_day(schedule, date_str, db_day, staff_service_ids):
+    """staff_dict for one date. `staff_service_ids(sid)` gives the staff
+    member's services offered at this location."""
+    staff_dict = {}
+
+    def entry(sid, name):
+        return staff_dict.setdefault(sid, {
+            "id": sid,
+            "name": name,
+            "service": list(staff_service_ids(sid)),
+            "slots": []
+        })
+
+    for sid, name, start, end, is_closed in schedule["one_time"].get(date_str, ()):
+        if not is_closed:  # closed for the day: no entry at all
+            entry(sid, name)["slots"].append({"start": str(start), "end": str(end)})
+    pinned = schedule["pinned"]
+    for sid, name, start, end, specific_date in schedule["recurring"].get(db_day, ()):
+        if specific_date == date_str or (sid, date_str) in pinned:
+            continue
+        entry(sid, name)["slots"].append({"start": str(start), "end": str(end)})
+    return staff_dict
+
+
+# ── Venue units ──────────────────────────────────────────────────────────────
+
+def load_venue_schedule(cur, tenant_id, location_id, first_date, last_date):
+    # Walk-in units are excluded from the cache — they're not bookable via
+    # voice-AI or the public page.
+    cur.execute("""
+        SELECT vu.venue_unit_id, vu.name, vu.venue_unit_type, vu.capacity, vu.min_capacity, va.service_duration, va.start_time, va.end_time, vu.zone_tag_ids, va.day_of_week, va.specific_date
+        FROM venue_unit vu
+        JOIN venue_availability va ON vu.tenant_id = va.tenant_id AND vu.venue_unit_id = va.venue_unit_id
+        WHERE vu.tenant_id = %s AND va.location_id = %s AND va.type = 'recurring'
+        AND va.is_active = TRUE AND vu.is_active = TRUE
+        AND vu.is_walk_in = FALSE
+    """, (tenant_id, location_id))
+    recurring = defaultdict(list)
+    for row in cur.fetchall():
+        recurring[row[9]].append(row[:9] + (_iso(row[10]),))
+
+    cur.execute("""
+        SELECT vu.venue_unit_id, vu.name, vu.venue_unit_type, vu.capacity, vu.min_capacity, va.service_duration, va.start_time, va.end_time, vu.zone_tag_ids, va.is_closed, va.specific_date
+        FROM venue_unit vu
+        JOIN venue_availability va ON vu.tenant_id = va.tenant_id AND vu.venue_unit_id = va.venue_unit_id
+        WHERE vu.tenant_id = %s AND va.location_id = %s AND va.type = 'one_time'
+        AND va.specific_date BETWEEN %s AND %s AND va.is_active = TRUE AND vu.is_active = TRUE
+        AND vu.is_walk_in = FALSE
+    """, (tenant_id, location_id, first_date, last_date))
+    one_time = defaultdict(list)
+    for row in cur.fetchall():
+        one_time[_iso(row[10])].append(row[:10])
+    return {"recurring": recurring, "one_time": one_time}
+
+
+def venue_day(schedule, date_str, db_day, unit_details):
+    """(venue_dict, is_dining_table) for one date. `unit_details(vuid,
+    zone_tag_ids)` gives the unit's (services at this location, zone tag
+    names) — the parts that do not change from day to day."""
+    venue_dict = {}
+    is_dining_table = False
+
+    def add(vuid, name, capacity, min_capacity, zone_tag_ids, start, end, service_duration):
+        if vuid not in venue_dict:
+            services, zone_tags = unit_details(vuid, zone_tag_ids)
+            venue_dict[vuid] = {
+                "id": vuid,
+                "name": name,
+                "capacity": capacity,
+                "min_capacity": min_capacity,
+                "service": list(services),
+                "zone_tags": zone_tags,
+                "zone_tag_ids": zone_tag_ids or [],
+                "slots": []
+            }
+        venue_dict[vuid]["slots"].append({"start": str(start), "end": str(end), "service_duration": str(service_duration)})
+
+    one_time = schedule["one_time"].get(date_str, ())
+    for vuid, name, unit_type, capacity, min_capacity, service_duration, start, end, zone_tag_ids, is_closed in one_time:
+        if unit_type == "dining_table":
+            is_dining_table = True
+        if not is_closed:  # closed for the day: no entry at all
+            add(vuid, name, capacity, min_capacity, zone_tag_ids, start, end, service_duration)
+
+    overridden = {row[0] for row in one_time}
+    for vuid, name, unit_type, capacity, min_capacity, service_duration, start, end, zone_tag_ids, specific_date in schedule["recurring"].get(db_day, ()):
+        if vuid in overridden or specific_date == date_str:
+            continue
+        if unit_type == "dining_table":
+            is_dining_table = True
+        add(vuid, name, capacity, min_capacity, zone_tag_ids, start, end, service_duration)
+    return venue_dict, is_dining_table
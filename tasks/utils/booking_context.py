@@ -0,0 +1,213 @@
+"""
+Everything a booking notification needs, loaded once per booking event.
+
+A single booking event fans out into several tasks in tasks/sms.py (customer
+SMS, merchant SMS, merchant email, customer email), and each used to run its
+own variant of the bookings⋈locations⋈staff⋈services⋈booking_page join plus
+separate lookups for the access token, zone names, customer email and meeting
+link. ``load_booking_context`` replaces all of them with one row:
+
+* **Fresh columns** (status, updated_at, source, the latest 'view' access
+  token, the live meeting link) are always read from the database — they are
+  what the tasks branch on and they can change between two tasks of the same
+  event.
+* **Everything else** (names, times, location details, zones, customer email)
+  is cached in Redis under ``(booking_id, status, updated_at)`` for
+  ``BOOKING_CONTEXT_TTL_SECONDS``. Any write that bumps the booking's version
+  misses the cache; the TTL bounds staleness of joined rows (a renamed staff
+  member, say) that don't bump it.
+
+With Redis unavailable it degrades to one joined query per task. Nothing here
+imports celery.
+"""
+
+import json
+import logging
+import os
+from datetime import date, datetime
+from decimal import Decimal
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "booking_ctx"
+# 0 disables the cache (every task runs the joined query).
+CONTEXT_TTL_SECONDS = int(os.getenv("BOOKING_CONTEXT_TTL_SECONDS", "300"))
+
+_FRESH_COLUMNS = """
+        b.booking_id,
+        b.tenant_id,
+        b.status,
+        b.updated_at,
+        b.source,
+        (SELECT t.token_id::text
+           FROM booking_access_tokens t
+          WHERE t.tenant_id = b.tenant_id AND t.booking_id = b.booking_id AND t.purpose = 'view'
+          ORDER BY t.created_at DESC
+          LIMIT 1) AS access_token,
+        (SELECT a.join_url
+           FROM booking_external_artifact a
+          WHERE a.tenant_id = b.tenant_id AND a.booking_id = b.booking_id
+            AND a.state IN ('pending', 'active') AND a.join_url IS NOT NULL
+          ORDER BY a.artifact_id DESC
+          LIMIT 1) AS meeting_link,
+        (SELECT a.join_url
+           FROM booking_external_artifact a
+          WHERE a.tenant_id = b.tenant_id AND a.booking_ref = b.booking_ref
+            AND a.state IN ('pending', 'active') AND a.join_url IS NOT NULL
+          ORDER BY a.artifact_id DESC
+          LIMIT 1) AS meeting_link_by_ref
+"""
+
+_FRESH_SQL = f"""
+    SELECT {_FRESH_COLUMNS}
+    FROM bookings b
+    WHERE b.booking_id = %(booking_id)s
+"""
+
+_CONTEXT_SQL = f"""
+    SELECT {_FRESH_COLUMNS},
+        b.location_id,
+        b.customer_name,
+        b.customer_email,
+        b.customer_id,
+        b.customer_phone,
+        b.start_time,
+        b.end_time,
+        b.duration,
+        b.booking_ref,
+        b.party_num,
+        b.staff_id,
+        b.service_id,
+        b.venue_unit_id,
+        b.guarantee_amount,
+        l.name AS location_name,
+        l.location_type,
+        l.flexible_booking_enabled,
+        l.booking_email_recipients,
+        s.name AS staff_name,
+        sv.name AS service_name,
+        sv.is_flexible_duration,
+        vu.name AS venue_unit_name,
+        vu.zone_tag_ids,
+        ARRAY(SELECT lt.name
+                FROM location_tag lt
+               WHERE lt.tenant_id = b.tenant_id AND lt.tag_id = ANY(vu.zone_tag_ids)
+               ORDER BY lt.name) AS zone_names,
+        c.email AS customer_table_email,
+        bp.alias AS booking_page_alias,
+        bp.logo_url,
+        bp.banner_url,
+        li.address AS location_address,
+        li.phone_with_country_code AS location_phone,
+        li.website_url AS location_website
+    FROM bookings b
+    JOIN locations l
+      ON b.tenant_id = l.tenant_id AND b.location_id = l.location_id
+    LEFT JOIN staff s
+      ON b.tenant_id = s.tenant_id AND b.staff_id = s.staff_id
+    LEFT JOIN services sv
+      ON b.tenant_id = sv.tenant_id AND b.service_id = sv.service_id
+    LEFT JOIN venue_unit vu
+      ON b.tenant_id = vu.tenant_id AND b.venue_unit_id = vu.venue_unit_id
+    LEFT JOIN booking_page bp
+      ON b.tenant_id = bp.tenant_id AND b.location_id = bp.location_id AND bp.is_active = true
+    LEFT JOIN location_info li
+      ON b.tenant_id = li.tenant_id AND b.location_id = li.location_id
+    LEFT JOIN customers c
+      ON b.tenant_id = c.tenant_id AND b.customer_id = c.customer_id
+     AND c.email IS NOT NULL AND c.email != ''
+    WHERE b.booking_id = %(booking_id)s
+"""
+
+
+def _fetch(cur, sql: str, booking_id: int) -> dict | None:
+    cur.execute(sql, {"booking_id": booking_id})
+    row = cur.fetchone()
+    if row is None:
+        return None
+    if isinstance(row, dict):
+        return dict(row)
+    return {col[0]: value for col, value in zip(cur.description, row)}
+
+
+# ── Redis ────────────────────────────────────────────────────────────────────
+
+def _client():
+    url = os.getenv("REDIS_URL")
+    if not url or CONTEXT_TTL_SECONDS <= 0:
+        return None
+    import redis
+    return redis.Redis.from_url(url, decode_responses=True)
+
+
+def _encode(value):
+    """json.dumps default hook. Types without a round-trip here raise, so a new
+    column can't come back as a string only when served from the cache."""
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"__decimal__": str(value)}
+    raise TypeError(f"{type(value).__name__} is not cacheable")
+
+
+def _decode(obj: dict):
+    if "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    if "__date__" in obj:
+        return date.fromisoformat(obj["__date__"])
+    if "__decimal__" in obj:
+        return Decimal(obj["__decimal__"])
+    return obj
+
+
+def context_key(booking_id: int, fresh: dict) -> str:
+    updated_at = fresh.get("updated_at")
+    version = updated_at.isoformat() if updated_at else "-"
+    return f"{KEY_PREFIX}:{booking_id}:{fresh.get('status')}:{version}"
+
+
+# ── Public ───────────────────────────────────────────────────────────────────
+
+def load_booking_context(cur, booking_id: int) -> dict | None:
+    """The booking, its location/staff/service/venue unit/booking page/location
+    info, zone names, customer-table email, latest 'view' token and meeting
+    link, as one dict keyed by column name. None if the booking doesn't exist.
+
+    `cur` may be a plain or a RealDictCursor.
+    """
+    try:
+        client = _client()
+    except Exception as exc:
+        logger.warning("[booking_context] redis unavailable (%s) — loading from db", exc)
+        client = None
+    if client is None:
+        return _fetch(cur, _CONTEXT_SQL, booking_id)
+
+    fresh = _fetch(cur, _FRESH_SQL, booking_id)
+    if fresh is None:
+        return None
+    key = context_key(booking_id, fresh)
+
+    try:
+        raw = client.get(key)
+        cached = json.loads(raw, object_hook=_decode) if raw else None
+    except Exception as exc:
+        logger.warning("[booking_context] read %s failed (%s) — treating as a miss", key, exc)
+        cached = None
+
+    if cached is None:
+        ctx = _fetch(cur, _CONTEXT_SQL, booking_id)
+        if ctx is None:
+            return None
+        try:
+            client.set(key, json.dumps(ctx, default=_encode), ex=CONTEXT_TTL_SECONDS)
+        except TypeError as exc:
+            logger.warning("[booking_context] not caching %s (%s)", key, exc)
+        except Exception as exc:
+            logger.warning("[booking_context] write %s failed (%s)", key, exc)
+        return ctx
+
+    cached.update(fresh)
+    return cached
@@ -33,6 +33,7 @@ guessed at.
 """
 
 import io
+import os
 
 import numpy as np
 
@@ -53,16 +54,26 @@ RELATIVE_FLOOR = 0.05
 MIN_UTTERANCE_S = 0.25
 HANGOVER_FRAMES = 8         # 160ms — bridges breath gaps inside one utterance
 
+# Recordings at least this long are analysed block by block (see _Stream)
+# instead of being decoded whole: 10 minutes of 22.05kHz stereo is ~50MB of
+# int16 before the float64 and index copies.
+STREAM_MIN_SECONDS = float(os.getenv("CALL_AUDIO_STREAM_MIN_SECONDS", "120"))
+STREAM_BLOCK_SAMPLES = 65536    # ~3s at 22.05kHz
+
 
 class MonoRecording(Exception):
     """Single-channel audio: caller and agent cannot be told apart."""
 
 
+def _source(data):
+    return io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
+
+
 def load(data):
     """bytes | path -> (caller, agent, sample_rate) as int16 arrays."""
     import soundfile as sf
 
-    src = io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
+    src = _source(data)
     samples, sr = sf.read(src, dtype="int16", always_2d=True)
     if samples.shape[1] < 2:
         raise MonoRecording("recording has a single channel")
@@ -89,7 +100,8 @@ def frame_energy(mono_int16, sr):
     if n == 0:
         return np.zeros(0), x, fl, 0
     frames = x[: n * fl].astype(np.float64).reshape(-1, fl)
-    return np.sqrt((frames ** 2).mean(axis=1)), x, fl, n
+    # Row-wise sum of squares without a squared copy; exact, as in segment_rms.
+    return np.sqrt(np.einsum("ij,ij->i", frames, frames) / fl), x, fl, n
 
 
 def energy_floor(energy):
@@ -103,6 +115,32 @@ def energy_floor(energy):
     return max(ABSOLUTE_FLOOR, float(np.median(loud)) * RELATIVE_FLOOR)
 
 
+def hangover(raw, frames=HANGOVER_FRAMES):
+    """Extend every speech frame over the `frames` that follow it: frame i is
+    on if any of raw[i-frames..i] is. One convolution instead of a frame loop."""
+    raw = np.asarray(raw, dtype=bool)
+    if raw.size == 0:
+        return raw.copy()
+    kernel = np.ones(frames + 1, dtype=np.int32)
+    return np.convolve(raw.astype(np.int32), kernel)[: raw.size] > 0
+
+
+def _vad_frames(vad, x, fl, n):
+    """webrtcvad verdict for each of the first `n` frames of `x`."""
+    # One zero-copy byte view of the frames; slicing it copies nothing.
+    buf = memoryview(np.ascontiguousarray(x[: n * fl])).cast("B")
+    step = fl * 2
+    return np.array(
+        [vad.is_speech(buf[i:i + step], VAD_RATE) for i in range(0, n * step, step)],
+        dtype=bool,
+    )
+
+
+def _gate(raw, energy):
+    raw &= energy > energy_floor(energy)
+    return hangover(raw)
+
+
 def speech_mask(mono_int16, sr):
     """Bool array over 20ms frames: VAD **and** energy must both agree."""
     import webrtcvad
@@ -110,45 +148,29 @@ def speech_mask(mono_int16, sr):
     energy, x, fl, n = frame_energy(mono_int16, sr)
     if n == 0:
         return np.zeros(0, dtype=bool)
-
-    vad = webrtcvad.Vad(AGGRESSIVENESS)
-    buf = x[: n * fl].tobytes()
-    raw = np.fromiter(
-        (vad.is_speech(buf[i * fl * 2:(i + 1) * fl * 2], VAD_RATE) for i in range(n)),
-        dtype=bool, count=n,
-    )
-    raw &= energy > energy_floor(energy)
-
-    out = raw.copy()
-    run = 0
-    for i, v in enumerate(raw):
-        if v:
-            run = HANGOVER_FRAMES
-        elif run:
-            out[i] = True
-            run -= 1
-    return out
+    return _gate(_vad_frames(webrtcvad.Vad(AGGRESSIVENESS), x, fl, n), energy)
 
 
 def segments(mask, min_s=MIN_UTTERANCE_S):
     """Frame mask -> [(start_s, end_s)] of contiguous speech."""
-    out, on, start = [], False, 0
-    for i, v in enumerate(mask):
-        if v and not on:
-            on, start = True, i
-        elif not v and on:
-            on = False
-            if (i - start) * FRAME_S >= min_s:
-                out.append((round(start * FRAME_S, 2), round(i * FRAME_S, 2)))
-    if on and (len(mask) - start) * FRAME_S >= min_s:
-        out.append((round(start * FRAME_S, 2), round(len(mask) * FRAME_S, 2)))
-    return out
+    mask = np.asarray(mask, dtype=bool)
+    if mask.size == 0:
+        return []
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    keep = (ends - starts) * FRAME_S >= min_s
+    return [(round(a * FRAME_S, 2), round(b * FRAME_S, 2))
+            for a, b in zip(starts[keep].tolist(), ends[keep].tolist())]
 
 
 def segment_rms(mono_int16, sr, start_s, end_s):
+    """RMS of one span. Sum of squares as a dot product: every partial sum is
+    an integer below 2**53, so it is exact and equals the old mean of squares,
+    without materialising the squared array."""
     a, b = int(start_s * sr), int(end_s * sr)
     seg = mono_int16[a:b].astype(np.float64)
-    return round(float(np.sqrt((seg ** 2).mean())), 1) if seg.size else 0.0
+    return round(float(np.sqrt(seg @ seg / seg.size)), 1) if seg.size else 0.0
 
 
 def estimate_offset(agent_segments, first_agent_log_s):
@@ -195,8 +217,138 @@ def caller_spoke_near(caller_segments, target_log_s, offset, window_s=3.0):
                      "duration_s": round(end - start, 2)}
 
 
-def analyze_caller(audio_bytes):
-    """Everything the verifier needs from one recording, in one pass."""
+# ── Streaming ────────────────────────────────────────────────────────────────
+# Same masks, segments and levels as the in-memory path, holding one block of
+# input plus a per-frame energy/VAD array (~50k entries per channel for a
+# 10-minute call) instead of whole-call arrays. Every step is elementwise or
+# per-frame, so processing it in order block by block gives identical results.
+
+class _Channel:
+    """One channel's decimated stream -> per-frame energy and raw VAD."""
+
+    def __init__(self, n_frames, fl):
+        import webrtcvad
+
+        self.vad = webrtcvad.Vad(AGGRESSIVENESS)
+        self.fl = fl
+        self.left = n_frames
+        self.carry = np.zeros(0, dtype=np.int16)
+        self.energy = []
+        self.raw = []
+
+    def push(self, x):
+        if self.left <= 0:
+            return
+        x = np.concatenate((self.carry, x)) if self.carry.size else x
+        n = min(len(x) // self.fl, self.left)
+        if n:
+            frames = x[: n * self.fl].astype(np.float64).reshape(-1, self.fl)
+            self.energy.append(np.sqrt(np.einsum("ij,ij->i", frames, frames) / self.fl))
+            self.raw.append(_vad_frames(self.vad, x, self.fl, n))
+            self.left -= n
+        self.carry = x[n * self.fl:].copy()
+
+    def mask(self):
+        if not self.raw:
+            return np.zeros(0, dtype=bool)
+        return _gate(np.concatenate(self.raw), np.concatenate(self.energy))
+
+
+class _Stream:
+    """Nearest-neighbour decimation of a stream of blocks, picking exactly the
+    samples _resample would pick from the whole signal."""
+
+    def __init__(self, total, sr):
+        self.total, self.sr = total, sr
+        self.n = total if sr == VAD_RATE else int(round(total * VAD_RATE / sr))
+        self.next_k = 0
+
+    def take(self, block, start):
+        """Output rows whose source index falls in [start, start+len(block)).
+        Takes the whole multi-channel block so every channel gets the same rows."""
+        if self.sr == VAD_RATE:
+            return block
+        if self.n <= 1:
+            return block[:0]
+        end = start + len(block)
+        ratio = (self.total - 1) / (self.n - 1)
+        k_end = min(self.n, int(end / ratio) + 2)
+        idx = (np.arange(self.next_k, k_end) * (self.total - 1) / (self.n - 1)).astype(np.int64)
+        idx = idx[idx < end]
+        self.next_k += len(idx)
+        return block[idx - start]
+
+
+def _stream_masks(f):
+    """(caller_mask, agent_mask, samples_read) over an open SoundFile."""
+    fl = int(VAD_RATE * FRAME_S)
+    stream = _Stream(f.frames, f.samplerate)
+    caller, agent = _Channel(stream.n // fl, fl), _Channel(stream.n // fl, fl)
+    start = 0
+    for block in f.blocks(blocksize=STREAM_BLOCK_SAMPLES, dtype="int16", always_2d=True):
+        picked = stream.take(block, start)
+        caller.push(picked[:, 0])
+        agent.push(picked[:, 1])
+        start += len(block)
+    return caller.mask(), agent.mask(), start
+
+
+def _stream_rms(f, segs):
+    """segment_rms for each (start_s, end_s) in one sequential pass."""
+    sr = f.samplerate
+    spans = [(int(s * sr), int(e * sr)) for s, e in segs]
+    sums = [0.0] * len(spans)
+    sizes = [0] * len(spans)
+    f.seek(0)
+    start = 0
+    for block in f.blocks(blocksize=STREAM_BLOCK_SAMPLES, dtype="int16", always_2d=True):
+        end = start + len(block)
+        for i, (a, b) in enumerate(spans):
+            lo, hi = max(a, start), min(b, end)
+            if lo < hi:
+                seg = block[lo - start:hi - start, 0].astype(np.float64)
+                sums[i] += seg @ seg        # exact integer sums, as in segment_rms
+                sizes[i] += hi - lo
+        start = end
+    return [round(float(np.sqrt(t / n)), 1) if n else 0.0 for t, n in zip(sums, sizes)]
+
+
+def _analyze_stream(f):
+    """analyze_caller over an open SoundFile, block by block. None if the
+    decoder's frame count turned out to be wrong (then the caller falls back
+    to decoding in memory, which only trusts what it actually decoded)."""
+    cmask, amask, read = _stream_masks(f)
+    if read != f.frames:
+        return None
+    sr = f.samplerate
+    cseg = segments(cmask)
+    return {
+        "sample_rate": sr,
+        "duration_s": round(read / sr, 2),
+        "caller_segments": cseg,
+        "agent_segments": segments(amask),
+        "caller_rms": {f"{s}-{e}": rms for (s, e), rms in zip(cseg, _stream_rms(f, cseg))},
+    }
+
+
+def analyze_caller(audio_bytes, stream=None):
+    """Everything the verifier needs from one recording, in one pass.
+
+    Recordings of STREAM_MIN_SECONDS or more are analysed block by block with
+    bounded memory; `stream` forces either path. Both give identical results.
+    """
+    import soundfile as sf
+
+    with sf.SoundFile(_source(audio_bytes)) as f:
+        if f.channels < 2:
+            raise MonoRecording("recording has a single channel")
+        if stream is None:
+            stream = f.frames >= STREAM_MIN_SECONDS * f.samplerate
+        if stream:
+            out = _analyze_stream(f)
+            if out is not None:
+                return out
+
     caller, agent, sr = load(audio_bytes)
     cseg = segments(speech_mask(caller, sr))
     aseg = segments(speech_mask(agent, sr))
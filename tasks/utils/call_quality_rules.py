@@ -114,6 +114,60 @@ _PATTERNS = (
     ("stream_stopped",           re.compile(r"^\[Twilio/Azure\] Stream stopped")),
 )
 
+# Every pattern above opens with a literal `[Tag] ...` prefix, and most log
+# lines carry a tag none of them use. Indexing the patterns by tag, and testing
+# each candidate's literal prefix with str.startswith before running its regex,
+# means a typical line costs a dict lookup and a few prefix checks instead of
+# eighteen regex attempts. The first-match order within a tag is kept, so the
+# result is exactly the linear scan's. A pattern without a literal tag is a
+# candidate for every line.
+_REGEX_SPECIAL = set(".^$*+?{}[]()|\\")
+_QUANTIFIERS = set("*+?{")
+
+
+def _literal_prefix(pattern):
+    """The text every match of an anchored pattern must start with."""
+    src = pattern.pattern
+    if not src.startswith("^"):
+        return ""
+    out, i = [], 1
+    while i < len(src):
+        ch = src[i]
+        if ch == "\\" and i + 1 < len(src) and src[i + 1] in _REGEX_SPECIAL | {"/", "-"}:
+            ch, width = src[i + 1], 2
+        elif ch in _REGEX_SPECIAL:
+            break
+        else:
+            width = 1
+        if src[i + width:i + width + 1] in _QUANTIFIERS:
+            break   # optional/repeated: not guaranteed
+        out.append(ch)
+        i += width
+    return "".join(out)
+
+
+def _line_tag(msg):
+    if msg[:1] == "[":
+        end = msg.find("]")
+        if end > 0:
+            return msg[1:end]
+    return None
+
+
+def _index_patterns(patterns):
+    entries = [(kind, _literal_prefix(p), p) for kind, p in patterns]
+    tags = [_line_tag(prefix) for _, prefix, _ in entries]
+    untagged = tuple(e for e, tag in zip(entries, tags) if tag is None)
+    index = {
+        tag: tuple(e for e, t in zip(entries, tags) if t in (tag, None))
+        for tag in set(tags) - {None}
+    }
+    return index, untagged
+
+
+_PATTERNS_BY_TAG, _UNTAGGED_PATTERNS = _index_patterns(_PATTERNS)
+
+
 # An assistant-side line means the agent produced something for this turn.
 #
 # `response_completed` is conditional: a response that ended `cancelled` having
@@ -296,7 +350,9 @@ def _parse_ts(value):
 def _classify(obj):
     """One line dict → an Event, or None if it carries no signal for us."""
     msg = obj.get("msg") or ""
-    for kind, pattern in _PATTERNS:
+    for kind, prefix, pattern in _PATTERNS_BY_TAG.get(_line_tag(msg), _UNTAGGED_PATTERNS):
+        if not msg.startswith(prefix):
+            continue
         match = pattern.match(msg)
         if match:
             return Event(
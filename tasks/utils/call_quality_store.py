@@ -78,3 +78,43 @@ def insert_findings(conn, *, tenant_id, location_id, conversation_id, call_sid,
             )
             inserted += cur.rowcount
     return inserted
+
+
+def insert_findings_batch(conn, calls):
+    """`insert_findings` for many calls in one statement. `calls` is a list of
+    dicts with tenant_id, location_id, conversation_id, call_sid, findings.
+    Same ON CONFLICT DO NOTHING semantics; returns the number of NEW rows."""
+    from psycopg2.extras import execute_values
+
+    rows = [
+        (
+            call["tenant_id"], call["location_id"], call["conversation_id"], call["call_sid"],
+            f["rule_id"], f["severity"], f["detector"], f["confidence"],
+            f["title"], f["explanation"], f["suggested_fix"],
+            json.dumps(f["evidence"]),
+            f["analyzer_version"], f["catalogue_version"],
+        )
+        for call in calls
+        for f in call["findings"]
+    ]
+    if not rows:
+        return 0
+
+    with conn.cursor() as cur:
+        inserted = execute_values(
+            cur,
+            """
+            INSERT INTO call_quality_findings (
+                tenant_id, location_id, location_conversation_id, call_sid,
+                rule_id, severity, detector, confidence,
+                title, explanation, suggested_fix,
+                evidence, analyzer_version, catalogue_version
+            ) VALUES %s
+            ON CONFLICT (location_conversation_id, rule_id) DO NOTHING
+            RETURNING 1
+            """,
+            rows,
+            template="(%s,%s,%s,%s, %s,%s,%s,%s, %s,%s,%s, %s::jsonb,%s,%s)",
+            fetch=True,
+        )
+    return len(inserted)
@@ -0,0 +1,172 @@
+"""
+Per-call partial traces for tasks/pull_render_logs.py, accumulated across sweeps.
+
+Without this, a call that straddles two sweeps is only captured because every
+sweep re-reads ``SETTLE_SECONDS`` of the previous window — paying Render API
+requests (capped at 30/min) for lines already seen — and a call longer than
+that overlap loses its early lines when it is finally uploaded. Here every
+sweep merges what it read into Redis and the cursor only keeps a short
+ingest overlap:
+
+* **Trace.** One hash per call, ``render_logs:trace:<call_sid>``: a field per
+  line keyed by its sequence number (so re-read lines deduplicate for free)
+  plus the header fields ``_group_by_call`` derives (tenant, location,
+  instance, terminal marker seen). Expires ``TRACE_TTL_SECONDS`` after the
+  last merge, so an abandoned trace cannot become litter.
+* **Open set.** A sorted set of unfinished calls scored by the timestamp of
+  their newest line, which is all ``claim_ready`` needs to find calls whose
+  terminal marker arrived or whose settle timeout passed — including calls
+  that logged nothing in this sweep.
+* **Claim.** ``claim_ready`` takes a ``SET NX`` marker per call before handing
+  it out, so overlapping runs finalise a call once; lines that trickle in after
+  finalisation are dropped. ``release`` hands a call back for a later sweep
+  (conversation row not written yet, upload failed) and counts attempts.
+
+Pure Redis + parsing, no celery/DB/R2, so it is unit-tested directly. Any Redis
+error is the caller's cue to fall back to the overlap re-read.
+"""
+
+import json
+import os
+from datetime import datetime, timezone
+
+from tasks.utils.render_log_parse import _sequence_gaps
+
+KEY_PREFIX = "render_logs:trace"
+OPEN_KEY = f"{KEY_PREFIX}:open"
+TRACE_TTL_SECONDS = int(os.getenv("RENDER_LOGS_TRACE_TTL_SECONDS", str(6 * 3600)))
+
+_LINE_FIELD = "l:"
+
+
+def _client():
+    url = os.getenv("REDIS_URL")
+    if not url:
+        return None
+    import redis
+    return redis.Redis.from_url(url, decode_responses=True)
+
+
+def _trace_key(call_sid):
+    return f"{KEY_PREFIX}:{call_sid}"
+
+
+def _claim_key(call_sid):
+    return f"{KEY_PREFIX}:{call_sid}:final"
+
+
+def _epoch(ts):
+    """Render timestamp -> epoch seconds, or None."""
+    try:
+        return datetime.fromisoformat((ts or "").replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def merge(client, calls, ingested_at=None):
+    """Fold one sweep's ``_group_by_call`` output into the store. Calls already
+    finalised are ignored. A call none of whose lines has a parseable
+    timestamp is opened at `ingested_at` (the sweep's time, default now), so it
+    still settles and gets finalised. Returns the number of calls merged."""
+    fallback = (ingested_at or datetime.now(timezone.utc)).timestamp()
+    sids = list(calls)
+    claimed = _pipelined(client, lambda pipe: [pipe.exists(_claim_key(sid)) for sid in sids])
+    finalised = {sid for sid, done in zip(sids, claimed) if done}
+
+    pipe = client.pipeline(transaction=False)
+    merged = 0
+    for call_sid, call in calls.items():
+        if call_sid in finalised or not call["lines"]:
+            continue
+        key = _trace_key(call_sid)
+        fields = {f"{_LINE_FIELD}{line['seq']}": json.dumps(line) for line in call["lines"]}
+        if call["instance"]:
+            fields["instance"] = call["instance"]
+        if call["tenant_id"] is not None:
+            fields["tenant_id"] = call["tenant_id"]
+            fields["location_id"] = call["location_id"]
+        if call["complete"]:
+            fields["complete"] = 1
+        pipe.hset(key, mapping=fields)
+        pipe.expire(key, TRACE_TTL_SECONDS)
+
+        newest = max((_epoch(line["ts"]) for line in call["lines"]), key=lambda t: t or 0)
+        if newest is not None:
+            pipe.zadd(OPEN_KEY, {call_sid: newest}, gt=True)   # GT still adds new members
+        else:
+            pipe.zadd(OPEN_KEY, {call_sid: fallback}, nx=True)  # keep a real timestamp if one is known
+        merged += 1
+    pipe.execute()
+    return merged
+
+
+def _pipelined(client, queue):
+    pipe = client.pipeline(transaction=False)
+    queue(pipe)
+    return pipe.execute()
+
+
+def _load(call_sid, raw):
+    lines = sorted(
+        (json.loads(value) for field, value in raw.items() if field.startswith(_LINE_FIELD)),
+        key=lambda line: line["seq"],
+    )
+    tenant_id = raw.get("tenant_id")
+    location_id = raw.get("location_id")
+    return {
+        "call_sid": call_sid,
+        "lines": lines,
+        "tenant_id": int(tenant_id) if tenant_id else None,
+        "location_id": int(location_id) if location_id else None,
+        "instance": raw.get("instance"),
+        "complete": raw.get("complete") == "1",
+        "gaps": _sequence_gaps(lines),
+        "attempts": int(raw.get("attempts") or 0),
+    }
+
+
+def claim_ready(client, now, settle_seconds, grace_seconds):
+    """Claim and return every open call that is finished: its terminal marker
+    was seen and its newest line is at least `grace_seconds` old, or its newest
+    line is at least `settle_seconds` old. Same shape as ``_group_by_call``
+    plus ``attempts``."""
+    now_ts = now.timestamp()
+    candidates = client.zrangebyscore(OPEN_KEY, "-inf", now_ts - grace_seconds, withscores=True)
+    if not candidates:
+        return []
+
+    traces = _pipelined(client, lambda pipe: [pipe.hgetall(_trace_key(sid)) for sid, _ in candidates])
+    ready = []
+    for (call_sid, newest), raw in zip(candidates, traces):
+        if not raw:
+            client.zrem(OPEN_KEY, call_sid)    # trace expired under us
+            continue
+        call = _load(call_sid, raw)
+        if not (call["complete"] or now_ts - newest >= settle_seconds):
+            continue
+        if not client.set(_claim_key(call_sid), 1, nx=True, ex=TRACE_TTL_SECONDS):
+            continue                           # another run has it
+        ready.append(call)
+    return ready
+
+
+def open_count(client):
+    return client.zcard(OPEN_KEY)
+
+
+def discard(client, call_sid):
+    """The call is done: drop its trace. The claim marker stays until it
+    expires, so late lines for the call are ignored rather than reopening it."""
+    pipe = client.pipeline(transaction=False)
+    pipe.delete(_trace_key(call_sid))
+    pipe.zrem(OPEN_KEY, call_sid)
+    pipe.execute()
+
+
+def release(client, call_sid):
+    """Give a claimed call back for a later sweep. Returns attempts so far."""
+    pipe = client.pipeline(transaction=False)
+    pipe.hincrby(_trace_key(call_sid), "attempts", 1)
+    pipe.expire(_trace_key(call_sid), TRACE_TTL_SECONDS)
+    pipe.delete(_claim_key(call_sid))
+    return pipe.execute()[0]
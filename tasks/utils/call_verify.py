@@ -45,11 +45,13 @@ def _first_agent_log_seconds(events):
     return None
 
 
-def _target_log_seconds(events, seq):
+def _log_seconds_by_seq(events):
+    """seq -> seconds past the hour, first timestamped event per seq."""
+    out = {}
     for e in events:
-        if e.seq == seq and e.ts is not None:
-            return _at(e.ts)
-    return None
+        if e.ts is not None:
+            out.setdefault(e.seq, _at(e.ts))
+    return out
 
 
 def unverifiable(reason):
@@ -64,23 +66,38 @@ def verify_finding(finding, log_text, audio_bytes):
     actual diagnostic, since it distinguishes "spoke normally and STT failed"
     from "spoke very quietly".
     """
+    return verify_findings([finding], log_text, audio_bytes)[0]
+
+
+def verify_findings(findings, log_text, audio_bytes):
+    """Evidence for every finding of ONE call, in order.
+
+    The log is parsed, the recording decoded and both speech masks computed
+    once, then each finding is only a window lookup — a call with several
+    dropped utterances costs one decode, not one per finding.
+    """
     _, events = parse_artifact(log_text)
     if not events:
-        return unverifiable("no_log_events")
+        return [unverifiable("no_log_events") for _ in findings]
 
     try:
         analysis = audio.analyze_caller(audio_bytes)
     except audio.MonoRecording:
-        return unverifiable("mono")
+        return [unverifiable("mono") for _ in findings]
     except Exception:
-        return unverifiable("undecodable")
+        return [unverifiable("undecodable") for _ in findings]
 
-    target = _target_log_seconds(events, (finding.get("evidence") or {}).get("seq"))
+    log_at = _log_seconds_by_seq(events)
+    offset = audio.estimate_offset(
+        analysis["agent_segments"], _first_agent_log_seconds(events))
+    return [_verify_one(f, log_at, analysis, offset) for f in findings]
+
+
+def _verify_one(finding, log_at, analysis, offset):
+    target = log_at.get((finding.get("evidence") or {}).get("seq"))
     if target is None:
         return unverifiable("no_timestamp")
 
-    offset = audio.estimate_offset(
-        analysis["agent_segments"], _first_agent_log_seconds(events))
     verdict, detail = audio.caller_spoke_near(
         analysis["caller_segments"], target, offset)
 
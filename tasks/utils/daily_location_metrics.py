@@ -0,0 +1,262 @@
+"""
+daily_location_metrics — per-location, per-day rollup behind the dashboard.
+
+generate_dashboard_metrics used to aggregate raw ``bookings`` and
+``location_conversations`` over 30/60/90-day windows on every run, for every
+tenant. The rollup keeps one row per (tenant, location, local date):
+
+* one booking count per channel band (CHANNEL_BANDS) plus ``bookings_total``
+  (every counted booking, whatever its source), counting COUNTED_STATUSES;
+* ``calls_successful``, ``calls_with_duration`` and ``call_duration_secs``
+  (a sum, so averages re-aggregate exactly over any range of days).
+
+Booking dates are ``DATE(start_time)`` (bookings store local wall-clock time).
+Call dates are the call's start in the location's timezone. The refresh pins
+the session to UTC so that holds whether ``call_start_time`` is ``timestamp``
+(naive UTC, as the sync writes it) or ``timestamptz``.
+
+The refresh is incremental. Each clean run stores its DB start time as a
+watermark in Redis. The next run recomputes only the days that own a booking
+or call row updated since then, less a grace window for late commits. Each
+such day is recomputed whole from the raw rows, so a count can never drift.
+A modification marks the original booking 'modified', which touches its old
+day too. A missing watermark (first run, Redis flushed) or ``full=True``
+rebuilds every day from REBUILD_DAYS ago onwards. That also picks up hard
+deletes, which the incremental path cannot see.
+"""
+
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# Channel bands
+# ============================================================================
+#
+# ADDING A CHANNEL: a booking whose source appears in no band is counted in NO
+# band -- it silently vanishes from the dashboard chart rather than falling into
+# an "other" bucket. That is how 'web-widget' left two prod tenants staring at an
+# empty chart while holding real bookings. If you add a booking_source value, add
+# it here AND in speako-web/src/lib/dashboard-metrics-generator.ts, then bump
+# TRENDS_CACHE_VERSION in tasks/generate_dashboard_metrics.py so every tenant
+# rebuilds. A new band is also a new daily_location_metrics column: add it with
+# ALTER TABLE and run the refresh with full=True.
+#
+# 'onboarding' is mapped for completeness only -- obsolete, zero rows on dev and
+# prod.
+CHANNEL_BANDS = [
+    ("bookings_ai", ("voice-ai",)),
+    ("bookings_web", ("web",)),
+    ("bookings_dashboard", ("dashboard", "onboarding")),
+    ("bookings_chat", ("facebook", "instagram", "web-widget")),
+]
+
+BAND_FIELDS = [field for field, _ in CHANNEL_BANDS]
+
+# Booking states that count as real business.
+#
+# 'completed' is included deliberately: applying a terminal service tag moves a
+# booking there (to release the venue-unit EXCLUDE constraint), and counting only
+# 'confirmed' made a tenant's own numbers shrink as they marked work done.
+# 'cancelled' didn't happen; 'modified' rows are superseded originals and would
+# double-count every modification; a pending guarantee isn't a booking yet.
+COUNTED_STATUSES = "('confirmed','completed')"
+
+WATERMARK_KEY = "daily_location_metrics:watermark"
+# Slack for rows whose transaction committed after the previous run read the
+# clock (updated_at is stamped at statement time, not at commit).
+WATERMARK_GRACE_SECONDS = 300
+# How far back a full rebuild reaches: the 90-day trends plus margin.
+REBUILD_DAYS = int(os.getenv("DAILY_METRICS_REBUILD_DAYS", "120"))
+
+SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS daily_location_metrics (
+        tenant_id           integer     NOT NULL,
+        location_id         integer     NOT NULL,
+        metric_date         date        NOT NULL,
+""" + "".join(f"        {field:<19} integer     NOT NULL DEFAULT 0,\n" for field in BAND_FIELDS) + """        bookings_total      integer     NOT NULL DEFAULT 0,
+        calls_successful    integer     NOT NULL DEFAULT 0,
+        calls_with_duration integer     NOT NULL DEFAULT 0,
+        call_duration_secs  bigint      NOT NULL DEFAULT 0,
+        updated_at          timestamptz NOT NULL DEFAULT now(),
+        PRIMARY KEY (tenant_id, location_id, metric_date)
+    )
+"""
+
+
+# Local date of a call: see the module docstring for why the cast is safe.
+_CALL_LOCAL_DATE = "(c.call_start_time::timestamptz AT TIME ZONE l.timezone)::date"
+
+_DIRTY_SINCE_SQL = """
+    SELECT b.tenant_id, b.location_id, DATE(b.start_time) AS metric_date
+    FROM bookings b
+    WHERE b.updated_at > %(since)s::timestamptz
+    UNION
+    SELECT c.tenant_id, c.location_id, """ + _CALL_LOCAL_DATE + """
+    FROM location_conversations c
+    JOIN locations l ON l.tenant_id = c.tenant_id AND l.location_id = c.location_id
+    WHERE c.updated_at > %(since)s::timestamptz
+"""
+
+_DIRTY_FULL_SQL = """
+    SELECT b.tenant_id, b.location_id, DATE(b.start_time) AS metric_date
+    FROM bookings b
+    WHERE b.start_time >= CURRENT_DATE - %(days)s
+    UNION
+    SELECT c.tenant_id, c.location_id, """ + _CALL_LOCAL_DATE + """
+    FROM location_conversations c
+    JOIN locations l ON l.tenant_id = c.tenant_id AND l.location_id = c.location_id
+    WHERE c.call_start_time >= CURRENT_DATE - %(days)s - 1
+    UNION
+    SELECT tenant_id, location_id, metric_date
+    FROM daily_location_metrics
+    WHERE metric_date >= CURRENT_DATE - %(days)s
+"""
+
+
+def upsert_sql(full=False):
+    """Recompute every dirty (tenant, location, date) from the raw rows and
+    upsert it; days whose rows all went away are written as zeros."""
+    fields = BAND_FIELDS
+    band_counts = ",\n                ".join(
+        "COUNT(*) FILTER (WHERE b.source IN ({})) AS {}".format(
+            ", ".join("'{}'".format(src) for src in sources), field)
+        for field, sources in CHANNEL_BANDS
+    )
+    columns = fields + ["bookings_total", "calls_successful", "calls_with_duration", "call_duration_secs"]
+    return """
+        WITH dirty AS (""" + (_DIRTY_FULL_SQL if full else _DIRTY_SINCE_SQL) + """)
+        INSERT INTO daily_location_metrics
+            (tenant_id, location_id, metric_date, """ + ", ".join(columns) + """, updated_at)
+        SELECT d.tenant_id, d.location_id, d.metric_date,
+               """ + ", ".join(f"bk.{f}" for f in fields) + """, bk.bookings_total,
+               cl.calls_successful, cl.calls_with_duration, cl.call_duration_secs, now()
+        FROM dirty d
+        JOIN locations l ON l.tenant_id = d.tenant_id AND l.location_id = d.location_id
+        CROSS JOIN LATERAL (
+            SELECT
+                """ + band_counts + """,
+                COUNT(*) AS bookings_total
+            FROM bookings b
+            WHERE b.tenant_id = d.tenant_id AND b.location_id = d.location_id
+              AND b.start_time >= d.metric_date AND b.start_time < d.metric_date + 1
+              AND b.status IN """ + COUNTED_STATUSES + """
+        ) bk
+        CROSS JOIN LATERAL (
+            SELECT COUNT(*) AS calls_successful,
+                   COUNT(c.call_duration_secs) AS calls_with_duration,
+                   COALESCE(SUM(c.call_duration_secs), 0) AS call_duration_secs
+            FROM location_conversations c
+            WHERE c.tenant_id = d.tenant_id AND c.location_id = d.location_id
+              AND c.call_successful = true
+              AND c.call_start_time >= (d.metric_date::timestamp AT TIME ZONE l.timezone)
+              AND c.call_start_time < ((d.metric_date + 1)::timestamp AT TIME ZONE l.timezone)
+        ) cl
+        WHERE d.metric_date IS NOT NULL
+        ON CONFLICT (tenant_id, location_id, metric_date) DO UPDATE SET
+            """ + ",\n            ".join(f"{c} = EXCLUDED.{c}" for c in columns) + """,
+            updated_at = EXCLUDED.updated_at
+    """
+
+
+# ── Watermark ────────────────────────────────────────────────────────────────
+
+def _client():
+    url = os.getenv("REDIS_URL")
+    if not url:
+        return None
+    import redis
+    return redis.Redis.from_url(url, decode_responses=True)
+
+
+def read_watermark():
+    """DB start time of the last clean refresh, or None (→ full rebuild)."""
+    try:
+        client = _client()
+        return (client.get(WATERMARK_KEY) or None) if client else None
+    except Exception as exc:
+        logger.warning("[daily_location_metrics] watermark read failed (%s) — full rebuild", exc)
+        return None
+
+
+def write_watermark(value):
+    try:
+        client = _client()
+        if client:
+            client.set(WATERMARK_KEY, value, ex=30 * 24 * 3600)
+    except Exception as exc:
+        logger.warning("[daily_location_metrics] watermark write failed (%s) — next run rebuilds", exc)
+
+
+# ── Refresh ──────────────────────────────────────────────────────────────────
+
+def refresh(conn, since=None):
+    """Bring the rollup up to date on `conn` and commit. `since` (a
+    watermark) limits the work to days touched after it, less the grace
+    window; None rebuilds the last REBUILD_DAYS. Returns
+    {"mode", "days_upserted", "watermark"}; store the watermark only after
+    this returns."""
+    with conn.cursor() as cur:
+        cur.execute(SCHEMA_SQL)
+        cur.execute("SET LOCAL TIME ZONE 'UTC'")
+        cur.execute("SELECT now()")
+        run_start = cur.fetchone()[0]
+        if since is None:
+            cur.execute(upsert_sql(full=True), {"days": REBUILD_DAYS})
+        else:
+            cur.execute("SELECT %s::timestamptz - make_interval(secs => %s)",
+                        (since, WATERMARK_GRACE_SECONDS))
+            cur.execute(upsert_sql(full=False), {"since": cur.fetchone()[0]})
+        days = cur.rowcount
+    conn.commit()
+    return {"mode": "full" if since is None else "incremental", "days_upserted": days,
+            "watermark": run_start.isoformat() if hasattr(run_start, "isoformat") else str(run_start)}
+
+
+# ── Readers ──────────────────────────────────────────────────────────────────
+
+def band_counts_by_day(cur, tenant_id, location_ids, first_date, last_date=None):
+    """[(location_id, date, <one count per band>)] for days >= first_date
+    (and <= last_date when given), days with no bookings omitted."""
+    fields = BAND_FIELDS
+    cur.execute("""
+        SELECT location_id, metric_date, """ + ", ".join(fields) + """
+        FROM daily_location_metrics
+        WHERE tenant_id = %s AND location_id = ANY(%s)
+          AND metric_date >= %s AND (%s::date IS NULL OR metric_date <= %s::date)
+          AND (""" + " + ".join(fields) + """) > 0
+        ORDER BY metric_date
+    """, (tenant_id, list(location_ids), first_date, last_date, last_date))
+    return cur.fetchall()
+
+
+def period_totals(cur, tenant_id, location_ids, today):
+    """{location_id: {...}} for the summary cards: the last 30 days (today
+    and on, so future bookings count as they always have) against the 30
+    before them."""
+    cur.execute("""
+        SELECT location_id,
+               COALESCE(SUM(bookings_total) FILTER (WHERE metric_date > %(today)s::date - 30), 0),
+               COALESCE(SUM(bookings_total) FILTER (WHERE metric_date <= %(today)s::date - 30), 0),
+               COALESCE(SUM(calls_successful) FILTER (WHERE metric_date > %(today)s::date - 30 AND metric_date <= %(today)s::date), 0),
+               COALESCE(SUM(calls_successful) FILTER (WHERE metric_date <= %(today)s::date - 30), 0),
+               SUM(call_duration_secs) FILTER (WHERE metric_date > %(today)s::date - 30 AND metric_date <= %(today)s::date)
+                 / NULLIF(SUM(calls_with_duration) FILTER (WHERE metric_date > %(today)s::date - 30 AND metric_date <= %(today)s::date), 0),
+               SUM(call_duration_secs) FILTER (WHERE metric_date <= %(today)s::date - 30)
+                 / NULLIF(SUM(calls_with_duration) FILTER (WHERE metric_date <= %(today)s::date - 30), 0)
+        FROM daily_location_metrics
+        WHERE tenant_id = %(tenant_id)s AND location_id = ANY(%(location_ids)s)
+          AND metric_date > %(today)s::date - 60
+        GROUP BY location_id
+    """, {"tenant_id": tenant_id, "location_ids": list(location_ids), "today": today})
+    return {
+        row[0]: {
+            "bookings_current": row[1], "bookings_previous": row[2],
+            "calls_current": row[3], "calls_previous": row[4],
+            "avg_duration_current": int(row[5]) if row[5] else 0,
+            "avg_duration_previous": int(row[6]) if row[6] else 0,
+        }
+        for row in cur.fetchall()
+    }
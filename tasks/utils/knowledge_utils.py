@@ -183,22 +183,162 @@ def build_analysis_artifact_key(tenant_id: str, location_id: str, unique_filenam
     return f"knowledges/{tenant_id}/{location_id}/analysis/{base}.json"
 
 
-def _bytes_to_text(data: bytes) -> str:
-    """Decode bytes to text using utf-8 with fallback to latin-1."""
+def _bytes_to_text(data: bytes, max_bytes: int | None = None) -> str:
+    """Decode bytes to text using utf-8 with fallback to latin-1.
+
+    With `max_bytes`, only that prefix is decoded; a multi-byte character cut in
+    half at the boundary is dropped rather than triggering the latin-1 fallback.
+    """
+    if max_bytes is not None and len(data) > max_bytes:
+        data = data[:max_bytes]
+        try:
+            return data.decode('utf-8')
+        except UnicodeDecodeError as e:
+            if e.start >= len(data) - 3:
+                try:
+                    return data[:e.start].decode('utf-8')
+                except UnicodeDecodeError:
+                    pass
+            return data.decode('latin-1', errors='replace')
     try:
         return data.decode('utf-8')
     except UnicodeDecodeError:
         return data.decode('latin-1', errors='replace')
 
 
-def preprocess_for_model(file_bytes: bytes, filename: str, content_type: str) -> dict:
+def _default_text_budget() -> int:
+    # Same cap analyze_knowledge applies before the model call; there is no
+    # point extracting text that will be cut off anyway.
+    return int(os.getenv('KNOWLEDGE_MAX_TEXT_BYTES', '200000'))
+
+
+def _default_row_budget() -> int:
+    return int(os.getenv('KNOWLEDGE_MAX_SHEET_ROWS', '20000'))
+
+
+def _cell_text(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _csv_line(values) -> str:
+    import csv
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator='\n').writerow([_cell_text(v) for v in values])
+    return buf.getvalue()
+
+
+def _iter_xlsx_lines(file_bytes: bytes):
+    """Yield '# Sheet: ...' headers and CSV lines from an .xlsx, one row at a time.
+
+    openpyxl read-only mode streams the sheet XML instead of building the whole
+    workbook object model, so memory stays flat regardless of sheet size.
+    """
+    import openpyxl
+
+    wb = openpyxl.load_workbook(io.BytesIO(file_bytes), read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            yield f"# Sheet: {ws.title}\n"
+            for row in ws.iter_rows(values_only=True):
+                # read-only sheets report their declared dimension, which is
+                # often padded with thousands of blank rows
+                if row is None or all(v is None or v == '' for v in row):
+                    continue
+                yield _csv_line(row)
+            yield "\n"
+    finally:
+        wb.close()
+
+
+def _iter_xls_lines(file_bytes: bytes):
+    """Legacy .xls via xlrd, loading one sheet at a time (on_demand)."""
+    import xlrd
+
+    book = xlrd.open_workbook(file_contents=file_bytes, on_demand=True)
+    try:
+        for idx in range(book.nsheets):
+            sheet = book.sheet_by_index(idx)
+            yield f"# Sheet: {sheet.name}\n"
+            for r in range(sheet.nrows):
+                row = sheet.row_values(r)
+                if all(v == '' for v in row):
+                    continue
+                yield _csv_line(row)
+            yield "\n"
+            book.unload_sheet(idx)
+    finally:
+        book.release_resources()
+
+
+_W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+def _iter_docx_lines(file_bytes: bytes):
+    """Yield paragraph text from word/document.xml with iterparse.
+
+    Avoids python-docx, which parses the whole document (and every part it
+    references) into an object tree. Paragraphs inside tables are included,
+    which matters for price lists laid out as Word tables.
+    """
+    import zipfile
+    from xml.etree.ElementTree import iterparse
+
+    with zipfile.ZipFile(io.BytesIO(file_bytes)) as zf:
+        with zf.open('word/document.xml') as xml:
+            parts: list[str] = []
+            for event, elem in iterparse(xml, events=('end',)):
+                tag = elem.tag
+                if tag == f'{_W_NS}t':
+                    parts.append(elem.text or '')
+                elif tag == f'{_W_NS}tab':
+                    parts.append('\t')
+                elif tag in (f'{_W_NS}br', f'{_W_NS}cr'):
+                    parts.append('\n')
+                elif tag == f'{_W_NS}p':
+                    text = ''.join(parts)
+                    parts = []
+                    if text:
+                        yield text + '\n'
+                    elem.clear()
+
+
+def _collect_text(lines, max_bytes: int, max_rows: int | None = None) -> tuple[str, bool]:
+    """Join streamed lines until the byte (utf-8) or line budget is spent.
+
+    Returns (text, truncated). Stops pulling from the generator as soon as the
+    budget is full, so the rest of the file is never decoded.
+    """
+    out: list[str] = []
+    total = 0
+    rows = 0
+    for line in lines:
+        size = len(line.encode('utf-8', errors='ignore'))
+        if total + size > max_bytes:
+            remaining = max_bytes - total
+            if remaining > 0:
+                out.append(line.encode('utf-8', errors='ignore')[:remaining].decode('utf-8', errors='ignore'))
+            return ''.join(out), True
+        out.append(line)
+        total += size
+        rows += 1
+        if max_rows is not None and rows >= max_rows:
+            return ''.join(out), True
+    return ''.join(out), False
+
+
+def preprocess_for_model(file_bytes: bytes, filename: str, content_type: str, *,
+                         max_bytes: int | None = None, max_rows: int | None = None) -> dict:
     """Return a dict describing how to feed this content to the model.
 
     Modes:
     - { 'mode': 'file', 'filename': str, 'file_bytes': bytes }
       Use OpenAI Files+Responses with input_file (currently best for PDF).
 
-    - { 'mode': 'text', 'text': str, 'note': str }
+    - { 'mode': 'text', 'text': str, 'note': str, 'truncated': bool }
       Provide extracted/converted text as input_text.
 
     Supported:
@@ -209,56 +349,66 @@ def preprocess_for_model(file_bytes: bytes, filename: str, content_type: str) ->
     - Excel (.xlsx/.xls) => mode=text (CSV text of sheets)
     - Word (.docx) => mode=text (paragraph text)
     - Word (.doc) => unsupported (return {'mode':'unsupported', 'reason': 'doc_not_supported'})
+
+    Text extraction is streamed and stops once `max_bytes` (default
+    KNOWLEDGE_MAX_TEXT_BYTES) of text or `max_rows` lines (default
+    KNOWLEDGE_MAX_SHEET_ROWS) have been produced, so a huge spreadsheet costs
+    O(budget) memory rather than O(file). Neither pandas nor python-docx is
+    imported.
     """
     ext = os.path.splitext(filename.lower())[1]
+    if max_bytes is None:
+        max_bytes = _default_text_budget()
+    if max_rows is None:
+        max_rows = _default_row_budget()
 
     # PDF: let OpenAI parse as a file attachment
     if ext == '.pdf' or content_type == 'application/pdf':
         return { 'mode': 'file', 'filename': filename, 'file_bytes': file_bytes }
 
+    def _raw_text(note: str) -> dict:
+        return {
+            'mode': 'text',
+            'text': _bytes_to_text(file_bytes, max_bytes),
+            'note': note,
+            'truncated': len(file_bytes) > max_bytes,
+        }
+
     # CSV: treat as plain text
     if ext == '.csv' or content_type in ('text/csv',):
-        return { 'mode': 'text', 'text': _bytes_to_text(file_bytes), 'note': 'csv-as-text' }
+        return _raw_text('csv-as-text')
 
     # Markdown / plain text: treat as raw text (already model-friendly)
     if ext in ('.md', '.txt') or content_type in ('text/markdown', 'text/plain'):
-        return { 'mode': 'text', 'text': _bytes_to_text(file_bytes), 'note': 'markdown-as-text' }
+        return _raw_text('markdown-as-text')
 
     # JSON: treat as plain text (preserve structure)
     if ext == '.json' or content_type in ('application/json',):
-        return { 'mode': 'text', 'text': _bytes_to_text(file_bytes), 'note': 'json-as-text' }
+        return _raw_text('json-as-text')
 
-    # Excel: convert to CSV text using pandas
+    # Excel: stream rows out as CSV text
     if ext in ('.xlsx', '.xls') or content_type in (
         'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
         'application/vnd.ms-excel'
     ):
+        is_xls = ext == '.xls' or (ext != '.xlsx' and content_type == 'application/vnd.ms-excel')
         try:
-            import pandas as pd
-            # Read all sheets, concatenate with sheet headers
-            excel_buffer = io.BytesIO(file_bytes)
-            xls = pd.ExcelFile(excel_buffer)
-            parts = []
-            for sheet_name in xls.sheet_names:
-                df = xls.parse(sheet_name)
-                csv_text = df.to_csv(index=False)
-                parts.append(f"# Sheet: {sheet_name}\n{csv_text}\n")
-            text = "\n".join(parts)
-            return { 'mode': 'text', 'text': text, 'note': 'excel-as-csv-text' }
+            lines = _iter_xls_lines(file_bytes) if is_xls else _iter_xlsx_lines(file_bytes)
+            text, truncated = _collect_text(lines, max_bytes, max_rows)
+            lines.close()
+            return { 'mode': 'text', 'text': text, 'note': 'excel-as-csv-text', 'truncated': truncated }
         except Exception as e:
             return { 'mode': 'unsupported', 'reason': f'excel_parse_failed: {e}' }
 
-    # Word: .docx supported via python-docx
+    # Word: .docx paragraphs streamed from the document XML
     if ext == '.docx' or content_type in (
         'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
     ):
         try:
-            import docx
-            buf = io.BytesIO(file_bytes)
-            document = docx.Document(buf)
-            paragraphs = [p.text for p in document.paragraphs if p.text]
-            text = "\n".join(paragraphs)
-            return { 'mode': 'text', 'text': text, 'note': 'docx-as-text' }
+            lines = _iter_docx_lines(file_bytes)
+            text, truncated = _collect_text(lines, max_bytes)
+            lines.close()
+            return { 'mode': 'text', 'text': text.rstrip('\n'), 'note': 'docx-as-text', 'truncated': truncated }
         except Exception as e:
             return { 'mode': 'unsupported', 'reason': f'docx_parse_failed: {e}' }
 
@@ -267,7 +417,7 @@ def preprocess_for_model(file_bytes: bytes, filename: str, content_type: str) ->
         return { 'mode': 'unsupported', 'reason': 'doc_not_supported' }
 
     # Default: try as text
-    return { 'mode': 'text', 'text': _bytes_to_text(file_bytes), 'note': 'default-text' }
+    return _raw_text('default-text')
 
 
 def build_scrape_artifact_paths(tenant_id: str, location_id: str, url: str) -> dict:
@@ -0,0 +1,227 @@
+"""
+Concurrent Twilio number inventory helpers.
+
+maintain_phone_number_availability (tasks/purchase_twilio_number.py) used to
+walk every country and region in turn, one blocking search and one blocking
+purchase after another, and open a connection per purchased number. A pool
+running low across AU/US/GB regions took minutes. These helpers are what it
+runs on now:
+
+* ``plan_shortfall`` turns one grouped availability count into the capped
+  purchase plan;
+* ``run_parallel`` works the plan's regions with at most
+  TWILIO_INVENTORY_CONCURRENCY Twilio requests in flight (Twilio answers
+  429 past an account's concurrency limit; ``with_rate_limit_retry`` backs
+  off and retries those);
+* ``SearchCache`` keeps search results for TWILIO_SEARCH_CACHE_TTL_SECONDS,
+  so a re-run or a retry does not repeat the same search. Numbers that were
+  bought, or that failed to buy, are dropped from it;
+* ``insert_numbers`` / ``update_numbers`` write the inventory with one
+  statement each (execute_values), also used by the import/update/move
+  dispatch scripts.
+
+Nothing here imports Twilio: the search and purchase calls are passed in.
+"""
+
+import os
+import threading
+import time
+
+INVENTORY_CONCURRENCY = int(os.getenv("TWILIO_INVENTORY_CONCURRENCY", "4"))
+SEARCH_CACHE_TTL_SECONDS = int(os.getenv("TWILIO_SEARCH_CACHE_TTL_SECONDS", "120"))
+# Extra candidates fetched per search, so a number taken between search and
+# purchase is replaced without searching again.
+SEARCH_SPARES = 2
+RATE_LIMIT_RETRIES = 3
+RATE_LIMIT_BACKOFF_SECONDS = 1.0
+
+NUMBER_COLUMNS = ("phone_number", "friendly_name", "country_code", "area_code", "region", "twilio_sid", "status")
+
+
+# ── Planning ────────────────────────────────────────────────────────────────
+
+def plan_shortfall(targets_by_country, counts_by_country, cap):
+    """
+    [(country_code, region, needed), ...] for every target below its count,
+    with the total trimmed to `cap` in plan order.
+
+    Args:
+        targets_by_country: {country: {region or '_national': target}}
+        counts_by_country: {country: {region or '_national': available}};
+            '_national' targets count every region of the country
+        cap: most numbers to buy in one run
+
+    Returns:
+        tuple: (plan, total_needed before the cap)
+    """
+    plan = []
+    total_needed = 0
+    for country_code, targets in targets_by_country.items():
+        counts = counts_by_country.get(country_code, {})
+        for region, target in targets.items():
+            current = sum(counts.values()) if region == "_national" else counts.get(region, 0)
+            needed = max(0, target - current)
+            if needed:
+                plan.append((country_code, region, needed))
+                total_needed += needed
+
+    capped, remaining = [], cap
+    for country_code, region, needed in plan:
+        take = min(needed, remaining)
+        if take <= 0:
+            break
+        capped.append((country_code, region, take))
+        remaining -= take
+    return capped, total_needed
+
+
+# ── Concurrency ─────────────────────────────────────────────────────────────
+
+def is_rate_limited(error):
+    return getattr(error, "status", None) == 429
+
+
+def with_rate_limit_retry(fn, *args, retries=RATE_LIMIT_RETRIES, sleep=time.sleep, **kwargs):
+    """fn(*args, **kwargs), retried with exponential backoff while Twilio
+    answers 429. Other errors are raised straight away."""
+    for attempt in range(retries + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == retries or not is_rate_limited(e):
+                raise
+            sleep(RATE_LIMIT_BACKOFF_SECONDS * (2 ** attempt))
+
+
+def run_parallel(fn, items, concurrency=INVENTORY_CONCURRENCY):
+    """[(item, result, error), ...] for fn(item) over `items`, in order, with
+    at most `concurrency` running at once. An error is captured, not raised."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    items = list(items)
+    if not items:
+        return []
+    out = []
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(items)))) as pool:
+        futures = [(item, pool.submit(fn, item)) for item in items]
+        for item, fut in futures:
+            try:
+                out.append((item, fut.result(), None))
+            except Exception as e:
+                out.append((item, None, e))
+    return out
+
+
+# ── Search cache ────────────────────────────────────────────────────────────
+
+class SearchCache:
+    """Search results per (country, region, number_type), kept `ttl` seconds.
+    Shared by the region workers, so access is locked."""
+
+    def __init__(self, ttl=SEARCH_CACHE_TTL_SECONDS, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, key, limit):
+        """Cached results if at least `limit` are still fresh, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self.clock() - entry[0] > self.ttl:
+                self._entries.pop(key, None)
+                return None
+            return list(entry[1]) if len(entry[1]) >= limit else None
+
+    def put(self, key, results):
+        with self._lock:
+            self._entries[key] = (self.clock(), list(results))
+
+    def discard(self, phone_numbers):
+        """Drop numbers that are no longer for sale (bought, or failed to buy)."""
+        gone = set(phone_numbers)
+        with self._lock:
+            for key, (stamp, results) in list(self._entries.items()):
+                self._entries[key] = (stamp, [r for r in results if r["phone_number"] not in gone])
+
+
+search_cache = SearchCache()
+
+
+def cached_search(search_fn, country_code, region, number_type, limit, cache=None):
+    """search_fn(...) results for a region, from `cache` when fresh. Searches
+    fetch SEARCH_SPARES more than `limit`."""
+    cache = search_cache if cache is None else cache
+    key = (country_code, region, number_type)
+    results = cache.get(key, limit)
+    if results is None:
+        results = with_rate_limit_retry(
+            search_fn, country_code=country_code, region=region,
+            number_type=number_type, limit=limit + SEARCH_SPARES,
+        )
+        cache.put(key, results)
+    return results
+
+
+# ── Bulk writes ─────────────────────────────────────────────────────────────
+
+def number_row(phone_number, friendly_name, country_code, area_code, region, twilio_sid, status="available"):
+    """A twilio_phone_numbers row in NUMBER_COLUMNS order (area_code cut to
+    the column's varchar(10))."""
+    return (phone_number, friendly_name, country_code, area_code[:10] if area_code else None,
+            region, twilio_sid, status)
+
+
+def insert_numbers(cur, rows, skip_existing=True):
+    """
+    Insert number_row() tuples in one statement.
+
+    Returns:
+        dict: {phone_number: phone_number_id} for the rows inserted (rows
+        already present are skipped when skip_existing)
+    """
+    if not rows:
+        return {}
+    from psycopg2.extras import execute_values
+
+    inserted = execute_values(
+        cur,
+        """
+        INSERT INTO twilio_phone_numbers (""" + ", ".join(NUMBER_COLUMNS) + """, created_at, updated_at)
+        VALUES %s
+        """ + ("ON CONFLICT (phone_number) DO NOTHING" if skip_existing else "") + """
+        RETURNING phone_number, phone_number_id
+        """,
+        rows,
+        template="(%s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)",
+        page_size=len(rows),
+        fetch=True,
+    )
+    return {phone: phone_id for phone, phone_id in inserted}
+
+
+def update_numbers(cur, rows):
+    """Fill area_code/region/twilio_sid for [(phone_number_id, area_code,
+    region, twilio_sid), ...] in one statement. A None keeps the current
+    value. Returns the number of rows updated."""
+    if not rows:
+        return 0
+    from psycopg2.extras import execute_values
+
+    rows = [(phone_id, area_code[:10] if area_code else None, region, sid)
+            for phone_id, area_code, region, sid in rows]
+    execute_values(
+        cur,
+        """
+        UPDATE twilio_phone_numbers t
+        SET area_code = COALESCE(v.area_code, t.area_code),
+            region = COALESCE(v.region, t.region),
+            twilio_sid = COALESCE(v.twilio_sid, t.twilio_sid),
+            updated_at = CURRENT_TIMESTAMP
+        FROM (VALUES %s) AS v (phone_number_id, area_code, region, twilio_sid)
+        WHERE t.phone_number_id = v.phone_number_id
+        """,
+        rows,
+        page_size=len(rows),
+    )
+    return cur.rowcount
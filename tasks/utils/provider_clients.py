@@ -0,0 +1,62 @@
+"""
+Process-level Twilio and SendGrid clients.
+
+tasks/sms.py used to build a fresh ``twilio.rest.Client`` for every SMS, so
+each message paid for a new ``requests`` session and TLS handshake. The
+clients here are built once per worker process (per credentials) and reused;
+Twilio's ``TwilioHttpClient`` keeps a pooled keep-alive session, which the
+batch reminder task shares across its sending threads.
+
+Clients are keyed by pid as well, so a prefork child never reuses a socket
+inherited from its parent.
+"""
+
+import os
+import threading
+
+_lock = threading.Lock()
+_clients = {}
+
+TWILIO_HTTP_TIMEOUT_SECONDS = float(os.getenv("TWILIO_HTTP_TIMEOUT_SECONDS", "15"))
+
+
+def _pooled(kind: str, key: tuple, factory):
+    pid = os.getpid()
+    with _lock:
+        entry = _clients.get((kind, key))
+        if entry is None or entry[0] != pid:
+            entry = (pid, factory())
+            _clients[(kind, key)] = entry
+        return entry[1]
+
+
+def twilio_client(account_sid: str | None = None, auth_token: str | None = None):
+    """Shared ``twilio.rest.Client`` for these credentials (env by default)."""
+    sid = account_sid or os.getenv("TWILIO_ACCOUNT_SID")
+    token = auth_token or os.getenv("TWILIO_AUTH_TOKEN")
+
+    def build():
+        from twilio.http.http_client import TwilioHttpClient
+        from twilio.rest import Client
+        return Client(sid, token, http_client=TwilioHttpClient(
+            pool_connections=True, timeout=TWILIO_HTTP_TIMEOUT_SECONDS,
+        ))
+
+    return _pooled("twilio", (sid, token), build)
+
+
+def sendgrid_client(api_key: str | None = None):
+    """Shared ``SendGridAPIClient`` for this key (env by default)."""
+    key = api_key or os.getenv("SENDGRID_API_KEY")
+
+    def build():
+        from sendgrid import SendGridAPIClient
+        return SendGridAPIClient(key)
+
+    return _pooled("sendgrid", (key,), build)
+
+
+def reset() -> None:
+    """Drop every cached client (tests, credential rotation)."""
+    with _lock:
+        _clients.clear()
@@ -309,7 +309,7 @@ def upload_call_log_to_r2(
     return r2_key
 
 
-def download_call_log_from_r2(r2_key: str, use_dev: bool = False) -> bytes:
+def download_call_log_from_r2(r2_key: str, use_dev: bool = False, client=None) -> bytes:
     """
     Fetch a per-call server-log artifact back out of R2, still gzipped.
 
@@ -321,11 +321,15 @@ def download_call_log_from_r2(r2_key: str, use_dev: bool = False) -> bytes:
     Reads only — never deletes or overwrites. Raises on a missing key rather
     than returning None, so a caller cannot mistake "artifact gone" for
     "artifact empty".
+
+    Pass `client` to reuse one boto3 client across many downloads (boto3
+    clients are thread-safe; creating them is not).
     """
     bucket_name = R2_BUCKET_NAME_DEV if use_dev else R2_BUCKET_NAME
     if not bucket_name:
         raise RuntimeError(
             f"R2 bucket not configured ({'R2_BUCKET_NAME_DEV' if use_dev else 'R2_BUCKET_NAME'})"
         )
-    client = _get_r2_client()
+    if client is None:
+        client = _get_r2_client()
     return client.get_object(Bucket=bucket_name, Key=r2_key)["Body"].read()
@@ -0,0 +1,149 @@
+"""
+Short-lived cache of Firecrawl results, and of the LLM extractions built on them.
+
+Onboarding flows scrape the same site several times in one session (preview,
+then "Add From URL" per knowledge type, then the business-profile pilot), and
+every run used to re-fetch every page from Firecrawl and re-run the OpenAI
+extraction on a corpus that had not changed. The R2 artifacts written by
+``build_scrape_artifact_paths`` are an audit trail keyed by the raw URL, not a
+cache: they carry no freshness and are per-location.
+
+Two layers, both in Redis and both best-effort (Redis down == cache miss):
+
+* **Pages** — keyed by the normalised URL. Holds the markdown, Firecrawl's
+  metadata and a content hash, and expires after ``SCRAPE_CACHE_TTL_SECONDS``.
+  A repeat scrape inside that window never touches Firecrawl.
+* **Extractions** — keyed by a hash of everything that determines the model's
+  answer (model, prompt, corpus). When a stale page is re-fetched and the
+  corpus comes back byte-identical, the hash matches and the OpenAI call is
+  skipped. This is the revalidation step: Firecrawl has no conditional GET, so
+  "not modified" is decided on content, not on headers.
+
+Pure apart from the Redis client; nothing here imports celery.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "scrape_cache"
+# 0 disables the page layer entirely (every scrape goes to Firecrawl).
+PAGE_TTL_SECONDS = int(os.getenv("SCRAPE_CACHE_TTL_SECONDS", str(6 * 3600)))
+# Extractions are only ever reused for an identical corpus, so they can live
+# far longer than the pages they were built from.
+EXTRACTION_TTL_SECONDS = int(os.getenv("SCRAPE_EXTRACTION_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+
+def _norm_url(u: str) -> str:
+    """Normalize a URL for dedup: lowercase + strip trailing slash/whitespace."""
+    return (u or "").strip().rstrip("/").lower()
+
+
+def content_hash(*parts: str) -> str:
+    """sha256 over the given strings, NUL-separated so ("ab", "c") != ("a", "bc")."""
+    h = hashlib.sha256()
+    for i, part in enumerate(parts):
+        if i:
+            h.update(b"\0")
+        h.update((part or "").encode("utf-8", errors="ignore"))
+    return h.hexdigest()
+
+
+def _client():
+    url = os.getenv("REDIS_URL")
+    if not url:
+        return None
+    import redis
+    return redis.Redis.from_url(url, decode_responses=True)
+
+
+def _url_key(kind: str, url: str) -> str:
+    # Hashed so arbitrarily long query strings can't produce oversized keys.
+    digest = hashlib.md5(_norm_url(url).encode("utf-8")).hexdigest()
+    return f"{KEY_PREFIX}:{kind}:{digest}"
+
+
+def _get(key: str):
+    try:
+        client = _client()
+        if client is None:
+            return None
+        raw = client.get(key)
+        return json.loads(raw) if raw else None
+    except Exception as exc:
+        logger.warning("[scrape_cache] read %s failed (%s) — treating as a miss", key, exc)
+        return None
+
+
+def _put(key: str, value, ttl: int) -> None:
+    if ttl <= 0:
+        return
+    try:
+        client = _client()
+        if client is None:
+            return
+        client.set(key, json.dumps(value), ex=ttl)
+    except Exception as exc:
+        logger.warning("[scrape_cache] write %s failed (%s) — next run re-fetches", key, exc)
+
+
+# ── Pages ────────────────────────────────────────────────────────────────────
+
+def get_page(url: str) -> dict | None:
+    """Cached Firecrawl ``data`` object for one URL, or None on a miss."""
+    if PAGE_TTL_SECONDS <= 0:
+        return None
+    entry = _get(_url_key("page", url))
+    return entry.get("data") if isinstance(entry, dict) else None
+
+
+def put_page(url: str, data: dict) -> None:
+    """Cache a Firecrawl ``data`` object. Empty results are never cached — an
+    empty page is usually a transient render failure, not the site's content."""
+    markdown = (data or {}).get("markdown") or ""
+    if not markdown.strip():
+        return
+    _put(_url_key("page", url), {
+        "data": {"markdown": markdown, "metadata": data.get("metadata") or {}},
+        "content_hash": content_hash(markdown),
+        "fetched_at": int(time.time()),
+    }, PAGE_TTL_SECONDS)
+
+
+def get_crawl(url: str, page_limit: int) -> list[dict] | None:
+    """Cached ``[{url, title, markdown}, ...]`` for a whole-site crawl."""
+    if PAGE_TTL_SECONDS <= 0:
+        return None
+    entry = _get(_url_key(f"crawl:{int(page_limit)}", url))
+    return entry.get("pages") if isinstance(entry, dict) else None
+
+
+def put_crawl(url: str, page_limit: int, pages: list[dict]) -> None:
+    if not pages:
+        return
+    _put(_url_key(f"crawl:{int(page_limit)}", url), {
+        "pages": pages,
+        "content_hash": content_hash(*(p.get("markdown") or "" for p in pages)),
+        "fetched_at": int(time.time()),
+    }, PAGE_TTL_SECONDS)
+
+
+# ── Extractions ──────────────────────────────────────────────────────────────
+
+def get_extraction(namespace: str, digest: str):
+    """Previously stored extraction for this ``content_hash``, or None."""
+    entry = _get(f"{KEY_PREFIX}:extract:{namespace}:{digest}")
+    return entry.get("value") if isinstance(entry, dict) else None
+
+
+def put_extraction(namespace: str, digest: str, value) -> None:
+    if value is None:
+        return
+    _put(f"{KEY_PREFIX}:extract:{namespace}:{digest}", {
+        "value": value,
+        "stored_at": int(time.time()),
+    }, EXTRACTION_TTL_SECONDS)
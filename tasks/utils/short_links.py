@@ -0,0 +1,169 @@
+"""
+Short links for the manage-booking URL in customer SMS.
+
+``create_tiny_url`` used to POST to TinyURL (10s timeout) for every SMS, and
+the confirmation, the modification and each reminder offset of one booking all
+re-shortened the same URL — so a reminder burst at the top of the hour was
+gated by TinyURL latency. This module puts a store in front of it:
+
+* **Store.** long URL -> short URL in Redis for ``SHORT_LINK_TTL_SECONDS``
+  (default 180 days, longer than any booking's reminder window). A URL is
+  shortened once, then every later SMS for that booking is a Redis read.
+* **Own redirect keys.** With ``SHORT_LINK_BASE_URL`` set (the public URL of
+  this app), a miss mints a code locally — ``<base>/s/<code>``, resolved by the
+  ``/s/<code>`` route in app.py — and never calls TinyURL at all. Without it,
+  a miss falls back to TinyURL and caches the result.
+* **Pre-warming.** ``tasks.sms.warm_manage_link`` shortens a booking's link
+  ahead of time (app.py enqueues it when no customer SMS is sent, so the first
+  reminder still finds it warm).
+
+Everything is best-effort: Redis down means "shorten as before", and a failed
+shortening returns the long URL, which still works in an SMS.
+
+**Eviction.** Redis holds the only copy of a code -> URL mapping. If a code
+is lost, a link already sent in an SMS returns 404. So the Redis behind
+REDIS_URL must run with ``maxmemory-policy noeviction`` (see render.yaml). A
+``volatile-*`` policy does not protect these keys, because every one of them
+has a TTL. Each new SMS for an own-code link also re-asserts its code key, so
+the link stays valid for LINK_TTL_SECONDS after the last SMS that carried it.
+"""
+
+import hashlib
+import logging
+import os
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "short_link"
+LINK_TTL_SECONDS = int(os.getenv("SHORT_LINK_TTL_SECONDS", str(180 * 24 * 3600)))
+TINYURL_TIMEOUT_SECONDS = float(os.getenv("TINYURL_TIMEOUT_SECONDS", "10"))
+CODE_LENGTH = 8
+
+_ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def _client():
+    url = os.getenv("REDIS_URL")
+    if not url:
+        return None
+    import redis
+    return redis.Redis.from_url(url, decode_responses=True)
+
+
+def _url_key(long_url: str) -> str:
+    return f"{KEY_PREFIX}:url:{hashlib.sha256(long_url.encode('utf-8')).hexdigest()}"
+
+
+def _code_key(code: str) -> str:
+    return f"{KEY_PREFIX}:code:{code}"
+
+
+def _code(long_url: str, attempt: int) -> str:
+    """Deterministic base62 code, so re-minting the same URL yields the same link."""
+    n = int.from_bytes(hashlib.sha256(f"{attempt}:{long_url}".encode("utf-8")).digest()[:8], "big")
+    out = []
+    for _ in range(CODE_LENGTH):
+        n, r = divmod(n, len(_ALPHABET))
+        out.append(_ALPHABET[r])
+    return "".join(out)
+
+
+def own_base_url() -> str | None:
+    base = (os.getenv("SHORT_LINK_BASE_URL") or "").strip().rstrip("/")
+    return base or None
+
+
+def tinyurl_create(long_url: str) -> str | None:
+    """Shorten via the TinyURL API. None on any failure."""
+    api_token = os.getenv("TINYURL_API_TOKEN")
+    if not api_token:
+        print("[TinyURL] API token not found, returning original URL")
+        return None
+    try:
+        response = requests.post(
+            "https://api.tinyurl.com/create",
+            headers={"Authorization": f"Bearer {api_token}", "Content-Type": "application/json"},
+            json={"url": long_url},
+            timeout=TINYURL_TIMEOUT_SECONDS,
+        )
+        if response.status_code != 200:
+            print(f"[TinyURL] API error {response.status_code}: {response.text}")
+            return None
+        tiny_url = response.json().get("data", {}).get("tiny_url")
+        if not tiny_url:
+            print("[TinyURL] No tiny_url in response, returning original URL")
+            return None
+        print(f"[TinyURL] Successfully shortened URL: {long_url} -> {tiny_url}")
+        return tiny_url
+    except Exception as e:
+        print(f"[TinyURL] Error creating short URL: {e}")
+        return None
+
+
+def _mint(client, long_url: str, base: str) -> str | None:
+    for attempt in range(4):
+        code = _code(long_url, attempt)
+        # NX: an existing code is only reused if it already points at this URL.
+        if client.set(_code_key(code), long_url, nx=True, ex=LINK_TTL_SECONDS):
+            return f"{base}/s/{code}"
+        if client.get(_code_key(code)) == long_url:
+            client.expire(_code_key(code), LINK_TTL_SECONDS)
+            return f"{base}/s/{code}"
+    logger.warning("[short_links] no free code for %s after 4 attempts", long_url)
+    return None
+
+
+def shorten(long_url: str) -> str:
+    """Short link for `long_url`: cached, else minted locally, else TinyURL.
+    Returns `long_url` itself if nothing worked."""
+    try:
+        client = _client()
+    except Exception as exc:
+        logger.warning("[short_links] redis unavailable (%s)", exc)
+        client = None
+
+    if client is not None:
+        try:
+            cached = client.get(_url_key(long_url))
+            base = own_base_url()
+            if cached and not (base and cached.startswith(f"{base}/s/")):
+                return cached
+            if base:
+                # Also on a hit for our own link: re-asserts the code key, so
+                # the redirect lives as long as the link is still being sent.
+                short = _mint(client, long_url, base)
+                if short:
+                    if short != cached:
+                        client.set(_url_key(long_url), short, ex=LINK_TTL_SECONDS)
+                    return short
+            if cached:
+                return cached
+        except Exception as exc:
+            logger.warning("[short_links] store failed (%s) — falling back to TinyURL", exc)
+            client = None
+
+    short = tinyurl_create(long_url)
+    if short is None:
+        return long_url
+    if client is not None:
+        try:
+            client.set(_url_key(long_url), short, ex=LINK_TTL_SECONDS)
+        except Exception as exc:
+            logger.warning("[short_links] cache write failed (%s)", exc)
+    return short
+
+
+def resolve(code: str) -> str | None:
+    """Long URL for one of our own codes, or None."""
+    if not code or len(code) != CODE_LENGTH or any(c not in _ALPHABET for c in code):
+        return None
+    try:
+        client = _client()
+        if client is None:
+            return None
+        return client.get(_code_key(code))
+    except Exception as exc:
+        logger.warning("[short_links] resolve failed for %s (%s)", code, exc)
+        return None
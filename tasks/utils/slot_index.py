@@ -0,0 +1,247 @@
+"""
+Slot-search index over the availability cache.
+
+The availability chunks answer "what does this location look like for these
+three days", but "earliest slot for service X, or for a party of N, at or
+after T" meant fetching chunk blobs and scanning them — cost grows with chunk
+size, and the voice agent asks it mid-call. The generators in
+tasks/availability_gen_regen.py now also write every day they compute into
+Redis sorted sets, one per *lane*:
+
+* ``svc_<service_id>`` (staff locations): every start at which some staff
+  member offering the service has a free window at least the service's
+  duration long (the minimum for flexible services), on the
+  ``DEFAULT_SLOT_INTERVAL_MINUTES`` grid from the window start.
+* ``cap_<min>_<max>`` (venue locations): every ``bookable_starts`` entry of
+  the venue units seating ``min``..``max`` guests.
+
+Members are ``"YYYY-MM-DD HH:MM|<staff or unit id>"``, scored by minutes since
+1970-01-01 of the location's local wall-clock time, so earliest-fit is one
+``ZRANGEBYSCORE … LIMIT 0 1`` per lane and a range query is one bounded
+``ZRANGEBYSCORE`` — logarithmic in the index, independent of chunk size. A
+hash ``…:lanes`` records which lanes exist and what they hold, so a party-size
+query only touches the capacity lanes that fit.
+
+Days are replaced whole (the day's score range is cleared in every lane, then
+rewritten): regen replaces the days it computed, and every other run rebuilds
+the index from the whole window it cached, which keeps both consistent with
+the chunks. Best-effort like the rest of the cache: a failed index write is
+logged and the chunks stay authoritative.
+"""
+
+import json
+import logging
+import os
+import threading
+from datetime import date, datetime
+
+from tasks.utils.availability_helpers import DEFAULT_SLOT_INTERVAL_MINUTES
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "slot_index"
+# Lanes outlive the 60-day window by a little; every run refreshes them.
+INDEX_TTL_SECONDS = int(os.getenv("SLOT_INDEX_TTL_SECONDS", str(62 * 24 * 3600)))
+MINUTES_PER_DAY = 24 * 60
+_EPOCH = date(1970, 1, 1)
+
+_client_lock = threading.Lock()
+_clients = {}
+
+
+def _client():
+    """One pooled client per process (the app answers live-call lookups)."""
+    url = os.getenv("REDIS_URL")
+    if not url:
+        return None
+    pid = os.getpid()
+    with _client_lock:
+        client = _clients.get((pid, url))
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url, decode_responses=True)
+            _clients[(pid, url)] = client
+        return client
+
+
+def _prefix(tenant_id, location_id):
+    return f"{KEY_PREFIX}:tenant_{tenant_id}:location_{location_id}"
+
+
+def lane_key(tenant_id, location_id, lane):
+    return f"{_prefix(tenant_id, location_id)}:{lane}"
+
+
+def lanes_key(tenant_id, location_id):
+    return f"{_prefix(tenant_id, location_id)}:lanes"
+
+
+# ── Scores ───────────────────────────────────────────────────────────────────
+
+def score(date_str, hhmm):
+    """Minutes since 1970-01-01 of a local date + 'HH:MM[:SS]'."""
+    days = (date.fromisoformat(date_str) - _EPOCH).days
+    hours, minutes = hhmm.split(":")[:2]
+    return days * MINUTES_PER_DAY + int(hours) * 60 + int(minutes)
+
+
+def score_of(local_dt):
+    """Score of a naive (location-local) datetime."""
+    return score(local_dt.date().isoformat(), local_dt.strftime("%H:%M"))
+
+
+def _day_bounds(date_str):
+    start = score(date_str, "00:00")
+    return start, start + MINUTES_PER_DAY - 1
+
+
+# ── Building ─────────────────────────────────────────────────────────────────
+
+def _to_minutes(hhmmss):
+    hours, minutes = hhmmss.split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def staff_day_entries(day, services):
+    """{lane: {member: score}} and {lane: meta} for one staff day."""
+    entries, meta = {}, {}
+    if not day.get("is_open"):
+        return entries, meta
+    durations = {
+        s["id"]: s.get("min_duration_minutes") if s.get("is_flexible_duration") else s["duration"]
+        for s in services
+    }
+    step = DEFAULT_SLOT_INTERVAL_MINUTES
+    day_start = score(day["date"], "00:00")
+    for staff in day.get("staff", []):
+        for service_id in staff.get("service", []):
+            duration = durations.get(service_id)
+            if not duration:
+                continue
+            lane = f"svc_{service_id}"
+            members = entries.setdefault(lane, {})
+            meta[lane] = {"kind": "service", "service_id": service_id}
+            for slot in staff.get("slots", []):
+                start, end = _to_minutes(slot["start"]), _to_minutes(slot["end"])
+                for t in range(start, end - duration + 1, step):
+                    members[f"{day['date']} {t // 60:02d}:{t % 60:02d}|{staff['id']}"] = day_start + t
+    return entries, meta
+
+
+def venue_day_entries(day):
+    """{lane: {member: score}} and {lane: meta} for one venue day."""
+    entries, meta = {}, {}
+    if not day.get("is_open"):
+        return entries, meta
+    for unit in day.get("tables", day.get("venue_units", [])):
+        low = unit.get("min_capacity") or 1
+        high = unit.get("capacity")
+        if not high:
+            continue
+        lane = f"cap_{low}_{high}"
+        members = entries.setdefault(lane, {})
+        meta[lane] = {"kind": "capacity", "min": low, "max": high}
+        for slot in unit.get("slots", []):
+            for start in slot.get("bookable_starts", []):
+                members[f"{day['date']} {start}|{unit['id']}"] = score(day["date"], start)
+    return entries, meta
+
+
+def write_days(client, tenant_id, location_id, days, services=None, rebuild=False):
+    """Replace the index entries of every day in `days` ({date_str: day}, as
+    cached in the chunks). Staff days need `services` (the chunk's list).
+    `rebuild` drops every existing lane first — for runs that pass the
+    whole window. Returns the number of members written, or None on failure."""
+    entries, meta = {}, {}
+    for day in days.values():
+        if "staff" in day:
+            day_entries, day_meta = staff_day_entries(day, services or [])
+        else:
+            day_entries, day_meta = venue_day_entries(day)
+        for lane, members in day_entries.items():
+            entries.setdefault(lane, {}).update(members)
+        meta.update(day_meta)
+
+    try:
+        lanes_hash = lanes_key(tenant_id, location_id)
+        existing = set(client.hkeys(lanes_hash))
+        pipe = client.pipeline(transaction=True)
+        if rebuild:
+            for lane in existing:
+                pipe.delete(lane_key(tenant_id, location_id, lane))
+            pipe.delete(lanes_hash)
+            existing = set()
+        for lane in existing | set(entries):
+            key = lane_key(tenant_id, location_id, lane)
+            for date_str in days:
+                pipe.zremrangebyscore(key, *_day_bounds(date_str))
+            if entries.get(lane):
+                pipe.zadd(key, entries[lane])
+            pipe.expire(key, INDEX_TTL_SECONDS)
+        if meta:
+            pipe.hset(lanes_hash, mapping={lane: json.dumps(m) for lane, m in meta.items()})
+        pipe.expire(lanes_hash, INDEX_TTL_SECONDS)
+        pipe.execute()
+    except Exception as exc:
+        logger.warning("[slot_index] write for %s/%s failed (%s) — chunks stay authoritative",
+                       tenant_id, location_id, exc)
+        return None
+    return sum(len(m) for m in entries.values())
+
+
+# ── Querying ─────────────────────────────────────────────────────────────────
+
+def _lanes_for(client, tenant_id, location_id, service_id=None, party_size=None):
+    if service_id is not None:
+        return [f"svc_{service_id}"]
+    lanes = []
+    for lane, raw in client.hgetall(lanes_key(tenant_id, location_id)).items():
+        m = json.loads(raw)
+        if m["kind"] == "capacity" and (party_size is None or m["min"] <= party_size <= m["max"]):
+            lanes.append(lane)
+    return lanes
+
+
+def _slot(member, lane):
+    when, unit_id = member.rsplit("|", 1)
+    day, start = when.split(" ")
+    slot = {"date": day, "start": start, "lane": lane}
+    slot["staff_id" if lane.startswith("svc_") else "venue_unit_id"] = int(unit_id)
+    return slot
+
+
+def search(client, tenant_id, location_id, after, before=None, service_id=None,
+           party_size=None, limit=20):
+    """Free starts in [after, before] (naive local datetimes; `before` None =
+    open-ended), earliest first, at most `limit`. Filter by `service_id`
+    (staff locations) or `party_size` (venue locations)."""
+    lanes = _lanes_for(client, tenant_id, location_id, service_id, party_size)
+    if not lanes:
+        return []
+    low = score_of(after)
+    high = score_of(before) if before else "+inf"
+    pipe = client.pipeline(transaction=False)
+    for lane in lanes:
+        pipe.zrangebyscore(lane_key(tenant_id, location_id, lane), low, high,
+                           start=0, num=limit, withscores=True)
+    found = [
+        (s, member, lane)
+        for lane, rows in zip(lanes, pipe.execute())
+        for member, s in rows
+    ]
+    found.sort(key=lambda row: (row[0], row[1]))
+    return [_slot(member, lane) for _, member, lane in found[:limit]]
+
+
+def earliest(client, tenant_id, location_id, after, service_id=None, party_size=None,
+             before=None):
+    """The first free start at or after `after`, or None."""
+    hits = search(client, tenant_id, location_id, after, before=before,
+                  service_id=service_id, party_size=party_size, limit=1)
+    return hits[0] if hits else None
+
+
+def local_now(location_tz):
+    """The location's current wall-clock time, naive, to pass as `after`."""
+    from zoneinfo import ZoneInfo
+    return datetime.now(ZoneInfo(location_tz)).replace(tzinfo=None, second=0, microsecond=0)
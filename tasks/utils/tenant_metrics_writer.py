@@ -0,0 +1,86 @@
+"""
+Buffered writer for tenant_aggregated_metrics.
+
+The dashboard metrics run used to open a connection per tenant just to
+upsert one row. A MetricsWriter instead collects the finished metrics of
+many tenants on a connection the caller already holds. It writes them with
+one multi-row ``INSERT ... ON CONFLICT`` (execute_values, one statement per
+flush) and commits.
+
+    with MetricsWriter(conn) as writer:
+        for tenant_id in tenant_ids:
+            writer.add(tenant_id, build_metrics(tenant_id))   # flushes every batch_size
+    # flushed on a clean exit; a pending buffer is dropped on an exception
+
+A tenant added twice before a flush keeps its latest metrics (Postgres
+rejects an ON CONFLICT statement that touches the same row twice).
+"""
+
+import json
+from datetime import datetime
+
+# v2 = four channel bands + 'completed' counted. Kept in step with
+# speako-web's generator, which writes the same string.
+METRICS_VERSION = "v2"
+
+BATCH_SIZE = 200
+
+UPSERT_SQL = """
+    INSERT INTO tenant_aggregated_metrics
+        (tenant_id, generated_at, metrics, metrics_version)
+    VALUES %s
+    ON CONFLICT (tenant_id)
+    DO UPDATE SET
+        generated_at = EXCLUDED.generated_at,
+        metrics = EXCLUDED.metrics,
+        metrics_version = EXCLUDED.metrics_version
+"""
+
+
+class MetricsWriter:
+    """Buffers (tenant_id, metrics) rows and upserts them in bulk on `conn`."""
+
+    def __init__(self, conn, batch_size=BATCH_SIZE):
+        self.conn = conn
+        self.batch_size = batch_size
+        self._pending = {}
+        self.written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        else:
+            self._pending.clear()
+        return False
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, tenant_id, metrics, generated_at=None):
+        """Queue a tenant's metrics; flushes once batch_size tenants are pending."""
+        self._pending[tenant_id] = (tenant_id, generated_at or datetime.now(), json.dumps(metrics), METRICS_VERSION)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Upsert everything pending in one statement and commit. Returns the
+        number of tenants written. On failure the transaction is rolled back
+        and the rows stay pending."""
+        if not self._pending:
+            return 0
+        from psycopg2.extras import execute_values
+
+        rows = list(self._pending.values())
+        try:
+            with self.conn.cursor() as cur:
+                execute_values(cur, UPSERT_SQL, rows, page_size=len(rows))
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        self._pending.clear()
+        self.written += len(rows)
+        return len(rows)
@@ -0,0 +1,169 @@
+"""
+Dense array engine for the dashboard booking trends.
+
+The trends used to be built as one Python list per (location, band). Each
+rollup row was placed with a ``dates.index()`` linear search, and locations
+were summed with a triple loop. Every 7/30/90-day window was then copied out
+as new lists. On chains with many locations that was the CPU-bound part of a
+tenant's metrics run.
+
+A TrendCube holds the counts as one int64 array of shape (location, band,
+day) over a shared list of day labels:
+
+* placing rows is one fancy-indexed assignment, with O(1) dict lookups for
+  the location and day (by ordinal) indices;
+* ``all_locations`` is ``counts.sum(axis=0)``;
+* windows are views (``[..., -w:]``). Lists are only materialised by
+  ``tolist()`` when the JSON is built.
+
+The JSON is exactly the shape generate_dashboard_metrics has always cached
+and stored (see test_trends_engine.py for the parity check against the list
+implementation).
+"""
+
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from tasks.utils.daily_location_metrics import BAND_FIELDS
+
+DAYS = 90
+WINDOWS = (7, 30, 90)
+
+
+def window_end(timezones, now=None):
+    """The last day of a tenant's window: the latest local date among its
+    locations' timezones, so every location's today is on the axis (each
+    location's rows are already bucketed by its own local date). Falls back
+    to the UTC date when no timezone is usable."""
+    now = now or datetime.now(timezone.utc)
+    days = []
+    for tz in timezones:
+        try:
+            days.append(now.astimezone(ZoneInfo(tz)).date())
+        except Exception:
+            continue
+    return max(days) if days else now.date()
+
+
+def window_dates(end, days=DAYS):
+    """ISO labels of the `days` days ending at `end`, oldest first."""
+    return [(end - timedelta(days=i)).isoformat() for i in range(days - 1, -1, -1)]
+
+
+def _ordinal(day):
+    """Day key for a date or an ISO date string."""
+    return (date.fromisoformat(day) if isinstance(day, str) else day).toordinal()
+
+
+class TrendCube:
+    """Booking counts per (location, band, day) over `dates` (ISO strings,
+    oldest first)."""
+
+    def __init__(self, location_ids, dates, names=None):
+        self.location_ids = list(location_ids)
+        self.dates = list(dates)
+        self.names = dict(names or {})
+        self.counts = np.zeros((len(self.location_ids), len(BAND_FIELDS), len(self.dates)), dtype=np.int64)
+        self._reindex()
+
+    def _reindex(self):
+        self._loc_index = {loc: i for i, loc in enumerate(self.location_ids)}
+        self._day_index = {_ordinal(d): i for i, d in enumerate(self.dates)}
+
+    # ── Building ─────────────────────────────────────────────────────────────
+
+    @classmethod
+    def from_rows(cls, location_ids, dates, rows):
+        cube = cls(location_ids, dates)
+        cube.fill(rows)
+        return cube
+
+    @classmethod
+    def from_json(cls, trends):
+        """A cube over a cached trends dict. Bands the cache predates start
+        at zero."""
+        by_location = trends["by_location"]
+        cube = cls([int(k) for k in by_location], trends["all_locations"]["90_days"]["dates"],
+                   names={int(k): v.get("location_name") for k, v in by_location.items()})
+        for i, loc_data in enumerate(by_location.values()):
+            series = loc_data["90_days"]
+            for b, field in enumerate(BAND_FIELDS):
+                if field in series:
+                    cube.counts[i, b, :] = series[field]
+        return cube
+
+    def fill(self, rows):
+        """Write rollup rows (location_id, date, <one count per band>) into
+        their cells. Rows for other locations or days outside the window are
+        ignored."""
+        rows = list(rows)
+        if not rows:
+            return
+        columns = list(zip(*rows))
+        li = np.array([self._loc_index.get(loc, -1) for loc in columns[0]])
+        di = np.array([self._day_index.get(_ordinal(day), -1) for day in columns[1]])
+        values = np.array(columns[2:2 + len(BAND_FIELDS)], dtype=object).T
+        values[np.equal(values, None)] = 0
+        keep = (li >= 0) & (di >= 0)
+        self.counts[li[keep], :, di[keep]] = values[keep].astype(np.int64)
+
+    def add_location(self, location_id, name=None):
+        self.location_ids.append(location_id)
+        self.names[location_id] = name
+        self.counts = np.concatenate([self.counts, np.zeros((1,) + self.counts.shape[1:], dtype=np.int64)])
+        self._reindex()
+
+    def roll(self, new_dates):
+        """Slide the window forward: drop the oldest len(new_dates) days and
+        append `new_dates` as empty days."""
+        n = len(new_dates)
+        if not n:
+            return
+        if n >= len(self.dates):
+            self.counts[:] = 0
+        else:
+            self.counts[:, :, :-n] = self.counts[:, :, n:]
+            self.counts[:, :, -n:] = 0
+        self.dates = (self.dates + list(new_dates))[-len(self.dates):]
+        self._reindex()
+
+    def advance_to(self, end):
+        """Catch the window up so it ends at `end`, for a cube over
+        consecutive days. The new days start empty and the old last day is
+        cleared too (it was cut mid-day), so refilling from the returned
+        date onwards makes the cube equal to a full build at `end`. Returns
+        None when the gap is a window or more (or the cube is ahead of
+        `end`), meaning only a full build will do."""
+        last = date.fromisoformat(self.dates[-1])
+        gap = (end - last).days
+        if gap < 0 or gap >= len(self.dates):
+            return None
+        self.roll(window_dates(end, gap + 1)[1:])
+        self.counts[:, :, -(gap + 1):] = 0
+        return last
+
+    # ── Output ───────────────────────────────────────────────────────────────
+
+    def _windows(self, series):
+        """{"7_days": {...}, ...} for a (band, day) array, by views."""
+        out = {}
+        for w in WINDOWS:
+            view = series[:, -w:]
+            out[f"{w}_days"] = dict(
+                {"dates": self.dates[-w:]},
+                **{field: view[b].tolist() for b, field in enumerate(BAND_FIELDS)},
+            )
+        return out
+
+    def to_json(self, location_names=None):
+        """The trends dict. A location's name comes from `location_names`
+        only when the cube does not already carry one (cached names are kept,
+        as they always were)."""
+        location_names = location_names or {}
+        trends = {"all_locations": self._windows(self.counts.sum(axis=0)), "by_location": {}}
+        for i, loc in enumerate(self.location_ids):
+            name = self.names.get(loc) or location_names.get(loc, f"Location {loc}")
+            trends["by_location"][str(loc)] = dict({"location_name": name}, **self._windows(self.counts[i]))
+        return trends
@@ -18,6 +18,12 @@ Separate from the log sweep on purpose: recordings arrive AFTER the call (Twilio
 finalises them, then voice-ai uploads with retries), so the audio frequently is
 not there yet when the log sweep runs.
 
+Findings are handled per conversation: a call with several dropped utterances
+downloads its recording and log once and decodes the audio once
+(call_verify.verify_findings). Up to FETCH_CONCURRENCY conversations are
+downloaded at a time; decoding stays on the task's own thread so at most a
+few recordings are held in memory.
+
 ⚠️ Never overrides a human. The verifier writes `confidence` and `evidence`, and
 may set `status` only while it is still `open`.
 """
@@ -25,14 +31,16 @@ may set `status` only while it is still `open`.
 import gzip
 import json
 import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 import psycopg2
 import requests
 from celery.utils.log import get_task_logger
 
 from tasks.celery_app import app
-from tasks.utils.call_verify import unverifiable, verify_finding
-from tasks.utils.publish_r2 import download_call_log_from_r2
+from tasks.utils.call_verify import unverifiable, verify_findings
+from tasks.utils.publish_r2 import _get_r2_client, download_call_log_from_r2
 
 logger = get_task_logger(__name__)
 
@@ -50,10 +58,73 @@ VERIFIABLE_RULES = ("stt_empty_transcript", "stt_transcription_failed")
 RETRYABLE_REASONS = ("error", "audio_missing", "no_audio")
 RETRY_WINDOW = "2 days"     # recordings land in minutes; this is generous
 
-MAX_CALLS_PER_RUN = 25
+MAX_CALLS_PER_RUN = 100                 # conversations, not findings
+FETCH_CONCURRENCY = int(os.getenv("VERIFY_FETCH_CONCURRENCY", "4"))
 AUDIO_TIMEOUT_SECONDS = 30
 MAX_AUDIO_BYTES = 25 * 1024 * 1024      # a long call is ~2MB; this is a sanity cap
 
+# Newest conversations with at least one eligible finding, then every eligible
+# finding of each — so a call's findings are never split across runs.
+ELIGIBLE_FINDINGS_SQL = """
+    WITH eligible AS (
+        SELECT f.id, f.rule_id, f.evidence, f.location_conversation_id, f.created_at,
+               c.audio_r2_path, c.raw_metadata->>'log_r2_key' AS log_key
+          FROM call_quality_findings f
+          JOIN location_conversations c
+            ON c.location_conversation_id = f.location_conversation_id
+         WHERE f.rule_id = ANY(%s)
+           AND f.status = 'open'
+           AND c.raw_metadata ? 'log_r2_key'
+           AND (
+                 NOT (f.evidence ? 'audio_verified')
+              OR (f.evidence->>'audio_reason' = ANY(%s)
+                  AND f.created_at > now() - %s::interval)
+               )
+    ), calls AS (
+        SELECT location_conversation_id
+          FROM eligible
+         GROUP BY location_conversation_id
+         ORDER BY max(created_at) DESC
+         LIMIT %s
+    )
+    SELECT e.id, e.rule_id, e.evidence, e.location_conversation_id,
+           e.audio_r2_path, e.log_key
+      FROM eligible e
+      JOIN calls USING (location_conversation_id)
+     ORDER BY e.created_at DESC
+"""
+
+
+def _fetch_call(audio_url, log_key, is_dev, r2):
+    """(audio_bytes, log_text, None) for one conversation, or (None, None,
+    reason) when there is nothing to verify against. Network errors raise."""
+    if not audio_url:
+        return None, None, "no_audio"
+    resp = requests.get(audio_url, timeout=AUDIO_TIMEOUT_SECONDS)
+    if resp.status_code != 200 or not resp.content:
+        return None, None, "audio_missing"
+    if len(resp.content) > MAX_AUDIO_BYTES:
+        return None, None, "audio_too_large"
+    log_gz = download_call_log_from_r2(log_key, use_dev=is_dev, client=r2)
+    return resp.content, gzip.decompress(log_gz).decode("utf-8", "replace"), None
+
+
+def _fetched(calls, fetch, workers):
+    """Yield (call, future) in order, at most 2*workers downloads ahead of the
+    consumer — bounds how many recordings are held at once."""
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        pending = deque()
+        it = iter(calls)
+        for call in it:
+            pending.append((call, pool.submit(fetch, call)))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            yield pending.popleft()
+            nxt = next(it, None)
+            if nxt is not None:
+                pending.append((nxt, pool.submit(fetch, nxt)))
+
 
 @app.task(bind=True, name="tasks.verify_call_findings.verify_call_findings")
 def verify_call_findings(self, is_dev=False, limit=None):
@@ -71,75 +142,71 @@ def verify_call_findings(self, is_dev=False, limit=None):
     conn = psycopg2.connect(db_url)
     cur = conn.cursor()
     cur.execute(
-        """
-        SELECT f.id, f.rule_id, f.evidence, f.location_conversation_id,
-               c.audio_r2_path, c.raw_metadata->>'log_r2_key'
-          FROM call_quality_findings f
-          JOIN location_conversations c
-            ON c.location_conversation_id = f.location_conversation_id
-         WHERE f.rule_id = ANY(%s)
-           AND f.status = 'open'
-           AND c.raw_metadata ? 'log_r2_key'
-           AND (
-                 NOT (f.evidence ? 'audio_verified')
-              OR (f.evidence->>'audio_reason' = ANY(%s)
-                  AND f.created_at > now() - %s::interval)
-               )
-         ORDER BY f.created_at DESC
-         LIMIT %s
-        """,
+        ELIGIBLE_FINDINGS_SQL,
         (list(VERIFIABLE_RULES), list(RETRYABLE_REASONS), RETRY_WINDOW,
          min(limit or MAX_CALLS_PER_RUN, MAX_CALLS_PER_RUN)),
     )
     rows = cur.fetchall()
 
+    # conv_id -> (audio_url, log_key, [(fid, rule_id, evidence)]), newest first
+    calls = {}
+    for fid, rule_id, evidence, conv_id, audio_url, log_key in rows:
+        calls.setdefault(conv_id, (audio_url, log_key, []))[2].append(
+            (fid, rule_id, evidence))
+
+    try:
+        r2 = _get_r2_client()
+    except Exception as exc:
+        logger.warning("[AudioVerify] R2 client unavailable: %s", exc)
+        r2 = None
+
     counts = {"spoke": 0, "silent": 0, "ambiguous": 0,
               "unaligned": 0, "unverifiable": 0}
-    for fid, rule_id, evidence, conv_id, audio_url, log_key in rows:
+
+    def fetch(conv_id):
+        audio_url, log_key, _ = calls[conv_id]
+        return _fetch_call(audio_url, log_key, is_dev, r2)
+
+    for conv_id, future in _fetched(list(calls), fetch, FETCH_CONCURRENCY):
+        findings = calls[conv_id][2]
         try:
-            if not audio_url:
-                result = unverifiable("no_audio")
+            audio_bytes, log_text, reason = future.result()
+            if reason:
+                results = [unverifiable(reason) for _ in findings]
             else:
-                resp = requests.get(audio_url, timeout=AUDIO_TIMEOUT_SECONDS)
-                if resp.status_code != 200 or not resp.content:
-                    result = unverifiable("audio_missing")
-                elif len(resp.content) > MAX_AUDIO_BYTES:
-                    result = unverifiable("audio_too_large")
-                else:
-                    log_text = download_call_log_from_r2(
-                        log_key, use_dev=is_dev)
-                    result = verify_finding(
-                        {"rule_id": rule_id, "evidence": evidence or {}},
-                        gzip.decompress(log_text).decode("utf-8", "replace"),
-                        resp.content,
-                    )
+                results = verify_findings(
+                    [{"rule_id": rule_id, "evidence": evidence or {}}
+                     for _, rule_id, evidence in findings],
+                    log_text, audio_bytes,
+                )
         except Exception as exc:
-            logger.warning("[AudioVerify] finding %s failed: %s", fid, exc)
-            result = unverifiable("error")
-
-        verdict = result.get("audio_verified", "unverifiable")
-        counts[verdict if verdict in counts else "unverifiable"] += 1
-
-        # Only `spoke` raises confidence. A `silent` verdict does NOT clear the
-        # finding: alignment drifts ~1-1.5s, so absence in the window is much
-        # weaker evidence than presence. Confirm or abstain, never contradict.
-        confidence = "high" if verdict == "spoke" else None
-        # Strip `audio_reason` before merging: a retry that succeeds must not
-        # leave the previous attempt's failure reason sitting beside its verdict.
-        # The new payload re-adds it only if this attempt also abstained.
-        cur.execute(
-            """UPDATE call_quality_findings
-                  SET evidence = (COALESCE(evidence,'{}'::jsonb) - 'audio_reason')
-                                 || %s::jsonb,
-                      confidence = COALESCE(%s, confidence)
-                WHERE id = %s AND status = 'open'""",
-            (json.dumps(result), confidence, fid),
-        )
-
-    conn.commit()
+            logger.warning("[AudioVerify] conversation %s failed: %s", conv_id, exc)
+            results = [unverifiable("error") for _ in findings]
+
+        for (fid, _, _), result in zip(findings, results):
+            verdict = result.get("audio_verified", "unverifiable")
+            counts[verdict if verdict in counts else "unverifiable"] += 1
+
+            # Only `spoke` raises confidence. A `silent` verdict does NOT clear the
+            # finding: alignment drifts ~1-1.5s, so absence in the window is much
+            # weaker evidence than presence. Confirm or abstain, never contradict.
+            confidence = "high" if verdict == "spoke" else None
+            # Strip `audio_reason` before merging: a retry that succeeds must not
+            # leave the previous attempt's failure reason sitting beside its verdict.
+            # The new payload re-adds it only if this attempt also abstained.
+            cur.execute(
+                """UPDATE call_quality_findings
+                      SET evidence = (COALESCE(evidence,'{}'::jsonb) - 'audio_reason')
+                                     || %s::jsonb,
+                          confidence = COALESCE(%s, confidence)
+                    WHERE id = %s AND status = 'open'""",
+                (json.dumps(result), confidence, fid),
+            )
+        conn.commit()   # per call: a long run keeps what it has verified
+
     conn.close()
 
     summary = {"success": True, "env": "dev" if is_dev else "prod",
-               "considered": len(rows), **counts}
+               "considered": len(rows), "calls": len(calls), **counts}
     logger.info("[AudioVerify] %s", json.dumps(summary))
     return summary
@@ -0,0 +1,147 @@
+"""
+Tests for the day-granular availability store
+(tasks/utils/availability_day_store.py).
+
+Redis is an in-memory dict; the database is a fake cursor answering the two
+checks a midnight roll makes. What matters is that a stored day comes back
+exactly as it went in, and that a day is only reused when nothing that feeds
+it can have changed.
+
+Run:  python -m pytest test_availability_day_store.py -q
+"""
+
+import json
+from datetime import date, datetime
+
+import pytest
+
+from tasks.utils import availability_day_store as ds
+
+DATES = ["2026-10-18", "2026-10-19", "2026-10-20"]
+DAY = {"date": "2026-10-19", "staff": [{"id": 4, "name": "Jo", "service": [2],
+       "slots": [{"start": "09:00:00", "end": "12:00:00"}]}],
+       "holiday": None, "is_open": True, "open_hours": [{"start": "09:00", "end": "17:00"}]}
+STAMP = "2026-10-18T00:05:00+00:00"
+
+
+class FakeRedis:
+    def __init__(self):
+        self.store = {}
+
+    def mget(self, keys):
+        return [self.store.get(k) for k in keys]
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def set(self, key, value, ex=None):
+        self.store[key] = value
+
+    def execute(self):
+        return []
+
+
+class FakeCursor:
+    """`change_log` rows are (is_published, created_at, published_at); the
+    EXISTS check is evaluated against them."""
+
+    def __init__(self, change_log=(), changed_dates=()):
+        self.change_log = list(change_log)
+        self.changed_dates = [date.fromisoformat(d) for d in changed_dates]
+        self.queries = []
+        self.connection = self
+        self.rolled_back = False
+        self._row = None
+
+    def execute(self, sql, params):
+        self.queries.append((sql, params))
+        if "availability_change_log" in sql:
+            since = datetime.fromisoformat(params[2])
+            self._row = (any(
+                not published or datetime.fromisoformat(created) > since
+                or (published_at and datetime.fromisoformat(published_at) > since)
+                for published, created, published_at in self.change_log
+            ),)
+
+    def fetchone(self):
+        return self._row
+
+    def fetchall(self):
+        return [(d,) for d in self.changed_dates]
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+@pytest.fixture
+def r():
+    return FakeRedis()
+
+
+def test_a_stored_day_round_trips_byte_identically(r):
+    ds.write_days(r, 1, 2, "staff", {"2026-10-19": DAY}, STAMP)
+    [(stamp, day)] = ds.read_days(r, 1, 2, "staff", DATES).values()
+    assert stamp == STAMP
+    assert json.dumps(day) == json.dumps(DAY)
+
+
+def test_staff_and_venue_days_do_not_mix(r):
+    ds.write_days(r, 1, 2, "staff", {"2026-10-19": DAY}, STAMP)
+    assert ds.read_days(r, 1, 2, "venue", DATES) == {}
+
+
+def test_unreadable_entries_are_recomputed(r):
+    r.store[ds.day_key(1, 2, "staff", "2026-10-19")] = "{not json"
+    r.store[ds.day_key(1, 2, "staff", "2026-10-20")] = json.dumps(DAY)  # pre-store format
+    assert ds.read_days(r, 1, 2, "staff", DATES) == {}
+
+
+def test_roll_reuses_stored_days_without_booking_changes(r):
+    ds.write_days(r, 1, 2, "staff", {"2026-10-18": DAY, "2026-10-19": DAY}, STAMP)
+    cur = FakeCursor(changed_dates=["2026-10-18"])
+    assert list(ds.reusable_days(cur, r, "staff", 1, 2, DATES)) == ["2026-10-19"]
+    _, params = cur.queries[-1]
+    assert params == (1, 2, "2026-10-18", "2026-10-20", STAMP)
+
+
+def test_unpublished_changes_disable_reuse(r):
+    ds.write_days(r, 1, 2, "staff", {"2026-10-19": DAY}, STAMP)
+    cur = FakeCursor(change_log=[(False, "2026-10-17T10:00:00+00:00", None)])
+    assert ds.reusable_days(cur, r, "staff", 1, 2, DATES) == {}
+
+
+def test_a_change_published_by_a_regen_after_the_days_were_stored_disables_reuse(r):
+    # Midnight stored 18-20; an edit at 09:00 was regenerated (and published)
+    # for the chunk around the 18th only, so the 19th is stale.
+    ds.write_days(r, 1, 2, "staff", {"2026-10-19": DAY, "2026-10-20": DAY}, STAMP)
+    ds.write_days(r, 1, 2, "staff", {"2026-10-18": DAY}, "2026-10-18T09:01:00+00:00")
+    cur = FakeCursor(change_log=[(True, "2026-10-18T09:00:00+00:00", "2026-10-18T09:01:00+00:00")])
+    assert ds.reusable_days(cur, r, "staff", 1, 2, DATES) == {}
+    [(_, params)] = [q for q in cur.queries if "availability_change_log" in q[0]]
+    assert params == (1, 2, STAMP, STAMP)   # checked against the oldest stored day
+
+
+def test_changes_published_before_the_days_were_stored_allow_reuse(r):
+    ds.write_days(r, 1, 2, "staff", {"2026-10-19": DAY}, STAMP)
+    cur = FakeCursor(change_log=[(True, "2026-10-17T09:00:00+00:00", "2026-10-17T09:01:00+00:00")])
+    assert list(ds.reusable_days(cur, r, "staff", 1, 2, DATES)) == ["2026-10-19"]
+
+
+def test_a_failing_check_recomputes_everything(r):
+    ds.write_days(r, 1, 2, "staff", {"2026-10-19": DAY}, STAMP)
+    cur = FakeCursor()
+
+    def broken(sql, params):
+        raise RuntimeError("relation does not exist")
+
+    cur.execute = broken
+    assert ds.reusable_days(cur, r, "staff", 1, 2, DATES) == {}
+    assert cur.rolled_back
+
+
+def test_broken_redis_reads_as_nothing_stored():
+    class Broken:
+        def mget(self, keys):
+            raise ConnectionError("down")
+
+    assert ds.read_days(Broken(), 1, 2, "staff", DATES) == {}
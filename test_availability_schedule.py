@@ -0,0 +1,167 @@
+"""
+Tests for the availability range loaders and per-date overlay
+(tasks/utils/availability_schedule.py).
+
+The database is a fake cursor that answers each loader query from canned rows
+and counts them. What matters is that a whole range costs a fixed handful of
+queries, and that overlaying a date's exceptions on its weekday base gives the
+precedence the old per-date SQL had.
+
+Run:  python -m pytest test_availability_schedule.py -q
+"""
+
+from datetime import date, datetime, time
+
+import pytest
+
+from tasks.utils import availability_schedule as sch
+
+MON = "2026-10-19"   # db weekday 1
+TUE = "2026-10-20"   # db weekday 2
+NEXT_MON = "2026-10-26"
+
+
+class FakeCursor:
+    """Routes each query to canned rows by a fragment of its SQL."""
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.queries = []
+        self._rows = []
+
+    def execute(self, sql, params):
+        self.queries.append(params)
+        for fragment, rows in self.routes.items():
+            if fragment in sql:
+                self._rows = rows
+                return
+        raise AssertionError(f"unexpected query: {sql}")
+
+    def fetchall(self):
+        return list(self._rows)
+
+
+def staff_schedule(recurring=(), one_time=(), pinned=()):
+    cur = FakeCursor({
+        "sa.type = 'recurring'": recurring,
+        "sa.type = 'one_time'": one_time,
+        "SELECT DISTINCT staff_id": pinned,
+    })
+    return sch.load_staff_schedule(cur, 1, 2, MON, NEXT_MON), cur
+
+
+def services(sid):
+    return [10 + sid]
+
+
+def test_recurring_staff_repeat_on_every_matching_weekday():
+    schedule, cur = staff_schedule(recurring=[(4, "Jo", time(9), time(17), 1, None)])
+    assert len(cur.queries) == 3
+    for day in (MON, NEXT_MON):
+        assert sch.staff_day(schedule, day, 1, services) == {
+            4: {"id": 4, "name": "Jo", "service": [14],
+                "slots": [{"start": "09:00:00", "end": "17:00:00"}]}}
+    assert sch.staff_day(schedule, TUE, 2, services) == {}
+
+
+def test_one_time_staff_row_replaces_the_recurring_one():
+    schedule, _ = staff_schedule(
+        recurring=[(4, "Jo", time(9), time(17), 1, None)],
+        one_time=[(4, "Jo", time(12), time(14), False, date(2026, 10, 19))],
+        pinned=[(4, date(2026, 10, 19))],
+    )
+    assert sch.staff_day(schedule, MON, 1, services)[4]["slots"] == [{"start": "12:00:00", "end": "14:00:00"}]
+    assert sch.staff_day(schedule, NEXT_MON, 1, services)[4]["slots"] == [{"start": "09:00:00", "end": "17:00:00"}]
+
+
+def test_closed_one_time_staff_row_removes_the_staff_member():
+    schedule, _ = staff_schedule(
+        recurring=[(4, "Jo", time(9), time(17), 1, None)],
+        one_time=[(4, "Jo", time(0), time(0), True, date(2026, 10, 19))],
+        pinned=[(4, date(2026, 10, 19))],
+    )
+    assert sch.staff_day(schedule, MON, 1, services) == {}
+
+
+def test_staff_pinned_to_another_location_drop_out():
+    # Only the tenant-wide pin query sees the other location's one-time row.
+    schedule, _ = staff_schedule(recurring=[(4, "Jo", time(9), time(17), 1, None)],
+                                 pinned=[(4, date(2026, 10, 19))])
+    assert sch.staff_day(schedule, MON, 1, services) == {}
+    assert 4 in sch.staff_day(schedule, NEXT_MON, 1, services)
+
+
+def test_recurring_row_with_the_same_specific_date_is_skipped():
+    schedule, _ = staff_schedule(recurring=[(4, "Jo", time(9), time(17), 1, date(2026, 10, 19))])
+    assert sch.staff_day(schedule, MON, 1, services) == {}
+    assert 4 in sch.staff_day(schedule, NEXT_MON, 1, services)
+
+
+def venue_schedule(recurring=(), one_time=()):
+    cur = FakeCursor({"va.type = 'recurring'": recurring, "va.type = 'one_time'": one_time})
+    return sch.load_venue_schedule(cur, 1, 2, MON, NEXT_MON)
+
+
+def test_venue_units_overlay_one_time_rows_and_memoise_details():
+    schedule = venue_schedule(
+        recurring=[
+            (7, "T7", "dining_table", 4, 2, 90, time(17), time(22), [1], 1, None),
+            (8, "T8", "dining_table", 2, 1, 90, time(17), time(22), None, 1, None),
+        ],
+        one_time=[(8, "T8", "dining_table", 2, 1, 60, time(18), time(20), None, False, date(2026, 10, 19))],
+    )
+    calls = []
+
+    def details(vuid, zone_tag_ids):
+        calls.append(vuid)
+        return [3], "Patio" if zone_tag_ids else ""
+
+    venue_dict, is_dining = sch.venue_day(schedule, MON, 1, details)
+    assert is_dining
+    assert venue_dict[7] == {"id": 7, "name": "T7", "capacity": 4, "min_capacity": 2, "service": [3],
+                             "zone_tags": "Patio", "zone_tag_ids": [1],
+                             "slots": [{"start": "17:00:00", "end": "22:00:00", "service_duration": "90"}]}
+    assert venue_dict[8]["slots"] == [{"start": "18:00:00", "end": "20:00:00", "service_duration": "60"}]
+    assert sorted(calls) == [7, 8]
+
+
+def test_a_closed_one_time_unit_row_still_marks_dining_tables():
+    schedule = venue_schedule(
+        one_time=[(8, "T8", "dining_table", 2, 1, 60, time(0), time(0), None, True, date(2026, 10, 19))])
+    assert sch.venue_day(schedule, MON, 1, lambda v, z: ([], "")) == ({}, True)
+
+
+@pytest.fixture
+def hours():
+    cur = FakeCursor({"FROM location_availability": [
+        ("recurring", 1, None, time(9), time(12), False),
+        ("one_time", None, date(2026, 10, 19), time(11), time(13), False),
+        ("recurring", 1, None, time(14), time(18), False),
+        ("one_time", None, date(2026, 10, 26), time(0), time(0), True),
+        ("recurring", 2, None, time(0), time(0), True),
+    ]})
+    return sch.load_location_hours(cur, 1, 2, MON, NEXT_MON)
+
+
+def test_open_hours_merge_weekday_and_one_time_rows_by_start(hours):
+    assert sch.open_hours(hours, MON, 1) == [
+        {"start": "09:00", "end": "12:00"}, {"start": "11:00", "end": "13:00"},
+        {"start": "14:00", "end": "18:00"}]
+
+
+def test_one_time_closure_is_a_holiday_and_recurring_closures_are_ignored(hours):
+    assert sch.open_hours(hours, NEXT_MON, 1) is None
+    assert sch.open_hours(hours, TUE, 2) == []
+
+
+def test_bookings_are_grouped_by_date():
+    cur = FakeCursor({"FROM bookings": [
+        (4, 99, datetime(2026, 10, 19, 10), datetime(2026, 10, 19, 11)),
+        (4, 98, datetime(2026, 10, 26, 9, 30), datetime(2026, 10, 26, 10)),
+    ]})
+    by_date = sch.load_bookings(cur, 1, 2, MON, NEXT_MON, "staff_id")
+    assert by_date[MON] == [{"staff_id": 4, "customer_id": 99,
+                             "start_time": "2026-10-19 10:00:00", "end_time": "2026-10-19 11:00:00"}]
+    assert list(by_date) == [MON, NEXT_MON]
+    with pytest.raises(ValueError):
+        sch.load_bookings(cur, 1, 2, MON, NEXT_MON, "customer_id; DROP")
@@ -0,0 +1,153 @@
+"""
+Tests for the shared booking-notification context loader
+(tasks/utils/booking_context.py).
+
+The database is a fake cursor that answers the two queries the loader runs and
+counts them; Redis is an in-memory dict. What matters is how many joined
+queries a booking event costs, which columns are always fresh, and that a
+cached row round-trips to the same Python values.
+
+Run:  python -m pytest test_booking_context.py -q
+"""
+
+from datetime import datetime, time
+from decimal import Decimal
+
+import pytest
+
+from tasks.utils import booking_context as bc
+
+FRESH = {
+    "booking_id": 42, "tenant_id": "t1", "status": "confirmed",
+    "updated_at": datetime(2026, 9, 1, 10, 0), "source": "voice",
+    "access_token": "tok-1", "meeting_link": None, "meeting_link_by_ref": None,
+}
+STATIC = {
+    "location_id": 7, "customer_name": "Ada", "customer_email": "ada@example.com",
+    "customer_id": None, "customer_phone": "+61400000000",
+    "start_time": datetime(2026, 9, 2, 18, 30), "end_time": datetime(2026, 9, 2, 20, 0),
+    "duration": 90, "booking_ref": "REF123", "party_num": 4, "staff_id": None,
+    "service_id": None, "venue_unit_id": 3, "guarantee_amount": Decimal("25.00"),
+    "location_name": "Cafe", "location_type": "rest", "flexible_booking_enabled": False,
+    "booking_email_recipients": "host@example.com", "staff_name": None,
+    "service_name": None, "is_flexible_duration": None, "venue_unit_name": "T3",
+    "zone_tag_ids": [1, 2], "zone_names": ["Patio", "Window"],
+    "customer_table_email": None, "booking_page_alias": "cafe", "logo_url": None,
+    "banner_url": None, "location_address": "1 St", "location_phone": "+612",
+    "location_website": None,
+}
+
+
+class FakeCursor:
+    """Plain (tuple) cursor over one booking row."""
+
+    def __init__(self, fresh, static):
+        self.fresh, self.static = dict(fresh), dict(static)
+        self.queries = []
+        self.description = None
+        self._row = None
+
+    def execute(self, sql, params):
+        assert params == {"booking_id": 42}
+        row = dict(self.fresh) if sql is bc._FRESH_SQL else {**self.fresh, **self.static}
+        self.queries.append("fresh" if sql is bc._FRESH_SQL else "context")
+        self.description = [(name,) for name in row]
+        self._row = tuple(row.values())
+
+    def fetchone(self):
+        return self._row
+
+
+class FakeRedis:
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def set(self, key, value, ex=None):
+        self.store[key] = value
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    r = FakeRedis()
+    monkeypatch.setattr(bc, "_client", lambda: r)
+    return r
+
+
+def test_first_task_of_an_event_runs_the_joined_query_and_caches_it(fake):
+    cur = FakeCursor(FRESH, STATIC)
+    ctx = bc.load_booking_context(cur, 42)
+    assert ctx == {**FRESH, **STATIC}
+    assert cur.queries == ["fresh", "context"]
+    assert list(fake.store) == [bc.context_key(42, FRESH)]
+
+
+def test_later_tasks_only_read_the_fresh_columns(fake):
+    bc.load_booking_context(FakeCursor(FRESH, STATIC), 42)
+    cur = FakeCursor(FRESH, STATIC)
+    ctx = bc.load_booking_context(cur, 42)
+    assert cur.queries == ["fresh"]
+    assert ctx == {**FRESH, **STATIC}
+
+
+def test_cached_values_keep_their_python_types(fake):
+    bc.load_booking_context(FakeCursor(FRESH, STATIC), 42)
+    ctx = bc.load_booking_context(FakeCursor(FRESH, STATIC), 42)
+    assert ctx["start_time"] == datetime(2026, 9, 2, 18, 30)
+    # str(Decimal) is what the pending-guarantee SMS prints; a float would read "25.0".
+    assert str(ctx["guarantee_amount"]) == "25.00"
+
+
+def test_token_and_meeting_link_are_never_served_from_cache(fake):
+    bc.load_booking_context(FakeCursor(FRESH, STATIC), 42)
+    later = {**FRESH, "access_token": "tok-2", "meeting_link": "https://meet.test/x"}
+    ctx = bc.load_booking_context(FakeCursor(later, STATIC), 42)
+    assert ctx["access_token"] == "tok-2"
+    assert ctx["meeting_link"] == "https://meet.test/x"
+
+
+def test_a_new_booking_version_misses_the_cache(fake):
+    bc.load_booking_context(FakeCursor(FRESH, STATIC), 42)
+    cancelled = {**FRESH, "status": "cancelled", "updated_at": datetime(2026, 9, 1, 11, 0)}
+    cur = FakeCursor(cancelled, {**STATIC, "customer_name": "Ada L."})
+    ctx = bc.load_booking_context(cur, 42)
+    assert cur.queries == ["fresh", "context"]
+    assert ctx["status"] == "cancelled"
+    assert ctx["customer_name"] == "Ada L."
+
+
+def test_without_redis_it_is_one_joined_query(monkeypatch):
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    cur = FakeCursor(FRESH, STATIC)
+    assert bc.load_booking_context(cur, 42)["customer_name"] == "Ada"
+    assert cur.queries == ["context"]
+
+
+def test_missing_booking_is_none(fake):
+    cur = FakeCursor(FRESH, STATIC)
+    cur.fetchone = lambda: None
+    assert bc.load_booking_context(cur, 42) is None
+
+
+def test_broken_redis_falls_back_to_the_database(monkeypatch):
+    class Broken:
+        def get(self, key):
+            raise ConnectionError("down")
+
+        def set(self, *a, **k):
+            raise ConnectionError("down")
+
+    monkeypatch.setattr(bc, "_client", lambda: Broken())
+    assert bc.load_booking_context(FakeCursor(FRESH, STATIC), 42)["location_name"] == "Cafe"
+
+
+def test_a_column_without_a_cache_encoding_is_not_cached(fake):
+    cur = FakeCursor(FRESH, {**STATIC, "reminder_at": time(9, 30)})
+    ctx = bc.load_booking_context(cur, 42)
+    assert ctx["reminder_at"] == time(9, 30)
+    assert fake.store == {}
+    again = FakeCursor(FRESH, {**STATIC, "reminder_at": time(9, 30)})
+    assert bc.load_booking_context(again, 42)["reminder_at"] == time(9, 30)
+    assert again.queries == ["fresh", "context"]
@@ -136,6 +136,55 @@ def test_segment_rms_separates_loud_from_quiet():
     assert ca.segment_rms(caller, sr, 0.0, 0.0) == 0.0
 
 
+def _loop_hangover(raw):
+    """The original frame-by-frame hangover, kept as the reference."""
+    out, run = raw.copy(), 0
+    for i, v in enumerate(raw):
+        if v:
+            run = ca.HANGOVER_FRAMES
+        elif run:
+            out[i] = True
+            run -= 1
+    return out
+
+
+def _loop_segments(mask, min_s=ca.MIN_UTTERANCE_S):
+    """The original frame-by-frame segmentation, kept as the reference."""
+    out, on, start = [], False, 0
+    for i, v in enumerate(mask):
+        if v and not on:
+            on, start = True, i
+        elif not v and on:
+            on = False
+            if (i - start) * ca.FRAME_S >= min_s:
+                out.append((round(start * ca.FRAME_S, 2), round(i * ca.FRAME_S, 2)))
+    if on and (len(mask) - start) * ca.FRAME_S >= min_s:
+        out.append((round(start * ca.FRAME_S, 2), round(len(mask) * ca.FRAME_S, 2)))
+    return out
+
+
+def test_vectorised_hangover_and_segments_match_the_frame_loops():
+    rng = np.random.default_rng(7)
+    for density in (0.02, 0.1, 0.5, 0.9):
+        for n in (0, 1, 9, 500, 3000):
+            raw = rng.random(n) < density
+            assert np.array_equal(ca.hangover(raw), _loop_hangover(raw))
+            mask = ca.hangover(raw)
+            assert ca.segments(mask) == _loop_segments(mask)
+            assert ca.segments(raw) == _loop_segments(raw)
+
+
+def test_segment_rms_matches_the_mean_of_squares():
+    rng = np.random.default_rng(3)
+    x = rng.integers(-32768, 32767, SR * 20, dtype=np.int16)
+    segs = [(0.0, 0.0), (0.5, 1.25), (3.0, 7.5), (19.5, 21.0), (2.0, 1.0)]
+    expected = []
+    for s, e in segs:
+        seg = x[int(s * SR):int(e * SR)].astype(np.float64)
+        expected.append(round(float(np.sqrt((seg ** 2).mean())), 1) if seg.size else 0.0)
+    assert [ca.segment_rms(x, SR, s, e) for s, e in segs] == expected
+
+
 # ── Alignment and the verdict ────────────────────────────────────────────────
 
 def test_offset_anchors_on_the_agent_first_utterance():
@@ -186,3 +235,27 @@ def test_analyze_caller_reports_segments_and_levels():
     assert len(out["caller_segments"]) == 1
     assert len(out["agent_segments"]) == 1
     assert all(v > 0 for v in out["caller_rms"].values())
+
+
+@pytest.mark.parametrize("sr", [22050, 16000, 8000, 44100])
+@pytest.mark.parametrize("block", [1000, 4096])
+def test_streaming_analysis_matches_decoding_in_memory(monkeypatch, sr, block):
+    monkeypatch.setattr(ca, "STREAM_BLOCK_SAMPLES", block)
+    audio = build(
+        [("silence", 1.0, 0), ("speech", 1.0, 9000), ("silence", 1.3, 0),
+         ("speech", 0.7, 3000), ("silence", 0.5, 0), ("speech", 1.6, 12000)],
+        [("silence", 0.4, 0), ("speech", 0.8, 9000), ("silence", 4.0, 0),
+         ("speech", 1.1, 7000)],
+        sr=sr,
+    )
+    in_memory = ca.analyze_caller(audio, stream=False)
+    assert ca.analyze_caller(audio, stream=True) == in_memory
+    assert len(in_memory["caller_segments"]) >= 2
+
+
+def test_long_recordings_stream_automatically(monkeypatch):
+    audio = build([("silence", 1.0, 0), ("speech", 1.0, 9000), ("silence", 1.0, 0)],
+                  [("silence", 0.5, 0), ("speech", 0.5, 9000), ("silence", 2.0, 0)])
+    monkeypatch.setattr(ca, "STREAM_MIN_SECONDS", 1.0)
+    monkeypatch.setattr(ca, "load", lambda data: pytest.fail("decoded in memory"))
+    assert len(ca.analyze_caller(audio)["caller_segments"]) == 1
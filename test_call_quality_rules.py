@@ -601,3 +601,62 @@ def test_dead_air_abstains_when_playback_was_never_confirmed():
         line(4, ASSISTANT, ts=at(40)),
     ]), CATALOGUE)
     assert "dead_air" not in rules(findings)
+
+
+# ── Tag-indexed classifier ───────────────────────────────────────────────────
+
+def _linear_classify(obj):
+    """The original scan: every pattern, in order, against every line."""
+    from tasks.utils.call_quality_rules import _PATTERNS, Event, _parse_ts
+
+    msg = obj.get("msg") or ""
+    for kind, pattern in _PATTERNS:
+        match = pattern.match(msg)
+        if match:
+            return Event(seq=obj.get("seq"), ts=_parse_ts(obj.get("ts")),
+                         level=(obj.get("level") or "").lower(), kind=kind,
+                         msg=msg, data=match.groupdict())
+    return None
+
+
+def _fixture_messages():
+    """Every log line used in this file, plus truncated and mangled variants."""
+    import ast
+
+    tree = ast.parse(Path(__file__).read_text())
+    base = {node.value for node in ast.walk(tree)
+            if isinstance(node, ast.Constant) and isinstance(node.value, str)
+            and node.value.startswith("[")}
+    base |= {
+        '[TurnMetrics] {"turn": 3, "latency_ms": 812}',
+        "[Twilio/Azure] Stream stopped: reason=hangup",
+        "[Azure] Tool call: check_availabilities call_id=c1 params={}",
+        "[Azure] Input audio buffer committed item=abc",
+        "[Azure] Caller transcript: multi\nline",
+        "[Render] GET /health 200", "plain line", "", "[", "[]", "[Azure]",
+    }
+    out = set(base)
+    for msg in base:
+        for cut in (1, 8, len(msg) // 2, len(msg) - 1):
+            out.add(msg[:cut])
+        out.add(msg.replace("] ", "]", 1))
+        out.add(msg.replace("[Azure]", "[azure]", 1))
+        out.add(" " + msg)
+        out.add(msg + " ]")
+    return sorted(out)
+
+
+def _fields(event):
+    return event and tuple(getattr(event, name) for name in event.__slots__)
+
+
+def test_tag_index_classifies_exactly_like_the_linear_scan():
+    from tasks.utils.call_quality_rules import _classify
+
+    messages = _fixture_messages()
+    assert len(messages) > 100
+    for seq, msg in enumerate(messages):
+        obj = {"seq": seq, "ts": at(seq % 60), "level": "INFO", "msg": msg}
+        assert _fields(_classify(obj)) == _fields(_linear_classify(obj)), msg
+    classified = {_classify({"msg": m}).kind for m in messages if _classify({"msg": m})}
+    assert len(classified) >= 15
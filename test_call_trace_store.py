@@ -0,0 +1,195 @@
+"""
+Tests for the per-call partial-trace store (tasks/utils/call_trace_store.py).
+
+Redis is an in-memory fake covering the hash/sorted-set/pipeline calls the
+store makes. What matters is that lines read twice collapse by seq, that a
+call split across sweeps comes out whole, that each call is handed out once,
+and that a released call comes back.
+
+Run:  python -m pytest test_call_trace_store.py -q
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from tasks.utils import call_trace_store as ts
+from tasks.utils.render_log_parse import CHANNEL_MARKER, _group_by_call
+
+CALL_A = "CA635ba4b3996df5ff06582599496185f6"
+CALL_B = "CAaaaabbbbccccddddeeeeffff00001111"
+T0 = datetime(2026, 8, 5, 11, 0, tzinfo=timezone.utc)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.hashes, self.zsets, self.strings = {}, {}, {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def exists(self, key):
+        return int(key in self.strings or key in self.hashes)
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.strings:
+            return None
+        self.strings[key] = str(value)
+        return True
+
+    def delete(self, key):
+        self.strings.pop(key, None)
+        self.hashes.pop(key, None)
+
+    def expire(self, key, ttl):
+        return True
+
+    def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update({k: str(v) for k, v in mapping.items()})
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def hincrby(self, key, field, amount):
+        h = self.hashes.setdefault(key, {})
+        h[field] = str(int(h.get(field, 0)) + amount)
+        return int(h[field])
+
+    def zadd(self, key, mapping, gt=False, nx=False):
+        z = self.zsets.setdefault(key, {})
+        for member, score in mapping.items():
+            if nx and member in z:
+                continue
+            if not gt or member not in z or score > z[member]:
+                z[member] = score
+
+    def zrangebyscore(self, key, low, high, withscores=False):
+        return sorted(((m, s) for m, s in self.zsets.get(key, {}).items() if s <= high),
+                      key=lambda item: item[1])
+
+    def zrem(self, key, member):
+        self.zsets.get(key, {}).pop(member, None)
+
+    def zcard(self, key):
+        return len(self.zsets.get(key, {}))
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client, self.queued = client, []
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+        return lambda *a, **k: self.queued.append(lambda: method(*a, **k))
+
+    def execute(self):
+        return [call() for call in self.queued]
+
+
+def entry(call_sid, seq, msg, at):
+    return {
+        "id": f"{call_sid}-{seq}",
+        "timestamp": at.isoformat().replace("+00:00", "Z"),
+        "message": f"INFO:root:{CHANNEL_MARKER}{call_sid}#{seq:05d} {msg}",
+        "labels": [{"name": "instance", "value": "srv-abc-8l5xf"}],
+    }
+
+
+def sweep(*entries):
+    return _group_by_call(list(entries))
+
+
+def claim(store, now):
+    return ts.claim_ready(store, now, settle_seconds=240, grace_seconds=60)
+
+
+@pytest.fixture
+def store():
+    return FakeRedis()
+
+
+def test_a_call_split_across_sweeps_comes_out_whole(store):
+    ts.merge(store, sweep(
+        entry(CALL_A, 1, "Stream started tenant_id=3 location_id=9", T0),
+        entry(CALL_A, 2, "[Azure] Caller transcript: hi", T0 + timedelta(seconds=5)),
+    ))
+    ts.merge(store, sweep(
+        entry(CALL_A, 2, "[Azure] Caller transcript: hi", T0 + timedelta(seconds=5)),
+        entry(CALL_A, 3, "[CallLifecycle] Call ended", T0 + timedelta(seconds=400)),
+    ))
+    [call] = claim(store, T0 + timedelta(seconds=500))
+    assert [line["seq"] for line in call["lines"]] == [1, 2, 3]
+    assert (call["tenant_id"], call["location_id"]) == (3, 9)
+    assert call["complete"] and call["gaps"] == []
+    assert call["instance"] == "srv-abc-8l5xf"
+
+
+def test_an_ended_call_waits_for_the_grace_period(store):
+    ts.merge(store, sweep(entry(CALL_A, 1, "[CallLifecycle] Call ended", T0)))
+    assert claim(store, T0 + timedelta(seconds=30)) == []
+    assert [c["call_sid"] for c in claim(store, T0 + timedelta(seconds=61))] == [CALL_A]
+
+
+def test_an_open_call_is_finalised_once_it_settles(store):
+    ts.merge(store, sweep(entry(CALL_A, 1, "[Azure] Caller transcript: hi", T0)))
+    assert claim(store, T0 + timedelta(seconds=200)) == []
+    [call] = claim(store, T0 + timedelta(seconds=240))
+    assert not call["complete"]
+
+
+def test_a_quiet_sweep_still_finalises_earlier_calls(store):
+    ts.merge(store, sweep(entry(CALL_A, 1, "[Twilio/Azure] Stream stopped", T0)))
+    ts.merge(store, {})
+    assert len(claim(store, T0 + timedelta(seconds=90))) == 1
+
+
+def test_each_call_is_handed_out_once(store):
+    ts.merge(store, sweep(entry(CALL_A, 1, "[CallLifecycle] Call ended", T0)))
+    now = T0 + timedelta(seconds=90)
+    assert len(claim(store, now)) == 1
+    assert claim(store, now) == []
+
+
+def test_late_lines_after_finalisation_are_dropped(store):
+    ts.merge(store, sweep(entry(CALL_A, 1, "[CallLifecycle] Call ended", T0)))
+    [call] = claim(store, T0 + timedelta(seconds=90))
+    ts.discard(store, call["call_sid"])
+    assert ts.merge(store, sweep(entry(CALL_A, 2, "late", T0 + timedelta(seconds=95)))) == 0
+    assert ts.open_count(store) == 0
+
+
+def test_a_released_call_comes_back_with_its_attempts(store):
+    ts.merge(store, sweep(
+        entry(CALL_A, 1, "[CallLifecycle] Call ended", T0),
+        entry(CALL_B, 1, "[Azure] Caller transcript: still talking", T0 + timedelta(seconds=80)),
+    ))
+    now = T0 + timedelta(seconds=90)
+    [call] = claim(store, now)
+    assert call["attempts"] == 0
+    assert ts.release(store, CALL_A) == 1
+    [again] = claim(store, now)
+    assert again["call_sid"] == CALL_A and again["attempts"] == 1
+    assert ts.open_count(store) == 2
+
+
+def test_an_expired_trace_leaves_the_open_set(store):
+    ts.merge(store, sweep(entry(CALL_A, 1, "[CallLifecycle] Call ended", T0)))
+    store.hashes.clear()
+    assert claim(store, T0 + timedelta(seconds=90)) == []
+    assert ts.open_count(store) == 0
+
+
+def test_a_call_without_parseable_timestamps_settles_from_the_sweep_time(store):
+    calls = sweep(entry(CALL_A, 1, "[Azure] Caller transcript: hi", T0))
+    calls[CALL_A]["lines"][0]["ts"] = "not-a-time"
+    ts.merge(store, calls, ingested_at=T0)
+    assert claim(store, T0 + timedelta(seconds=200)) == []
+    assert [c["call_sid"] for c in claim(store, T0 + timedelta(seconds=240))] == [CALL_A]
+
+
+def test_the_sweep_time_never_overrides_a_known_line_time(store):
+    ts.merge(store, sweep(entry(CALL_A, 1, "[Azure] Caller transcript: hi", T0)))
+    calls = sweep(entry(CALL_A, 2, "[Azure] Caller transcript: still", T0))
+    calls[CALL_A]["lines"][0]["ts"] = None
+    ts.merge(store, calls, ingested_at=T0 + timedelta(seconds=600))
+    assert store.zsets[ts.OPEN_KEY][CALL_A] == T0.timestamp()
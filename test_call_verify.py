@@ -127,3 +127,25 @@ def test_log_seconds_parsing():
     assert cv.log_seconds("2026-08-13T10:07:29.471Z") == 449.471
     assert cv.log_seconds(None) is None
     assert cv.log_seconds("garbage") is None
+
+
+def test_findings_of_one_call_share_a_single_decode(monkeypatch):
+    audio = stereo(
+        caller=np.concatenate([_sil(8.0), _tone(1.0, 9000), _sil(3.0),
+                               _tone(1.5, 26000)]),
+        agent=np.concatenate([_sil(1.0), _tone(1.5, 9000), _sil(10.0)]),
+    )
+    text = log([AGENT_AT_2S, EMPTY_AT_9S])
+    other = {"rule_id": "stt_transcription_failed", "evidence": {"seq": 999}}
+    expected = [cv.verify_finding(FINDING, text, audio), cv.verify_finding(other, text, audio)]
+
+    calls = []
+    real = cv.audio.analyze_caller
+    monkeypatch.setattr(cv.audio, "analyze_caller", lambda b: calls.append(1) or real(b))
+    assert cv.verify_findings([FINDING, other], text, audio) == expected
+    assert len(calls) == 1
+
+
+def test_an_undecodable_call_abstains_for_every_finding():
+    out = cv.verify_findings([FINDING, FINDING], log([AGENT_AT_2S, EMPTY_AT_9S]), b"junk")
+    assert [o["audio_reason"] for o in out] == ["undecodable", "undecodable"]
@@ -0,0 +1,121 @@
+"""
+Tests for the daily_location_metrics rollup (tasks/utils/daily_location_metrics.py).
+
+The database is a fake connection that records the SQL it is sent. The
+queries themselves run against Postgres. What matters here is which refresh
+runs when, that the generated SQL can never drift from CHANNEL_BANDS, and
+that the summary readers shape rows the way the dashboard expects.
+
+Run:  python -m pytest test_daily_location_metrics.py -q
+"""
+
+from datetime import date, datetime, timezone
+
+import pytest
+
+from tasks.utils import daily_location_metrics as dlm
+
+RUN_START = datetime(2026, 10, 18, 3, 0, tzinfo=timezone.utc)
+SINCE_LESS_GRACE = datetime(2026, 10, 17, 2, 55, tzinfo=timezone.utc)
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = -1
+        self._row = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.conn.executed.append((sql, params))
+        if sql.strip() == "SELECT now()":
+            self._row = (RUN_START,)
+        elif "make_interval" in sql:
+            self._row = (SINCE_LESS_GRACE,)
+        elif "INSERT INTO daily_location_metrics" in sql:
+            self.rowcount = 12
+
+    def fetchone(self):
+        return self._row
+
+    def fetchall(self):
+        return list(self.conn.rows)
+
+
+class FakeConn:
+    def __init__(self, rows=()):
+        self.executed, self.rows, self.commits = [], rows, 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+
+def upsert_call(conn):
+    [(sql, params)] = [(s, p) for s, p in conn.executed if "INSERT INTO daily_location_metrics" in s]
+    return sql, params
+
+
+def test_missing_watermark_rebuilds_the_window():
+    conn = FakeConn()
+    result = dlm.refresh(conn, since=None)
+    sql, params = upsert_call(conn)
+    assert params == {"days": dlm.REBUILD_DAYS}
+    assert "FROM daily_location_metrics" in sql  # existing rows are re-zeroed too
+    assert result == {"mode": "full", "days_upserted": 12, "watermark": RUN_START.isoformat()}
+    assert conn.commits == 1
+
+
+def test_incremental_refresh_only_touches_rows_updated_since_the_watermark():
+    conn = FakeConn()
+    result = dlm.refresh(conn, since="2026-10-17T03:00:00+00:00")
+    grace = [p for s, p in conn.executed if "make_interval" in s]
+    assert grace == [("2026-10-17T03:00:00+00:00", dlm.WATERMARK_GRACE_SECONDS)]
+    sql, params = upsert_call(conn)
+    assert params == {"since": SINCE_LESS_GRACE}
+    assert "updated_at > %(since)s" in sql
+    assert result["mode"] == "incremental"
+
+
+def test_the_session_is_pinned_to_utc_before_dates_are_bucketed():
+    conn = FakeConn()
+    dlm.refresh(conn)
+    statements = [s.strip() for s, _ in conn.executed]
+    assert statements.index("SET LOCAL TIME ZONE 'UTC'") < statements.index("SELECT now()")
+
+
+@pytest.mark.parametrize("full", [True, False])
+def test_generated_sql_covers_every_band(full):
+    sql = dlm.upsert_sql(full=full)
+    for field, sources in dlm.CHANNEL_BANDS:
+        assert f"AS {field}" in sql
+        assert f"{field} = EXCLUDED.{field}" in sql
+        assert field in dlm.SCHEMA_SQL
+        for src in sources:
+            assert f"'{src}'" in sql
+    assert dlm.COUNTED_STATUSES in sql
+
+
+def test_period_totals_average_durations_over_calls_that_have_one():
+    conn = FakeConn(rows=[(7, 40, 20, 10, 0, 93.6, None)])
+    with conn.cursor() as cur:
+        totals = dlm.period_totals(cur, 1, [7], date(2026, 10, 18))
+    assert totals == {7: {"bookings_current": 40, "bookings_previous": 20,
+                          "calls_current": 10, "calls_previous": 0,
+                          "avg_duration_current": 93, "avg_duration_previous": 0}}
+
+
+def test_broken_redis_reads_as_no_watermark(monkeypatch):
+    class Broken:
+        def get(self, key):
+            raise ConnectionError("down")
+
+    monkeypatch.setattr(dlm, "_client", lambda: Broken())
+    assert dlm.read_watermark() is None
@@ -0,0 +1,91 @@
+"""
+Tests for the compiled email templates (tasks/email_template_utils.py).
+
+The real templates in tasks/email_templates/ are rendered; what matters is that
+the mustache-style sections resolve the way the old string-replacement renderer
+resolved them, and that a template is read from disk once per process outside
+dev.
+
+Run:  python -m pytest test_email_templates.py -q
+"""
+
+import os
+
+import jinja2
+import pytest
+
+from tasks import email_template_utils as etu
+
+CUSTOMER = dict(
+    email_title="Booking Confirmed", email_message="See you soon", location_name="Cafe",
+    booking_ref="REF123", customer_name="Ada", customer_phone="+61400000000", party_num=4,
+    booking_date="2026-09-02", start_time="6:30pm", end_time="8:00pm",
+    closing_message="Thanks", zone_names=["Patio", "Window"], booking_page_alias="cafe",
+    booking_access_token="tok-1", location_address="1 St", location_phone=None,
+    location_website=None, logo_url=None, banner_url=None,
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_env(monkeypatch):
+    monkeypatch.delenv("ENVIRONMENT", raising=False)
+    monkeypatch.setattr(etu, "_env", None)
+    monkeypatch.setattr(etu, "_raw_cache", {})
+
+
+def test_restaurant_booking_shows_zones_and_party_but_not_staff():
+    html = etu.render_customer_booking_confirmation_template(**CUSTOMER)
+    assert "Patio, Window" in html
+    assert "{{" not in html
+    assert "/customer/booking/cafe/view?token=tok-1" in html
+
+
+def test_unset_sections_and_placeholders_render_as_nothing():
+    html = etu.render_customer_booking_confirmation_template(**{**CUSTOMER, "logo_url": " "})
+    assert "{{" not in html and "}}" not in html
+    assert 'src=" "' not in html
+
+
+def test_a_caller_supplied_manage_url_wins():
+    html = etu.render_customer_booking_confirmation_template(**CUSTOMER, manage_booking_url="https://x.test/m")
+    assert "https://x.test/m" in html and "tok-1" not in html
+
+
+def test_merchant_modification_reads_modified_not_confirmed():
+    html = etu.render_booking_confirmation_template(
+        email_title="Booking Modified", location_name="Cafe", booking_ref="REF1",
+        customer_name="Ada", venue_unit_name="T3", is_modification=True,
+    )
+    assert "has been modified at" in html
+    new = etu.render_booking_confirmation_template(email_title="New", location_name="Cafe")
+    assert "has been confirmed at" in new
+
+
+def test_literal_braces_in_templates_are_left_alone():
+    src = "a { color: red } {{name}} {{ bad tag }} {{#x}}yes{{/x}}{{^x}}also{{/x}}"
+    out = jinja2.Environment().from_string(etu._to_jinja(src)).render(v={"name": "N"}, s={})
+    assert out == "a { color: red } N  yesalso"
+
+
+def test_templates_are_read_once_outside_dev(monkeypatch, tmp_path):
+    (tmp_path / "t.html").write_text("Hi {{name}}")
+    monkeypatch.setattr(etu, "TEMPLATE_DIR", str(tmp_path))
+    assert etu._render("t.html", {"name": "Ada"}, {}) == "Hi Ada"
+    (tmp_path / "t.html").write_text("Bye {{name}}")
+    assert etu._render("t.html", {"name": "Ada"}, {}) == "Hi Ada"
+
+
+def test_dev_hot_reloads_edited_templates(monkeypatch, tmp_path):
+    monkeypatch.setenv("ENVIRONMENT", "dev")
+    path = tmp_path / "t.html"
+    path.write_text("Hi {{name}}")
+    monkeypatch.setattr(etu, "TEMPLATE_DIR", str(tmp_path))
+    assert etu._render("t.html", {"name": "Ada"}, {}) == "Hi Ada"
+    path.write_text("Bye {{name}}")
+    st = path.stat()
+    os.utime(path, (st.st_atime, st.st_mtime + 5))
+    assert etu._render("t.html", {"name": "Ada"}, {}) == "Bye Ada"
+
+
+def test_missing_template_renders_empty():
+    assert etu._render("nope.html", {}, {}) == ""
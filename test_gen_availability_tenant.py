@@ -0,0 +1,139 @@
+"""
+Tests for the per-tenant generation batch (gen_availability_tenant in
+tasks/availability_gen_regen.py).
+
+No Postgres or Redis: the connection, cursor and Valkey client are fakes and
+the two per-location generators are replaced by recorders that write a chunk
+key, so only the batch's own logic runs. What matters here is that the
+tenant's service maps are read once for the whole batch, that each location
+goes to the generator for its type, and that one location failing is rolled
+back without stopping the others.
+
+Run:  python -m pytest test_gen_availability_tenant.py -q
+"""
+
+import contextlib
+import os
+
+import pytest
+
+with contextlib.redirect_stdout(open(os.devnull, "w")):
+    import tasks.availability_gen_regen as gen
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params=None):
+        self.conn.executed.append(sql)
+
+    def fetchall(self):
+        sql = self.conn.executed[-1]
+        if "FROM staff_services" in sql:
+            return [(1, 10), (1, 11), (2, 10)]
+        if "FROM venue_unit_services" in sql:
+            return [(7, 20)]
+        return []
+
+    def close(self):
+        pass
+
+
+class FakeConn:
+    def __init__(self):
+        self.executed = []
+        self.rollbacks = 0
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+class FakeValkey:
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value):
+        self.data[key] = value
+
+
+def run_task(task, *args, **kwargs):
+    """Call a bound task in-process (a stubbed Celery app leaves the plain
+    function, which takes `self` first)."""
+    run = getattr(task, "run", None)
+    return run(*args, **kwargs) if run else task(None, *args, **kwargs)
+
+
+@pytest.fixture
+def batch(monkeypatch):
+    state = {"conn": FakeConn(), "valkey": FakeValkey(), "scopes": [], "calls": [], "fail": set()}
+    monkeypatch.setenv("DATABASE_URL", "postgresql://test")
+    monkeypatch.setenv("REDIS_URL", "redis://test")
+    monkeypatch.setattr(gen.psycopg2, "connect", lambda url: state["conn"])
+    monkeypatch.setattr(gen.redis.Redis, "from_url", lambda url, **kwargs: state["valkey"])
+
+    real_scope = gen.load_tenant_scope
+
+    def load_tenant_scope(cur, tenant_id, **kwargs):
+        state["scopes"].append((tenant_id, kwargs))
+        return real_scope(cur, tenant_id, **kwargs)
+
+    def recorder(kind):
+        def generate(pg_conn, valkey_client, tenant_id, location_id, location_tz,
+                     rolling=False, tenant_scope=None, **kwargs):
+            state["calls"].append((kind, location_id, rolling, tenant_scope))
+            if location_id in state["fail"]:
+                raise RuntimeError("schedule query failed")
+            valkey_client.set(f"availability:{tenant_id}:{location_id}:chunk:0", "{}")
+            return {"status": "success"}
+        return generate
+
+    monkeypatch.setattr(gen, "load_tenant_scope", load_tenant_scope)
+    monkeypatch.setattr(gen, "generate_staff_location", recorder("staff"))
+    monkeypatch.setattr(gen, "generate_venue_location", recorder("venue"))
+    return state
+
+
+LOCATIONS = [
+    {"location_id": 101, "location_tz": "Australia/Sydney", "location_type": "staff"},
+    {"location_id": 102, "location_tz": "Australia/Sydney", "location_type": "rest"},
+    {"location_id": 103, "location_tz": "Australia/Perth", "location_type": "staff"},
+]
+
+
+def test_the_tenant_scope_is_read_once_and_each_type_gets_its_generator(batch):
+    result = run_task(gen.gen_availability_tenant, 5, LOCATIONS, rolling=True)
+
+    assert result == {"status": "success",
+                      "locations": {"101": "success", "102": "success", "103": "success"}}
+    assert batch["scopes"] == [(5, {"staff": True, "venue": True})]
+    assert [(kind, loc, rolling) for kind, loc, rolling, _ in batch["calls"]] == [
+        ("staff", 101, True), ("venue", 102, True), ("staff", 103, True)]
+    scope = batch["calls"][0][3]
+    assert scope == {"staff_services": {1: [10, 11], 2: [10]}, "venue_unit_services": {7: [20]}}
+    assert all(call[3] is scope for call in batch["calls"])
+    assert batch["conn"].closed
+
+
+def test_a_staff_only_batch_skips_the_venue_unit_map(batch):
+    run_task(gen.gen_availability_tenant, 5, [LOCATIONS[0], LOCATIONS[2]])
+    assert batch["scopes"] == [(5, {"staff": True, "venue": False})]
+    assert not any("venue_unit_services" in sql for sql in batch["conn"].executed)
+
+
+def test_a_failing_location_is_rolled_back_and_the_rest_still_generate(batch):
+    batch["fail"].add(102)
+    result = run_task(gen.gen_availability_tenant, 5, LOCATIONS)
+
+    assert result == {"status": "partial",
+                      "locations": {"101": "success", "102": "failed", "103": "success"}}
+    assert batch["conn"].rollbacks == 1
+    assert sorted(batch["valkey"].data) == ["availability:5:101:chunk:0", "availability:5:103:chunk:0"]
+    assert batch["conn"].closed
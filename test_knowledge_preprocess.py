@@ -0,0 +1,129 @@
+"""
+Tests for the streaming text extraction in
+tasks/utils/knowledge_utils.preprocess_for_model.
+
+Run:  python -m pytest test_knowledge_preprocess.py -q
+"""
+
+import io
+import sys
+import zipfile
+
+import openpyxl
+import pytest
+
+from tasks.utils.knowledge_utils import preprocess_for_model
+
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+DOCX = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def xlsx(sheets):
+    """sheets: {name: [row, ...]}"""
+    wb = openpyxl.Workbook()
+    wb.remove(wb.active)
+    for name, rows in sheets.items():
+        ws = wb.create_sheet(name)
+        for row in rows:
+            ws.append(row)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def docx(body_xml):
+    ns = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("word/document.xml",
+                    f'<?xml version="1.0"?><w:document {ns}><w:body>{body_xml}</w:body></w:document>')
+    return buf.getvalue()
+
+
+def para(text):
+    return f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>"
+
+
+@pytest.fixture
+def no_pandas(monkeypatch):
+    """The whole point of the streaming path: pandas must never be needed."""
+    monkeypatch.setitem(sys.modules, "pandas", None)
+
+
+def test_xlsx_becomes_csv_text_per_sheet(no_pandas):
+    data = xlsx({
+        "Prices": [["Item", "Price"], ["Flat white", 5], ["Long black", 4.5]],
+        "Hours": [["Day", "Open"], ["Mon", "7am"]],
+    })
+    out = preprocess_for_model(data, "menu.xlsx", XLSX)
+    assert out["mode"] == "text"
+    assert out["note"] == "excel-as-csv-text"
+    assert out["truncated"] is False
+    assert out["text"] == (
+        "# Sheet: Prices\nItem,Price\nFlat white,5\nLong black,4.5\n\n"
+        "# Sheet: Hours\nDay,Open\nMon,7am\n\n"
+    )
+
+
+def test_xlsx_quotes_cells_like_csv():
+    data = xlsx({"S": [["Name", "Notes"], ["Pie", 'has "nuts", dairy']]})
+    text = preprocess_for_model(data, "x.xlsx", XLSX)["text"]
+    assert 'Pie,"has ""nuts"", dairy"' in text
+
+
+def test_xlsx_skips_blank_rows():
+    data = xlsx({"S": [["a"], [None], ["b"]]})
+    assert preprocess_for_model(data, "x.xlsx", XLSX)["text"] == "# Sheet: S\na\nb\n\n"
+
+
+def test_xlsx_stops_at_the_byte_budget():
+    rows = [[f"item {i}", i] for i in range(5000)]
+    out = preprocess_for_model(xlsx({"Big": rows}), "big.xlsx", XLSX, max_bytes=1000)
+    assert out["truncated"] is True
+    assert len(out["text"].encode()) <= 1000
+    assert out["text"].startswith("# Sheet: Big\nitem 0,0\n")
+
+
+def test_xlsx_stops_at_the_row_budget():
+    rows = [[f"item {i}"] for i in range(100)]
+    out = preprocess_for_model(xlsx({"S": rows}), "x.xlsx", XLSX, max_rows=11)
+    assert out["truncated"] is True
+    assert out["text"].count("item ") == 10  # the sheet header is one of the 11
+
+
+def test_docx_paragraphs_including_tables(no_pandas):
+    body = (para("Welcome") + "<w:p/>"
+            + "<w:tbl><w:tr><w:tc>" + para("Haircut $40") + "</w:tc></w:tr></w:tbl>"
+            + para("Bye"))
+    out = preprocess_for_model(docx(body), "info.docx", DOCX)
+    assert out == {"mode": "text", "text": "Welcome\nHaircut $40\nBye",
+                   "note": "docx-as-text", "truncated": False}
+
+
+def test_docx_joins_runs_within_a_paragraph():
+    body = "<w:p><w:r><w:t>Open </w:t></w:r><w:r><w:t>daily</w:t></w:r></w:p>"
+    assert preprocess_for_model(docx(body), "a.docx", DOCX)["text"] == "Open daily"
+
+
+def test_corrupt_docx_is_unsupported_not_raised():
+    out = preprocess_for_model(b"not a zip", "a.docx", DOCX)
+    assert out["mode"] == "unsupported"
+    assert out["reason"].startswith("docx_parse_failed")
+
+
+def test_plain_text_is_capped_without_splitting_a_character():
+    data = ("é" * 10).encode()  # 2 bytes each
+    out = preprocess_for_model(data, "a.txt", "text/plain", max_bytes=5)
+    assert out["text"] == "éé"
+    assert out["truncated"] is True
+
+
+def test_latin1_fallback_still_applies():
+    out = preprocess_for_model("café".encode("latin-1"), "a.csv", "text/csv")
+    assert out["text"] == "café"
+    assert out["note"] == "csv-as-text"
+
+
+def test_pdf_is_passed_through_as_a_file():
+    out = preprocess_for_model(b"%PDF-1.4", "a.pdf", "application/pdf")
+    assert out == {"mode": "file", "filename": "a.pdf", "file_bytes": b"%PDF-1.4"}
@@ -0,0 +1,140 @@
+"""
+Tests for the Twilio number inventory helpers (tasks/utils/number_inventory.py).
+
+No Twilio or Postgres: searches and purchases are plain functions, and
+execute_values is replaced by a recorder. What matters here is the capped
+plan, the bounded parallelism and 429 retries, and the search cache's
+freshness rules.
+
+Run:  python -m pytest test_number_inventory.py -q
+"""
+
+import threading
+import time
+
+import psycopg2.extras
+import pytest
+
+from tasks.utils import number_inventory as inv
+
+
+class RateLimited(Exception):
+    status = 429
+
+
+def test_plan_counts_national_targets_across_regions_and_applies_the_cap():
+    targets = {"AU": {"NSW": 2, "VIC": 1}, "US": {"_national": 3}, "GB": {"_national": 1}}
+    counts = {"AU": {"NSW": 1, "VIC": 4}, "US": {"_national": 1, "CA": 1}}
+    plan, total = inv.plan_shortfall(targets, counts, cap=10)
+    assert plan == [("AU", "NSW", 1), ("US", "_national", 1), ("GB", "_national", 1)]
+    assert total == 3
+
+    plan, total = inv.plan_shortfall(targets, counts, cap=2)
+    assert plan == [("AU", "NSW", 1), ("US", "_national", 1)] and total == 3
+
+
+def test_regions_run_in_parallel_but_never_past_the_limit():
+    lock, state = threading.Lock(), {"now": 0, "peak": 0}
+
+    def work(item):
+        with lock:
+            state["now"] += 1
+            state["peak"] = max(state["peak"], state["now"])
+        time.sleep(0.02)
+        with lock:
+            state["now"] -= 1
+        if item == 3:
+            raise ValueError("no numbers")
+        return item * 10
+
+    out = inv.run_parallel(work, range(8), concurrency=3)
+    assert state["peak"] == 3
+    assert [(i, r) for i, r, _ in out] == [(i, None if i == 3 else i * 10) for i in range(8)]
+    assert isinstance(out[3][2], ValueError)
+
+
+def test_rate_limited_calls_back_off_and_retry():
+    calls, sleeps = [], []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise RateLimited()
+        return "ok"
+
+    assert inv.with_rate_limit_retry(flaky, sleep=sleeps.append) == "ok"
+    assert sleeps == [inv.RATE_LIMIT_BACKOFF_SECONDS, inv.RATE_LIMIT_BACKOFF_SECONDS * 2]
+
+    def broken():
+        raise ValueError("bad region")
+
+    with pytest.raises(ValueError):
+        inv.with_rate_limit_retry(broken, sleep=sleeps.append)
+    assert len(sleeps) == 2   # other errors are not retried
+
+
+def test_search_results_are_reused_briefly_and_bought_numbers_dropped():
+    now = [0.0]
+    cache = inv.SearchCache(ttl=60, clock=lambda: now[0])
+    searches = []
+
+    def search(country_code, region, number_type, limit):
+        searches.append(limit)
+        return [{"phone_number": f"+6120000000{i}"} for i in range(limit)]
+
+    first = inv.cached_search(search, "AU", "NSW", "local", 2, cache=cache)
+    assert searches == [2 + inv.SEARCH_SPARES] and len(first) == 4
+
+    cache.discard([first[0]["phone_number"]])
+    again = inv.cached_search(search, "AU", "NSW", "local", 3, cache=cache)
+    assert len(searches) == 1 and first[0] not in again
+
+    inv.cached_search(search, "AU", "NSW", "local", 4, cache=cache)    # too few left
+    assert len(searches) == 2
+    now[0] = 61.0
+    inv.cached_search(search, "AU", "NSW", "local", 1, cache=cache)    # expired
+    assert len(searches) == 3
+
+
+def test_inventory_rows_are_written_in_one_statement(monkeypatch):
+    calls = []
+
+    def record(cur, sql, rows, **kwargs):
+        calls.append((sql, rows, kwargs))
+        return [(r[0], i + 1) for i, r in enumerate(rows)]
+
+    monkeypatch.setattr(psycopg2.extras, "execute_values", record)
+    rows = [inv.number_row("+61200000001", "Pending DEV", "AU", "Sydney Metropolitan", "NSW", "PN1"),
+            inv.number_row("+15550000002", "Pending DEV", "US", None, None, "PN2")]
+    assert inv.insert_numbers(object(), rows) == {"+61200000001": 1, "+15550000002": 2}
+    [(sql, sent, kwargs)] = calls
+    assert "ON CONFLICT (phone_number) DO NOTHING" in sql
+    assert sent[0][3] == "Sydney Met" and sent[0][6] == "available"
+    assert kwargs["page_size"] == 2
+    assert inv.insert_numbers(object(), []) == {} and len(calls) == 1
+
+
+def test_each_bought_number_is_saved_before_the_next_is_bought(monkeypatch):
+    import tasks.purchase_twilio_number as ptn
+
+    events = []
+    monkeypatch.setattr(inv, "search_cache", inv.SearchCache())
+    monkeypatch.setattr(ptn, "search_available_numbers", lambda country_code, region, number_type, limit: [
+        {"phone_number": f"+6120000000{i}", "locality": "Sydney", "region": region} for i in range(limit)])
+
+    def buy(client, phone, **kwargs):
+        events.append(("buy", phone))
+        if len(events) > 2:
+            raise RuntimeError("worker lost")
+        return {"phone_number": phone, "twilio_sid": "PN" + phone, "friendly_name": kwargs["friendly_name"]}
+
+    monkeypatch.setattr(ptn, "buy_and_configure_number", buy)
+
+    def save(purchased):
+        events.append(("save", purchased["phone_number"]))
+        return 7
+
+    outcome = ptn._replenish_region(None, "AU", "NSW", 2, dry_run=False, save=save)
+    assert events[:2] == [("buy", "+61200000000"), ("save", "+61200000000")]
+    assert [p["phone_number_id"] for p in outcome["purchased"]] == [7]
+    assert outcome["errors"]
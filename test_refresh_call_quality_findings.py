@@ -0,0 +1,91 @@
+"""
+Tests for the call-quality backfill's fetch and checkpoint handling
+(dispatch/refresh_call_quality_findings.py).
+
+R2 is a fake client. What matters is that only a missing or corrupt
+artifact counts as unreadable, and that a fetch that keeps failing holds
+the checkpoint before that conversation instead of skipping it for good.
+
+Run:  python -m pytest test_refresh_call_quality_findings.py -q
+"""
+
+import gzip
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from dispatch import refresh_call_quality_findings as refresh
+
+
+class Missing(Exception):
+    response = {"Error": {"Code": "NoSuchKey"}}
+
+
+class Timeout(Exception):
+    pass
+
+
+class FakeR2:
+    """Serves `bodies` by key; a key mapped to an exception raises it every
+    time (or for the first `flaky[key]` calls)."""
+
+    def __init__(self, bodies, flaky=None):
+        self.bodies, self.flaky, self.calls = bodies, dict(flaky or {}), []
+
+    def get_object(self, Bucket, Key):
+        self.calls.append(Key)
+        if self.flaky.get(Key):
+            self.flaky[Key] -= 1
+            raise Timeout()
+        body = self.bodies[Key]
+        if isinstance(body, Exception):
+            raise body
+
+        class Body:
+            def read(self):
+                return body
+        return {"Body": Body()}
+
+
+def target(conv_id):
+    return (conv_id, 1, 2, f"CA{conv_id}", f"logs/{conv_id}.gz")
+
+
+@pytest.fixture(autouse=True)
+def bucket(monkeypatch):
+    monkeypatch.setenv("R2_BUCKET_NAME_DEV", "calls")
+
+
+def fetch(batch, client):
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        return refresh._fetch_batch(batch, True, client, pool, sleep=lambda s: None)
+
+
+def test_a_fetch_failing_mid_batch_holds_the_checkpoint_before_it():
+    batch = [target(c) for c in (10, 11, 12, 13)]
+    client = FakeR2({
+        "logs/10.gz": gzip.compress(b"log"),
+        "logs/11.gz": Missing(),          # gone for good: unreadable, not held
+        "logs/12.gz": Timeout(),          # R2 keeps timing out
+        "logs/13.gz": gzip.compress(b"log"),
+    })
+    fetched = fetch(batch, client)
+    assert [(t[0], err, transient) for t, _, err, transient in fetched] == [
+        (10, None, False), (11, "Missing", False), (12, "Timeout", True), (13, None, False)]
+    assert client.calls.count("logs/12.gz") == refresh.FETCH_ATTEMPTS
+    assert client.calls.count("logs/11.gz") == 1
+
+    analysed = [(t, [] if gz else None, err, transient) for t, gz, err, transient in fetched]
+    assert refresh.checkpoint_through(analysed) == (11, True)
+
+
+def test_a_transient_error_that_clears_is_retried_not_skipped():
+    client = FakeR2({"logs/10.gz": gzip.compress(b"log")}, flaky={"logs/10.gz": 2})
+    [(_, gz, err, transient)] = fetch([target(10)], client)
+    assert gz and err is None and not transient
+
+
+def test_a_failure_on_the_first_conversation_writes_no_checkpoint():
+    analysed = [(target(10), None, "Timeout", True), (target(11), [], None, False)]
+    assert refresh.checkpoint_through(analysed) == (None, True)
+    assert refresh.checkpoint_through(analysed[1:]) == (11, False)
@@ -0,0 +1,186 @@
+"""
+Tests for batched reminder sending (tasks.sms.send_reminders_batch) and the
+shared provider clients (tasks/utils/provider_clients.py).
+
+The database is faked at the claim/mark/release helpers and Twilio is a
+recording client. What matters is which reminders are sent, which claims are
+kept or released, and that every send in a batch goes through one client.
+
+Run:  python -m pytest test_reminder_batch.py -q
+"""
+
+import contextlib
+import os
+import threading
+from datetime import datetime
+
+import pytest
+
+with contextlib.redirect_stdout(open(os.devnull, "w")):
+    from tasks import sms
+from tasks.utils import provider_clients
+
+
+def _ctx(booking_id, **overrides):
+    ctx = {
+        "booking_id": booking_id, "tenant_id": "t1", "status": "confirmed", "source": "voice",
+        "customer_name": "Ada", "customer_phone": f"+6140000{booking_id:04d}",
+        "booking_ref": f"REF{booking_id}", "party_num": 2, "location_name": "Cafe",
+        "location_type": "rest", "staff_name": None, "service_name": None,
+        "start_time": datetime(2026, 9, 2, 18, 30), "end_time": datetime(2026, 9, 2, 20, 0),
+        "duration": 90, "is_flexible_duration": False, "flexible_booking_enabled": False,
+        "meeting_link_by_ref": None, "access_token": None, "booking_page_alias": None,
+    }
+    ctx.update(overrides)
+    return ctx
+
+
+class FakeConn:
+    def cursor(self):
+        return self
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeMessages:
+    def __init__(self, fail_for=()):
+        self.sent = []
+        self.fail_for = set(fail_for)
+        self._lock = threading.Lock()
+
+    def create(self, body, from_, to):
+        if to in self.fail_for:
+            raise RuntimeError("twilio 503")
+        with self._lock:
+            self.sent.append(to)
+        return type("Msg", (), {"sid": f"SM{len(self.sent)}"})()
+
+
+@pytest.fixture
+def world(monkeypatch):
+    state = {"contexts": {}, "marks": {}, "released": [], "clients": 0,
+             "messages": FakeMessages(), "already_claimed": set()}
+
+    def claim(conn, cur, pairs):
+        return [(int(b), str(int(o))) for b, o in pairs if (int(b), str(int(o))) not in state["already_claimed"]]
+
+    def client():
+        state["clients"] += 1
+        return type("Client", (), {"messages": state["messages"]})()
+
+    monkeypatch.setattr(sms.psycopg2, "connect", lambda *a, **k: FakeConn())
+    monkeypatch.setattr(sms, "_claim_reminders", claim)
+    monkeypatch.setattr(sms, "load_booking_context", lambda cur, booking_id: state["contexts"].get(booking_id))
+    monkeypatch.setattr(sms, "_mark_reminder",
+                        lambda conn, cur, tenant_id, b, key, st: state["marks"].__setitem__((b, key), st))
+    monkeypatch.setattr(sms, "_release_reminder",
+                        lambda conn, cur, b, key: state["released"].append((b, key)))
+    monkeypatch.setattr(sms, "twilio_client", client)
+    monkeypatch.setattr(sms, "create_tiny_url", lambda url: url)
+    return state
+
+
+def test_a_batch_sends_each_claimed_reminder_through_one_client(world):
+    world["contexts"] = {b: _ctx(b) for b in (1, 2, 3)}
+    summary = sms.send_reminders_batch([[1, 60], [2, 60], [3, 60], [1, 1440]])
+    assert summary == {"claimed": 4, "sent": 4, "suppressed": 0, "failed": 0}
+    assert sorted(world["messages"].sent) == sorted(
+        [_ctx(1)["customer_phone"]] * 2 + [_ctx(2)["customer_phone"], _ctx(3)["customer_phone"]]
+    )
+    assert world["clients"] == 1
+    assert {st["status"] for st in world["marks"].values()} == {"sent"}
+
+
+def test_already_claimed_reminders_are_not_sent_again(world):
+    world["contexts"] = {1: _ctx(1), 2: _ctx(2)}
+    world["already_claimed"] = {(1, "60")}
+    summary = sms.send_reminders_batch([[1, 60], [2, 60]])
+    assert summary["claimed"] == 1
+    assert world["messages"].sent == [_ctx(2)["customer_phone"]]
+
+
+def test_cancelled_chat_and_phoneless_bookings_are_suppressed(world):
+    world["contexts"] = {
+        1: _ctx(1, status="cancelled"),
+        2: _ctx(2, source="instagram"),
+        3: _ctx(3, customer_phone=None),
+    }
+    summary = sms.send_reminders_batch([[1, 60], [2, 60], [3, 60]])
+    assert summary["suppressed"] == 3
+    assert world["messages"].sent == []
+    assert world["marks"][(1, "60")] == {"status": "suppressed", "reason": "cancelled"}
+    assert world["marks"][(2, "60")]["reason"] == "chat_source"
+    assert world["marks"][(3, "60")]["reason"] == "no_phone"
+
+
+def test_a_failed_send_keeps_its_claim_and_the_rest_still_go_out(world):
+    world["contexts"] = {1: _ctx(1), 2: _ctx(2)}
+    world["messages"].fail_for = {_ctx(1)["customer_phone"]}
+    summary = sms.send_reminders_batch([[1, 60], [2, 60]])
+    assert summary["sent"] == 1 and summary["failed"] == 1
+    # The Twilio call was made, so the SMS may have gone out: never release.
+    assert world["released"] == []
+    assert (1, "60") not in world["marks"]
+
+
+def test_a_failure_before_sending_releases_the_claim(world, monkeypatch):
+    world["contexts"] = {1: _ctx(1)}
+
+    def broken(ctx):
+        raise ValueError("bad template")
+
+    monkeypatch.setattr(sms, "_reminder_message", broken)
+    summary = sms.send_reminders_batch([[1, 60]])
+    assert summary["failed"] == 1
+    assert world["released"] == [(1, "60")]
+    assert world["messages"].sent == []
+
+
+def test_provider_clients_are_built_once_per_process(monkeypatch):
+    provider_clients.reset()
+    built = []
+    first = provider_clients._pooled("x", ("k",), lambda: built.append(1) or object())
+    assert provider_clients._pooled("x", ("k",), lambda: built.append(1) or object()) is first
+    assert len(built) == 1
+
+    # A forked child gets its own client, never the parent's sockets.
+    monkeypatch.setattr(provider_clients.os, "getpid", lambda: -1)
+    assert provider_clients._pooled("x", ("k",), lambda: object()) is not first
+    provider_clients.reset()
+
+
+def test_missing_twilio_credentials_claim_nothing(world, monkeypatch):
+    world["contexts"] = {1: _ctx(1)}
+    claims = []
+    monkeypatch.setattr(sms, "_claim_reminders", lambda conn, cur, pairs: claims.append(pairs) or [])
+
+    def no_credentials():
+        raise ValueError("TWILIO_ACCOUNT_SID not set")
+
+    monkeypatch.setattr(sms, "twilio_client", no_credentials)
+    sms.send_reminders_batch([[1, 60]])
+    assert claims == []
+
+
+def test_a_batch_error_after_claiming_releases_every_unsent_claim(world, monkeypatch):
+    world["contexts"] = {1: _ctx(1), 2: _ctx(2, status="cancelled")}
+
+    class BrokenPool:
+        def __init__(self, *args, **kwargs):
+            raise RuntimeError("can't start new thread")
+
+    import concurrent.futures
+    monkeypatch.setattr(concurrent.futures, "ThreadPoolExecutor", BrokenPool)
+    summary = sms.send_reminders_batch([[1, 60], [1, 1440], [2, 60]])
+    assert summary["claimed"] == 3
+    assert world["messages"].sent == []
+    # 2/60 was settled as suppressed; the two unsent claims are freed
+    assert sorted(world["released"]) == [(1, "1440"), (1, "60")]
+    assert world["marks"][(2, "60")]["reason"] == "cancelled"
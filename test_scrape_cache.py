@@ -0,0 +1,93 @@
+"""
+Tests for the Firecrawl scrape cache (tasks/utils/scrape_cache.py).
+
+Redis is replaced with an in-memory dict — what matters here is the keying,
+the "never cache an empty page" rule and the fail-open behaviour, not Redis.
+
+Run:  python -m pytest test_scrape_cache.py -q
+"""
+
+import pytest
+
+from tasks.utils import scrape_cache as sc
+
+
+class FakeRedis:
+    def __init__(self):
+        self.store = {}
+        self.ttls = {}
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def set(self, key, value, ex=None):
+        self.store[key] = value
+        self.ttls[key] = ex
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    r = FakeRedis()
+    monkeypatch.setattr(sc, "_client", lambda: r)
+    return r
+
+
+PAGE = {"markdown": "# Menu\n\nFlat white $5", "metadata": {"title": "Menu", "sourceURL": "https://cafe.test/menu"}}
+
+
+def test_page_round_trips_under_the_normalised_url(fake):
+    """`_norm_url` is the dedup key select_urls already uses — a trailing slash
+    or different case must hit the same entry."""
+    sc.put_page("https://Cafe.test/menu/", PAGE)
+    assert sc.get_page("https://cafe.test/menu") == PAGE
+    assert len(fake.store) == 1
+
+
+def test_page_expires_after_the_freshness_ttl(fake):
+    sc.put_page("https://cafe.test/menu", PAGE)
+    assert list(fake.ttls.values()) == [sc.PAGE_TTL_SECONDS]
+
+
+def test_empty_page_is_never_cached(fake):
+    """An empty scrape is usually a transient render failure; caching it would
+    pin the failure for the whole TTL."""
+    sc.put_page("https://cafe.test/menu", {"markdown": "   ", "metadata": {}})
+    assert fake.store == {}
+    assert sc.get_page("https://cafe.test/menu") is None
+
+
+def test_crawls_are_keyed_by_page_limit(fake):
+    pages = [{"url": "https://cafe.test", "title": "Home", "markdown": "hi"}]
+    sc.put_crawl("https://cafe.test", 10, pages)
+    assert sc.get_crawl("https://cafe.test/", 10) == pages
+    assert sc.get_crawl("https://cafe.test", 5) is None
+
+
+def test_extraction_is_reused_only_for_an_identical_corpus(fake):
+    digest = sc.content_hash("gpt-4o-mini", "PROMPT", "corpus v1")
+    sc.put_extraction("knowledge", digest, '{"items": []}')
+    assert sc.get_extraction("knowledge", sc.content_hash("gpt-4o-mini", "PROMPT", "corpus v1")) == '{"items": []}'
+    assert sc.get_extraction("knowledge", sc.content_hash("gpt-4o-mini", "PROMPT", "corpus v2")) is None
+
+
+def test_content_hash_separates_its_parts():
+    assert sc.content_hash("ab", "c") != sc.content_hash("a", "bc")
+
+
+def test_no_redis_is_a_miss_not_an_error(monkeypatch):
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    sc.put_page("https://cafe.test/menu", PAGE)
+    assert sc.get_page("https://cafe.test/menu") is None
+
+
+def test_broken_redis_is_a_miss_not_an_error(monkeypatch):
+    class Broken:
+        def get(self, key):
+            raise ConnectionError("down")
+
+        def set(self, *a, **k):
+            raise ConnectionError("down")
+
+    monkeypatch.setattr(sc, "_client", lambda: Broken())
+    sc.put_page("https://cafe.test/menu", PAGE)
+    assert sc.get_page("https://cafe.test/menu") is None
@@ -0,0 +1,117 @@
+"""
+Tests for the SMS short-link store (tasks/utils/short_links.py).
+
+Redis is an in-memory dict and TinyURL is a counter — what matters is that a
+URL is shortened once, that our own codes never need TinyURL, and that every
+failure still leaves a usable link.
+
+Run:  python -m pytest test_short_links.py -q
+"""
+
+import pytest
+
+from tasks.utils import short_links as sl
+
+URL = "https://speako.ai/customer/booking/cafe/view?token=abc"
+
+
+class FakeRedis:
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.store:
+            return None
+        self.store[key] = value
+        return True
+
+    def expire(self, key, ttl):
+        return key in self.store
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    r = FakeRedis()
+    monkeypatch.setattr(sl, "_client", lambda: r)
+    return r
+
+
+@pytest.fixture
+def tinyurl(monkeypatch):
+    calls = []
+
+    def create(long_url):
+        calls.append(long_url)
+        return f"https://tinyurl.com/{len(calls)}"
+
+    monkeypatch.setattr(sl, "tinyurl_create", create)
+    return calls
+
+
+def test_tinyurl_is_called_once_per_url(fake, tinyurl, monkeypatch):
+    monkeypatch.delenv("SHORT_LINK_BASE_URL", raising=False)
+    assert sl.shorten(URL) == "https://tinyurl.com/1"
+    assert sl.shorten(URL) == "https://tinyurl.com/1"
+    assert tinyurl == [URL]
+
+
+def test_own_codes_skip_tinyurl_and_resolve(fake, tinyurl, monkeypatch):
+    monkeypatch.setenv("SHORT_LINK_BASE_URL", "https://api.speako.ai/")
+    short = sl.shorten(URL)
+    assert short.startswith("https://api.speako.ai/s/")
+    assert tinyurl == []
+    assert sl.resolve(short.rsplit("/", 1)[1]) == URL
+
+
+def test_own_codes_are_stable_for_the_same_url(fake, tinyurl, monkeypatch):
+    monkeypatch.setenv("SHORT_LINK_BASE_URL", "https://api.speako.ai")
+    first = sl.shorten(URL)
+    fake.store.pop(sl._url_key(URL))  # the url->short entry expired, the code didn't
+    assert sl.shorten(URL) == first
+
+
+def test_a_code_collision_picks_another_code(fake, tinyurl, monkeypatch):
+    monkeypatch.setenv("SHORT_LINK_BASE_URL", "https://api.speako.ai")
+    fake.store[sl._code_key(sl._code(URL, 0))] = "https://elsewhere.test"
+    short = sl.shorten(URL)
+    assert short.endswith(sl._code(URL, 1))
+    assert sl.resolve(sl._code(URL, 1)) == URL
+
+
+def test_failed_shortening_returns_the_long_url_uncached(fake, monkeypatch):
+    monkeypatch.delenv("SHORT_LINK_BASE_URL", raising=False)
+    monkeypatch.setattr(sl, "tinyurl_create", lambda long_url: None)
+    assert sl.shorten(URL) == URL
+    assert fake.store == {}
+
+
+def test_without_redis_it_shortens_as_before(monkeypatch, tinyurl):
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    monkeypatch.setenv("SHORT_LINK_BASE_URL", "https://api.speako.ai")
+    assert sl.shorten(URL) == "https://tinyurl.com/1"
+
+
+def test_resolve_rejects_malformed_codes(fake):
+    assert sl.resolve("../../etc") is None
+    assert sl.resolve("") is None
+
+
+def test_resolve_returns_none_when_redis_fails(monkeypatch):
+    class Down:
+        def get(self, key):
+            raise ConnectionError("redis down")
+
+    monkeypatch.setattr(sl, "_client", lambda: Down())
+    assert sl.resolve(sl._code(URL, 0)) is None
+
+
+def test_sending_a_cached_link_again_restores_its_code(fake, tinyurl, monkeypatch):
+    monkeypatch.setenv("SHORT_LINK_BASE_URL", "https://api.speako.ai")
+    short = sl.shorten(URL)
+    code = short.rsplit("/", 1)[1]
+    fake.store.pop(sl._code_key(code))  # the code was lost, the url->short entry wasn't
+    assert sl.shorten(URL) == short
+    assert sl.resolve(code) == URL and tinyurl == []
@@ -0,0 +1,232 @@
+"""
+Tests for the slot-search index (tasks/utils/slot_index.py).
+
+Redis is an in-memory fake covering the sorted-set, hash and pipeline calls
+the index makes. Days are built in the exact shape the availability
+generators cache. What matters is that earliest-fit and range queries agree
+with the chunk data, and that rewriting a day replaces it rather than adding
+to it.
+
+Run:  python -m pytest test_slot_index.py -q
+"""
+
+import contextlib
+import os
+from datetime import datetime
+
+import pytest
+
+from tasks.utils import slot_index as si
+
+SERVICES = [{"id": 2, "name": "Cut", "duration": 30},
+            {"id": 3, "name": "Colour", "duration": 90},
+            {"id": 5, "name": "Consult", "duration": 60, "is_flexible_duration": True,
+             "min_duration_minutes": 30, "max_duration_minutes": 120, "duration_increment_minutes": 30}]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.zsets, self.hashes = {}, {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def delete(self, key):
+        self.zsets.pop(key, None)
+        self.hashes.pop(key, None)
+
+    def set(self, key, value):
+        pass
+
+    def expire(self, key, ttl):
+        return True
+
+    def hkeys(self, key):
+        return list(self.hashes.get(key, {}))
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update(mapping)
+
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def zremrangebyscore(self, key, low, high):
+        low = float(low)
+        z = self.zsets.get(key, {})
+        for member in [m for m, s in z.items() if low <= s <= high]:
+            del z[member]
+
+    def zrangebyscore(self, key, low, high, start=0, num=None, withscores=False):
+        high = float(high)
+        rows = sorted(((m, s) for m, s in self.zsets.get(key, {}).items() if low <= s <= high),
+                      key=lambda r: (r[1], r[0]))
+        return rows[start:start + num if num is not None else None]
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client, self.queued = client, []
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+        return lambda *a, **k: self.queued.append(lambda: method(*a, **k))
+
+    def execute(self):
+        return [call() for call in self.queued]
+
+
+def staff_day(date_str, staff, is_open=True):
+    return {"date": date_str, "staff": staff, "holiday": None, "is_open": is_open,
+            "open_hours": [{"start": "09:00", "end": "17:00"}]}
+
+
+def venue_day(date_str, tables, is_open=True):
+    return {"date": date_str, "holiday": None, "is_open": is_open,
+            "open_hours": [{"start": "17:00", "end": "22:00"}], "tables": tables}
+
+
+def table(unit_id, low, high, starts):
+    return {"id": unit_id, "name": f"T{unit_id}", "capacity": high, "min_capacity": low,
+            "service": [1], "zone_tags": "", "zone_tag_ids": [],
+            "slots": [{"start": "17:00:00", "end": "22:00:00", "service_duration": "90",
+                       "bookable_starts": starts}]}
+
+
+@pytest.fixture
+def r():
+    return FakeRedis()
+
+
+def test_earliest_staff_start_fits_the_service_duration(r):
+    day = staff_day("2026-10-19", [
+        {"id": 4, "name": "Jo", "service": [2, 3], "slots": [{"start": "09:00:00", "end": "10:00:00"},
+                                                            {"start": "13:00:00", "end": "15:00:00"}]},
+        {"id": 6, "name": "Al", "service": [2], "slots": [{"start": "11:15:00", "end": "11:45:00"}]},
+    ])
+    si.write_days(r, 1, 2, {"2026-10-19": day}, services=SERVICES)
+    after = datetime(2026, 10, 19, 9, 40)
+    assert si.earliest(r, 1, 2, after, service_id=2) == {
+        "date": "2026-10-19", "start": "11:15", "lane": "svc_2", "staff_id": 6}
+    # A 90-minute colour never fits the 09:00-10:00 window.
+    assert si.earliest(r, 1, 2, datetime(2026, 10, 19, 0, 0), service_id=3)["start"] == "13:00"
+    assert [s["start"] for s in si.search(r, 1, 2, datetime(2026, 10, 19, 13, 0),
+                                          before=datetime(2026, 10, 19, 13, 30),
+                                          service_id=3, limit=10)] == ["13:00", "13:15", "13:30"]
+
+
+def test_flexible_services_fit_their_minimum_duration(r):
+    day = staff_day("2026-10-19", [
+        {"id": 4, "name": "Jo", "service": [5], "slots": [{"start": "09:00:00", "end": "09:30:00"}]}])
+    si.write_days(r, 1, 2, {"2026-10-19": day}, services=SERVICES)
+    assert si.earliest(r, 1, 2, datetime(2026, 10, 19, 8, 0), service_id=5)["start"] == "09:00"
+
+
+def test_party_size_only_searches_tables_that_seat_it(r):
+    day = venue_day("2026-10-19", [table(7, 1, 2, ["17:00", "17:15"]),
+                                   table(8, 3, 6, ["18:30"])])
+    si.write_days(r, 1, 2, {"2026-10-19": day})
+    after = datetime(2026, 10, 19, 16, 0)
+    assert si.earliest(r, 1, 2, after, party_size=4)["venue_unit_id"] == 8
+    assert si.earliest(r, 1, 2, after, party_size=2) == {
+        "date": "2026-10-19", "start": "17:00", "lane": "cap_1_2", "venue_unit_id": 7}
+    assert si.earliest(r, 1, 2, after, party_size=9) is None
+
+
+def test_search_crosses_days_in_order(r):
+    days = {"2026-10-19": venue_day("2026-10-19", [table(7, 1, 4, ["21:00"])]),
+            "2026-10-20": venue_day("2026-10-20", [table(7, 1, 4, ["17:00", "17:15"])])}
+    si.write_days(r, 1, 2, days)
+    hits = si.search(r, 1, 2, datetime(2026, 10, 19, 20, 0), party_size=2, limit=2)
+    assert [(h["date"], h["start"]) for h in hits] == [("2026-10-19", "21:00"), ("2026-10-20", "17:00")]
+
+
+def test_rewriting_a_day_replaces_its_starts(r):
+    si.write_days(r, 1, 2, {"2026-10-19": venue_day("2026-10-19", [table(7, 1, 4, ["17:00", "19:00"])]),
+                            "2026-10-20": venue_day("2026-10-20", [table(7, 1, 4, ["17:00"])])})
+    # A booking took 17:00 on the 19th; the regen rewrites that day only.
+    si.write_days(r, 1, 2, {"2026-10-19": venue_day("2026-10-19", [table(7, 1, 4, ["19:00"])])})
+    hits = si.search(r, 1, 2, datetime(2026, 10, 19, 0, 0), party_size=2, limit=10)
+    assert [(h["date"], h["start"]) for h in hits] == [("2026-10-19", "19:00"), ("2026-10-20", "17:00")]
+
+
+def test_a_closed_day_clears_every_lane(r):
+    si.write_days(r, 1, 2, {"2026-10-19": venue_day("2026-10-19", [table(7, 1, 4, ["17:00"])])})
+    si.write_days(r, 1, 2, {"2026-10-19": venue_day("2026-10-19", [], is_open=False)})
+    assert si.earliest(r, 1, 2, datetime(2026, 10, 19, 0, 0), party_size=2) is None
+
+
+def test_rebuild_drops_lanes_that_no_longer_exist(r):
+    si.write_days(r, 1, 2, {"2026-10-19": venue_day("2026-10-19", [table(7, 1, 4, ["17:00"])])})
+    si.write_days(r, 1, 2, {"2026-10-19": venue_day("2026-10-19", [table(9, 2, 8, ["18:00"])])},
+                  rebuild=True)
+    assert si.earliest(r, 1, 2, datetime(2026, 10, 19, 0, 0), party_size=2)["venue_unit_id"] == 9
+    assert list(r.hashes[si.lanes_key(1, 2)]) == ["cap_2_8"]
+
+
+def test_a_failed_write_is_reported_not_raised():
+    class Broken:
+        def hkeys(self, key):
+            raise ConnectionError("down")
+
+    day = venue_day("2026-10-19", [table(7, 1, 4, ["17:00"])])
+    assert si.write_days(Broken(), 1, 2, {"2026-10-19": day}) is None
+
+
+class GeneratorCursor:
+    """Answers the staff generator's services queries; everything else is empty."""
+
+    def __init__(self):
+        self.last = ""
+
+    def execute(self, sql, params=None):
+        self.last = sql
+
+    def fetchall(self):
+        if "JOIN services s" in self.last:
+            return [(2, "Cut", 30.0, False, None, None, None)]
+        if "SELECT service_id FROM location_services" in self.last:
+            return [(2,)]
+        return []
+
+    def close(self):
+        pass
+
+
+class GeneratorConn:
+    def cursor(self):
+        return GeneratorCursor()
+
+    def commit(self):
+        pass
+
+
+def test_a_midnight_roll_indexes_the_days_it_reused(r, monkeypatch):
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        import tasks.availability_gen_regen as gen
+
+    staff = [{"id": 9, "name": "Sam", "service": [2], "slots": [{"start": "09:00:00", "end": "10:00:00"}]}]
+
+    def reusable_days(cur, client, kind, tenant_id, location_id, dates):
+        return {d: staff_day(d, staff) for d in dates[:-1]}   # only the new last day is computed
+
+    monkeypatch.setattr(gen.day_store, "database_now", lambda cur: None)
+    monkeypatch.setattr(gen.day_store, "reusable_days", reusable_days)
+    monkeypatch.setattr(gen.day_store, "write_days", lambda *a, **k: None)
+    for loader in ("load_staff_schedule", "load_location_hours", "load_bookings"):
+        monkeypatch.setattr(gen.schedule, loader, lambda *a, **k: {})
+    monkeypatch.setattr(gen.schedule, "staff_day", lambda *a, **k: {})
+    monkeypatch.setattr(gen.schedule, "open_hours", lambda *a, **k: None)
+    r.hashes[si.lanes_key(1, 2)] = {"svc_99": '{"kind": "service", "service_id": 99}'}
+    r.zsets[si.lane_key(1, 2, "svc_99")] = {"2020-01-01 09:00|1": 0}
+
+    result = gen.generate_staff_location(GeneratorConn(), r, 1, 2, "Australia/Sydney", rolling=True)
+
+    assert result["days_computed"] == 1
+    today = si.local_now("Australia/Sydney").replace(hour=0, minute=0)
+    hit = si.earliest(r, 1, 2, today, service_id=2)
+    assert hit == {"date": today.date().isoformat(), "start": "09:00", "lane": "svc_2", "staff_id": 9}
+    assert list(r.hashes[si.lanes_key(1, 2)]) == ["svc_2"]      # rebuilt: the stale lane is gone
+    assert len({m.split(" ")[0] for m in r.zsets[si.lane_key(1, 2, "svc_2")]}) == 59   # every reused day
@@ -31,6 +31,7 @@ _task_db = types.ModuleType("tasks.utils.task_db")
 for _fn in ("mark_task_running", "mark_task_failed", "mark_task_succeeded",
             "upsert_tenant_integration_param"):
     setattr(_task_db, _fn, lambda *a, **k: None)
+_real_task_db = sys.modules.get("tasks.utils.task_db")
 sys.modules["tasks.utils.task_db"] = _task_db
 
 from tasks.sync_speako_data import (
@@ -45,6 +46,12 @@ from tasks.sync_speako_data import (
     _spell_out,
 )
 
+# Only the import above needs the stub; later test modules get the real one.
+if _real_task_db is None:
+    del sys.modules["tasks.utils.task_db"]
+else:
+    sys.modules["tasks.utils.task_db"] = _real_task_db
+
 _failures = []
 
 
@@ -0,0 +1,203 @@
+"""
+Tests for candidate discovery and the watermark in
+tasks/summarize_chat_sessions.py.
+
+No Postgres, OpenAI or Redis: the connection answers the task's queries from
+fixed rows, the completions/embeddings/writes are replaced, and Redis is an
+in-memory fake. What matters here is which candidate query a run uses, and
+that a failing segment holds the watermark back only until it runs out of
+attempts. bench_summarize_candidates.py times the queries themselves.
+
+Run:  python -m pytest test_summarize_chat_sessions.py -q
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from tasks import summarize_chat_sessions as scs
+
+RUN_START = datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc)
+
+
+def segment(session_id, seg):
+    return {"session_id": session_id, "tenant_id": 1, "channel": "messenger",
+            "channel_session_id": f"psid-{session_id}", "current_conversation_id": "current",
+            "seg": seg}
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.conn.executed.append((sql, params))
+        if "AS run_start" in sql:
+            self.result = [{"run_start": RUN_START}]
+        elif "AS since" in sql:
+            watermark, secs = params
+            self.result = [{"since": datetime.fromisoformat(watermark) - timedelta(seconds=secs)}]
+        elif "GROUP BY" in sql:
+            self.result = list(self.conn.candidates)
+        else:   # a transcript
+            self.result = [{"role": "user", "content": "hi"}] * scs.MIN_USER_MESSAGES
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+
+class FakeConn:
+    def __init__(self, candidates):
+        self.candidates = candidates
+        self.executed = []
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeRedis:
+    def __init__(self):
+        self.strings, self.hashes = {}, {}
+
+    def get(self, key):
+        return self.strings.get(key)
+
+    def set(self, key, value, ex=None):
+        self.strings[key] = value
+
+    def hincrby(self, key, field, amount):
+        h = self.hashes.setdefault(key, {})
+        h[field] = h.get(field, 0) + amount
+        return h[field]
+
+    def hdel(self, key, *fields):
+        for field in fields:
+            self.hashes.get(key, {}).pop(field, None)
+
+    def expire(self, key, ttl):
+        return True
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client, self.queued = client, []
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+        return lambda *a, **k: self.queued.append(lambda: method(*a, **k))
+
+    def execute(self):
+        return [call() for call in self.queued]
+
+
+def run_task(task, *args, **kwargs):
+    """Call a bound task in-process (a stubbed Celery app leaves the plain
+    function, which takes `self` first)."""
+    run = getattr(task, "run", None)
+    return run(*args, **kwargs) if run else task(None, *args, **kwargs)
+
+
+@pytest.fixture
+def env(monkeypatch):
+    state = {"redis": FakeRedis(), "conn": FakeConn([segment(1, "good"), segment(2, "bad")]),
+             "written": []}
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(scs, "_redis", lambda: state["redis"])
+    monkeypatch.setattr(scs, "_get_conn", lambda: state["conn"])
+
+    def summarize_all(client, jobs):
+        """Segment "bad" fails every time (a transcript the model chokes on)."""
+        done = [(row, "summary") for row, _ in jobs if row["seg"] != "bad"]
+        return done, [row for row, _ in jobs if row["seg"] == "bad"]
+
+    monkeypatch.setattr(scs, "_summarize_all", summarize_all)
+    monkeypatch.setattr(scs, "_embed_all", lambda client, texts: [[0.0]] * len(texts))
+    monkeypatch.setattr(scs, "_write_episodes",
+                        lambda conn, done, embeddings: state["written"].extend(r["seg"] for r, _ in done))
+    return state
+
+
+def candidate_query(conn):
+    """(sql, params) of the most recent run's candidate query."""
+    return [(sql, params) for sql, params in conn.executed if "GROUP BY" in sql][-1]
+
+
+def test_find_candidates_uses_the_bounded_query_only_with_a_since():
+    conn = FakeConn([])
+    scs.find_candidates(FakeCursor(conn))
+    scs.find_candidates(FakeCursor(conn), since="2026-10-18T10:00:00+00:00")
+    (full_sql, full_params), (since_sql, since_params) = conn.executed
+    assert full_sql == scs._CANDIDATES_FULL_SQL and "since" not in full_params
+    assert since_sql == scs._CANDIDATES_SINCE_SQL
+    assert since_params["since"] == "2026-10-18T10:00:00+00:00"
+
+
+def test_a_run_without_a_watermark_scans_everything(env):
+    env["conn"].candidates = [segment(1, "good")]
+    result = run_task(scs.summarize_chat_sessions)
+    assert candidate_query(env["conn"])[0] == scs._CANDIDATES_FULL_SQL
+    assert result["since"] is None and result["summarized"] == 1
+    assert env["redis"].strings[scs.WATERMARK_KEY] == RUN_START.isoformat()
+
+
+def test_a_watermark_bounds_the_window_by_the_idle_timeout_and_grace(env):
+    env["redis"].strings[scs.WATERMARK_KEY] = "2026-10-18T11:30:00+00:00"
+    env["conn"].candidates = [segment(1, "good")]
+    run_task(scs.summarize_chat_sessions)
+    sql, params = candidate_query(env["conn"])
+    assert sql == scs._CANDIDATES_SINCE_SQL
+    assert params["since"] == datetime(2026, 10, 18, 11, 30, tzinfo=timezone.utc) - timedelta(
+        seconds=scs.IDLE_TIMEOUT_SECONDS + scs.WATERMARK_GRACE_SECONDS)
+
+    run_task(scs.summarize_chat_sessions, full_scan=True)
+    assert candidate_query(env["conn"])[0] == scs._CANDIDATES_FULL_SQL
+
+
+def test_a_failing_segment_holds_the_watermark_until_it_runs_out_of_attempts(env):
+    env["redis"].strings[scs.WATERMARK_KEY] = "2026-10-18T11:30:00+00:00"
+    for attempt in range(1, scs.MAX_SEGMENT_ATTEMPTS):
+        result = run_task(scs.summarize_chat_sessions)
+        assert result["failed"] == 1
+        assert env["redis"].strings[scs.WATERMARK_KEY] == "2026-10-18T11:30:00+00:00"
+        assert env["redis"].hashes[scs.FAILURES_KEY] == {"2:bad": attempt}
+
+    run_task(scs.summarize_chat_sessions)
+    assert env["redis"].strings[scs.WATERMARK_KEY] == RUN_START.isoformat()
+
+
+def test_a_summarised_segment_forgets_its_failures(env):
+    env["redis"].hashes[scs.FAILURES_KEY] = {"1:good": 2}
+    env["conn"].candidates = [segment(1, "good")]
+    run_task(scs.summarize_chat_sessions)
+    assert env["redis"].hashes[scs.FAILURES_KEY] == {}
+    assert env["written"] == ["good"]
+
+
+def test_a_failed_episode_write_counts_against_every_segment_in_it(env, monkeypatch):
+    def broken(conn, done, embeddings):
+        raise RuntimeError("insert failed")
+
+    monkeypatch.setattr(scs, "_write_episodes", broken)
+    result = run_task(scs.summarize_chat_sessions)
+    assert result["failed"] == 2 and result["summarized"] == 0
+    assert env["redis"].hashes[scs.FAILURES_KEY] == {"1:good": 1, "2:bad": 1}
+    assert scs.WATERMARK_KEY not in env["redis"].strings
@@ -0,0 +1,117 @@
+"""
+Tests for per-queue routing and lazy task-module loading (tasks/task_registry.py).
+
+No broker is needed: lazy stubs are exercised with ``Task.apply()``.
+
+Run:  python -m pytest test_task_registry.py -q
+"""
+
+import importlib
+import sys
+import textwrap
+
+import pytest
+
+celery = pytest.importorskip("celery")
+if not hasattr(celery, "Task"):
+    # test_speakable_output / test_flexible_duration_* stub celery module-wide
+    # when collected in the same session.
+    pytest.skip("celery is stubbed in this session", allow_module_level=True)
+
+from tasks import task_registry as tr
+from tasks.celery_app import app
+
+
+def test_tasks_are_routed_to_their_modules_queue():
+    assert tr.route_task("tasks.sms.send_reminder", (), {}, {}) == {"queue": "sms"}
+    assert tr.route_task("tasks.availability_gen_regen.gen_availability", (), {}, {}) == {"queue": "availability"}
+    # Explicit name= equal to the module path.
+    assert tr.route_task("tasks.publish_native_agent", (), {}, {}) == {"queue": "agent"}
+    # Unknown names fall through to task_default_queue.
+    assert tr.route_task("celery.backend_cleanup", (), {}, {}) is None
+
+
+def test_routing_is_wired_into_the_app():
+    assert app.amqp.router.route({}, "tasks.scrape_url.scrape_url_to_markdown")["queue"].name == "scrape"
+    assert {q.name for q in app.conf.task_queues} == set(tr.all_queues())
+
+
+def test_a_worker_without_queues_loads_every_module():
+    assert tr.modules_for_queues() == list(tr.TASK_MODULES)
+
+
+def test_a_dedicated_worker_loads_only_its_queues():
+    mods = tr.modules_for_queues(["sms", "availability"])
+    assert mods == ["tasks.availability", "tasks.sms", "tasks.availability_gen_regen"]
+    assert "tasks.scrape_url" not in tr.modules_for_queues(exclude=["scrape"])
+
+
+def test_static_discovery_matches_what_importing_registers():
+    """The stub names must be exactly the names the real modules register, or
+    a lazily-loaded worker would reject messages as unregistered."""
+    for module in tr.TASK_MODULES:
+        importlib.import_module(module)
+    registered = {n for n in app.tasks if not n.startswith("celery.")}
+    discovered = {t["name"] for m in tr.TASK_MODULES for t in tr.discover_tasks(m)}
+    assert discovered == registered
+
+
+def test_discovery_keeps_task_options():
+    by_name = {t["name"]: t for t in tr.discover_tasks("tasks.availability_gen_regen")}
+    assert by_name["tasks.availability_gen_regen.gen_availability"]["options"]["acks_late"] is True
+    by_name = {t["name"]: t for t in tr.discover_tasks("tasks.refresh_annual_minutes")}
+    assert "max_retries" in by_name["tasks.refresh_annual_minutes.refresh_annual_minutes_for_tenant"]["options"]
+
+
+@pytest.fixture
+def demo_module(tmp_path, monkeypatch):
+    name = "lazy_demo_tasks"
+    (tmp_path / f"{name}.py").write_text(textwrap.dedent("""
+        from tasks.celery_app import app
+
+        @app.task(bind=True, max_retries=7)
+        def bound(self, x, y=0):
+            return {"id": self.request.id, "sum": x + y, "max_retries": self.max_retries}
+
+        @app.task
+        def plain(x):
+            return x * 2
+    """))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield name
+    sys.modules.pop(name, None)
+    for task in ("bound", "plain"):
+        app._tasks.pop(f"{name}.{task}", None)
+
+
+def test_lazy_stub_defers_the_import_until_first_run(demo_module):
+    names = tr.register_lazy(app, demo_module)
+    assert sorted(names) == [f"{demo_module}.bound", f"{demo_module}.plain"]
+    assert demo_module not in sys.modules
+    stub = app.tasks[f"{demo_module}.bound"]
+    assert isinstance(stub, tr.LazyTask)
+    assert stub.max_retries == 7
+
+    result = stub.apply(args=(2,), kwargs={"y": 3}, task_id="abc").get()
+    assert result == {"id": "abc", "sum": 5, "max_retries": 7}
+    assert demo_module in sys.modules
+    # The consumer keeps dispatching to the stub; it now forwards directly.
+    assert isinstance(app.tasks[f"{demo_module}.plain"], tr.LazyTask)
+    assert app.tasks[f"{demo_module}.plain"].apply(args=(4,)).get() == 8
+
+
+def test_lazy_stub_survives_a_module_imported_behind_its_back(demo_module):
+    """If another task imports the module while the stubs are registered, its
+    decorators return the stubs; resolving must still find the real functions."""
+    tr.register_lazy(app, demo_module)
+    importlib.import_module(demo_module)
+    assert app.tasks[f"{demo_module}.plain"].apply(args=(5,)).get() == 10
+
+
+def test_load_task_modules_stubs_instead_of_importing(monkeypatch):
+    monkeypatch.setattr(tr, "register_lazy", lambda app, module: [module])
+    imported = []
+    monkeypatch.setattr(tr.importlib, "import_module", imported.append)
+    out = tr.load_task_modules(app, queues=["scrape"], lazy=True)
+    assert out == {"imported": [], "stubbed": ["tasks.scrape_url", "tasks.scrape_business_profile"]}
+    assert imported == []
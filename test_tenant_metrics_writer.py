@@ -0,0 +1,96 @@
+"""
+Tests for the bulk tenant_aggregated_metrics writer
+(tasks/utils/tenant_metrics_writer.py).
+
+execute_values is replaced by a recorder. The statement itself runs against
+Postgres. What matters here is when the writer flushes, that one statement
+carries the whole buffer, and what happens to the buffer on failure.
+
+Run:  python -m pytest test_tenant_metrics_writer.py -q
+"""
+
+import json
+
+import psycopg2.extras
+import pytest
+
+from tasks.utils.tenant_metrics_writer import METRICS_VERSION, MetricsWriter
+
+
+class FakeCursor:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeConn:
+    def __init__(self):
+        self.commits = self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor()
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+@pytest.fixture
+def statements(monkeypatch):
+    calls = []
+
+    def record(cur, sql, rows, **kwargs):
+        calls.append((sql, list(rows), kwargs))
+
+    monkeypatch.setattr(psycopg2.extras, "execute_values", record)
+    return calls
+
+
+def test_many_tenants_go_out_in_one_statement(statements):
+    conn = FakeConn()
+    with MetricsWriter(conn) as writer:
+        for tenant_id in (1, 2, 3):
+            writer.add(tenant_id, {"summary": {"tenant": tenant_id}})
+        assert statements == []
+    [(sql, rows, kwargs)] = statements
+    assert "ON CONFLICT (tenant_id)" in sql
+    assert [r[0] for r in rows] == [1, 2, 3]
+    assert json.loads(rows[1][2]) == {"summary": {"tenant": 2}}
+    assert {r[3] for r in rows} == {METRICS_VERSION}
+    assert kwargs["page_size"] == 3
+    assert conn.commits == 1 and writer.written == 3
+
+
+def test_flushes_every_batch_size_and_keeps_the_latest_row_per_tenant(statements):
+    writer = MetricsWriter(FakeConn(), batch_size=2)
+    writer.add(1, {"v": "old"})
+    writer.add(1, {"v": "new"})   # same tenant: still one pending row
+    assert len(writer) == 1 and statements == []
+    writer.add(2, {})
+    assert len(statements) == 1 and len(writer) == 0
+    assert json.loads(statements[0][1][0][2]) == {"v": "new"}
+
+
+def test_a_failed_flush_rolls_back_and_keeps_the_rows(monkeypatch):
+    def broken(*args, **kwargs):
+        raise psycopg2.OperationalError("connection lost")
+
+    monkeypatch.setattr(psycopg2.extras, "execute_values", broken)
+    conn = FakeConn()
+    writer = MetricsWriter(conn)
+    writer.add(1, {})
+    with pytest.raises(psycopg2.OperationalError):
+        writer.flush()
+    assert conn.rollbacks == 1 and len(writer) == 1 and writer.written == 0
+
+
+def test_an_exception_in_the_block_drops_the_buffer(statements):
+    with pytest.raises(RuntimeError):
+        with MetricsWriter(FakeConn()) as writer:
+            writer.add(1, {})
+            raise RuntimeError("collection failed")
+    assert statements == [] and len(writer) == 0
@@ -0,0 +1,182 @@
+"""
+Parity tests for the dashboard trends engine (tasks/utils/trends_engine.py).
+
+The reference is the list-based construction generate_dashboard_metrics used
+before the array engine, kept here verbatim in its row-driven form. It covers
+the full 90-day build and the one-day incremental slide over a cached JSON.
+The multi-day catch-up (advance_to) is checked against a full build instead.
+Both engines are fed the same random rollup rows, and the JSON must serialise
+byte for byte the same, key order included.
+
+Run:  python -m pytest test_trends_engine.py -q
+"""
+
+import copy
+import json
+import random
+from datetime import date, datetime, timedelta, timezone
+
+from tasks.utils.daily_location_metrics import BAND_FIELDS
+from tasks.utils.trends_engine import TrendCube, window_dates, window_end
+
+TODAY = date(2026, 10, 18)
+
+
+def window(today):
+    return [(today - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(89, -1, -1)]
+
+
+def random_rows(location_ids, first, days, density=0.4, seed=0):
+    rng = random.Random(seed)
+    rows = []
+    for loc in location_ids:
+        for offset in range(days):
+            if rng.random() < density:
+                rows.append((loc, first + timedelta(days=offset),
+                             *[rng.choice([0, 0, 1, 2, 5, None]) for _ in BAND_FIELDS]))
+    return rows
+
+
+# ── Reference (the list implementation) ─────────────────────────────────────
+
+def legacy_full(rows, location_ids, location_names, today):
+    date_range_90 = [(today - timedelta(days=i)) for i in range(89, -1, -1)]
+    date_strings_90 = [d.strftime("%Y-%m-%d") for d in date_range_90]
+    location_data = {}
+    for loc_id in location_ids:
+        location_data[loc_id] = dict({"dates": date_strings_90.copy()}, **{f: [0] * 90 for f in BAND_FIELDS})
+    for row in rows:
+        date_str = row[1].strftime("%Y-%m-%d")
+        if date_str in date_strings_90:
+            idx = date_strings_90.index(date_str)
+            for i, field in enumerate(BAND_FIELDS):
+                location_data[row[0]][field][idx] = row[i + 2] or 0
+    trends = {"all_locations": {}, "by_location": {}}
+    all_locations_90 = {f: [0] * 90 for f in BAND_FIELDS}
+    for loc_id in location_ids:
+        for f in BAND_FIELDS:
+            for i in range(90):
+                all_locations_90[f][i] += location_data[loc_id][f][i]
+    for w in (7, 30, 90):
+        trends["all_locations"][f"{w}_days"] = dict(
+            {"dates": date_strings_90[-w:]}, **{f: all_locations_90[f][-w:] for f in BAND_FIELDS})
+    for loc_id in location_ids:
+        loc_data = location_data[loc_id]
+        trends["by_location"][str(loc_id)] = dict(
+            {"location_name": location_names.get(loc_id, f"Location {loc_id}")},
+            **{f"{w}_days": dict({"dates": loc_data["dates"][-w:]}, **{f: loc_data[f][-w:] for f in BAND_FIELDS})
+               for w in (7, 30, 90)})
+    return trends
+
+
+def legacy_incremental(cached_trends, yesterday_rows, yesterday_str):
+    yesterday_data = {str(row[0]): {f: row[i + 2] or 0 for i, f in enumerate(BAND_FIELDS)}
+                      for row in yesterday_rows}
+    for loc_id_str, loc_data in cached_trends["by_location"].items():
+        counts = yesterday_data.get(loc_id_str, {})
+        loc_data["90_days"]["dates"].append(yesterday_str)
+        loc_data["90_days"]["dates"].pop(0)
+        for field in BAND_FIELDS:
+            series = loc_data["90_days"].setdefault(field, [0] * 90)
+            series.append(counts.get(field, 0))
+            series.pop(0)
+        loc_data["30_days"]["dates"] = loc_data["90_days"]["dates"][-30:]
+        loc_data["7_days"]["dates"] = loc_data["90_days"]["dates"][-7:]
+        for field in BAND_FIELDS:
+            loc_data["30_days"][field] = loc_data["90_days"][field][-30:]
+            loc_data["7_days"][field] = loc_data["90_days"][field][-7:]
+    cached_trends["all_locations"]["90_days"]["dates"].append(yesterday_str)
+    cached_trends["all_locations"]["90_days"]["dates"].pop(0)
+    all_locations_90 = {f: [0] * 90 for f in BAND_FIELDS}
+    for loc_data in cached_trends["by_location"].values():
+        for f in BAND_FIELDS:
+            series = loc_data["90_days"].get(f, [0] * 90)
+            for i in range(90):
+                all_locations_90[f][i] += series[i]
+    cached_trends["all_locations"]["30_days"]["dates"] = cached_trends["all_locations"]["90_days"]["dates"][-30:]
+    cached_trends["all_locations"]["7_days"]["dates"] = cached_trends["all_locations"]["90_days"]["dates"][-7:]
+    for f in BAND_FIELDS:
+        cached_trends["all_locations"]["90_days"][f] = all_locations_90[f]
+        cached_trends["all_locations"]["30_days"][f] = all_locations_90[f][-30:]
+        cached_trends["all_locations"]["7_days"][f] = all_locations_90[f][-7:]
+    return cached_trends
+
+
+# ── Parity ──────────────────────────────────────────────────────────────────
+
+LOCATIONS = [3, 11, 12, 40]
+NAMES = {3: "Surry Hills", 11: "Newtown", 40: "Bondi"}   # 12 falls back to "Location 12"
+
+
+def test_full_build_matches_the_list_implementation():
+    rows = random_rows(LOCATIONS, TODAY - timedelta(days=95), 100)  # some before the window
+    expected = legacy_full(rows, LOCATIONS, NAMES, TODAY)
+    actual = TrendCube.from_rows(LOCATIONS, window(TODAY), rows).to_json(NAMES)
+    assert json.dumps(actual) == json.dumps(expected)
+
+
+def test_incremental_slide_matches_the_list_implementation():
+    cached = legacy_full(random_rows(LOCATIONS, TODAY - timedelta(days=89), 90, seed=1), LOCATIONS, NAMES, TODAY)
+    yesterday_rows = random_rows(LOCATIONS[:3], TODAY, 1, density=1.0, seed=2)
+
+    expected = legacy_incremental(copy.deepcopy(cached), yesterday_rows, TODAY.strftime("%Y-%m-%d"))
+    cube = TrendCube.from_json(copy.deepcopy(cached))
+    cube.roll([TODAY.strftime("%Y-%m-%d")])
+    cube.fill(yesterday_rows)
+    assert json.dumps(cube.to_json(NAMES)) == json.dumps(expected)
+
+
+def test_a_cache_that_predates_a_band_starts_it_at_zero():
+    cached = legacy_full([], LOCATIONS, NAMES, TODAY)
+    for loc_data in cached["by_location"].values():
+        del loc_data["90_days"][BAND_FIELDS[-1]]
+    cube = TrendCube.from_json(cached)
+    assert cube.counts.shape == (len(LOCATIONS), len(BAND_FIELDS), 90)
+    assert not cube.counts.any()
+
+
+def test_rolling_past_the_whole_window_empties_it():
+    cube = TrendCube.from_rows(LOCATIONS, window(TODAY), random_rows(LOCATIONS, TODAY - timedelta(days=89), 90))
+    new_dates = window(TODAY + timedelta(days=120))
+    cube.roll(new_dates)
+    assert cube.dates == new_dates
+    assert not cube.counts.any()
+
+
+def test_windows_are_views_until_serialised():
+    cube = TrendCube.from_rows(LOCATIONS, window(TODAY), [])
+    view = cube.counts[0][:, -7:]
+    cube.counts[0, 0, -1] = 9
+    assert view[0, -1] == 9
+    assert cube.to_json()["by_location"]["3"]["7_days"][BAND_FIELDS[0]][-1] == 9
+
+
+# ── Catch-up ───────────────────────────────────────────────────────────────
+
+def test_window_ends_on_the_latest_local_date():
+    now = datetime(2026, 10, 18, 14, 30, tzinfo=timezone.utc)   # already the 19th in Sydney
+    assert window_end(["America/Los_Angeles"], now) == date(2026, 10, 18)
+    assert window_end(["America/Los_Angeles", "Australia/Sydney"], now) == date(2026, 10, 19)
+    assert window_end(["Not/A_Zone", None], now) == date(2026, 10, 18)
+    assert window_dates(TODAY) == window(TODAY)
+
+
+def test_catching_up_several_days_matches_a_full_build():
+    rows = random_rows(LOCATIONS, TODAY - timedelta(days=89), 95, seed=3)
+    cached_rows = [r for r in rows if r[1] < TODAY] + [(LOCATIONS[0], TODAY, *[1] * len(BAND_FIELDS))]  # today, cut mid-day
+    cached = TrendCube.from_rows(LOCATIONS, window(TODAY), cached_rows).to_json(NAMES)
+
+    end = TODAY + timedelta(days=4)
+    cube = TrendCube.from_json(cached)
+    refresh_from = cube.advance_to(end)
+    assert refresh_from == TODAY
+    cube.fill([r for r in rows if refresh_from <= r[1] <= end])
+    expected = TrendCube.from_rows(LOCATIONS, window(end), rows).to_json(NAMES)
+    assert json.dumps(cube.to_json(NAMES)) == json.dumps(expected)
+
+
+def test_a_gap_of_a_window_or_a_cache_from_the_future_needs_a_full_build():
+    cached = TrendCube.from_rows(LOCATIONS, window(TODAY), []).to_json(NAMES)
+    assert TrendCube.from_json(cached).advance_to(TODAY + timedelta(days=90)) is None
+    assert TrendCube.from_json(cached).advance_to(TODAY - timedelta(days=1)) is None
+    assert TrendCube.from_json(cached).advance_to(TODAY) == TODAY